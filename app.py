@@ -42,6 +42,7 @@ from flask_migrate import Migrate
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
 import time
+import logging
 from datetime import datetime
 
 # Import configuration and utilities
@@ -58,84 +59,63 @@ from utils.email_service import mail, init_mail
 from middleware import init_usage_tracking
 
 # Import professional core systems
-from core.logging_config import setup_logging, cropio_logger
+from core.logging_config import setup_logging, cropio_logger, access_logger
 from core.error_handlers import init_error_handlers, create_error_monitoring_blueprint
+from core.conversion_cache import conversion_cache
+from core.job_queue import job_queue
+from core.usage_accounting import usage_accounting
+from core.usage_rollups import user_stats_cache
+from security.core.rate_limiter import rate_limiter, cleanup_expired_limits
+from core.result_store import result_store, sweep_result_store
+from core.storage_index import storage_index, reconcile_storage_index
+from core.libreoffice_pool import libreoffice_pool
+from core.metrics import app_metrics
 
-# Import all route blueprints
-from routes.main_routes import main_bp
-from routes.image_converter.image_converter_routes import image_converter_bp
-from routes.pdf_converters.pdf_converter_routes import pdf_converter_bp
-from routes.document_converter.document_converter_routes import document_converter_bp  # Old import
-# from routes.document_converter.document_converter_routes import document_converter_bp  # New Document Converter
-from routes.excel_converter.excel_converter_routes import excel_converter_bp
-from routes.file_compressor.file_compressor_routes import file_compressor_bp
-from routes.image_converter.image_cropper_routes import image_cropper_bp
-from routes.pdf_converters.pdf_editor_routes import pdf_editor_bp
-from routes.file_serving_routes import file_serving_bp
-from routes.reverse_converter_routes import reverse_converter_bp
-from routes.text_ocr_converters.text_ocr_routes import text_ocr_bp
-from routes.pdf_converters.secure_pdf_routes import secure_pdf_bp
-from routes.pdf_converters.pdf_merge_routes import pdf_merge_bp
-from routes.pdf_converters.pdf_signature_routes import pdf_signature_bp
-from routes.pdf_converters.pdf_page_delete_routes import pdf_page_delete_bp
-from routes.notebook_converter.notebook_converter_routes import notebook_converter_bp
-from routes.auth_routes import auth_bp
-from routes.dashboard_routes import dashboard_bp
-from routes.presentation_converter.presentation_converter_routes import presentation_converter_bp
-from routes.pdf_converters.pdf_presentation_converter_routes import pdf_presentation_converter_bp
-from routes.pdf_converters.powerbi_converter_routes import powerbi_converter_bp
+from core.capabilities import capability_cache
+from core.blueprint_registry import blueprint_registry
+from routes.jobs_routes import account_finished_jobs  # Background job accounting
 
-# Import API routes
-from routes.api_routes import api_bp
-
-# Import admin routes
-from routes.admin import admin  # Admin routes
-from routes.health_routes import health_bp  # Health check endpoints
-from routes.legal_routes import legal_bp  # Legal pages (Terms, Privacy)
-from routes.analytics_routes import analytics_bp  # Usage Analytics
+# Route blueprints, registered in this order by create_app. Each module's
+# import time is reported at startup; optional ones are skipped if they
+# cannot be imported.
+blueprint_registry.add('routes.main_routes', 'main_bp')
+blueprint_registry.add('routes.image_converter.image_converter_routes', 'image_converter_bp')
+blueprint_registry.add('routes.pdf_converters.pdf_converter_routes', 'pdf_converter_bp')
+blueprint_registry.add('routes.document_converter.document_converter_routes', 'document_converter_bp')
+blueprint_registry.add('routes.excel_converter.excel_converter_routes', 'excel_converter_bp')
+blueprint_registry.add('routes.file_compressor.file_compressor_routes', 'file_compressor_bp')
+blueprint_registry.add('routes.image_converter.image_cropper_routes', 'image_cropper_bp')  # Image Cropper
+blueprint_registry.add('routes.pdf_converters.pdf_editor_routes', 'pdf_editor_bp')
+blueprint_registry.add('routes.file_serving_routes', 'file_serving_bp')
+blueprint_registry.add('routes.reverse_converter_routes', 'reverse_converter_bp')
+blueprint_registry.add('routes.text_ocr_converters.text_ocr_routes', 'text_ocr_bp')
+blueprint_registry.add('routes.pdf_converters.secure_pdf_routes', 'secure_pdf_bp')
+blueprint_registry.add('routes.pdf_converters.pdf_merge_routes', 'pdf_merge_bp')
+blueprint_registry.add('routes.pdf_converters.pdf_signature_routes', 'pdf_signature_bp')
+blueprint_registry.add('routes.pdf_converters.pdf_page_delete_routes', 'pdf_page_delete_bp')
+blueprint_registry.add('routes.notebook_converter.notebook_converter_routes', 'notebook_converter_bp')
+blueprint_registry.add('routes.auth_routes', 'auth_bp')
+blueprint_registry.add('routes.dashboard_routes', 'dashboard_bp')
+blueprint_registry.add('routes.presentation_converter.presentation_converter_routes', 'presentation_converter_bp')  # PPTX to PDF Converter
+blueprint_registry.add('routes.pdf_converters.pdf_presentation_converter_routes', 'pdf_presentation_converter_bp')  # PDF to PPTX Converter
+blueprint_registry.add('routes.pdf_converters.powerbi_converter_routes', 'powerbi_converter_bp')  # PowerBI to PDF Converter
+blueprint_registry.add('routes.api_routes', 'api_bp')  # Global API routes
+blueprint_registry.add('routes.health_routes', 'health_bp')  # Health check endpoints
+blueprint_registry.add('routes.admin', 'admin')  # Admin routes
+blueprint_registry.add('routes.legal_routes', 'legal_bp')  # Legal pages (Terms, Privacy)
+blueprint_registry.add('routes.analytics_routes', 'analytics_bp')  # Usage Analytics
+blueprint_registry.add('routes.jobs_routes', 'jobs_bp')  # Background job status
 # from routes.universal_converter_routes import universal_converter_bp  # Commented out due to missing dependencies
 
 # Phase 1.5 - New converter blueprints (with unique names to avoid conflicts)
-try:
-    from routes.latex_pdf_routes import latex_pdf_bp as latex_pdf_doc_bp
-except:
-    latex_pdf_doc_bp = None
-    
-try:
-    from routes.document.markdown_html_converter_routes import markdown_html_converter_bp
-except:
-    markdown_html_converter_bp = None
-    
-try:
-    from routes.image.heic_jpg_routes import heic_jpg_bp as heic_jpg_img_bp
-except:
-    heic_jpg_img_bp = None
-    
-try:
-    from routes.image.raw_jpg_routes import raw_jpg_bp
-except:
-    raw_jpg_bp = None
-    
-try:
-    from routes.image.gif_png_sequence_routes import gif_png_sequence_bp
-except:
-    gif_png_sequence_bp = None
-    
-try:
-    from routes.image.gif_mp4_routes import gif_mp4_bp
-except:
-    gif_mp4_bp = None
-
-try:
-    from routes.web_code.html_pdf_snapshot_routes import html_pdf_snapshot_bp
-except:
-    html_pdf_snapshot_bp = None
-    
-    
-try:
-    from routes.web_code.yaml_json_routes import yaml_json_bp
-except:
-    yaml_json_bp = None
+blueprint_registry.add('routes.latex_pdf_routes', 'latex_pdf_bp', optional=True)  # Document LaTeX converter
+blueprint_registry.add('routes.image.heic_jpg_routes', 'heic_jpg_bp', optional=True)  # Image HEIC converter
+blueprint_registry.add('routes.web_code.yaml_json_routes', 'yaml_json_bp', optional=True)  # Web Code YAML/JSON converter
+blueprint_registry.add('routes.document.markdown_html_converter_routes', 'markdown_html_converter_bp', optional=True)
+blueprint_registry.add('routes.image.raw_jpg_routes', 'raw_jpg_bp', optional=True)
+blueprint_registry.add('routes.image.gif_png_sequence_routes', 'gif_png_sequence_bp', optional=True)
+blueprint_registry.add('routes.image.gif_mp4_routes', 'gif_mp4_bp', optional=True)
+blueprint_registry.add('routes.web_code.html_pdf_snapshot_routes', 'html_pdf_snapshot_bp', optional=True)  # Web Code HTML PDF Snapshot converter
 
 def setup_latex_environment():
     """Setup LaTeX environment for the application"""
@@ -219,6 +199,61 @@ def create_app():
     except Exception as e:
         cropio_logger.warning(f"Usage tracking initialization failed: {e}")
     
+    # Initialize conversion result cache
+    try:
+        conversion_cache.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Conversion cache initialization failed: {e}")
+    
+    # Initialize write-behind usage accounting
+    try:
+        usage_accounting.init_app(app)
+        user_stats_cache.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Usage accounting initialization failed: {e}")
+    
+    # Initialize background job queue
+    try:
+        job_queue.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Job queue initialization failed: {e}")
+    
+    # Initialize shared rate limit storage
+    try:
+        rate_limiter.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Rate limiter initialization failed: {e}")
+    
+    # Initialize shared conversion result store
+    try:
+        result_store.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Result store initialization failed: {e}")
+    
+    # Initialize warm LibreOffice pool for office conversions
+    try:
+        libreoffice_pool.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"LibreOffice pool initialization failed: {e}")
+    
+    # Initialize storage accounting index
+    try:
+        storage_index.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Storage index initialization failed: {e}")
+    
+    # Initialize cached backend capability probes
+    try:
+        capability_cache.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Capability cache initialization failed: {e}")
+    
+    # Initialize request, conversion and job metrics
+    try:
+        app_metrics.init_app(app)
+    except Exception as e:
+        cropio_logger.warning(f"Metrics initialization failed: {e}")
+    
     # Setup database migrations
     migrate = Migrate(app, db)
     
@@ -238,25 +273,18 @@ def create_app():
             if client_ip and ',' in client_ip:
                 client_ip = client_ip.split(',')[0].strip()
             
-            # Format timestamp
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
-            
-            # Log all requests with detailed information
-            log_message = f"{client_ip} - - [{datetime.now().strftime('%d/%b/%Y %H:%M:%S')}] \"{request.method} {request.path}"
-            if request.query_string:
-                log_message += f"?{request.query_string.decode()}"
-            log_message += f" {request.environ.get('SERVER_PROTOCOL', 'HTTP/1.1')}\" {response.status_code} -"
-            
-            # Print to console with color (skip static files for cleaner logs)
+            # Log all requests with detailed information (skip static files for cleaner logs)
             if not request.path.startswith('/static/'):
-                if response.status_code >= 500:
-                    print(f"\033[91m{timestamp} - werkzeug - INFO - {log_message}\033[0m")  # Red for errors
-                elif response.status_code >= 400:
-                    print(f"\033[93m{timestamp} - werkzeug - INFO - {log_message}\033[0m")  # Yellow for client errors
-                elif response.status_code >= 300:
-                    print(f"\033[94m{timestamp} - werkzeug - INFO - {log_message}\033[0m")  # Blue for redirects
-                else:
-                    print(f"\033[92m{timestamp} - werkzeug - INFO - {log_message}\033[0m")  # Green for success
+                path = request.path
+                if request.query_string:
+                    path += f"?{request.query_string.decode()}"
+                level = logging.INFO if response.status_code < 400 else logging.WARNING
+                access_logger.log(
+                    level, '%s - - [%s] "%s %s %s" %s -',
+                    client_ip, datetime.now().strftime('%d/%b/%Y %H:%M:%S'), request.method, path,
+                    request.environ.get('SERVER_PROTOCOL', 'HTTP/1.1'), response.status_code,
+                    extra={'status_code': response.status_code, 'duration': duration}
+                )
             
             # Log slow requests separately
             if duration > 2.0:
@@ -287,50 +315,7 @@ def create_app():
     
     # Register blueprints
     try:
-        app.register_blueprint(main_bp)
-        app.register_blueprint(image_converter_bp)
-        app.register_blueprint(pdf_converter_bp)
-        app.register_blueprint(document_converter_bp)
-        app.register_blueprint(excel_converter_bp)
-        app.register_blueprint(file_compressor_bp)
-        app.register_blueprint(image_cropper_bp)  # Image Cropper
-        app.register_blueprint(pdf_editor_bp)
-        app.register_blueprint(file_serving_bp)
-        app.register_blueprint(reverse_converter_bp)
-        app.register_blueprint(text_ocr_bp)
-        app.register_blueprint(secure_pdf_bp)
-        app.register_blueprint(pdf_merge_bp)
-        app.register_blueprint(pdf_signature_bp)
-        app.register_blueprint(pdf_page_delete_bp)
-        app.register_blueprint(notebook_converter_bp)
-        app.register_blueprint(auth_bp)
-        app.register_blueprint(dashboard_bp)
-        app.register_blueprint(presentation_converter_bp)  # PPTX to PDF Converter
-        app.register_blueprint(pdf_presentation_converter_bp)  # PDF to PPTX Converter
-        app.register_blueprint(powerbi_converter_bp)  # PowerBI to PDF Converter
-        app.register_blueprint(api_bp)  # Global API routes
-        app.register_blueprint(health_bp)  # Health check endpoints
-        app.register_blueprint(admin)
-        app.register_blueprint(legal_bp)  # Legal pages
-        app.register_blueprint(analytics_bp)  # Usage Analytics
-        
-        # Register new organized converter blueprints
-        if latex_pdf_doc_bp:
-            app.register_blueprint(latex_pdf_doc_bp)  # Document LaTeX converter
-        if heic_jpg_img_bp:
-            app.register_blueprint(heic_jpg_img_bp)   # Image HEIC converter
-        if yaml_json_bp:
-            app.register_blueprint(yaml_json_bp)      # Web Code YAML/JSON converter
-        if markdown_html_converter_bp:
-            app.register_blueprint(markdown_html_converter_bp)
-        if raw_jpg_bp:
-            app.register_blueprint(raw_jpg_bp)
-        if gif_png_sequence_bp:
-            app.register_blueprint(gif_png_sequence_bp)
-        if gif_mp4_bp:
-            app.register_blueprint(gif_mp4_bp)
-        if html_pdf_snapshot_bp:
-            app.register_blueprint(html_pdf_snapshot_bp)  # Web Code HTML PDF Snapshot converter
+        blueprint_registry.register_all(app)
         
         cropio_logger.info("All blueprints registered successfully")
         
@@ -352,6 +337,13 @@ app = create_app()
 # Background Scheduler for File Cleanup
 scheduler = BackgroundScheduler(daemon=True)
 scheduler.add_job(cleanup_files, 'interval', minutes=30)
+scheduler.add_job(account_finished_jobs, 'interval', minutes=1, args=[app])
+scheduler.add_job(cleanup_expired_limits, 'interval', minutes=10)
+scheduler.add_job(sweep_result_store, 'interval', minutes=1)
+# Index files written without the storage hooks; right away when the index is new
+reconcile_start = {'next_run_time': datetime.now()} if storage_index.is_empty() else {}
+scheduler.add_job(reconcile_storage_index, 'interval',
+                  minutes=app.config.get('STORAGE_RECONCILE_MINUTES', 1440), **reconcile_start)
 scheduler.start()
 
 # Graceful shutdown handler
@@ -364,6 +356,11 @@ def shutdown_handler():
     except Exception as e:
         cropio_logger.error(f"Error during scheduler shutdown: {e}")
     
+    try:
+        libreoffice_pool.shutdown()
+    except Exception as e:
+        cropio_logger.error(f"Error during LibreOffice pool shutdown: {e}")
+    
     cropio_logger.info("Cropio SaaS Platform shutdown complete")
 
 # Route to serve uploaded files
@@ -371,6 +368,7 @@ def shutdown_handler():
 def uploaded_file(filename):
     """Serve uploaded files"""
     from flask import send_from_directory
+    storage_index.mark_served(os.path.join(app.config['UPLOAD_FOLDER'], filename))
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 # Register shutdown handler
@@ -99,11 +99,21 @@ def setup_directories(app):
     app.config['UPLOAD_FOLDER'] = os.path.join(base_dir, 'uploads')
     app.config['COMPRESSED_FOLDER'] = os.path.join(base_dir, 'compressed')
     app.config['OUTPUT_FOLDER'] = os.path.join(base_dir, 'outputs')
+    app.config['CONVERSION_CACHE_FOLDER'] = os.path.join(base_dir, 'cache')
+    app.config['JOB_QUEUE_FOLDER'] = os.path.join(base_dir, 'jobs')
+    app.config['RATE_LIMIT_FOLDER'] = os.path.join(base_dir, 'ratelimit')
+    app.config['RESULT_STORE_FOLDER'] = os.path.join(base_dir, 'results')
+    app.config['STORAGE_INDEX_FOLDER'] = os.path.join(base_dir, 'storage')
     app.config['ALLOWED_CROP_EXTENSIONS'] = ALLOWED_CROP_EXTENSIONS
     
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['COMPRESSED_FOLDER'], exist_ok=True)
     os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['CONVERSION_CACHE_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['JOB_QUEUE_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['RATE_LIMIT_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['RESULT_STORE_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['STORAGE_INDEX_FOLDER'], exist_ok=True)
 
 
 # --- Professional Configuration Classes ---
@@ -144,6 +154,34 @@ class BaseConfig:
     REQUEST_TIMEOUT = get_env_int('REQUEST_TIMEOUT', 120)  # 2 minutes for large documents
     SEND_FILE_MAX_AGE = get_env_int('SEND_FILE_MAX_AGE', 31536000)  # Cache compiled PDFs
     
+    # Conversion Result Cache
+    CONVERSION_CACHE_ENABLED = get_env_bool('CONVERSION_CACHE_ENABLED', True)
+    CONVERSION_CACHE_MAX_BYTES = get_env_int('CONVERSION_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024)  # 2GB
+    CONVERSION_CACHE_TTL = get_env_int('CONVERSION_CACHE_TTL', 24 * 3600)  # 24 hours
+    
+    # Background Job Queue (heavy conversions run outside gunicorn workers)
+    JOB_QUEUE_ENABLED = get_env_bool('JOB_QUEUE_ENABLED', True)
+    JOB_WORKERS = get_env_int('JOB_WORKERS', 2)
+    JOB_WORKERS_AUTOSTART = get_env_bool('JOB_WORKERS_AUTOSTART', True)  # Disable when running `python -m core.job_queue` as a service
+    JOB_TIMEOUT = get_env_int('JOB_TIMEOUT', 900)  # 15 minutes per job
+    JOB_RESULT_TTL = get_env_int('JOB_RESULT_TTL', 3600)  # Keep results for 1 hour
+    
+    # Warm headless LibreOffice instances for office conversions
+    LIBREOFFICE_PATH = get_env_var('LIBREOFFICE_PATH')  # Found on PATH when unset
+    LIBREOFFICE_POOL_SIZE = get_env_int('LIBREOFFICE_POOL_SIZE', 2)  # Instances per process; 0 disables the pool
+    LIBREOFFICE_MAX_CONVERSIONS = get_env_int('LIBREOFFICE_MAX_CONVERSIONS', 50)  # Restart an instance after this many
+    LIBREOFFICE_TIMEOUT = get_env_int('LIBREOFFICE_TIMEOUT', 300)  # Seconds per conversion, including queueing
+    
+    # Backend capability probes (test renders, binary checks), reused across restarts
+    CAPABILITY_CACHE_FILE = get_env_var('CAPABILITY_CACHE_FILE')  # Defaults to <cache folder>/capabilities.json
+    CAPABILITY_CACHE_TTL = get_env_int('CAPABILITY_CACHE_TTL', 24 * 3600)  # Re-probe after this many seconds
+    
+    # Write-behind usage accounting
+    USAGE_WRITE_BEHIND_ENABLED = get_env_bool('USAGE_WRITE_BEHIND_ENABLED', True)
+    USAGE_FLUSH_INTERVAL = get_env_int('USAGE_FLUSH_INTERVAL', 2)  # seconds
+    USAGE_FLUSH_MAX_PENDING = get_env_int('USAGE_FLUSH_MAX_PENDING', 100)  # events before an early flush
+    DASHBOARD_STATS_TTL = get_env_int('DASHBOARD_STATS_TTL', 30)  # seconds to cache per-user dashboard stats
+    
     # Email Configuration
     MAIL_SERVER = get_env_var('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = get_env_int('MAIL_PORT', 587)
@@ -163,6 +201,15 @@ class BaseConfig:
     LOG_MAX_BYTES = get_env_int('LOG_MAX_BYTES', 10485760)  # 10MB
     LOG_BACKUP_COUNT = get_env_int('LOG_BACKUP_COUNT', 5)
     LOG_DIR = get_env_var('LOG_DIR', 'logs')
+    LOG_ASYNC = get_env_bool('LOG_ASYNC', True)  # Queue records for one writer process instead of writing inline
+    LOG_QUEUE_SIZE = get_env_int('LOG_QUEUE_SIZE', 10000)  # Records buffered per process before new ones are dropped
+    LOG_RATE_LIMIT = get_env_int('LOG_RATE_LIMIT', 50)  # Per message template per second, below ERROR; 0 disables
+    LOG_SAMPLE_RATES = get_env_var('LOG_SAMPLE_RATES', '')  # e.g. "cropio.requests=0.1" keeps 10% of request lines
+    
+    # Metrics (Prometheus format at /api/metrics)
+    METRICS_ENABLED = get_env_bool('METRICS_ENABLED', True)
+    METRICS_SAMPLE_INTERVAL = get_env_int('METRICS_SAMPLE_INTERVAL', 15)  # Seconds between system gauge samples
+    METRICS_TOKEN = get_env_var('METRICS_TOKEN', '')  # Bearer token required to scrape, if set
     
     # Security Headers
     SECURITY_HEADERS = {
@@ -176,6 +223,18 @@ class BaseConfig:
     # Rate Limiting
     RATELIMIT_STORAGE_URL = get_env_var('REDIS_URL', 'redis://localhost:6379/1')
     RATELIMIT_HEADERS_ENABLED = True
+    RATE_LIMIT_BACKEND = get_env_var('RATE_LIMIT_BACKEND', 'auto')  # auto, memory, sqlite or redis
+    RATE_LIMIT_REDIS_URL = get_env_var('REDIS_URL')  # auto uses Redis only when configured
+    
+    # Shared conversion results and one-time tokens
+    RESULT_STORE_BACKEND = get_env_var('RESULT_STORE_BACKEND', 'auto')  # auto, memory, disk or redis
+    RESULT_STORE_REDIS_URL = get_env_var('REDIS_URL')
+    RESULT_STORE_HOST_ID = get_env_var('RESULT_STORE_HOST_ID')  # Defaults to the hostname; unique per filesystem
+    
+    # Storage accounting index (admin storage stats and file cleanup)
+    STORAGE_INDEX_ENABLED = get_env_bool('STORAGE_INDEX_ENABLED', True)
+    STORAGE_FILE_TTL = get_env_int('STORAGE_FILE_TTL', 3600)  # Delete uploads and outputs 1 hour after writing
+    STORAGE_RECONCILE_MINUTES = get_env_int('STORAGE_RECONCILE_MINUTES', 1440)  # Rescan for files written without the index
     
     # Payment Configuration (Optional)
     RAZORPAY_KEY_ID = get_env_var('RAZORPAY_KEY_ID')
@@ -299,6 +358,7 @@ class TestingConfig(BaseConfig):
     # Disable features that interfere with testing
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    USAGE_WRITE_BEHIND_ENABLED = False  # Write usage immediately so tests can assert on it
     
     # Fast testing settings
     SQLALCHEMY_ENGINE_OPTIONS = {
@@ -0,0 +1,114 @@
+"""
+Blueprint Registry for Cropio SaaS Platform
+Imports and registers route modules with a per-module startup-time report
+"""
+import time
+import importlib
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from core.logging_config import cropio_logger
+from core.lazy_imports import import_timings, load_all
+
+
+# Modules taking longer than this to import are called out in the startup log
+SLOW_IMPORT_SECONDS = 0.5
+
+
+class BlueprintRegistry:
+    """
+    Declarative list of the application's blueprints.
+
+    Each entry names a route module and the blueprint attribute in it.
+    ``register_all`` imports the modules in order, registers their
+    blueprints and records how long each import took. A required module
+    that fails to import is an error; an optional one is skipped with a
+    warning. Route modules keep their heavy libraries behind
+    ``core.lazy_imports`` so importing them stays cheap; ``warm_up`` runs
+    hooks that load those libraries ahead of the first request, e.g. in a
+    freshly forked worker.
+    """
+
+    def __init__(self):
+        self._entries: List[Dict[str, Any]] = []
+        self._warmups: List[Callable[[], Any]] = []
+        self._report: List[Dict[str, Any]] = []
+        self._warmed = False
+        self._lock = threading.Lock()
+
+    def add(self, module: str, attr: str, optional: bool = False):
+        """Declare a blueprint by module path and attribute name"""
+        self._entries.append({'module': module, 'attr': attr, 'optional': optional})
+
+    def warmup(self, func: Callable[[], Any]) -> Callable[[], Any]:
+        """Decorator registering a hook for ``warm_up``"""
+        self._warmups.append(func)
+        return func
+
+    def register_all(self, app) -> List[Dict[str, Any]]:
+        """
+        Import every declared module and register its blueprint on ``app``.
+
+        Returns the startup report. Raises the import error of the first
+        required module that cannot be loaded.
+        """
+        report = []
+        for entry in self._entries:
+            started = time.perf_counter()
+            record = {'module': entry['module'], 'blueprint': entry['attr'], 'status': 'registered'}
+            try:
+                module = importlib.import_module(entry['module'])
+                app.register_blueprint(getattr(module, entry['attr']))
+            except Exception as e:
+                if not entry['optional']:
+                    raise
+                record['status'] = 'unavailable'
+                record['error'] = str(e)
+                cropio_logger.warning(f"Optional blueprint {entry['module']} not loaded: {e}")
+            record['seconds'] = round(time.perf_counter() - started, 4)
+            report.append(record)
+
+        self._report = report
+        total = sum(record['seconds'] for record in report)
+        slow = [r for r in report if r['seconds'] >= SLOW_IMPORT_SECONDS]
+        cropio_logger.info(f"Registered {len(report)} blueprint modules in {total:.2f}s")
+        for record in sorted(slow, key=lambda r: r['seconds'], reverse=True):
+            cropio_logger.info(f"Slow blueprint import: {record['module']} took {record['seconds']:.2f}s")
+        return report
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Load deferred libraries and run warm-up hooks once per process.
+
+        Returns seconds per hook; lazily imported modules are reported
+        under ``lazy_imports``.
+        """
+        with self._lock:
+            if self._warmed:
+                return {}
+            self._warmed = True
+
+        timings = {'lazy_imports': round(sum(load_all().values()), 4)}
+        for hook in self._warmups:
+            name = f"{hook.__module__}.{hook.__name__}"
+            started = time.perf_counter()
+            try:
+                hook()
+            except Exception as e:
+                cropio_logger.warning(f"Warm-up hook {name} failed: {e}")
+            timings[name] = round(time.perf_counter() - started, 4)
+        cropio_logger.info(f"Warm-up finished in {sum(timings.values()):.2f}s")
+        return timings
+
+    def get_report(self) -> Dict[str, Any]:
+        """Startup-time report: blueprint imports and lazy imports loaded so far"""
+        return {
+            'blueprints': list(self._report),
+            'total_seconds': round(sum(r['seconds'] for r in self._report), 4),
+            'lazy_imports': import_timings(),
+            'warmed_up': self._warmed,
+        }
+
+
+# Global blueprint registry instance
+blueprint_registry = BlueprintRegistry()
@@ -0,0 +1,141 @@
+"""
+Cached Backend Capability Probes for Cropio SaaS Platform
+Remembers which optional conversion backends work on this host across restarts
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+from importlib import metadata
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from core.logging_config import cropio_logger
+
+
+DEFAULT_TTL_SECONDS = 24 * 3600  # 24 hours
+
+
+def package_fingerprint(packages: Iterable[str]) -> str:
+    """Installed versions of ``packages``; a probe is redone when this changes"""
+    versions = []
+    for package in packages:
+        try:
+            versions.append(f"{package}={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}=missing")
+    return ';'.join(versions)
+
+
+class CapabilityCache:
+    """
+    Results of expensive backend probes (test renders, binary checks).
+
+    Results are kept in memory for the life of the process and in a JSON
+    file shared by every worker on the host, keyed by probe name and a
+    fingerprint of the packages involved, so a restarted worker reuses them
+    instead of probing again. Only memory is used until ``init_app`` is
+    called.
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self.ttl_seconds = DEFAULT_TTL_SECONDS
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the cache file location from Flask app configuration"""
+        self.path = app.config.get('CAPABILITY_CACHE_FILE') or os.path.join(
+            app.config.get('CONVERSION_CACHE_FOLDER', 'cache'), 'capabilities.json'
+        )
+        self.ttl_seconds = app.config.get('CAPABILITY_CACHE_TTL', DEFAULT_TTL_SECONDS)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def _read_file(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: Dict[str, Dict[str, Any]]):
+        if not self.path:
+            return
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            cropio_logger.warning(f"Could not save capability cache: {e}")
+
+    def _fresh(self, entry: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+        return (
+            entry is not None
+            and entry.get('fingerprint') == fingerprint
+            and time.time() - entry.get('probed_at', 0) < self.ttl_seconds
+        )
+
+    def get(self, name: str, probe: Callable[[], Any], packages: Iterable[str] = ()) -> Any:
+        """
+        Result of ``probe()`` for ``name``, probing only when no fresh result exists.
+
+        The result must be JSON serializable.
+        """
+        fingerprint = package_fingerprint(packages)
+
+        with self._lock:
+            entry = self._results.get(name)
+            if not self._fresh(entry, fingerprint):
+                entry = self._read_file().get(name)
+                if self._fresh(entry, fingerprint):
+                    self._results[name] = entry
+            if self._fresh(entry, fingerprint):
+                return entry['result']
+
+            started = time.perf_counter()
+            result = probe()
+            entry = {
+                'fingerprint': fingerprint,
+                'result': result,
+                'probed_at': time.time(),
+                'probe_seconds': round(time.perf_counter() - started, 4),
+            }
+            self._results[name] = entry
+            data = self._read_file()
+            data[name] = entry
+            self._save(data)
+
+        cropio_logger.info(f"Capability probe '{name}' took {entry['probe_seconds']}s")
+        return result
+
+    def invalidate(self, name: Optional[str] = None):
+        """Forget one probe result, or all of them, so the next lookup probes again"""
+        with self._lock:
+            if name is None:
+                self._results.clear()
+                if self.path and os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            self._results.pop(name, None)
+            data = self._read_file()
+            if data.pop(name, None) is not None:
+                self._save(data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {'result': entry['result'], 'probe_seconds': entry.get('probe_seconds')}
+                for name, entry in self._results.items()
+            }
+
+
+# Global capability cache instance
+capability_cache = CapabilityCache()
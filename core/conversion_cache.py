@@ -0,0 +1,381 @@
+"""
+Content-Addressed Conversion Result Cache for Cropio SaaS Platform
+Reuses converter outputs when the same input is converted with the same options
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import inspect
+import tempfile
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.logging_config import cropio_logger
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2GB
+DEFAULT_TTL_SECONDS = 24 * 3600  # 24 hours
+
+
+def canonicalize_options(options: Optional[Dict[str, Any]]) -> str:
+    """Serialize an options dict to a stable string for cache keys"""
+    def normalize(value):
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        if isinstance(value, (set, frozenset)):
+            return sorted(normalize(v) for v in value)
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
+
+    return json.dumps(normalize(options or {}), sort_keys=True, separators=(',', ':'))
+
+
+def make_cache_key(input_sha256: str, converter: str, version: str,
+                   options: Optional[Dict[str, Any]] = None) -> str:
+    """Build the cache key for an input hash, converter and options"""
+    material = f"{converter}\0{version}\0{input_sha256}\0{canonicalize_options(options)}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ConversionCache:
+    """
+    On-disk conversion cache with size-bounded LRU eviction.
+
+    Blobs live under ``<folder>/<key[:2]>/<key>`` and are indexed in a SQLite
+    database, so every gunicorn worker on the host shares the same entries
+    and hit/miss counters. The cache is disabled until ``init_app`` is called.
+    """
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.ttl_seconds = DEFAULT_TTL_SECONDS
+        self.enabled = False
+        self._local = threading.local()
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the cache with Flask app configuration"""
+        self.enabled = app.config.get('CONVERSION_CACHE_ENABLED', True)
+        self.folder = app.config.get('CONVERSION_CACHE_FOLDER') or os.path.join(
+            os.path.dirname(app.config.get('UPLOAD_FOLDER', 'uploads')), 'cache'
+        )
+        self.max_bytes = app.config.get('CONVERSION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.ttl_seconds = app.config.get('CONVERSION_CACHE_TTL', DEFAULT_TTL_SECONDS)
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        self._create_schema()
+        cropio_logger.info(f"Conversion cache initialized: {self.folder}")
+
+    # ------------------------------------------------------------------
+    # Index storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'folder', None) != self.folder:
+            conn = sqlite3.connect(os.path.join(self.folder, 'index.sqlite3'), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.folder = self.folder
+        return conn
+
+    def _create_schema(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY, converter TEXT NOT NULL, size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL, last_access REAL NOT NULL, result TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_created_at ON entries (created_at)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats ('
+                ' converter TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0,'
+                ' misses INTEGER NOT NULL DEFAULT 0, stores INTEGER NOT NULL DEFAULT 0,'
+                ' evictions INTEGER NOT NULL DEFAULT 0)'
+            )
+
+    def _count(self, conn: sqlite3.Connection, converter: str, field: str, amount: int = 1) -> None:
+        conn.execute(
+            f'INSERT INTO stats (converter, {field}) VALUES (?, ?) '
+            f'ON CONFLICT(converter) DO UPDATE SET {field} = {field} + excluded.{field}',
+            (converter, amount)
+        )
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], key)
+
+    def _remove_blob(self, key: str) -> None:
+        try:
+            os.remove(self._blob_path(key))
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def fetch(self, key: str, output_path: str, converter: str = 'unknown') -> Tuple[bool, Any]:
+        """
+        Copy a cached result to output_path.
+
+        Returns (hit, stored_result). A miss is counted against ``converter``.
+        """
+        if not self.enabled:
+            return False, None
+
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT created_at, result FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+
+            now = time.time()
+            if row and now - row[0] <= self.ttl_seconds:
+                try:
+                    output_dir = os.path.dirname(output_path)
+                    if output_dir:
+                        os.makedirs(output_dir, exist_ok=True)
+                    shutil.copyfile(self._blob_path(key), output_path)
+                except FileNotFoundError:
+                    pass  # Blob removed behind the index; treat as a stale entry
+                else:
+                    with conn:
+                        conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+                        self._count(conn, converter, 'hits')
+                    return True, json.loads(row[1]) if row[1] else None
+
+            with conn:
+                if row is not None:
+                    conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    self._remove_blob(key)
+                self._count(conn, converter, 'misses')
+        except Exception as e:
+            cropio_logger.warning(f"Conversion cache lookup failed: {e}")
+
+        return False, None
+
+    def store(self, key: str, output_path: str, converter: str = 'unknown',
+              result: Any = None) -> bool:
+        """Store a converter output file under key"""
+        if not self.enabled or not os.path.isfile(output_path):
+            return False
+
+        try:
+            size = os.path.getsize(output_path)
+            if size == 0 or size > self.max_bytes:
+                return False
+
+            blob_path = self._blob_path(key)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+            # Copy to a temp file first so readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as out, open(output_path, 'rb') as src:
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+                os.replace(tmp_path, blob_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            now = time.time()
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, converter, size, created_at, last_access, result) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, converter, size, now, now, json.dumps(result, default=str))
+                )
+                self._count(conn, converter, 'stores')
+
+            self._evict_to_budget()
+            return True
+        except Exception as e:
+            cropio_logger.warning(f"Conversion cache store failed: {e}")
+            return False
+
+    def _evict_to_budget(self) -> int:
+        """Evict least recently used entries until the cache fits max_bytes"""
+        conn = self._connect()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        rows = conn.execute('SELECT key, converter, size FROM entries ORDER BY last_access').fetchall()
+        with conn:
+            for key, converter, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._count(conn, converter, 'evictions')
+                self._remove_blob(key)
+                total -= size
+                evicted += 1
+
+        return evicted
+
+    def purge_expired(self) -> Dict[str, int]:
+        """Delete entries older than the TTL (run from the cleanup scheduler)"""
+        if not self.enabled:
+            return {'deleted': 0, 'size_freed': 0}
+
+        deleted = 0
+        size_freed = 0
+        try:
+            conn = self._connect()
+            cutoff = time.time() - self.ttl_seconds
+            rows = conn.execute(
+                'SELECT key, size FROM entries WHERE created_at < ?', (cutoff,)
+            ).fetchall()
+            with conn:
+                for key, size in rows:
+                    conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    self._remove_blob(key)
+                    deleted += 1
+                    size_freed += size
+        except Exception as e:
+            cropio_logger.warning(f"Conversion cache purge failed: {e}")
+
+        return {'deleted': deleted, 'size_freed': size_freed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit/miss counters for the admin system page"""
+        stats = {
+            'enabled': self.enabled,
+            'entries': 0,
+            'total_size': 0,
+            'max_size': self.max_bytes,
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'hit_rate': 0.0,
+            'by_converter': {}
+        }
+        if not self.enabled:
+            return stats
+
+        try:
+            conn = self._connect()
+            stats['entries'], stats['total_size'] = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+
+            for converter, hits, misses, stores, evictions in conn.execute(
+                'SELECT converter, hits, misses, stores, evictions FROM stats ORDER BY converter'
+            ):
+                stats['by_converter'][converter] = {
+                    'hits': hits, 'misses': misses, 'stores': stores, 'evictions': evictions
+                }
+                stats['hits'] += hits
+                stats['misses'] += misses
+                stats['stores'] += stores
+                stats['evictions'] += evictions
+
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups * 100, 1) if lookups else 0.0
+        except Exception as e:
+            cropio_logger.warning(f"Conversion cache stats failed: {e}")
+
+        return stats
+
+    def run(self, converter: str, version: str, input_path: str, output_path: str,
+            options: Optional[Dict[str, Any]], func: Callable[[], Any],
+            input_sha256: Optional[str] = None,
+            is_success: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Return a cached result for this conversion or run func and cache its output.
+
+        func must write its output to output_path. Its return value is stored
+        alongside the output and returned again on cache hits.
+        """
+        if not self.enabled:
+            return func()
+
+        try:
+            if input_sha256 is None:
+                from core.file_manager import file_manager
+                input_sha256 = file_manager.calculate_file_hashes(input_path)['sha256']
+            key = make_cache_key(input_sha256, converter, version, options)
+        except Exception as e:
+            cropio_logger.warning(f"Conversion cache key failed: {e}")
+            return func()
+
+        hit, stored = self.fetch(key, output_path, converter)
+        if hit:
+            return tuple(stored) if isinstance(stored, list) else stored
+
+        result = func()
+        if (is_success or _is_successful_result)(result):
+            self.store(key, output_path, converter, result)
+        return result
+
+
+def _is_successful_result(result: Any) -> bool:
+    """Converters return either a bool or a (success, message) tuple"""
+    if isinstance(result, tuple):
+        return bool(result) and result[0] is True
+    return result is True
+
+
+def cached_conversion(converter: str, version: str = '1',
+                      input_arg: str = 'input_path', output_arg: str = 'output_path'):
+    """
+    Decorator caching a converter function by input hash and arguments.
+
+    Every argument except the input/output paths (and ``self``) is treated as
+    a conversion option. Bump ``version`` when the converter's output changes.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not conversion_cache.enabled:
+                return func(*args, **kwargs)
+
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+            except TypeError:
+                return func(*args, **kwargs)
+
+            options = {}
+            for name, value in bound.arguments.items():
+                if name in ('self', input_arg, output_arg):
+                    continue
+                if signature.parameters[name].kind == inspect.Parameter.VAR_KEYWORD:
+                    options.update(value)
+                else:
+                    options[name] = value
+
+            return conversion_cache.run(
+                converter, version,
+                bound.arguments[input_arg], bound.arguments[output_arg],
+                options, lambda: func(*args, **kwargs)
+            )
+
+        return wrapper
+    return decorator
+
+
+# Global conversion cache instance
+conversion_cache = ConversionCache()
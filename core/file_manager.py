@@ -3,7 +3,9 @@ Professional File Management System for Cropio SaaS Platform
 Implements secure file handling, validation, cleanup, and monitoring
 """
 import os
+import re
 import shutil
+import base64
 import hashlib
 import time
 from pathlib import Path
@@ -13,6 +15,7 @@ from dataclasses import dataclass
 from flask import current_app
 from werkzeug.utils import secure_filename
 from core.logging_config import cropio_logger
+from core.storage_index import storage_index
 
 # Try to import python-magic, fall back to filetype if not available
 try:
@@ -60,6 +63,12 @@ class MaliciousFileError(FileValidationError):
     pass
 
 
+# Chunk size used when streaming uploads and scanning files
+STREAM_CHUNK_SIZE = 64 * 1024
+# Number of leading bytes checked for dangerous signatures
+SIGNATURE_HEADER_BYTES = 1024
+
+
 class FileSecurityValidator:
     """Advanced file security validation"""
     
@@ -105,6 +114,24 @@ class FileSecurityValidator:
             self.mime_checker = None
             self.file_checker = None
     
+    def get_mime_type_from_buffer(self, header: bytes) -> str:
+        """Get MIME type from the leading bytes of a file"""
+        if MAGIC_AVAILABLE and self.mime_checker:
+            try:
+                return self.mime_checker.from_buffer(header)
+            except Exception as e:
+                cropio_logger.warning(f"Magic MIME detection failed: {e}")
+        
+        # Fallback to filetype
+        try:
+            kind = filetype.guess(header)
+            if kind:
+                return kind.mime
+        except Exception as e:
+            cropio_logger.warning(f"Filetype MIME detection failed: {e}")
+        
+        return "application/octet-stream"
+    
     def get_mime_type(self, file_path: str) -> str:
         """Get MIME type using available library"""
         if MAGIC_AVAILABLE and self.mime_checker:
@@ -129,18 +156,9 @@ class FileSecurityValidator:
         
         try:
             with open(file_path, 'rb') as f:
-                header = f.read(1024)  # Read first 1KB
-            
-            # Check for dangerous signatures
-            for signature, description in self.DANGEROUS_SIGNATURES.items():
-                if header.startswith(signature):
-                    errors.append(f"Dangerous file signature detected: {description}")
+                header = f.read(SIGNATURE_HEADER_BYTES)  # Read first 1KB
             
-            # Check for dangerous patterns
-            header_lower = header.lower()
-            for pattern in self.DANGEROUS_PATTERNS:
-                if pattern in header_lower:
-                    errors.append(f"Potentially malicious pattern detected: {pattern.decode('utf-8', errors='ignore')}")
+            return self.validate_header(header)
             
         except Exception as e:
             cropio_logger.error(f"Error validating file signature: {e}")
@@ -148,12 +166,32 @@ class FileSecurityValidator:
         
         return len(errors) == 0, errors
     
-    def validate_mime_type(self, file_path: str, allowed_extensions: set) -> Tuple[bool, List[str]]:
+    def validate_header(self, header: bytes) -> Tuple[bool, List[str]]:
+        """Validate the first bytes of a file against dangerous signatures and patterns"""
+        errors = []
+        header = header[:SIGNATURE_HEADER_BYTES]
+        
+        # Check for dangerous signatures
+        for signature, description in self.DANGEROUS_SIGNATURES.items():
+            if header.startswith(signature):
+                errors.append(f"Dangerous file signature detected: {description}")
+        
+        # Check for dangerous patterns
+        header_lower = header.lower()
+        for pattern in self.DANGEROUS_PATTERNS:
+            if pattern in header_lower:
+                errors.append(f"Potentially malicious pattern detected: {pattern.decode('utf-8', errors='ignore')}")
+        
+        return len(errors) == 0, errors
+    
+    def validate_mime_type(self, file_path: str, allowed_extensions: set,
+                           detected_mime: Optional[str] = None) -> Tuple[bool, List[str]]:
         """Validate MIME type matches file extension"""
         errors = []
         
         try:
-            detected_mime = self.get_mime_type(file_path)
+            if detected_mime is None:
+                detected_mime = self.get_mime_type(file_path)
             file_extension = Path(file_path).suffix.lower()[1:]  # Remove dot
             
             # MIME type mappings for common file types
@@ -197,40 +235,154 @@ class FileSecurityValidator:
     
     def scan_for_embedded_files(self, file_path: str) -> Tuple[bool, List[str]]:
         """Scan for embedded executable files or scripts"""
-        errors = []
+        scanner = StreamingFileScanner(self)
         
         try:
             with open(file_path, 'rb') as f:
-                content = f.read()
-            
-            # Look for embedded executables
-            for signature, description in self.DANGEROUS_SIGNATURES.items():
-                # Check if signature appears anywhere in the file (not just header)
-                if signature in content[100:]:  # Skip first 100 bytes to avoid false positives
-                    errors.append(f"Embedded {description} detected")
-            
-            # Check for suspicious base64 patterns (potential payload)
-            import base64
-            import re
-            
-            base64_pattern = re.compile(rb'[A-Za-z0-9+/]{50,}={0,2}')
-            matches = base64_pattern.findall(content)
-            
-            for match in matches[:5]:  # Check first 5 matches
-                try:
-                    decoded = base64.b64decode(match)
-                    # Check if decoded content contains dangerous patterns
-                    for pattern in self.DANGEROUS_PATTERNS:
-                        if pattern in decoded.lower():
-                            errors.append("Suspicious base64 encoded content detected")
-                            break
-                except:
-                    continue
-            
+                for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                    scanner.update(chunk)
         except Exception as e:
             cropio_logger.warning(f"Embedded file scan failed: {e}")
         
-        return len(errors) == 0, errors
+        scanner.finalize()
+        return len(scanner.embedded_errors) == 0, scanner.embedded_errors
+
+
+class StreamingFileScanner:
+    """
+    Single-pass file scanner fed with chunks of an upload.
+    
+    Hashes, header checks, MIME sniffing and the embedded payload scan are all
+    computed from the same stream so a file never has to be re-read from disk
+    or held in memory. Memory use is bounded by the chunk size plus a few
+    small carry-over buffers.
+    """
+    
+    # Bytes kept from the start of the stream for MIME sniffing
+    MIME_SNIFF_BYTES = 8192
+    # Signatures at offsets below this are header matches, not embedded payloads
+    EMBEDDED_MIN_OFFSET = 100
+    # Maximum number of base64 runs decoded per file
+    MAX_BASE64_CANDIDATES = 5
+    # Longest base64 run decoded; longer runs are truncated
+    MAX_BASE64_RUN = 1024 * 1024
+    
+    _BASE64_RUN = re.compile(rb'[A-Za-z0-9+/]{50,}={0,2}')
+    _BASE64_CHARS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='
+    
+    def __init__(self, validator: FileSecurityValidator):
+        self.validator = validator
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.header = b""
+        self.embedded_errors: List[str] = []
+        
+        # Multi-pattern matcher over all dangerous signatures: one scan per
+        # chunk instead of one substring search per signature. The lookahead
+        # reports overlapping matches, like an Aho-Corasick automaton would.
+        signatures = sorted(validator.DANGEROUS_SIGNATURES, key=len, reverse=True)
+        self._signature_matcher = re.compile(
+            b'(?=(' + b'|'.join(re.escape(sig) for sig in signatures) + b'))'
+        )
+        self._signature_overlap = max(len(sig) for sig in signatures) - 1
+        self._signature_tail = b""
+        self._found_signatures: set = set()
+        
+        self._patterns_lower = [pattern.lower() for pattern in validator.DANGEROUS_PATTERNS]
+        self._base64_carry = b""
+        self._base64_checked = 0
+        self._base64_flagged = False
+        self._finalized = False
+    
+    def update(self, chunk: bytes) -> None:
+        """Feed the next chunk of the stream"""
+        if not chunk:
+            return
+        
+        self.md5.update(chunk)
+        self.sha256.update(chunk)
+        
+        if len(self.header) < self.MIME_SNIFF_BYTES:
+            self.header += chunk[:self.MIME_SNIFF_BYTES - len(self.header)]
+        
+        self._scan_signatures(chunk)
+        self._scan_base64(chunk)
+        self.size += len(chunk)
+    
+    def _scan_signatures(self, chunk: bytes) -> None:
+        buffer = self._signature_tail + chunk
+        buffer_offset = self.size - len(self._signature_tail)
+        
+        for match in self._signature_matcher.finditer(buffer):
+            if buffer_offset + match.start() >= self.EMBEDDED_MIN_OFFSET:
+                self._found_signatures.add(match.group(1))
+        
+        self._signature_tail = buffer[-self._signature_overlap:] if self._signature_overlap else b""
+    
+    def _scan_base64(self, chunk: bytes, final: bool = False) -> None:
+        if self._base64_checked >= self.MAX_BASE64_CANDIDATES:
+            return
+        
+        buffer = self._base64_carry + chunk
+        
+        # Hold back a trailing base64 run that may continue in the next chunk
+        if final:
+            cut = len(buffer)
+        else:
+            cut = len(buffer.rstrip(self._BASE64_CHARS))
+            if len(buffer) - cut > self.MAX_BASE64_RUN:
+                cut = len(buffer)
+        
+        self._base64_carry = buffer[cut:]
+        
+        for match in self._BASE64_RUN.finditer(buffer, 0, cut):
+            if self._base64_checked >= self.MAX_BASE64_CANDIDATES:
+                self._base64_carry = b""
+                break
+            self._base64_checked += 1
+            self._check_base64_candidate(match.group())
+    
+    def _check_base64_candidate(self, candidate: bytes) -> None:
+        if self._base64_flagged:
+            return
+        
+        candidate = candidate[:self.MAX_BASE64_RUN]
+        try:
+            decoded = base64.b64decode(candidate).lower()
+        except Exception:
+            return
+        
+        for pattern in self._patterns_lower:
+            if pattern in decoded:
+                self._base64_flagged = True
+                break
+    
+    def finalize(self) -> None:
+        """Flush carry-over buffers and collect embedded payload errors"""
+        if self._finalized:
+            return
+        self._finalized = True
+        
+        self._scan_base64(b"", final=True)
+        
+        for signature, description in self.validator.DANGEROUS_SIGNATURES.items():
+            if signature in self._found_signatures:
+                self.embedded_errors.append(f"Embedded {description} detected")
+        
+        if self._base64_flagged:
+            self.embedded_errors.append("Suspicious base64 encoded content detected")
+    
+    @property
+    def hashes(self) -> Dict[str, str]:
+        return {
+            'md5': self.md5.hexdigest(),
+            'sha256': self.sha256.hexdigest()
+        }
+    
+    def mime_type(self) -> str:
+        """Sniff MIME type from the buffered header"""
+        return self.validator.get_mime_type_from_buffer(self.header)
 
 
 class FileManager:
@@ -262,7 +414,7 @@ class FileManager:
         sha256_hash = hashlib.sha256()
         
         with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
                 md5_hash.update(chunk)
                 sha256_hash.update(chunk)
         
@@ -296,50 +448,56 @@ class FileManager:
         temp_filename = f"temp_{int(time.time())}_{safe_filename}"
         temp_path = os.path.join(self.upload_folder, temp_filename)
         
+        max_size = max_size or self.max_file_size
+        scanner = StreamingFileScanner(self.validator)
+        
         try:
-            file_obj.save(temp_path)
-            
-            # Get file size
-            file_size = os.path.getsize(temp_path)
+            # Single pass: write to disk while hashing and scanning
+            stream = getattr(file_obj, 'stream', file_obj)
+            with open(temp_path, 'wb') as out:
+                for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b""):
+                    if scanner.size + len(chunk) > max_size:
+                        raise FileSizeExceededError(
+                            f"File size exceeds maximum allowed "
+                            f"size ({max_size} bytes)"
+                        )
+                    scanner.update(chunk)
+                    out.write(chunk)
+            scanner.finalize()
             
-            # Check file size
-            max_size = max_size or self.max_file_size
-            if file_size > max_size:
-                raise FileSizeExceededError(
-                    f"File size ({file_size} bytes) exceeds maximum allowed "
-                    f"size ({max_size} bytes)"
-                )
+            file_size = scanner.size
             
             # Get MIME type
             try:
-                mime_type = self.validator.get_mime_type(temp_path)
+                mime_type = scanner.mime_type()
             except Exception:
                 mime_type = "unknown"
             
-            # Calculate file hashes
-            hashes = self.calculate_file_hashes(temp_path)
+            # File hashes
+            hashes = scanner.hashes
             
             # Security validation
             validation_errors = []
             is_safe = True
             
             # Validate file signature
-            sig_safe, sig_errors = self.validator.validate_file_signature(temp_path)
+            sig_safe, sig_errors = self.validator.validate_header(scanner.header)
             if not sig_safe:
                 is_safe = False
                 validation_errors.extend(sig_errors)
             
             # Validate MIME type
-            mime_safe, mime_errors = self.validator.validate_mime_type(temp_path, allowed_extensions)
+            mime_safe, mime_errors = self.validator.validate_mime_type(
+                temp_path, allowed_extensions, detected_mime=mime_type
+            )
             if not mime_safe:
                 validation_errors.extend(mime_errors)
                 # MIME type mismatches are warnings, not blocking errors
             
-            # Scan for embedded files
-            embed_safe, embed_errors = self.validator.scan_for_embedded_files(temp_path)
-            if not embed_safe:
+            # Embedded payload scan
+            if scanner.embedded_errors:
                 is_safe = False
-                validation_errors.extend(embed_errors)
+                validation_errors.extend(scanner.embedded_errors)
             
             if not is_safe:
                 raise MaliciousFileError(f"File failed security validation: {'; '.join(validation_errors)}")
@@ -401,6 +559,7 @@ class FileManager:
         
         # Move file
         shutil.move(file_info.filepath, destination_path)
+        storage_index.record(destination_path)
         
         cropio_logger.info(
             f"File moved to destination: {unique_filename}",
@@ -437,6 +596,7 @@ class FileManager:
                     if file_mtime < cutoff_timestamp:
                         file_size = os.path.getsize(file_path)
                         os.remove(file_path)
+                        storage_index.forget(file_path)
                         deleted_count += 1
                         total_size_freed += file_size
                         
@@ -0,0 +1,131 @@
+"""
+Background Job Handlers for Cropio SaaS Platform
+Heavy conversions that run in the job worker pool
+
+Each handler receives a JobContext plus the job's input_path and params and
+returns a result dict containing ``output_path``. Converter libraries are
+imported inside the handlers so web processes can load this module cheaply.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from core.job_queue import JobContext, JobError, job_handler
+
+
+@job_handler('pdf_to_docx')
+def pdf_to_docx(ctx: JobContext, input_path: str) -> Dict[str, Any]:
+    """Convert a PDF to DOCX with pdf2docx"""
+    from pdf2docx import Converter
+
+    output_path = ctx.output_path(f"{os.path.splitext(os.path.basename(input_path))[0]}.docx")
+    ctx.progress(5, 'Analyzing PDF layout')
+
+    cv = Converter(input_path)
+    try:
+        cv.convert(output_path, start=0, end=None)
+    finally:
+        cv.close()
+
+    return {
+        'output_path': output_path,
+        'mimetype': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'output_size': os.path.getsize(output_path)
+    }
+
+
+@job_handler('gif_mp4')
+def gif_mp4(ctx: JobContext, input_path: str, conversion_mode: str,
+            options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Convert GIF to MP4 or MP4 to GIF with ffmpeg"""
+    from utils.video.gif_mp4_processor import GifMp4Processor
+    from utils.video.ffmpeg_progress import FFmpegProgress
+
+    try:
+        processor = GifMp4Processor(upload_folder=ctx.work_dir)
+    except RuntimeError as e:
+        raise JobError(f'FFmpeg not available: {e}')
+
+    ctx.progress(5, 'Converting video')
+
+    def report(progress):
+        if progress.percent is not None:
+            ctx.progress(5 + progress.percent * 0.9, 'Converting video')
+
+    options = dict(options or {}, progress=FFmpegProgress(on_update=report))
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    if conversion_mode == 'gif_to_mp4':
+        output_format = 'mp4'
+        result = processor.gif_to_mp4(input_path=input_path,
+                                      output_path=ctx.output_path(f'{base_name}_converted.mp4'),
+                                      **options)
+    elif conversion_mode == 'mp4_to_gif':
+        output_format = 'gif'
+        result = processor.mp4_to_gif(input_path=input_path,
+                                      output_path=ctx.output_path(f'{base_name}_converted.gif'),
+                                      **options)
+    else:
+        raise JobError('Invalid conversion mode')
+
+    if not result.get('success'):
+        raise JobError(result.get('error', 'Video conversion failed'))
+
+    result['output_format'] = output_format
+    result['mimetype'] = 'video/mp4' if output_format == 'mp4' else 'image/gif'
+    return result
+
+
+@job_handler('raw_convert')
+def raw_convert(ctx: JobContext, input_path: str, output_format: str = 'JPEG',
+                quality: int = 95, preserve_metadata: bool = True,
+                processing_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Demosaic a camera RAW file, or convert an image to DNG"""
+    from utils.image.raw_processor import RAWProcessor
+
+    ctx.progress(5, 'Processing RAW image')
+    processor = RAWProcessor(ctx.work_dir)
+    result = processor.smart_convert(
+        input_path,
+        output_format=output_format,
+        quality=quality,
+        preserve_metadata=preserve_metadata,
+        processing_params=processing_params
+    )
+
+    if not result['success']:
+        raise JobError(result['error'])
+
+    return {
+        'output_path': result['output_path'],
+        'conversion_type': result['conversion_type'],
+        'detected_format': result.get('detected_format'),
+        'output_format': output_format,
+        'output_size': os.path.getsize(result['output_path'])
+    }
+
+
+@job_handler('latex_to_pdf')
+def latex_to_pdf(ctx: JobContext, input_path: str, auto_wrap: bool = True,
+                 include_log: bool = False) -> Dict[str, Any]:
+    """Compile a LaTeX source file to PDF"""
+    from utils.latex_utils import LatexProcessor
+
+    with open(input_path, 'r', encoding='utf-8') as f:
+        latex_content = f.read()
+
+    ctx.progress(5, 'Compiling LaTeX')
+    result = LatexProcessor().build_pdf(
+        latex_content,
+        ctx.output_path('document.pdf'),
+        auto_wrap=auto_wrap,
+        include_log=include_log
+    )
+
+    if not result['success']:
+        raise JobError(result.get('error', 'Compilation failed'))
+
+    return {
+        'output_path': result['pdf_path'],
+        'mimetype': 'application/pdf',
+        'compilation_time': result['compilation_time'],
+        'log': result.get('log')
+    }
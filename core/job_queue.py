@@ -0,0 +1,604 @@
+"""
+Background Job Queue for Cropio SaaS Platform
+Runs heavy conversions in a local worker process pool instead of gunicorn workers
+
+Jobs are stored in a SQLite database under ``JOB_QUEUE_FOLDER`` and each job
+gets its own workspace directory holding its input and output files. A
+supervisor process (``python -m core.job_queue``) keeps a pool of worker
+processes alive; web processes start it on demand when
+``JOB_WORKERS_AUTOSTART`` is enabled, or it can be run as a separate service.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import signal
+import sqlite3
+import argparse
+import importlib
+import threading
+import subprocess
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+from core.logging_config import cropio_logger
+from core.metrics import app_metrics
+
+
+DEFAULT_WORKERS = 2
+DEFAULT_RESULT_TTL = 3600  # 1 hour
+DEFAULT_JOB_TIMEOUT = 900  # 15 minutes
+DEFAULT_SUPERVISOR_IDLE = 600  # 10 minutes
+MAX_ATTEMPTS = 2
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 1.0
+HEARTBEAT_STALE_AFTER = 15.0
+PROGRESS_MIN_INTERVAL = 0.5
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+# Modules that register job handlers; imported lazily by web and worker processes
+HANDLER_MODULES = ('core.job_handlers',)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_handlers: Dict[str, Callable[..., Dict[str, Any]]] = {}
+
+
+class JobError(Exception):
+    """Raised by job handlers to fail a job with a user-facing message"""
+    pass
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for a job kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def load_handlers() -> Dict[str, Callable[..., Dict[str, Any]]]:
+    """Import the handler modules and return the handler registry"""
+    for module_name in HANDLER_MODULES:
+        importlib.import_module(module_name)
+    return _handlers
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress and placing outputs"""
+
+    def __init__(self, queue: 'JobQueue', job_id: str, work_dir: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.work_dir = work_dir
+        self._last_progress = 0.0
+
+    def progress(self, percent: float, message: Optional[str] = None) -> None:
+        """Record job progress; intermediate updates are throttled"""
+        now = time.time()
+        if percent < 100 and now - self._last_progress < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_progress = now
+        self.queue.update_progress(self.job_id, percent, message)
+
+    def output_path(self, filename: str) -> str:
+        """Return a path for an output file inside the job workspace"""
+        return os.path.join(self.work_dir, os.path.basename(filename))
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by every process on the host.
+
+    Web processes submit jobs and read their status; worker processes claim
+    queued jobs, run the registered handler and record the result. Finished
+    jobs stay available until ``JOB_RESULT_TTL`` expires.
+    """
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.enabled = False
+        self.workers = DEFAULT_WORKERS
+        self.result_ttl = DEFAULT_RESULT_TTL
+        self.job_timeout = DEFAULT_JOB_TIMEOUT
+        self.autostart = True
+        self._local = threading.local()
+        self._last_spawn = 0.0
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the queue with Flask app configuration"""
+        self.configure(
+            app.config.get('JOB_QUEUE_FOLDER') or os.path.join(
+                os.path.dirname(app.config.get('UPLOAD_FOLDER', 'uploads')), 'jobs'
+            ),
+            enabled=app.config.get('JOB_QUEUE_ENABLED', True),
+            workers=app.config.get('JOB_WORKERS', DEFAULT_WORKERS),
+            result_ttl=app.config.get('JOB_RESULT_TTL', DEFAULT_RESULT_TTL),
+            job_timeout=app.config.get('JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT),
+            autostart=app.config.get('JOB_WORKERS_AUTOSTART', True)
+        )
+        if self.enabled:
+            cropio_logger.info(f"Job queue initialized: {self.folder}")
+
+    def configure(self, folder: str, enabled: bool = True, workers: int = DEFAULT_WORKERS,
+                  result_ttl: int = DEFAULT_RESULT_TTL, job_timeout: int = DEFAULT_JOB_TIMEOUT,
+                  autostart: bool = True) -> None:
+        """Point the queue at a folder; used directly by the worker supervisor"""
+        self.folder = folder
+        self.enabled = enabled
+        self.workers = max(1, int(workers))
+        self.result_ttl = result_ttl
+        self.job_timeout = job_timeout
+        self.autostart = autostart
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        self._create_schema()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'folder', None) != self.folder:
+            conn = sqlite3.connect(os.path.join(self.folder, 'jobs.sqlite3'), timeout=10,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.folder = self.folder
+        return conn
+
+    def _create_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,'
+            ' progress REAL NOT NULL DEFAULT 0, message TEXT, params TEXT,'
+            ' result TEXT, error TEXT, input_path TEXT, output_path TEXT,'
+            ' download_name TEXT, tool_type TEXT, user_id INTEGER, owner TEXT,'
+            ' timeout REAL, attempts INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER,'
+            ' accounted INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,'
+            ' started_at REAL, finished_at REAL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_finished_at ON jobs (finished_at)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS supervisor ('
+            ' id INTEGER PRIMARY KEY CHECK (id = 1), pid INTEGER, heartbeat REAL)'
+        )
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def job_dir(self, job_id: str) -> str:
+        """Return the workspace directory of a job"""
+        return os.path.join(self.folder, job_id)
+
+    # ------------------------------------------------------------------
+    # Web process API
+    # ------------------------------------------------------------------
+
+    def submit(self, kind: str, input_path: Optional[str] = None,
+               params: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None,
+               owner: Optional[str] = None, tool_type: Optional[str] = None,
+               download_name: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """
+        Queue a job and return its id.
+
+        The input file is moved into the job workspace so it is cleaned up
+        with the job. params must be JSON-serializable and are passed to the
+        handler as keyword arguments alongside ``input_path``.
+        """
+        if not self.enabled:
+            raise RuntimeError('Job queue is not enabled')
+        if kind not in load_handlers():
+            raise ValueError(f'Unknown job kind: {kind}')
+
+        job_id = uuid.uuid4().hex
+        work_dir = self.job_dir(job_id)
+        os.makedirs(work_dir, exist_ok=True)
+
+        if input_path:
+            moved_path = os.path.join(work_dir, os.path.basename(input_path))
+            shutil.move(input_path, moved_path)
+            input_path = moved_path
+
+        self._connect().execute(
+            'INSERT INTO jobs (id, kind, status, params, input_path, download_name,'
+            ' tool_type, user_id, owner, timeout, created_at)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, 'queued', json.dumps(params or {}), input_path, download_name,
+             tool_type or kind, user_id, owner, timeout or self.job_timeout, time.time())
+        )
+
+        if self.autostart:
+            self.ensure_workers()
+
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if it does not exist"""
+        if not self.enabled:
+            return None
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim_accounting(self, job_id: str) -> bool:
+        """Mark a finished job as accounted; True only for the first caller"""
+        cursor = self._connect().execute(
+            f'UPDATE jobs SET accounted = 1 WHERE id = ? AND accounted = 0'
+            f' AND status IN {FINISHED_STATUSES}',
+            (job_id,)
+        )
+        return cursor.rowcount == 1
+
+    def claim_unaccounted(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Mark up to limit finished, unaccounted jobs as accounted and return them"""
+        if not self.enabled:
+            return []
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                f'SELECT * FROM jobs WHERE accounted = 0 AND status IN {FINISHED_STATUSES}'
+                f' ORDER BY finished_at LIMIT ?',
+                (limit,)
+            ).fetchall()
+            conn.executemany('UPDATE jobs SET accounted = 1 WHERE id = ?',
+                             [(row['id'],) for row in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [self._row_to_job(row) for row in rows]
+
+    def purge_expired(self) -> Dict[str, int]:
+        """Delete finished jobs older than the result TTL along with their workspaces"""
+        if not self.enabled:
+            return {'deleted': 0}
+
+        cutoff = time.time() - self.result_ttl
+        conn = self._connect()
+        rows = conn.execute(
+            f'SELECT id FROM jobs WHERE status IN {FINISHED_STATUSES} AND finished_at < ?'
+            f' AND accounted = 1',
+            (cutoff,)
+        ).fetchall()
+
+        for row in rows:
+            shutil.rmtree(self.job_dir(row['id']), ignore_errors=True)
+            conn.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+
+        return {'deleted': len(rows)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return job counts by status and whether the worker pool is alive"""
+        if not self.enabled:
+            return {'enabled': False}
+
+        conn = self._connect()
+        counts = {status: 0 for status in ('queued', 'running') + FINISHED_STATUSES}
+        for row in conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status'):
+            counts[row['status']] = row['n']
+
+        return {
+            'enabled': True,
+            'jobs': counts,
+            'workers': self.workers,
+            'workers_alive': self.supervisor_alive()
+        }
+
+    # ------------------------------------------------------------------
+    # Worker pool management
+    # ------------------------------------------------------------------
+
+    def supervisor_alive(self) -> bool:
+        """Whether a supervisor has reported a recent heartbeat"""
+        row = self._connect().execute('SELECT heartbeat FROM supervisor WHERE id = 1').fetchone()
+        return bool(row and row['heartbeat'] and time.time() - row['heartbeat'] < HEARTBEAT_STALE_AFTER)
+
+    def ensure_workers(self) -> bool:
+        """
+        Start the supervisor process if none is running.
+
+        The supervisor runs in its own session so it outlives the gunicorn
+        worker that started it (workers are recycled after max_requests).
+        """
+        if self.supervisor_alive():
+            return True
+        if time.time() - self._last_spawn < HEARTBEAT_STALE_AFTER:
+            return False
+
+        self._last_spawn = time.time()
+        command = [
+            sys.executable, '-m', 'core.job_queue',
+            '--folder', self.folder,
+            '--workers', str(self.workers),
+            '--result-ttl', str(self.result_ttl),
+            '--job-timeout', str(self.job_timeout),
+            '--idle-exit', str(DEFAULT_SUPERVISOR_IDLE)
+        ]
+        try:
+            popen_kwargs = {'start_new_session': True} if os.name == 'posix' else {}
+            subprocess.Popen(command, cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL,
+                             close_fds=True, **popen_kwargs)
+            cropio_logger.info(f"Started job worker supervisor with {self.workers} workers")
+            return True
+        except Exception as e:
+            cropio_logger.error(f"Failed to start job worker supervisor: {e}")
+            return False
+
+    def _claim_supervisor(self) -> bool:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT pid, heartbeat FROM supervisor WHERE id = 1').fetchone()
+            if row and row['pid'] != os.getpid() and row['heartbeat'] \
+                    and time.time() - row['heartbeat'] < HEARTBEAT_STALE_AFTER:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                'INSERT INTO supervisor (id, pid, heartbeat) VALUES (1, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET pid = excluded.pid, heartbeat = excluded.heartbeat',
+                (os.getpid(), time.time())
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _heartbeat(self) -> bool:
+        cursor = self._connect().execute(
+            'UPDATE supervisor SET heartbeat = ? WHERE id = 1 AND pid = ?',
+            (time.time(), os.getpid())
+        )
+        return cursor.rowcount == 1
+
+    def _release_supervisor(self) -> None:
+        self._connect().execute('DELETE FROM supervisor WHERE id = 1 AND pid = ?', (os.getpid(),))
+
+    def recover_jobs(self, worker_pid: Optional[int] = None) -> int:
+        """
+        Requeue running jobs whose worker died, or fail them after MAX_ATTEMPTS.
+
+        With no worker_pid every running job is recovered; the supervisor does
+        this at startup because any running job belongs to a dead pool.
+        """
+        conn = self._connect()
+        where = 'status = ?'
+        args: List[Any] = ['running']
+        if worker_pid is not None:
+            where += ' AND worker_pid = ?'
+            args.append(worker_pid)
+
+        recovered = conn.execute(
+            f"UPDATE jobs SET status = 'queued', worker_pid = NULL, started_at = NULL"
+            f' WHERE {where} AND attempts < ?',
+            args + [MAX_ATTEMPTS]
+        ).rowcount
+        conn.execute(
+            f"UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE {where}",
+            ['Worker exited while processing the job', time.time()] + args
+        )
+        return recovered
+
+    def expired_running_jobs(self) -> List[Dict[str, Any]]:
+        """Return running jobs that have exceeded their timeout"""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE status = 'running' AND started_at + timeout < ?",
+            (time.time(),)
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def has_pending_jobs(self) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+    # ------------------------------------------------------------------
+    # Worker API
+    # ------------------------------------------------------------------
+
+    def claim_next(self, worker_pid: int) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ?,"
+                ' attempts = attempts + 1, progress = 0 WHERE id = ?',
+                (worker_pid, time.time(), row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id'])
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str] = None) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET progress = ?, message = COALESCE(?, message)"
+            " WHERE id = ? AND status = 'running'",
+            (max(0.0, min(100.0, float(progress))), message, job_id)
+        )
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = 'completed', progress = 100, result = ?,"
+            " output_path = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (json.dumps(result, default=str), result.get('output_path'), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?"
+            " WHERE id = ? AND status = 'running'",
+            (error, time.time(), job_id)
+        )
+
+    def execute(self, job: Dict[str, Any]) -> None:
+        """Run the handler for a claimed job and record its outcome"""
+        handler = load_handlers().get(job['kind'])
+        if handler is None:
+            self.fail(job['id'], f"Unknown job kind: {job['kind']}")
+            return
+
+        context = JobContext(self, job['id'], self.job_dir(job['id']))
+        started = time.time()
+        status, output_path = 'failed', None
+        try:
+            result = handler(context, input_path=job['input_path'], **job['params']) or {}
+            output_path = result.get('output_path')
+            if not output_path or not os.path.exists(output_path):
+                raise JobError('Conversion produced no output file')
+            self.complete(job['id'], result)
+            status = 'completed'
+        except JobError as e:
+            self.fail(job['id'], str(e))
+        except Exception as e:
+            cropio_logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}", exc_info=True)
+            self.fail(job['id'], f'Conversion failed: {e}')
+        finally:
+            self._record_metrics(job, started, status, output_path)
+
+    def _record_metrics(self, job: Dict[str, Any], started: float, status: str,
+                        output_path: Optional[str]) -> None:
+        """Report queue wait, run time and conversion bytes for a finished job"""
+        try:
+            run_seconds = time.time() - started
+            wait_seconds = started - job['created_at'] if job.get('created_at') else None
+            app_metrics.record_job(job['kind'], wait_seconds, run_seconds, status)
+
+            def size(path):
+                return os.path.getsize(path) if path and os.path.isfile(path) else 0
+
+            app_metrics.record_conversion(
+                job.get('tool_type') or job['kind'], run_seconds,
+                input_bytes=size(job.get('input_path')),
+                output_bytes=size(output_path) if status == 'completed' else 0,
+                success=status == 'completed'
+            )
+        except Exception as e:
+            cropio_logger.warning(f"Job metrics failed for {job['id']}: {e}")
+
+
+job_queue = JobQueue()
+
+
+def _worker_main(folder: str, supervisor_pid: int) -> None:
+    """Worker process loop: claim and run jobs until the supervisor goes away"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue = JobQueue()
+    queue.configure(folder, autostart=False)
+    load_handlers()
+
+    while os.getppid() == supervisor_pid:
+        job = queue.claim_next(os.getpid())
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        queue.execute(job)
+
+
+def run_supervisor(queue: JobQueue, idle_exit: Optional[float] = None) -> int:
+    """
+    Keep queue.workers worker processes alive until stopped.
+
+    Dead workers are replaced and their jobs recovered; workers running a job
+    past its timeout are terminated. With idle_exit, the supervisor exits
+    after that many seconds without queued or running jobs.
+    """
+    if not queue._claim_supervisor():
+        return 0
+
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.append(True))
+
+    queue.recover_jobs()
+    mp_context = multiprocessing.get_context('spawn')
+    workers: Dict[int, multiprocessing.Process] = {}
+    idle_since = time.time()
+
+    try:
+        while not stopping:
+            for slot in range(queue.workers):
+                process = workers.get(slot)
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    process.join()
+                    queue.recover_jobs(process.pid)
+                process = mp_context.Process(target=_worker_main,
+                                             args=(queue.folder, os.getpid()), daemon=True)
+                process.start()
+                workers[slot] = process
+
+            for job in queue.expired_running_jobs():
+                queue.fail(job['id'], 'Conversion timed out')
+                for process in workers.values():
+                    if process.pid == job['worker_pid']:
+                        process.terminate()
+
+            if queue.has_pending_jobs():
+                idle_since = time.time()
+            elif idle_exit and time.time() - idle_since > idle_exit:
+                break
+
+            if not queue._heartbeat():
+                break
+            time.sleep(HEARTBEAT_INTERVAL)
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join(timeout=5)
+        queue._release_supervisor()
+
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run the Cropio background job workers')
+    parser.add_argument('--folder', default=os.environ.get(
+        'JOB_QUEUE_FOLDER', os.path.join(PROJECT_ROOT, 'jobs')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKERS', DEFAULT_WORKERS)))
+    parser.add_argument('--result-ttl', type=int, default=DEFAULT_RESULT_TTL)
+    parser.add_argument('--job-timeout', type=int, default=DEFAULT_JOB_TIMEOUT)
+    parser.add_argument('--idle-exit', type=float, default=None,
+                        help='Exit after this many idle seconds (used when started on demand)')
+    args = parser.parse_args(argv)
+
+    queue = JobQueue()
+    queue.configure(args.folder, workers=args.workers, result_ttl=args.result_ttl,
+                    job_timeout=args.job_timeout, autostart=False)
+    return run_supervisor(queue, idle_exit=args.idle_exit)
+
+
+if __name__ == '__main__':
+    # Run through the importable module so spawned workers and handler
+    # modules share one handler registry instead of a copy in __main__
+    from core.job_queue import main as _main
+    sys.exit(_main())
@@ -0,0 +1,92 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+Converter modules are imported at startup so their blueprints can be
+registered, but libraries such as pandas only need to be loaded when a
+conversion actually uses them. ``lazy_import`` returns a module stand-in
+that imports the real module on first attribute access and records how
+long that took.
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+import types
+from typing import Dict
+
+
+_timings: Dict[str, float] = {}
+_modules: Dict[str, 'LazyModule'] = {}
+_lock = threading.RLock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the named module on first use"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    _timings[self.__name__] = round(time.perf_counter() - started, 4)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a stand-in for ``name`` that is imported on first attribute access"""
+    with _lock:
+        if name not in _modules:
+            _modules[name] = LazyModule(name)
+        return _modules[name]
+
+
+def module_available(name: str) -> bool:
+    """Whether ``name`` is installed, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def is_loaded(module: types.ModuleType) -> bool:
+    """Whether a lazy module has been imported yet; real modules always are"""
+    if isinstance(module, LazyModule):
+        return module.__dict__['_lazy_module'] is not None
+    return True
+
+
+def load_all() -> Dict[str, float]:
+    """Import every lazy module requested so far; returns seconds per module"""
+    with _lock:
+        pending = [module for module in _modules.values() if not is_loaded(module)]
+    for module in pending:
+        try:
+            module._load()
+        except ImportError:
+            pass
+    return import_timings()
+
+
+def import_timings() -> Dict[str, float]:
+    """Seconds spent importing each lazy module that has been loaded"""
+    with _lock:
+        return dict(_timings)
@@ -0,0 +1,461 @@
+"""
+LibreOffice Conversion Pool for Cropio SaaS Platform
+Keeps warm headless LibreOffice instances so office conversions skip cold start
+
+Every conversion used to launch ``soffice --convert-to`` from scratch with a
+profile directory shared by all requests, so each one paid LibreOffice's
+multi-second startup and concurrent requests fought over the profile lock.
+The pool instead keeps up to ``LIBREOFFICE_POOL_SIZE`` long-running soffice
+listeners per process, each with a private profile and port:
+- requests queue for a free instance and give up after their timeout
+- an instance is health-checked on checkout and restarted if it died
+- instances are recycled after ``LIBREOFFICE_MAX_CONVERSIONS`` conversions
+- a conversion that overruns its timeout kills and restarts its instance
+
+Conversions are driven over UNO. When the ``uno`` bindings are not
+importable, each conversion falls back to a one-off ``soffice
+--convert-to`` run with its own private profile.
+"""
+import os
+import time
+import atexit
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    UNO_AVAILABLE = True
+except ImportError:
+    UNO_AVAILABLE = False
+
+from core.logging_config import cropio_logger
+
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_CONVERSIONS = 50
+DEFAULT_TIMEOUT = 300  # 5 minutes per conversion, including time queued
+STARTUP_TIMEOUT = 30
+HEALTH_CHECK_INTERVAL = 30  # Probe an idle instance over UNO at most this often
+TERMINATE_GRACE = 5
+
+SOFFICE_CANDIDATES = (
+    'soffice',
+    'libreoffice',
+    '/usr/bin/soffice',
+    '/usr/bin/libreoffice',
+    '/usr/lib/libreoffice/program/soffice',
+    '/opt/libreoffice/program/soffice',
+    '/snap/bin/libreoffice',
+    '/Applications/LibreOffice.app/Contents/MacOS/soffice',
+    r'C:\Program Files\LibreOffice\program\soffice.exe',
+    r'C:\Program Files (x86)\LibreOffice\program\soffice.exe',
+)
+
+SOFFICE_FLAGS = ['--headless', '--invisible', '--nodefault', '--nolockcheck',
+                 '--nologo', '--norestore']
+
+# Export filter by target extension. PDF depends on the kind of document loaded.
+EXPORT_FILTERS = {
+    'docx': 'MS Word 2007 XML',
+    'doc': 'MS Word 97',
+    'odt': 'writer8',
+    'rtf': 'Rich Text Format',
+    'txt': 'Text',
+    'pptx': 'Impress MS PowerPoint 2007 XML',
+    'odp': 'impress8',
+    'xlsx': 'Calc MS Excel 2007 XML',
+    'ods': 'calc8',
+}
+PDF_EXPORT_FILTERS = (
+    ('com.sun.star.presentation.PresentationDocument', 'impress_pdf_Export'),
+    ('com.sun.star.sheet.SpreadsheetDocument', 'calc_pdf_Export'),
+    ('com.sun.star.drawing.DrawingDocument', 'draw_pdf_Export'),
+    ('com.sun.star.text.TextDocument', 'writer_pdf_Export'),
+)
+
+
+class LibreOfficeError(Exception):
+    """Raised when LibreOffice cannot convert a document"""
+    pass
+
+
+def find_soffice() -> Optional[str]:
+    """Locate the soffice executable: LIBREOFFICE_PATH, then PATH, then common install dirs"""
+    configured = os.environ.get('LIBREOFFICE_PATH')
+    if configured and os.path.isfile(configured):
+        return configured
+
+    for candidate in SOFFICE_CANDIDATES:
+        if os.path.isabs(candidate):
+            if os.path.isfile(candidate):
+                return candidate
+        else:
+            found = shutil.which(candidate)
+            if found:
+                return found
+    return None
+
+
+def _popen_kwargs() -> Dict[str, Any]:
+    """Own process group on POSIX so soffice's children die with it; no console on Windows"""
+    if os.name == 'posix':
+        return {'start_new_session': True}
+    return {'creationflags': getattr(subprocess, 'CREATE_NO_WINDOW', 0)}
+
+
+def _terminate(process: subprocess.Popen) -> None:
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+        process.wait(timeout=TERMINATE_GRACE)
+    except subprocess.TimeoutExpired:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        process.wait()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _profile_url(path: str) -> str:
+    return Path(path).resolve().as_uri()
+
+
+def _properties(**values) -> tuple:
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+class OfficeInstance:
+    """One headless soffice process listening for UNO connections on a private port"""
+
+    def __init__(self, soffice_path: str, index: int):
+        self.soffice_path = soffice_path
+        self.index = index
+        self.process: Optional[subprocess.Popen] = None
+        self.port: Optional[int] = None
+        self.profile_dir: Optional[str] = None
+        self.conversions = 0
+        self.last_checked = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        """Launch soffice and wait until it accepts UNO connections"""
+        self.stop()
+        self.profile_dir = tempfile.mkdtemp(prefix=f'libreoffice_pool_{self.index}_')
+        self.port = _free_port()
+        cmd = [self.soffice_path] + SOFFICE_FLAGS + [
+            f'-env:UserInstallation={_profile_url(self.profile_dir)}',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+        ]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, **_popen_kwargs())
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline and self.running:
+            try:
+                self._desktop()
+                self.conversions = 0
+                self.last_checked = time.time()
+                cropio_logger.info(f"LibreOffice instance {self.index} started on port {self.port}")
+                return
+            except Exception:
+                time.sleep(0.25)
+
+        self.stop()
+        raise LibreOfficeError(f'LibreOffice did not start within {STARTUP_TIMEOUT}s')
+
+    def stop(self) -> None:
+        if self.process is not None:
+            _terminate(self.process)
+            self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def healthy(self) -> bool:
+        """Process alive and, when not probed recently, answering over UNO"""
+        if not self.running:
+            return False
+        if time.time() - self.last_checked < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            self._desktop()
+        except Exception as e:
+            cropio_logger.warning(f"LibreOffice instance {self.index} failed health check: {e}")
+            return False
+        self.last_checked = time.time()
+        return True
+
+    def _desktop(self):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local)
+        context = resolver.resolve(
+            f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext')
+        return context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def convert(self, input_path: str, output_path: str, timeout: float) -> None:
+        """
+        Convert one document, killing the instance if it overruns ``timeout``.
+
+        The UNO call cannot be interrupted, so it runs on a helper thread;
+        stopping soffice makes that call fail and lets the thread finish.
+        """
+        outcome: Dict[str, Exception] = {}
+
+        def work():
+            try:
+                self._store(input_path, output_path)
+            except Exception as e:
+                outcome['error'] = e
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            self.stop()
+            raise LibreOfficeError(f'LibreOffice conversion timed out after {int(timeout)}s')
+        if 'error' in outcome:
+            raise LibreOfficeError(str(outcome['error']))
+        self.conversions += 1
+        self.last_checked = time.time()
+
+    def _store(self, input_path: str, output_path: str) -> None:
+        document = self._desktop().loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)), '_blank', 0,
+            _properties(Hidden=True, ReadOnly=True))
+        if document is None:
+            raise LibreOfficeError('LibreOffice could not open the document')
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                                _properties(FilterName=export_filter(document, output_path)))
+        finally:
+            document.close(True)
+
+
+def export_filter(document, output_path: str) -> str:
+    """Export filter name for a loaded document and the target file extension"""
+    ext = os.path.splitext(output_path)[1].lstrip('.').lower()
+    if ext == 'pdf':
+        for service, name in PDF_EXPORT_FILTERS:
+            if document.supportsService(service):
+                return name
+        return 'writer_pdf_Export'
+    if ext not in EXPORT_FILTERS:
+        raise LibreOfficeError(f'Unsupported LibreOffice output format: {ext}')
+    return EXPORT_FILTERS[ext]
+
+
+class LibreOfficePool:
+    """Bounded pool of warm LibreOffice instances shared by the office converters"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._instances: List[OfficeInstance] = []
+        self._idle: List[OfficeInstance] = []
+        self._soffice_path: Optional[str] = None
+        self._resolved = False
+        self._atexit_registered = False
+        self.size = DEFAULT_POOL_SIZE
+        self.max_conversions = DEFAULT_MAX_CONVERSIONS
+        self.timeout = DEFAULT_TIMEOUT
+
+    def init_app(self, app):
+        """Apply pool settings from Flask app configuration"""
+        self.configure(
+            size=app.config.get('LIBREOFFICE_POOL_SIZE', DEFAULT_POOL_SIZE),
+            max_conversions=app.config.get('LIBREOFFICE_MAX_CONVERSIONS', DEFAULT_MAX_CONVERSIONS),
+            timeout=app.config.get('LIBREOFFICE_TIMEOUT', DEFAULT_TIMEOUT),
+            soffice_path=app.config.get('LIBREOFFICE_PATH')
+        )
+        cropio_logger.info(
+            f"LibreOffice pool: size={self.size}, uno={'yes' if UNO_AVAILABLE else 'no'}, "
+            f"soffice={self.soffice_path or 'not found'}"
+        )
+
+    def configure(self, size: int = DEFAULT_POOL_SIZE, max_conversions: int = DEFAULT_MAX_CONVERSIONS,
+                  timeout: float = DEFAULT_TIMEOUT, soffice_path: Optional[str] = None) -> None:
+        self.shutdown()
+        self.size = max(0, int(size))
+        self.max_conversions = max(1, int(max_conversions))
+        self.timeout = timeout
+        self._soffice_path = soffice_path
+        self._resolved = soffice_path is not None
+
+    @property
+    def soffice_path(self) -> Optional[str]:
+        if not self._resolved:
+            self._soffice_path = find_soffice()
+            self._resolved = True
+        return self._soffice_path
+
+    def is_available(self) -> bool:
+        """Whether LibreOffice is installed at all"""
+        return self.soffice_path is not None
+
+    def is_pooled(self) -> bool:
+        """Whether conversions run on warm instances rather than one-off processes"""
+        return UNO_AVAILABLE and self.size > 0 and self.is_available()
+
+    def convert(self, input_path: str, output_path: str, timeout: Optional[float] = None) -> None:
+        """
+        Convert ``input_path`` to ``output_path``; the format follows the output extension.
+
+        Raises:
+            LibreOfficeError: LibreOffice is missing, timed out or failed
+        """
+        timeout = timeout or self.timeout
+        if not self.is_available():
+            raise LibreOfficeError('LibreOffice is not installed')
+        if not self.is_pooled():
+            self._convert_once(input_path, output_path, timeout)
+            return
+
+        deadline = time.time() + timeout
+        instance = self._checkout(deadline)
+        converted = False
+        try:
+            instance.convert(input_path, output_path, max(1.0, deadline - time.time()))
+            converted = True
+        finally:
+            self._checkin(instance, converted)
+
+    def warm(self) -> None:
+        """Start every instance ahead of the first request"""
+        if not self.is_pooled():
+            return
+        for _ in range(self.size):
+            instance = self._checkout(time.time() + STARTUP_TIMEOUT)
+            self._release(instance)
+
+    def _checkout(self, deadline: float) -> OfficeInstance:
+        with self._cond:
+            while True:
+                if self._idle:
+                    instance = self._idle.pop()
+                    break
+                if len(self._instances) < self.size:
+                    instance = OfficeInstance(self.soffice_path, len(self._instances))
+                    self._instances.append(instance)
+                    if not self._atexit_registered:
+                        atexit.register(self.shutdown)
+                        self._atexit_registered = True
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise LibreOfficeError('Timed out waiting for a free LibreOffice instance')
+                self._cond.wait(remaining)
+
+        try:
+            if not instance.healthy():
+                instance.start()
+        except Exception:
+            self._release(instance)
+            raise
+        return instance
+
+    def _checkin(self, instance: OfficeInstance, converted: bool) -> None:
+        if converted and instance.conversions < self.max_conversions:
+            self._release(instance)
+            return
+
+        # Restart off the request path so the next request finds a warm instance
+        def recycle():
+            try:
+                instance.start()
+            except Exception as e:
+                cropio_logger.warning(f"LibreOffice instance {instance.index} restart failed: {e}")
+            if not self._release(instance):
+                instance.stop()  # pool was shut down meanwhile
+
+        threading.Thread(target=recycle, name=f'libreoffice-recycle-{instance.index}', daemon=True).start()
+
+    def _release(self, instance: OfficeInstance) -> bool:
+        with self._cond:
+            if instance not in self._instances:
+                return False
+            if instance not in self._idle:
+                self._idle.append(instance)
+                self._cond.notify()
+            return True
+
+    def _convert_once(self, input_path: str, output_path: str, timeout: float) -> None:
+        """Cold ``soffice --convert-to`` run with a private profile and output directory"""
+        ext = os.path.splitext(output_path)[1].lstrip('.').lower()
+        work_dir = tempfile.mkdtemp(prefix='libreoffice_convert_')
+        try:
+            cmd = [self.soffice_path] + SOFFICE_FLAGS + [
+                f'-env:UserInstallation={_profile_url(os.path.join(work_dir, "profile"))}',
+                '--convert-to', ext,
+                '--outdir', work_dir,
+                os.path.abspath(input_path),
+            ]
+            process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, text=True, cwd=work_dir,
+                                       **_popen_kwargs())
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _terminate(process)
+                raise LibreOfficeError(f'LibreOffice conversion timed out after {int(timeout)}s')
+
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            generated = os.path.join(work_dir, f'{base_name}.{ext}')
+            if process.returncode != 0 or not os.path.exists(generated):
+                raise LibreOfficeError((stderr or stdout or '').strip()
+                                       or f'LibreOffice exited with code {process.returncode}')
+            shutil.move(generated, output_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def shutdown(self) -> None:
+        """Stop every instance and remove their profiles"""
+        with self._cond:
+            instances = list(self._instances)
+            self._instances.clear()
+            self._idle.clear()
+            self._cond.notify_all()
+        for instance in instances:
+            instance.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'available': self.is_available(),
+                'pooled': self.is_pooled(),
+                'size': self.size,
+                'instances': len(self._instances),
+                'idle': len(self._idle),
+                'running': sum(1 for i in self._instances if i.running),
+                'conversions': sum(i.conversions for i in self._instances),
+            }
+
+
+libreoffice_pool = LibreOfficePool()
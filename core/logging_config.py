@@ -3,15 +3,79 @@ Professional Logging Configuration for Cropio SaaS Platform
 Implements structured logging, log rotation, error tracking, and monitoring
 """
 import os
+import sys
+import time
+import queue
+import pickle
+import random
+import socket
+import atexit
 import logging
 import logging.handlers
+import threading
+import weakref
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import json
 import traceback
-from flask import request, current_app, has_request_context
-from flask_login import current_user
+from flask import request, current_app, g, has_request_context
+
+
+# Records waiting to be written per process; beyond this they are dropped, never waited on
+DEFAULT_QUEUE_SIZE = 10000
+
+# Largest record sent from a worker to the writing process
+MAX_RECORD_BYTES = 64 * 1024
+
+
+def capture_request_context() -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Request and user details for a log record.
+
+    Only reads what the request already holds; the user is included when
+    Flask-Login has loaded it, rather than loading it for the log line.
+    """
+    if not has_request_context():
+        return None, None
+
+    request_context = {
+        'method': request.method,
+        'url': request.url,
+        'endpoint': request.endpoint,
+        'remote_addr': request.remote_addr,
+        'user_agent': request.headers.get('User-Agent', '')
+    }
+    request_id = g.get('request_id')
+    if request_id:
+        request_context['request_id'] = request_id
+
+    user_context = None
+    user = g.get('_login_user')
+    if user is not None and getattr(user, 'is_authenticated', False):
+        user_context = {
+            'id': getattr(user, 'id', None),
+            'username': getattr(user, 'username', None),
+            'email': getattr(user, 'email', None)
+        }
+    return request_context, user_context
+
+
+def _exception_entry(exc_info) -> Dict[str, Any]:
+    try:
+        return {
+            'type': exc_info[0].__name__,
+            'message': str(exc_info[1]),
+            'traceback': traceback.format_exception(*exc_info)
+        }
+    except (TypeError, AttributeError, IndexError):
+        # Fallback if exc_info is malformed
+        return {
+            'type': 'UnknownException',
+            'message': str(exc_info) if exc_info else 'Exception info unavailable',
+            'traceback': []
+        }
 
 
 class StructuredFormatter(logging.Formatter):
@@ -22,7 +86,7 @@ class StructuredFormatter(logging.Formatter):
         
         # Create base log structure
         log_entry = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -31,41 +95,28 @@ class StructuredFormatter(logging.Formatter):
             'line': record.lineno
         }
         
-        # Add request context if available
-        if has_request_context():
-            log_entry.update({
-                'request': {
-                    'method': request.method,
-                    'url': request.url,
-                    'endpoint': request.endpoint,
-                    'remote_addr': request.remote_addr,
-                    'user_agent': request.headers.get('User-Agent', '')
-                }
-            })
-            
-            # Add user context if authenticated
-            if current_user.is_authenticated:
-                log_entry['user'] = {
-                    'id': current_user.id,
-                    'username': current_user.username,
-                    'email': current_user.email
-                }
+        # Request context is captured when the record is queued; records
+        # formatted synchronously read it from the live request
+        if hasattr(record, 'request_context'):
+            request_context, user_context = record.request_context, record.user_context
+        else:
+            request_context, user_context = capture_request_context()
+        
+        if request_context:
+            log_entry['request'] = request_context
+        
+        # Add user context if authenticated
+        if user_context:
+            log_entry['user'] = user_context
         
         # Add exception info if present
-        if record.exc_info and record.exc_info != True:
-            try:
-                log_entry['exception'] = {
-                    'type': record.exc_info[0].__name__,
-                    'message': str(record.exc_info[1]),
-                    'traceback': traceback.format_exception(*record.exc_info)
-                }
-            except (TypeError, AttributeError, IndexError):
-                # Fallback if exc_info is malformed
-                log_entry['exception'] = {
-                    'type': 'UnknownException',
-                    'message': str(record.exc_info) if record.exc_info else 'Exception info unavailable',
-                    'traceback': []
-                }
+        if getattr(record, 'exception', None):
+            log_entry['exception'] = record.exception
+        elif record.exc_info and record.exc_info != True:
+            log_entry['exception'] = _exception_entry(record.exc_info)
+        
+        if getattr(record, 'suppressed', 0):
+            log_entry['suppressed'] = record.suppressed
         
         # Add extra fields if present
         if hasattr(record, 'extra_data'):
@@ -91,8 +142,347 @@ class SecurityAuditFilter(logging.Filter):
         )
 
 
+class AccessLogFormatter(logging.Formatter):
+    """Colored console lines for the request log"""
+    
+    COLORS = ((500, '\033[91m'), (400, '\033[93m'), (300, '\033[94m'), (0, '\033[92m'))
+    
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+        status_code = getattr(record, 'status_code', 200)
+        color = next(color for floor, color in self.COLORS if status_code >= floor)
+        return f"{color}{timestamp} - werkzeug - INFO - {record.getMessage()}\033[0m"
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records below WARNING from selected loggers.
+    
+    ``rates`` maps logger names to the fraction kept; a logger without an
+    entry uses its nearest configured ancestor, and 1.0 if there is none.
+    """
+    
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self._resolved: Dict[str, float] = {}
+    
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, current = 1.0, name
+            while current:
+                if current in self.rates:
+                    rate = self.rates[current]
+                    break
+                current = current.rpartition('.')[0]
+            self._resolved[name] = rate
+        return rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger and message template for records below ERROR.
+    
+    Each template may be logged ``rate`` times per second, with bursts of
+    up to ``burst``. The next record let through after a suppressed run
+    carries the number dropped as ``suppressed``.
+    """
+    
+    MAX_KEYS = 1024
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or rate
+        self._buckets: 'OrderedDict[Tuple[str, str], List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno >= logging.ERROR:
+            return True
+        
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+                while len(self._buckets) > self.MAX_KEYS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse ``"cropio.requests=0.1,urllib3=0"`` into a rate per logger"""
+    rates = {}
+    for item in (value or '').split(','):
+        name, _, rate = item.strip().partition('=')
+        if name and rate:
+            try:
+                rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+            except ValueError:
+                continue
+    return rates
+
+
+class RoutingHandler(logging.Handler):
+    """
+    Hands each record to the handlers configured for its logger.
+    
+    ``routes`` maps logger names to ``(handlers, propagate)``; a record goes
+    to the handlers of its logger and of each ancestor up to the root ('')
+    until a route with ``propagate=False``, as logger propagation would.
+    """
+    
+    def __init__(self, routes: Dict[str, Tuple[List[logging.Handler], bool]]):
+        super().__init__()
+        self.routes = routes
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        name = record.name if record.name != 'root' else ''
+        while True:
+            handlers, propagate = self.routes.get(name, ((), True))
+            for handler in handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            if not name or not propagate:
+                break
+            name = name.rpartition('.')[0]
+    
+    def close(self) -> None:
+        for handlers, _ in self.routes.values():
+            for handler in handlers:
+                handler.close()
+        super().close()
+
+
+class LogPipeline:
+    """
+    Moves formatting and file I/O off the logging thread and into one writer.
+    
+    Log calls only put the record on an in-process queue; when it is full
+    the record is dropped and counted rather than waited on. A forwarder
+    thread drains the queue. In the process that created the pipeline it
+    hands records to ``target`` (the formatting, rotating handlers); in
+    processes forked from it, such as gunicorn workers of a preloaded app,
+    it sends them over an inherited Unix datagram socket to that process.
+    Every log file therefore has a single writer on the host, and rotation
+    cannot race between workers.
+    """
+    
+    def __init__(self, target: logging.Handler, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.target = target
+        self.queue_size = queue_size
+        self.owner_pid = os.getpid()
+        self.dropped = 0
+        self._stopped = False
+        self._reset()
+        _pipelines.add(self)
+        
+        self._reader = self._reader_sock = self._writer_sock = None
+        if hasattr(socket, 'AF_UNIX') and hasattr(os, 'register_at_fork'):
+            self._reader_sock, self._writer_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._reader = threading.Thread(target=self._read_loop, name='log-pipeline-reader', daemon=True)
+            self._reader.start()
+    
+    def _reset(self) -> None:
+        """Fresh queue and forwarder state; also run in forked children"""
+        self._queue = queue.Queue(self.queue_size)
+        self._lock = threading.Lock()
+        self._forwarder_pid = None
+    
+    def put(self, record: logging.LogRecord) -> None:
+        """Queue a prepared record without blocking"""
+        if self._forwarder_pid != os.getpid():
+            self._start_forwarder()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _start_forwarder(self) -> None:
+        with self._lock:
+            if self._forwarder_pid == os.getpid():
+                return
+            threading.Thread(target=self._forward_loop, name='log-pipeline-forwarder', daemon=True).start()
+            self._forwarder_pid = os.getpid()
+    
+    def _forward_loop(self) -> None:
+        local_queue = self._queue
+        while True:
+            record = local_queue.get()
+            try:
+                if record is None:
+                    return
+                if os.getpid() == self.owner_pid:
+                    self.target.handle(record)
+                elif self._writer_sock is not None:
+                    self._send(record)
+            except Exception:
+                self.target.handleError(record)
+            finally:
+                local_queue.task_done()
+    
+    def _send(self, record: logging.LogRecord) -> None:
+        data = self._encode(record.__dict__)
+        if len(data) > MAX_RECORD_BYTES:
+            fields = dict(record.__dict__)
+            fields['msg'] = str(fields['msg'])[:MAX_RECORD_BYTES // 4] + ' [truncated]'
+            fields.pop('exception', None)
+            fields.pop('extra_data', None)
+            data = self._encode(fields)
+        try:
+            self._writer_sock.send(data)
+        except OSError:
+            self.dropped += 1  # The writing process has gone away
+    
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> bytes:
+        try:
+            return pickle.dumps(fields, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Unpicklable extra data is sent as its JSON representation
+            return pickle.dumps(json.loads(json.dumps(fields, default=str)), pickle.HIGHEST_PROTOCOL)
+    
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                data = self._reader_sock.recv(MAX_RECORD_BYTES)
+            except OSError:
+                return
+            if not data:
+                if self._stopped:
+                    return
+                continue
+            try:
+                self.target.handle(logging.makeLogRecord(pickle.loads(data)))
+            except Exception:
+                continue
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until this process's queued records are written or sent"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write out this process's queued records; the creating process also stops the writer"""
+        self.flush(timeout)
+        if os.getpid() != self.owner_pid or self._stopped:
+            return
+        
+        self._stopped = True
+        with self._lock:
+            if self._forwarder_pid == os.getpid():
+                try:
+                    self._queue.put(None, timeout=timeout)
+                except queue.Full:
+                    pass
+                self._forwarder_pid = None
+        if self._reader is not None:
+            # Datagrams arrive in order, so everything sent before this is written first
+            self._writer_sock.send(b'')
+            self._reader.join(timeout)
+            self._reader_sock.close()
+            self._writer_sock.close()
+        self.target.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize(),
+            'dropped': self.dropped,
+            'writer_pid': self.owner_pid
+        }
+
+
+class PipelineHandler(logging.Handler):
+    """Captures request context, then queues the record on a ``LogPipeline``"""
+    
+    def __init__(self, pipeline: LogPipeline):
+        super().__init__()
+        self.pipeline = pipeline
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Resolve everything that cannot be read later in the writer"""
+        record.request_context, record.user_context = capture_request_context()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and record.exc_info != True:
+            record.exception = _exception_entry(record.exc_info)
+        record.exc_info = None
+        record.exc_text = None
+        return record
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.pipeline.put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+# Pipeline of the current logging setup
+log_pipeline: Optional[LogPipeline] = None
+
+
+# Every pipeline in this process; a forked child must not replay their queues
+_pipelines: 'weakref.WeakSet[LogPipeline]' = weakref.WeakSet()
+
+
+def _reset_pipelines_after_fork() -> None:
+    for pipeline in list(_pipelines):
+        pipeline._reset()
+
+
+def _stop_pipeline() -> None:
+    if log_pipeline is not None:
+        log_pipeline.stop()
+
+
+def flush_logs(timeout: float = 5.0) -> bool:
+    """Wait for records queued in this process, e.g. before a worker exits"""
+    if log_pipeline is None:
+        return True
+    return log_pipeline.flush(timeout)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pipelines_after_fork)
+atexit.register(_stop_pipeline)
+
+
 def setup_logging(app) -> None:
-    """Setup comprehensive logging for the application"""
+    """
+    Setup comprehensive logging for the application.
+    
+    Handlers are attached to one routing handler. With ``LOG_ASYNC`` (the
+    default) the root logger only queues records for a ``LogPipeline``
+    whose writer runs in this process; under gunicorn with ``preload_app``
+    this is the master, and workers forward their records to it.
+    """
+    global log_pipeline
     
     # Create logs directory
     log_dir = Path(app.config.get('LOG_DIR', 'logs'))
@@ -105,6 +495,9 @@ def setup_logging(app) -> None:
     # Remove default handlers
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    if log_pipeline is not None:
+        log_pipeline.stop()
+        log_pipeline = None
     
     # Application log file with rotation
     app_handler = logging.handlers.RotatingFileHandler(
@@ -133,6 +526,8 @@ def setup_logging(app) -> None:
     security_handler.setFormatter(StructuredFormatter())
     security_handler.addFilter(SecurityAuditFilter())
     
+    root_handlers = [app_handler, error_handler]
+    
     # Console handler for development
     if app.debug:
         console_handler = logging.StreamHandler()
@@ -140,16 +535,7 @@ def setup_logging(app) -> None:
             '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
         )
         console_handler.setFormatter(console_formatter)
-        root_logger.addHandler(console_handler)
-    
-    # Add all handlers to root logger
-    root_logger.addHandler(app_handler)
-    root_logger.addHandler(error_handler)
-    
-    # Create dedicated security logger
-    security_logger = logging.getLogger('cropio.security')
-    security_logger.addHandler(security_handler)
-    security_logger.setLevel(logging.INFO)
+        root_handlers.insert(0, console_handler)
     
     # Performance logger for slow queries and requests
     perf_handler = logging.handlers.RotatingFileHandler(
@@ -158,9 +544,39 @@ def setup_logging(app) -> None:
         backupCount=5
     )
     perf_handler.setFormatter(StructuredFormatter())
-    perf_logger = logging.getLogger('cropio.performance')
-    perf_logger.addHandler(perf_handler)
-    perf_logger.setLevel(logging.WARNING)
+    
+    # Request log lines go to stdout only
+    access_handler = logging.StreamHandler(sys.stdout)
+    access_handler.setFormatter(AccessLogFormatter())
+    
+    router = RoutingHandler({
+        '': (root_handlers, True),
+        'cropio.security': ([security_handler], True),
+        'cropio.performance': ([perf_handler], True),
+        'cropio.requests': ([access_handler], False),
+    })
+    
+    if app.config.get('LOG_ASYNC', True):
+        log_pipeline = LogPipeline(router, queue_size=app.config.get('LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        entry_handler = PipelineHandler(log_pipeline)
+    else:
+        entry_handler = router
+    
+    # Hot messages are thinned before they are queued
+    sample_rates = parse_sample_rates(app.config.get('LOG_SAMPLE_RATES', ''))
+    if sample_rates:
+        entry_handler.addFilter(SamplingFilter(sample_rates))
+    if app.config.get('LOG_RATE_LIMIT', 0) > 0:
+        entry_handler.addFilter(RateLimitFilter(app.config['LOG_RATE_LIMIT']))
+    root_logger.addHandler(entry_handler)
+    
+    # Dedicated loggers; their records are routed from the root handler
+    for name in ('cropio.security', 'cropio.performance', 'cropio.requests'):
+        for handler in logging.getLogger(name).handlers[:]:
+            logging.getLogger(name).removeHandler(handler)
+    logging.getLogger('cropio.security').setLevel(logging.INFO)
+    logging.getLogger('cropio.performance').setLevel(logging.WARNING)
+    logging.getLogger('cropio.requests').setLevel(logging.INFO)
     
     # Suppress noisy third-party loggers
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
@@ -249,6 +665,9 @@ class CropioLogger:
 # Global logger instance
 cropio_logger = CropioLogger()
 
+# Request log lines; sampled and rate limited through LOG_SAMPLE_RATES / LOG_RATE_LIMIT
+access_logger = logging.getLogger('cropio.requests')
+
 
 def log_request_info():
     """Middleware to log request information"""
@@ -295,15 +714,21 @@ def log_file_operation(operation: str, filename: str,
 
 
 def log_conversion_metrics(tool: str, processing_time: float,
-                         file_size: int, success: bool = True) -> None:
-    """Log conversion performance metrics"""
+                         file_size: int, success: bool = True, output_size: int = 0) -> None:
+    """Log conversion performance metrics and record them for /api/metrics"""
     cropio_logger.info(
-        f"Conversion completed: {tool}",
+        f"Conversion {'completed' if success else 'failed'}: {tool}",
         extra_data={
             'tool': tool,
             'processing_time': processing_time,
             'file_size': file_size,
+            'output_size': output_size,
             'success': success,
             'conversion_metrics': True
         }
     )
+    
+    # Imported here: core.metrics imports this module
+    from core.metrics import app_metrics
+    app_metrics.record_conversion(tool, processing_time, input_bytes=file_size,
+                                  output_bytes=output_size, success=success)
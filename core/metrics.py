@@ -0,0 +1,313 @@
+"""
+Application Metrics for Cropio SaaS Platform
+Request, conversion and job metrics exposed in Prometheus text format
+
+Counters and histograms are recorded in-process with ``prometheus_client``.
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (gunicorn_config.py sets it before
+the app is loaded) every process writes its values to files in that
+directory and a scrape of any worker aggregates all of them, including the
+background job workers. System gauges are sampled by a background thread
+and served from that sample, so a scrape never waits on psutil or the
+database.
+"""
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from flask import g, request
+
+from core.logging_config import cropio_logger
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+DEFAULT_SAMPLE_INTERVAL = 15  # seconds between system samples
+
+# Request latency, and conversion/job latency which runs much longer
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONVERSION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 900)
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Directory aggregating metrics across processes, if configured"""
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+if PROMETHEUS_AVAILABLE:
+    # Metrics live on a private registry; the process-wide default registry
+    # is left to libraries that register their own collectors
+    _registry = CollectorRegistry()
+
+    HTTP_REQUESTS = Counter(
+        'cropio_http_requests_total', 'HTTP requests handled',
+        ['method', 'endpoint', 'status'], registry=_registry
+    )
+    HTTP_REQUEST_DURATION = Histogram(
+        'cropio_http_request_duration_seconds', 'HTTP request latency',
+        ['method', 'endpoint'], buckets=REQUEST_BUCKETS, registry=_registry
+    )
+    HTTP_REQUEST_BYTES = Counter(
+        'cropio_http_request_bytes_total', 'Request body bytes received',
+        ['endpoint'], registry=_registry
+    )
+    HTTP_RESPONSE_BYTES = Counter(
+        'cropio_http_response_bytes_total', 'Response body bytes sent (when the length is known)',
+        ['endpoint'], registry=_registry
+    )
+    CONVERSIONS = Counter(
+        'cropio_conversions_total', 'Conversions by tool and outcome',
+        ['tool', 'status'], registry=_registry
+    )
+    CONVERSION_DURATION = Histogram(
+        'cropio_conversion_duration_seconds', 'Conversion latency by tool',
+        ['tool'], buckets=CONVERSION_BUCKETS, registry=_registry
+    )
+    CONVERSION_INPUT_BYTES = Counter(
+        'cropio_conversion_input_bytes_total', 'Bytes of conversion input',
+        ['tool'], registry=_registry
+    )
+    CONVERSION_OUTPUT_BYTES = Counter(
+        'cropio_conversion_output_bytes_total', 'Bytes of conversion output',
+        ['tool'], registry=_registry
+    )
+    JOBS = Counter(
+        'cropio_jobs_total', 'Background jobs finished by kind and outcome',
+        ['kind', 'status'], registry=_registry
+    )
+    JOB_QUEUE_WAIT = Histogram(
+        'cropio_job_queue_wait_seconds', 'Time background jobs spent queued before a worker claimed them',
+        ['kind'], buckets=CONVERSION_BUCKETS, registry=_registry
+    )
+    JOB_DURATION = Histogram(
+        'cropio_job_duration_seconds', 'Background job run time',
+        ['kind'], buckets=CONVERSION_BUCKETS, registry=_registry
+    )
+
+
+class SystemSampler:
+    """
+    Host and application gauges refreshed on a background thread.
+
+    The first read in each process takes a sample and starts the thread,
+    so workers that never serve a scrape do not sample. Later reads return
+    the latest sample immediately.
+    """
+
+    def __init__(self, interval: int = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.app = None
+        self._sample: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        self._db_error_logged = False
+
+    def configure(self, app, interval: int) -> None:
+        self.app = app
+        self.interval = interval
+
+    def _collect(self, include_cpu: bool = True) -> Dict[str, Any]:
+        sample: Dict[str, Any] = {'sampled_at': time.time()}
+
+        if PSUTIL_AVAILABLE:
+            if include_cpu:
+                # Utilisation since the previous sample; never blocks
+                sample['cpu_percent'] = psutil.cpu_percent(interval=None)
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            sample.update({
+                'memory_used_percent': memory.percent,
+                'memory_available_bytes': memory.available,
+                'disk_used_percent': disk.used / disk.total * 100 if disk.total else 0.0,
+                'disk_free_bytes': disk.free,
+                'load_average': list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0, 0, 0],
+            })
+
+        if self.app is not None:
+            try:
+                from models import User
+                with self.app.app_context():
+                    sample['total_users'] = User.query.count()
+                    sample['active_users'] = User.query.filter_by(is_active=True).count()
+            except Exception as e:
+                if not self._db_error_logged:
+                    cropio_logger.warning(f"Metrics user count sampling failed: {e}")
+                    self._db_error_logged = True
+
+        return sample
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                sample = self._collect()
+                with self._lock:
+                    self._sample = sample
+            except Exception as e:
+                cropio_logger.warning(f"System metrics sampling failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest sample; starts the sampling thread in this process if needed"""
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._thread_pid = os.getpid()
+                if PSUTIL_AVAILABLE:
+                    psutil.cpu_percent(interval=None)  # Start the CPU measurement window
+                # The first sample is taken here; CPU is reported from the next one
+                self._sample = self._collect(include_cpu=False)
+                threading.Thread(target=self._run, name='metrics-sampler', daemon=True).start()
+            return dict(self._sample)
+
+
+class SystemCollector:
+    """Exposes the latest ``SystemSampler`` sample as gauges at scrape time"""
+
+    GAUGES = (
+        ('cpu_percent', 'cropio_system_cpu_percent', 'Host CPU utilisation'),
+        ('memory_used_percent', 'cropio_system_memory_used_percent', 'Host memory in use'),
+        ('memory_available_bytes', 'cropio_system_memory_available_bytes', 'Host memory available'),
+        ('disk_used_percent', 'cropio_system_disk_used_percent', 'Root filesystem in use'),
+        ('disk_free_bytes', 'cropio_system_disk_free_bytes', 'Root filesystem free space'),
+        ('total_users', 'cropio_users', 'Registered users'),
+        ('active_users', 'cropio_users_active', 'Active registered users'),
+    )
+
+    def __init__(self, sampler: SystemSampler):
+        self.sampler = sampler
+
+    def collect(self):
+        sample = self.sampler.snapshot()
+        for key, name, documentation in self.GAUGES:
+            if key in sample:
+                yield GaugeMetricFamily(name, documentation, value=sample[key])
+
+        if 'load_average' in sample:
+            load = GaugeMetricFamily('cropio_system_load_average', 'Host load average', labels=['period'])
+            for period, value in zip(('1m', '5m', '15m'), sample['load_average']):
+                load.add_metric([period], value)
+            yield load
+
+        if 'sampled_at' in sample:
+            yield GaugeMetricFamily(
+                'cropio_system_sample_age_seconds', 'Age of the system sample',
+                value=time.time() - sample['sampled_at']
+            )
+
+
+class AppMetrics:
+    """
+    Records request, conversion and job metrics for the Prometheus endpoint.
+
+    ``init_app`` adds request timing hooks; converters and the job queue
+    report through ``record_conversion`` and ``record_job``. Every method is
+    a no-op when ``prometheus_client`` is not installed.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = PROMETHEUS_AVAILABLE
+        self.sampler = SystemSampler()
+        self._collector = SystemCollector(self.sampler)
+        if PROMETHEUS_AVAILABLE:
+            _registry.register(self._collector)
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize metrics with Flask app configuration"""
+        self.enabled = PROMETHEUS_AVAILABLE and app.config.get('METRICS_ENABLED', True)
+        self.sampler.configure(app, app.config.get('METRICS_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL))
+
+        if not self.enabled:
+            if not PROMETHEUS_AVAILABLE:
+                cropio_logger.warning("prometheus_client not installed; metrics disabled")
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        mode = f"multiprocess ({multiprocess_dir()})" if multiprocess_dir() else 'single process'
+        cropio_logger.info(f"Metrics initialized: {mode}")
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        try:
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(request.method, endpoint).observe(time.perf_counter() - started)
+            if request.content_length:
+                HTTP_REQUEST_BYTES.labels(endpoint).inc(request.content_length)
+            if response.content_length:
+                HTTP_RESPONSE_BYTES.labels(endpoint).inc(response.content_length)
+        except Exception as e:
+            cropio_logger.warning(f"Request metrics failed: {e}")
+        return response
+
+    def record_conversion(self, tool: str, seconds: Optional[float] = None, input_bytes: int = 0,
+                          output_bytes: int = 0, success: bool = True) -> None:
+        """Count one conversion; ``seconds`` is left out when it was not measured"""
+        if not self.enabled:
+            return
+        tool = tool or 'unknown'
+        CONVERSIONS.labels(tool, 'success' if success else 'failure').inc()
+        if seconds is not None:
+            CONVERSION_DURATION.labels(tool).observe(seconds)
+        if input_bytes:
+            CONVERSION_INPUT_BYTES.labels(tool).inc(input_bytes)
+        if output_bytes:
+            CONVERSION_OUTPUT_BYTES.labels(tool).inc(output_bytes)
+
+    def record_job(self, kind: str, wait_seconds: Optional[float], run_seconds: float, status: str) -> None:
+        """Count one finished background job with its queue wait and run time"""
+        if not self.enabled:
+            return
+        JOBS.labels(kind, status).inc()
+        if wait_seconds is not None:
+            JOB_QUEUE_WAIT.labels(kind).observe(max(0.0, wait_seconds))
+        JOB_DURATION.labels(kind).observe(run_seconds)
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    def render(self) -> Tuple[bytes, str]:
+        """Current metrics in Prometheus text format, with its content type"""
+        if not PROMETHEUS_AVAILABLE:
+            return b'# prometheus_client is not installed\n', CONTENT_TYPE_LATEST
+
+        if multiprocess_dir():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(self._collector)
+        else:
+            registry = _registry
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    def system_snapshot(self) -> Dict[str, Any]:
+        """Latest sampled system gauges, for JSON consumers"""
+        return self.sampler.snapshot()
+
+
+# Global metrics instance
+app_metrics = AppMetrics()
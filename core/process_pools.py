@@ -0,0 +1,31 @@
+"""
+Process Pool Sizing for Cropio SaaS Platform
+Splits the host's cores between the pools that every web worker starts
+"""
+import os
+from typing import Optional
+
+
+def web_worker_count() -> int:
+    """Number of web worker processes on this host (set by gunicorn_config)"""
+    try:
+        return max(1, int(os.environ.get('CROPIO_WEB_WORKERS', 1)))
+    except ValueError:
+        return 1
+
+
+def pool_size(setting: str, default_total: Optional[int] = None) -> int:
+    """
+    Workers this process may start for a process pool.
+
+    ``setting`` names the environment variable holding the pool's budget
+    for the whole host; without it the budget is ``default_total`` or the
+    number of cores. Every web worker starts its own pool, so the budget is
+    divided between them. Always at least one.
+    """
+    try:
+        total = int(os.environ.get(setting, 0))
+    except ValueError:
+        total = 0
+    total = total or default_total or os.cpu_count() or 1
+    return max(1, total // web_worker_count())
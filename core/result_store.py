@@ -0,0 +1,492 @@
+"""
+Shared Conversion Result Store for Cropio SaaS Platform
+Keeps short-lived conversion results and one-time tokens where every worker can see them
+
+Routes used to keep results in module-level dicts, which only exist in the
+gunicorn worker that created them, and started one sleeping thread per
+result to clean up. Entries now live in a pluggable backend with a TTL:
+- MemoryResultStoreBackend: per-process, the default until init_app runs
+- DiskResultStoreBackend: a SQLite index plus blob files, shared by all workers on one host
+- RedisResultStoreBackend: shared across hosts; used when REDIS_URL is set
+
+Each entry has JSON metadata, an optional binary blob and a list of local
+paths owned by the entry. One sweeper (run from the app scheduler) deletes
+expired entries together with their blobs. Paths are only deleted on the
+host that wrote them: with Redis, a host that removes another host's entry
+hands the paths over to that host's next sweep.
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import socket
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from core.logging_config import cropio_logger
+
+
+BACKENDS = ('auto', 'memory', 'disk', 'redis')
+DEFAULT_TTL_SECONDS = 3600  # 1 hour
+SQLITE_MMAP_SIZE = 8 * 1024 * 1024
+RELEASED_PATHS_LIMIT = 500
+
+# Entry tuple used between the store and its backends
+# (data, blob, paths, expires_at)
+Entry = Tuple[Dict[str, Any], Optional[bytes], List[str], float]
+
+
+def remove_paths(paths: Iterable[str]) -> None:
+    """Delete files and directories owned by an expired entry"""
+    for path in paths or ():
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            cropio_logger.warning(f"Result store could not remove {path}: {e}")
+
+
+class OwnedPaths(list):
+    """An entry's paths together with the host whose filesystem they are on"""
+
+    def __init__(self, paths: Iterable[str], host: Optional[str]):
+        super().__init__(paths)
+        self.host = host
+
+
+class MemoryResultStoreBackend:
+    """Per-process entries; only suitable for development and tests"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Entry] = {}
+
+    def put(self, namespace: str, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = entry
+
+    def get(self, namespace: str, key: str, with_blob: bool = False) -> Optional[Entry]:
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        data, blob, paths, expires_at = entry
+        return dict(data), blob if with_blob else None, list(paths), expires_at
+
+    def pop(self, namespace: str, key: str) -> Optional[Entry]:
+        with self._lock:
+            return self._entries.pop((namespace, key), None)
+
+    def set_expiry(self, namespace: str, key: str, expires_at: float) -> bool:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return False
+            self._entries[(namespace, key)] = entry[:3] + (expires_at,)
+            return True
+
+    def expired(self, now: float, limit: int) -> List[Tuple[str, str]]:
+        return [k for k, entry in list(self._entries.items()) if entry[3] <= now][:limit]
+
+    def count(self) -> int:
+        return len(self._entries)
+
+    def release_paths(self, paths: List[str]) -> None:
+        remove_paths(paths)
+
+    def take_released_paths(self, limit: int) -> List[str]:
+        return []
+
+
+class DiskResultStoreBackend:
+    """
+    Entries in a SQLite index with blobs as files, shared by every worker on the host.
+
+    Blobs are written to a temp file and renamed into place, so a reader never
+    sees a partial blob. pop() deletes the index row in its own transaction,
+    so a one-time token is handed to exactly one request.
+    """
+
+    name = 'disk'
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._local = threading.local()
+        os.makedirs(os.path.join(folder, 'blobs'), exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                paths TEXT NOT NULL,
+                has_blob INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.folder, 'results.sqlite3'), timeout=10,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, namespace: str, key: str) -> str:
+        digest = hashlib.sha256(f'{namespace}\0{key}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, 'blobs', digest)
+
+    def _read_blob(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(namespace, key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove_blob(self, namespace: str, key: str) -> None:
+        try:
+            os.remove(self._blob_path(namespace, key))
+        except FileNotFoundError:
+            pass
+
+    def put(self, namespace: str, key: str, entry: Entry) -> None:
+        data, blob, paths, expires_at = entry
+        if blob is not None:
+            blob_path = self._blob_path(namespace, key)
+            # mkstemp creates the file readable by this user only
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_path, blob_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        else:
+            self._remove_blob(namespace, key)
+
+        self._connect().execute(
+            'INSERT OR REPLACE INTO results (namespace, key, data, paths, has_blob, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (namespace, key, json.dumps(data, default=str), json.dumps(paths),
+             int(blob is not None), expires_at)
+        )
+
+    def get(self, namespace: str, key: str, with_blob: bool = False) -> Optional[Entry]:
+        row = self._connect().execute(
+            'SELECT data, paths, has_blob, expires_at FROM results WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        blob = self._read_blob(namespace, key) if with_blob and row[2] else None
+        return json.loads(row[0]), blob, json.loads(row[1]), row[3]
+
+    def pop(self, namespace: str, key: str) -> Optional[Entry]:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT data, paths, has_blob, expires_at FROM results WHERE namespace = ? AND key = ?',
+                (namespace, key)
+            ).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM results WHERE namespace = ? AND key = ?', (namespace, key))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if row is None:
+            return None
+        blob = self._read_blob(namespace, key) if row[2] else None
+        self._remove_blob(namespace, key)
+        return json.loads(row[0]), blob, json.loads(row[1]), row[3]
+
+    def set_expiry(self, namespace: str, key: str, expires_at: float) -> bool:
+        return self._connect().execute(
+            'UPDATE results SET expires_at = ? WHERE namespace = ? AND key = ?',
+            (expires_at, namespace, key)
+        ).rowcount > 0
+
+    def expired(self, now: float, limit: int) -> List[Tuple[str, str]]:
+        return self._connect().execute(
+            'SELECT namespace, key FROM results WHERE expires_at <= ? LIMIT ?', (now, limit)
+        ).fetchall()
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def release_paths(self, paths: List[str]) -> None:
+        # Every worker sharing the index shares the filesystem
+        remove_paths(paths)
+
+    def take_released_paths(self, limit: int) -> List[str]:
+        return []
+
+
+class RedisResultStoreBackend:
+    """
+    Entries in Redis hashes, with a sorted set of expiry times for the sweeper.
+
+    Redis also expires each hash on its own an hour after the entry's TTL, so
+    nothing leaks if no sweeper runs. Local paths are only meaningful on the
+    host that wrote them, so each entry records its owning host. When another
+    host pops or sweeps the entry, its paths are pushed to a per-host list
+    and the owner deletes them on its next sweep. Paths of a host that never
+    sweeps again are dropped from Redis after RELEASED_PATHS_TTL.
+    """
+
+    name = 'redis'
+    EXPIRY_INDEX = 'result_store:expiry'
+    KEY_GRACE_SECONDS = 3600
+    RELEASED_PATHS_TTL = 24 * 3600
+
+    def __init__(self, url: str, host_id: Optional[str] = None):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('redis package is not installed')
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=1)
+        self.client.ping()
+        self.host_id = host_id or socket.gethostname()
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f'result_store:{namespace}:{key}'
+
+    @staticmethod
+    def _member(namespace: str, key: str) -> str:
+        return f'{namespace}\0{key}'
+
+    @staticmethod
+    def _released_key(host: str) -> str:
+        return f'result_store:released:{host}'
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes], with_blob: bool) -> Entry:
+        blob = fields.get(b'blob') if with_blob else None
+        host = fields.get(b'host')
+        paths = OwnedPaths(json.loads(fields[b'paths']), host.decode('utf-8') if host else None)
+        return json.loads(fields[b'data']), blob, paths, float(fields[b'expires_at'])
+
+    def put(self, namespace: str, key: str, entry: Entry) -> None:
+        data, blob, paths, expires_at = entry
+        redis_key = self._key(namespace, key)
+        fields = {
+            'data': json.dumps(data, default=str),
+            'paths': json.dumps(paths),
+            # An entry put back by another host's sweeper keeps its owner
+            'host': getattr(paths, 'host', None) or self.host_id,
+            'expires_at': repr(expires_at),
+        }
+        pipe = self.client.pipeline()
+        pipe.delete(redis_key)
+        if blob is not None:
+            fields['blob'] = blob
+        pipe.hset(redis_key, mapping=fields)
+        pipe.expireat(redis_key, int(expires_at) + self.KEY_GRACE_SECONDS)
+        pipe.zadd(self.EXPIRY_INDEX, {self._member(namespace, key): expires_at})
+        pipe.execute()
+
+    def get(self, namespace: str, key: str, with_blob: bool = False) -> Optional[Entry]:
+        redis_key = self._key(namespace, key)
+        if with_blob:
+            fields = self.client.hgetall(redis_key)
+        else:
+            values = self.client.hmget(redis_key, 'data', 'paths', 'host', 'expires_at')
+            fields = dict(zip((b'data', b'paths', b'host', b'expires_at'), values)) if values[0] else {}
+        return self._decode(fields, with_blob) if fields else None
+
+    def pop(self, namespace: str, key: str) -> Optional[Entry]:
+        redis_key = self._key(namespace, key)
+        pipe = self.client.pipeline()
+        pipe.hgetall(redis_key)
+        pipe.delete(redis_key)
+        pipe.zrem(self.EXPIRY_INDEX, self._member(namespace, key))
+        fields, deleted, _ = pipe.execute()
+        # Only the request whose DELETE removed the key owns the entry
+        return self._decode(fields, True) if fields and deleted else None
+
+    def set_expiry(self, namespace: str, key: str, expires_at: float) -> bool:
+        redis_key = self._key(namespace, key)
+        if not self.client.exists(redis_key):
+            return False
+        pipe = self.client.pipeline()
+        pipe.hset(redis_key, 'expires_at', repr(expires_at))
+        pipe.expireat(redis_key, int(expires_at) + self.KEY_GRACE_SECONDS)
+        pipe.zadd(self.EXPIRY_INDEX, {self._member(namespace, key): expires_at})
+        pipe.execute()
+        return True
+
+    def expired(self, now: float, limit: int) -> List[Tuple[str, str]]:
+        members = self.client.zrangebyscore(self.EXPIRY_INDEX, '-inf', now, start=0, num=limit)
+        return [tuple(m.decode('utf-8').split('\0', 1)) for m in members]
+
+    def count(self) -> int:
+        return self.client.zcard(self.EXPIRY_INDEX)
+
+    def release_paths(self, paths: List[str]) -> None:
+        """Delete paths written on this host; hand other hosts' paths to their sweeper"""
+        host = getattr(paths, 'host', None) or self.host_id
+        if host == self.host_id:
+            remove_paths(paths)
+        elif paths:
+            released_key = self._released_key(host)
+            pipe = self.client.pipeline()
+            pipe.rpush(released_key, *paths)
+            pipe.expire(released_key, self.RELEASED_PATHS_TTL)
+            pipe.execute()
+
+    def take_released_paths(self, limit: int) -> List[str]:
+        """Paths other hosts handed over for this host to delete"""
+        paths = self.client.lpop(self._released_key(self.host_id), limit) or []
+        return [path.decode('utf-8') for path in paths]
+
+
+class ResultStore:
+    """Namespaced, TTL-bound result and token store over a configurable backend"""
+
+    def __init__(self):
+        self.backend = MemoryResultStoreBackend()
+
+    def init_app(self, app):
+        """Select the storage backend from Flask app configuration"""
+        choice = (app.config.get('RESULT_STORE_BACKEND') or 'auto').lower()
+        if choice not in BACKENDS:
+            raise ValueError(f"Unknown result store backend: {choice}")
+
+        redis_url = app.config.get('RESULT_STORE_REDIS_URL')
+        if choice == 'redis' or (choice == 'auto' and redis_url):
+            try:
+                self.backend = RedisResultStoreBackend(redis_url or app.config.get('RATELIMIT_STORAGE_URL'),
+                                                       app.config.get('RESULT_STORE_HOST_ID'))
+                cropio_logger.info("Result store using Redis backend")
+                return
+            except Exception as e:
+                cropio_logger.warning(f"Redis result store unavailable, falling back to disk: {e}")
+
+        if choice == 'memory':
+            self.backend = MemoryResultStoreBackend()
+        else:
+            folder = app.config.get('RESULT_STORE_FOLDER') or os.path.join(
+                os.path.dirname(app.config.get('UPLOAD_FOLDER', 'uploads')), 'results'
+            )
+            self.backend = DiskResultStoreBackend(folder)
+        cropio_logger.info(f"Result store using {self.backend.name} backend")
+
+    def put(self, namespace: str, key: str, data: Dict[str, Any],
+            ttl: float = DEFAULT_TTL_SECONDS, blob: Optional[bytes] = None,
+            paths: Optional[List[str]] = None) -> None:
+        """
+        Store an entry.
+
+        Args:
+            namespace: Owning tool, e.g. 'gif_mp4'
+            key: Entry ID within the namespace
+            data: JSON-serializable metadata
+            ttl: Seconds until the sweeper deletes the entry
+            blob: Optional binary payload, read back with get_blob() or pop()
+            paths: Local files or directories deleted together with the entry,
+                on this host
+        """
+        self.backend.put(namespace, key, (data, blob, list(paths or []), time.time() + ttl))
+
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return an entry's metadata, or None if it is missing or expired"""
+        entry = self.backend.get(namespace, key)
+        if entry is None or entry[3] <= time.time():
+            return None
+        return entry[0]
+
+    def get_blob(self, namespace: str, key: str) -> Optional[bytes]:
+        entry = self.backend.get(namespace, key, with_blob=True)
+        if entry is None or entry[3] <= time.time():
+            return None
+        return entry[1]
+
+    def pop(self, namespace: str, key: str) -> Optional[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        Atomically remove an entry and return (data, blob).
+
+        Only one caller across all workers gets the entry, which makes this
+        the way to redeem one-time tokens. The entry's paths are deleted.
+        """
+        entry = self.backend.pop(namespace, key)
+        if entry is None:
+            return None
+        data, blob, paths, expires_at = entry
+        self.backend.release_paths(paths)
+        if expires_at <= time.time():
+            return None
+        return data, blob
+
+    def delete(self, namespace: str, key: str) -> bool:
+        """Remove an entry now, with its blob and owned paths"""
+        entry = self.backend.pop(namespace, key)
+        if entry is None:
+            return False
+        self.backend.release_paths(entry[2])
+        return True
+
+    def expire_in(self, namespace: str, key: str, seconds: float) -> bool:
+        """Shorten or extend an entry's lifetime; the sweeper removes it afterwards"""
+        return self.backend.set_expiry(namespace, key, time.time() + seconds)
+
+    def sweep(self, limit: int = 500) -> int:
+        """
+        Delete expired entries and their paths; run periodically by the scheduler.
+
+        Also deletes paths that other hosts removed entries for but could not
+        reach, since they are on this host.
+        """
+        remove_paths(self.backend.take_released_paths(RELEASED_PATHS_LIMIT))
+        removed = 0
+        for namespace, key in self.backend.expired(time.time(), limit):
+            entry = self.backend.pop(namespace, key)
+            if entry is None:
+                continue  # Another worker swept it first
+            if entry[3] > time.time():
+                # Refreshed after we listed it; put it back untouched
+                self.backend.put(namespace, key, entry)
+                continue
+            self.backend.release_paths(entry[2])
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            entries = self.backend.count()
+        except Exception as e:
+            cropio_logger.warning(f"Result store stats failed: {e}")
+            entries = None
+        return {'backend': self.backend.name, 'entries': entries}
+
+
+# Global instance
+result_store = ResultStore()
+
+
+def sweep_result_store():
+    """Scheduler job: remove expired results from the shared store"""
+    try:
+        return result_store.sweep()
+    except Exception as e:
+        cropio_logger.error(f"Result store sweep failed: {e}")
+        return 0
@@ -0,0 +1,444 @@
+"""
+Storage Accounting Index for Cropio SaaS Platform
+Tracks files in the upload, compressed and output folders without scanning them
+
+Every indexed file has a row with its size, owner, tool, creation time and
+expiry in a SQLite database shared by all workers on the host. Per-folder
+totals are kept up to date by triggers, so admin statistics are a single
+row read, and cleanup deletes files in expiry order from an index instead
+of stat-ing every file on disk.
+
+Files are recorded when they are written (``record``, or
+``record_after_request`` from routes and processors that save into a
+tracked folder themselves), served (``mark_served``) or deleted
+(``forget``/``remove``). Anything written some other way is picked up by
+``reconcile``, which walks the folders; it runs at startup when the index
+is empty and then once a day.
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from core.logging_config import cropio_logger
+
+
+DEFAULT_FILE_TTL = 3600  # 1 hour, for files directly in a tracked folder
+SWEEP_BATCH = 1000
+RECONCILE_BATCH = 5000
+
+
+def is_temp_name(name: str) -> bool:
+    """Whether a file name marks a temporary file"""
+    return name.startswith('temp_') or name.endswith('.tmp')
+
+
+class StorageIndex:
+    """
+    SQLite index of stored files with incrementally maintained totals.
+
+    Files directly inside a tracked folder expire ``file_ttl`` seconds after
+    they were last written, matching the old age-based cleanup; files in
+    subdirectories are counted but only expire when recorded with a ttl.
+    The index is disabled until ``init_app`` is called.
+    """
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.roots: List[str] = []
+        self.file_ttl = DEFAULT_FILE_TTL
+        self.enabled = False
+        self._local = threading.local()
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize the index with Flask app configuration"""
+        self.enabled = app.config.get('STORAGE_INDEX_ENABLED', True)
+        self.folder = app.config.get('STORAGE_INDEX_FOLDER') or os.path.join(
+            os.path.dirname(app.config.get('UPLOAD_FOLDER', 'uploads')), 'storage'
+        )
+        self.file_ttl = app.config.get('STORAGE_FILE_TTL', DEFAULT_FILE_TTL)
+        self.roots = [
+            os.path.abspath(app.config[name])
+            for name in ('UPLOAD_FOLDER', 'COMPRESSED_FOLDER', 'OUTPUT_FOLDER')
+            if app.config.get(name)
+        ]
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        self._create_schema()
+        app.after_request(self._after_request)
+        cropio_logger.info(f"Storage index initialized: {self.folder}")
+
+    # ------------------------------------------------------------------
+    # Index storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if (conn is None or getattr(self._local, 'folder', None) != self.folder
+                or getattr(self._local, 'pid', None) != os.getpid()):
+            conn = sqlite3.connect(os.path.join(self.folder, 'index.sqlite3'), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.folder = self.folder
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                ' path TEXT PRIMARY KEY, root TEXT NOT NULL, size INTEGER NOT NULL,'
+                ' owner INTEGER, tool TEXT, is_temp INTEGER NOT NULL DEFAULT 0,'
+                ' created_at REAL NOT NULL, expires_at REAL, served_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_files_expires_at ON files (expires_at)'
+                         ' WHERE expires_at IS NOT NULL')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_files_root_created ON files (root, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_files_root_temp ON files (root) WHERE is_temp = 1')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS totals ('
+                ' root TEXT PRIMARY KEY, files INTEGER NOT NULL DEFAULT 0,'
+                ' bytes INTEGER NOT NULL DEFAULT 0, temp_files INTEGER NOT NULL DEFAULT 0)'
+            )
+            # Totals follow every change to the files table
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS files_added AFTER INSERT ON files BEGIN'
+                ' INSERT OR IGNORE INTO totals (root) VALUES (NEW.root);'
+                ' UPDATE totals SET files = files + 1, bytes = bytes + NEW.size,'
+                '  temp_files = temp_files + NEW.is_temp WHERE root = NEW.root;'
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS files_removed AFTER DELETE ON files BEGIN'
+                ' UPDATE totals SET files = files - 1, bytes = bytes - OLD.size,'
+                '  temp_files = temp_files - OLD.is_temp WHERE root = OLD.root;'
+                ' END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS files_resized AFTER UPDATE OF size ON files BEGIN'
+                ' UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE root = NEW.root;'
+                ' END'
+            )
+
+    def _locate(self, path: str) -> Optional[tuple]:
+        """(absolute path, tracked root, path relative to it), or None if untracked"""
+        path = os.path.abspath(path)
+        for root in self.roots:
+            if path.startswith(root + os.sep):
+                return path, root, path[len(root) + 1:]
+        return None
+
+    def _expiry(self, relative: str, written_at: float, ttl: Optional[float]) -> Optional[float]:
+        if ttl is not None:
+            return written_at + ttl
+        if os.sep not in relative:
+            return written_at + self.file_ttl
+        return None
+
+    def _row(self, path: str, root: str, relative: str, stat: os.stat_result,
+             owner: Optional[int] = None, tool: Optional[str] = None,
+             ttl: Optional[float] = None) -> tuple:
+        return (path, root, stat.st_size, owner, tool, int(is_temp_name(os.path.basename(path))),
+                stat.st_mtime, self._expiry(relative, stat.st_mtime, ttl))
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, path: str, owner: Optional[int] = None, tool: Optional[str] = None,
+               ttl: Optional[float] = None) -> bool:
+        """
+        Add or refresh a written file.
+
+        Args:
+            path: File inside one of the tracked folders; others are ignored
+            owner: ID of the user the file belongs to, if any
+            tool: Tool that produced the file
+            ttl: Seconds after the write until cleanup deletes the file
+
+        Returns whether the file was indexed.
+        """
+        if not self.enabled:
+            return False
+        located = self._locate(path)
+        if located is None:
+            return False
+        try:
+            stat = os.stat(located[0])
+        except OSError:
+            return False
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO files (path, root, size, owner, tool, is_temp, created_at, expires_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET'
+                ' size = excluded.size, owner = COALESCE(excluded.owner, owner),'
+                ' tool = COALESCE(excluded.tool, tool), created_at = excluded.created_at,'
+                ' expires_at = excluded.expires_at',
+                self._row(*located, stat, owner, tool, ttl)
+            )
+        return True
+
+    def mark_served(self, path: str) -> None:
+        """Note that a file was downloaded, indexing it if it was written without a hook"""
+        if not self.enabled:
+            return
+        located = self._locate(path)
+        if located is None:
+            return
+        conn = self._connect()
+        with conn:
+            updated = conn.execute('UPDATE files SET served_at = ? WHERE path = ?',
+                                   (time.time(), located[0])).rowcount
+        if not updated and self.record(path):
+            with conn:
+                conn.execute('UPDATE files SET served_at = ? WHERE path = ?', (time.time(), located[0]))
+
+    def forget(self, paths: Iterable[str]) -> None:
+        """Drop index rows for files that were deleted elsewhere"""
+        if not self.enabled:
+            return
+        if isinstance(paths, str):
+            paths = [paths]
+        conn = self._connect()
+        with conn:
+            conn.executemany('DELETE FROM files WHERE path = ?',
+                             [(os.path.abspath(path),) for path in paths])
+
+    def remove(self, path: str) -> int:
+        """Delete a file and its row; returns the bytes freed"""
+        path = os.path.abspath(path)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            size = 0
+        self.forget(path)
+        return size
+
+    def _after_request(self, response):
+        """Record the input and output files a conversion route left on ``g``"""
+        try:
+            from flask import g
+
+            paths = [g.get('input_file_path'), g.get('output_file_path')]
+            paths.extend(g.get('storage_paths') or ())
+            paths = [path for path in paths if path]
+            if paths:
+                # Only use a user Flask-Login already loaded for this request
+                user = g.get('_login_user')
+                owner = user.id if user is not None and getattr(user, 'is_authenticated', False) else None
+                for path in paths:
+                    self.record(path, owner=owner, tool=g.get('tool_name'))
+        except Exception as e:
+            cropio_logger.warning(f"Storage index update failed: {e}")
+        return response
+
+    # ------------------------------------------------------------------
+    # Cleanup
+    # ------------------------------------------------------------------
+
+    def _delete_files(self, rows: List[tuple], now: float, check_age: bool) -> Dict[str, int]:
+        """
+        Delete indexed (path, created_at, expires_at) files.
+
+        With check_age, a file written again since it was indexed keeps its
+        lifetime from the new write and is only deleted once that has passed.
+        """
+        result = {'deleted': 0, 'size_freed': 0, 'missing': 0}
+        gone, refreshed = [], []
+
+        for path, created_at, expires_at in rows:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                gone.append((path,))
+                result['missing'] += 1
+                continue
+            except OSError as e:
+                cropio_logger.warning(f"Storage cleanup could not stat {path}: {e}")
+                continue
+
+            if check_age and stat.st_mtime > created_at:
+                expires_at += stat.st_mtime - created_at
+                if expires_at > now:
+                    refreshed.append((stat.st_size, stat.st_mtime, expires_at, path))
+                    continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                cropio_logger.warning(f"Storage cleanup could not remove {path}: {e}")
+                continue
+            gone.append((path,))
+            result['deleted'] += 1
+            result['size_freed'] += stat.st_size
+
+        conn = self._connect()
+        with conn:
+            conn.executemany('DELETE FROM files WHERE path = ?', gone)
+            conn.executemany('UPDATE files SET size = ?, created_at = ?, expires_at = ? WHERE path = ?',
+                             refreshed)
+        return result
+
+    def sweep(self, limit: int = SWEEP_BATCH) -> Dict[str, int]:
+        """Delete files past their expiry, oldest first; run periodically by the scheduler"""
+        if not self.enabled:
+            return {'deleted': 0, 'size_freed': 0, 'missing': 0}
+        now = time.time()
+        rows = self._connect().execute(
+            'SELECT path, created_at, expires_at FROM files WHERE expires_at IS NOT NULL AND expires_at <= ?'
+            ' ORDER BY expires_at LIMIT ?', (now, limit)
+        ).fetchall()
+        return self._delete_files(rows, now, check_age=True)
+
+    def delete_temp_files(self, root: Optional[str] = None) -> Dict[str, int]:
+        """Delete every indexed temporary file, optionally within one tracked folder"""
+        if not self.enabled:
+            return {'deleted': 0, 'size_freed': 0, 'missing': 0}
+        query, params = 'SELECT path, created_at, expires_at FROM files WHERE is_temp = 1', ()
+        if root:
+            query, params = query + ' AND root = ?', (os.path.abspath(root),)
+        rows = self._connect().execute(query, params).fetchall()
+        return self._delete_files(rows, time.time(), check_age=False)
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def get_stats(self, root: Optional[str] = None) -> Dict[str, int]:
+        """File count, bytes and temporary file count, for one tracked folder or all"""
+        empty = {'files': 0, 'bytes': 0, 'temp_files': 0}
+        if not self.enabled:
+            return empty
+        query, params = 'SELECT SUM(files), SUM(bytes), SUM(temp_files) FROM totals', ()
+        if root:
+            query, params = query + ' WHERE root = ?', (os.path.abspath(root),)
+        files, size, temp_files = self._connect().execute(query, params).fetchone()
+        return {'files': files or 0, 'bytes': size or 0, 'temp_files': temp_files or 0}
+
+    def count_older_than(self, seconds: float, root: Optional[str] = None) -> int:
+        """Non-temporary files last written more than ``seconds`` ago"""
+        if not self.enabled:
+            return 0
+        cutoff = time.time() - seconds
+        roots = [os.path.abspath(root)] if root else self.roots
+        conn = self._connect()
+        return sum(
+            conn.execute('SELECT COUNT(*) FROM files WHERE root = ? AND created_at < ? AND is_temp = 0',
+                         (tracked, cutoff)).fetchone()[0]
+            for tracked in roots
+        )
+
+    def is_empty(self) -> bool:
+        if not self.enabled:
+            return True
+        try:
+            return self._connect().execute('SELECT 1 FROM files LIMIT 1').fetchone() is None
+        except sqlite3.Error:
+            return False
+
+    # ------------------------------------------------------------------
+    # Reconciliation
+    # ------------------------------------------------------------------
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Bring the index in line with the tracked folders.
+
+        Names the index already holds are not stat-ed; new files are added
+        and rows for files that disappeared are dropped.
+        """
+        result = {'added': 0, 'removed': 0}
+        if not self.enabled:
+            return result
+
+        conn = self._connect()
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            known = {path for (path,) in conn.execute('SELECT path FROM files WHERE root = ?', (root,))}
+            pending = []
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if entry.path in known:
+                        known.discard(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    pending.append(self._row(entry.path, root, entry.path[len(root) + 1:], stat))
+                    if len(pending) >= RECONCILE_BATCH:
+                        result['added'] += self._insert_new(pending)
+                        pending = []
+            result['added'] += self._insert_new(pending)
+
+            # Whatever is left was in the index but is no longer on disk
+            with conn:
+                conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in known])
+            result['removed'] += len(known)
+
+        if result['added'] or result['removed']:
+            cropio_logger.info(f"Storage index reconciled: {result['added']} added, {result['removed']} removed")
+        return result
+
+    def _insert_new(self, rows: List[tuple]) -> int:
+        if not rows:
+            return 0
+        conn = self._connect()
+        with conn:
+            return conn.executemany(
+                'INSERT OR IGNORE INTO files (path, root, size, owner, tool, is_temp, created_at, expires_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+            ).rowcount
+
+
+# Global instance
+storage_index = StorageIndex()
+
+
+def record_after_request(path: str) -> None:
+    """
+    Index a file a route or processor writes directly into a tracked folder.
+
+    Inside a request the path is recorded when the request ends, so it may be
+    registered before the file is written; outside one it is recorded now.
+    """
+    from flask import g, has_request_context
+
+    if has_request_context():
+        g.storage_paths = list(g.get('storage_paths') or ()) + [path]
+    else:
+        storage_index.record(path)
+
+
+def reconcile_storage_index():
+    """Scheduler job: pick up files written or deleted without going through the index"""
+    try:
+        return storage_index.reconcile()
+    except Exception as e:
+        cropio_logger.error(f"Storage index reconcile failed: {e}")
+        return {'added': 0, 'removed': 0}
@@ -0,0 +1,314 @@
+"""
+Write-Behind Usage Accounting for Cropio SaaS Platform
+Buffers usage counters and history rows and flushes them to the database in bulk
+
+Conversions used to update the daily UsageTracking row and insert history
+rows with a commit each, inside the request. The accountant instead
+aggregates counter deltas per (user, day) in memory and appends history and
+analytics rows to a buffer. A background thread flushes everything in one
+transaction every few seconds, or sooner once enough events are pending.
+If the database rejects a batch, its rows are written one at a time and the
+rows it rejects are logged and dropped, so one bad row cannot hold up the
+rest. Batches that keep failing for other reasons are dropped after a few
+attempts.
+Counters are applied as ``count = count + n`` so concurrent workers never
+overwrite each other, and the dashboard rollups (core.usage_rollups) are
+updated in the same transaction.
+
+Quota checks add this process's pending deltas to the stored counters, so a
+user cannot exceed a limit through the buffer. Until ``init_app`` is called
+every record is flushed immediately.
+"""
+import os
+import atexit
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import has_app_context
+from sqlalchemy import func
+from sqlalchemy.exc import DataError, IntegrityError
+
+from core.logging_config import cropio_logger
+from core.usage_rollups import apply_rollup_deltas, user_stats_cache
+from models import db, UsageTracking, ConversionHistory, UsageAnalytics
+
+
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+DEFAULT_MAX_PENDING = 100  # events before an early flush
+MAX_BUFFERED_EVENTS = 10000  # drop history rows beyond this if the database stays down
+MAX_FLUSH_ATTEMPTS = 5  # consecutive failed flushes before the pending batch is dropped
+
+# Errors caused by the rows themselves; retrying them can never succeed
+ROW_ERRORS = (IntegrityError, DataError)
+
+USAGE_COUNTERS = (
+    'conversions_count', 'storage_used', 'processing_time',
+    'image_conversions', 'pdf_conversions', 'document_conversions', 'ai_features_used'
+)
+HISTORY_FIELDS = (
+    'user_id', 'original_filename', 'original_format', 'target_format', 'file_size',
+    'conversion_type', 'tool_used', 'processing_time', 'status', 'error_message',
+    'created_at', 'completed_at'
+)
+ANALYTICS_FIELDS = (
+    'user_id', 'feature_name', 'feature_category', 'extra_metadata',
+    'processing_time', 'success', 'timestamp'
+)
+
+
+def conversion_counters(conversion_type: str, file_size: int = 0,
+                        processing_time: float = 0.0) -> Dict[str, Any]:
+    """Counter deltas for one conversion, matching UsageTracking.increment_usage"""
+    conversion_type = conversion_type or ''
+    deltas = {'conversions_count': 1, 'storage_used': file_size or 0,
+              'processing_time': processing_time or 0.0}
+    if conversion_type.startswith('image'):
+        deltas['image_conversions'] = 1
+    elif conversion_type.startswith('pdf'):
+        deltas['pdf_conversions'] = 1
+    elif conversion_type.startswith('document'):
+        deltas['document_conversions'] = 1
+    elif conversion_type.startswith('ai'):
+        deltas['ai_features_used'] = 1
+    return deltas
+
+
+class UsageAccountant:
+    """In-process buffer of usage deltas and history rows with bulk flushing"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.max_pending = DEFAULT_MAX_PENDING
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._usage: Dict[Tuple[int, date], Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+        self._history: List[Dict[str, Any]] = []
+        self._analytics: List[Dict[str, Any]] = []
+        self._pending_events = 0
+        self._failed_flushes = 0
+        self._flusher_pid = None
+        self._atexit_registered = False
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Enable write-behind accounting with Flask app configuration"""
+        self.app = app
+        self.enabled = app.config.get('USAGE_WRITE_BEHIND_ENABLED', True)
+        self.flush_interval = app.config.get('USAGE_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self.max_pending = app.config.get('USAGE_FLUSH_MAX_PENDING', DEFAULT_MAX_PENDING)
+
+        if self.enabled and not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+        cropio_logger.info(
+            f"Usage accounting: {'write-behind every %ss' % self.flush_interval if self.enabled else 'synchronous'}"
+        )
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record_usage(self, user_id: int, day: Optional[date] = None, **deltas) -> None:
+        """Add counter deltas (see USAGE_COUNTERS) to a user's daily usage"""
+        day = day or date.today()
+        with self._lock:
+            counters = self._usage[(user_id, day)]
+            for name, value in deltas.items():
+                if name not in USAGE_COUNTERS:
+                    raise ValueError(f"Unknown usage counter: {name}")
+                counters[name] += value
+            self._pending_events += 1
+        self._after_record()
+
+    def record_history(self, **row) -> None:
+        """Queue a ConversionHistory row"""
+        row.setdefault('created_at', datetime.utcnow())
+        with self._lock:
+            self._history.append({field: row.get(field) for field in HISTORY_FIELDS})
+            self._pending_events += 1
+        self._after_record()
+
+    def record_analytics(self, **row) -> None:
+        """Queue a UsageAnalytics row"""
+        row.setdefault('timestamp', datetime.utcnow())
+        row.setdefault('success', True)
+        with self._lock:
+            self._analytics.append({field: row.get(field) for field in ANALYTICS_FIELDS})
+            self._pending_events += 1
+        self._after_record()
+
+    def _after_record(self) -> None:
+        if not self.enabled:
+            self.flush()
+            return
+        self._ensure_flusher()
+        if self._pending_events >= self.max_pending:
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Quota read path
+    # ------------------------------------------------------------------
+
+    def pending_usage(self, user_id: int, day: Optional[date] = None) -> Dict[str, Any]:
+        """Unflushed counter deltas for a user, for one day or summed over all days"""
+        totals = defaultdict(int)
+        with self._lock:
+            for (pending_user, pending_day), counters in self._usage.items():
+                if pending_user == user_id and (day is None or pending_day == day):
+                    for name, value in counters.items():
+                        totals[name] += value
+        return dict(totals)
+
+    def pending_conversions(self, user_id: int, day: Optional[date] = None) -> int:
+        """Unflushed conversions for a user today (or on day)"""
+        return self.pending_usage(user_id, day or date.today()).get('conversions_count', 0)
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        """Start the flush thread in this process (workers are forked after app load)"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='usage-accounting', daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _take_pending(self):
+        with self._lock:
+            usage, self._usage = self._usage, defaultdict(lambda: defaultdict(int))
+            history, self._history = self._history, []
+            analytics, self._analytics = self._analytics, []
+            self._pending_events = 0
+        return usage, history, analytics
+
+    def _restore_pending(self, usage, history, analytics) -> None:
+        """Put a failed batch back in front of anything recorded since"""
+        with self._lock:
+            for key, counters in usage.items():
+                for name, value in counters.items():
+                    self._usage[key][name] += value
+            self._history = history + self._history
+            self._analytics = analytics + self._analytics
+            dropped = (max(0, len(self._history) - MAX_BUFFERED_EVENTS)
+                       + max(0, len(self._analytics) - MAX_BUFFERED_EVENTS))
+            if dropped:
+                self._history = self._history[-MAX_BUFFERED_EVENTS:]
+                self._analytics = self._analytics[-MAX_BUFFERED_EVENTS:]
+                cropio_logger.error(f"Usage accounting buffer full, dropped {dropped} oldest rows")
+            self._pending_events += len(usage) + len(history) + len(analytics)
+
+    def _in_app_context(self, func, *args):
+        if has_app_context() or self.app is None:
+            return func(*args)
+        with self.app.app_context():
+            return func(*args)
+
+    def flush(self) -> Dict[str, int]:
+        """Write all pending deltas and rows in a single transaction"""
+        with self._flush_lock:
+            usage, history, analytics = self._take_pending()
+            if not (usage or history or analytics):
+                return {'usage_rows': 0, 'history_rows': 0, 'analytics_rows': 0}
+
+            try:
+                try:
+                    self._in_app_context(self._write, usage, history, analytics)
+                except ROW_ERRORS as e:
+                    cropio_logger.warning(f"Usage accounting batch rejected, writing rows one at a time: {e}")
+                    written, remaining = self._in_app_context(self._write_rows, usage, history, analytics)
+                    usage, history, analytics = written
+                    if any(remaining):
+                        self._restore_pending(*remaining)
+            except Exception as e:
+                self._failed_flushes += 1
+                if self._failed_flushes < MAX_FLUSH_ATTEMPTS:
+                    cropio_logger.error(f"Usage accounting flush failed, will retry: {e}")
+                    self._restore_pending(usage, history, analytics)
+                else:
+                    cropio_logger.error(
+                        f"Usage accounting flush failed {self._failed_flushes} times, dropping "
+                        f"{len(usage)} usage, {len(history)} history and {len(analytics)} analytics rows: {e}"
+                    )
+                    self._failed_flushes = 0
+                return {'usage_rows': 0, 'history_rows': 0, 'analytics_rows': 0}
+            self._failed_flushes = 0
+
+            user_stats_cache.invalidate({user_id for user_id, _ in usage} | {row['user_id'] for row in history})
+            return {'usage_rows': len(usage), 'history_rows': len(history), 'analytics_rows': len(analytics)}
+
+    def _write_rows(self, usage, history, analytics):
+        """
+        Write a rejected batch row by row, dropping the rows the database rejects.
+
+        Returns the rows written and, if another error stops the pass, the
+        rows still to be written.
+        """
+        items = [({key: counters}, [], []) for key, counters in usage.items()]
+        items += [({}, [row], []) for row in history]
+        items += [({}, [], [row]) for row in analytics]
+        written, remaining = ({}, [], []), ({}, [], [])
+        for index, item in enumerate(items):
+            try:
+                self._write(*item)
+            except ROW_ERRORS as e:
+                cropio_logger.error(f"Usage accounting dropped a rejected row {item}: {e}")
+                continue
+            except Exception as e:
+                cropio_logger.error(f"Usage accounting flush interrupted, will retry: {e}")
+                for rows in items[index:]:
+                    remaining[0].update(rows[0])
+                    remaining[1].extend(rows[1])
+                    remaining[2].extend(rows[2])
+                break
+            written[0].update(item[0])
+            written[1].extend(item[1])
+            written[2].extend(item[2])
+        return written, remaining
+
+    def _write(self, usage, history, analytics) -> None:
+        table = UsageTracking.__table__
+        with db.engine.begin() as conn:
+            for (user_id, day), counters in usage.items():
+                where = (table.c.user_id == user_id) & (table.c.date == day)
+                increments = {
+                    name: func.coalesce(table.c[name], 0) + value for name, value in counters.items()
+                }
+                if conn.execute(table.update().where(where).values(**increments)).rowcount:
+                    continue
+                try:
+                    with conn.begin_nested():
+                        conn.execute(table.insert().values(
+                            user_id=user_id, date=day,
+                            **{name: counters.get(name, 0) for name in USAGE_COUNTERS}
+                        ))
+                except IntegrityError:
+                    # Another worker created today's row first
+                    conn.execute(table.update().where(where).values(**increments))
+
+            if history:
+                conn.execute(ConversionHistory.__table__.insert(), history)
+            apply_rollup_deltas(conn, usage, history)
+            if analytics:
+                conn.execute(UsageAnalytics.__table__.insert(), analytics)
+
+
+# Global instance
+usage_accounting = UsageAccountant()
@@ -0,0 +1,193 @@
+"""
+Per-User Usage Rollups for Cropio SaaS Platform
+All-time dashboard statistics served without aggregating history tables
+
+UserUsageRollup holds the sum of a user's UsageTracking counters and
+UserToolRollup the ConversionHistory row counts per tool and conversion type.
+Both are updated by the usage accountant in the same transaction as the rows
+they summarize. A user without a rollup yet (existing data, or a fresh
+database) gets one rebuilt from the base tables on first use.
+
+Reads go through a short-TTL per-process cache; flushes in this process
+invalidate the affected users immediately.
+"""
+import time
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, UsageTracking, ConversionHistory, UserUsageRollup, UserToolRollup
+
+
+DEFAULT_STATS_TTL = 30  # seconds
+MAX_CACHED_USERS = 10000
+
+ROLLUP_COUNTERS = tuple(
+    column.name for column in UserUsageRollup.__table__.columns
+    if column.name not in ('user_id', 'updated_at')
+)
+
+
+def rebuild_user_rollup(conn, user_id: int) -> None:
+    """Insert a user's rollup rows computed from UsageTracking and ConversionHistory"""
+    usage = UsageTracking.__table__
+    history = ConversionHistory.__table__
+
+    totals = conn.execute(
+        select(*[func.coalesce(func.sum(usage.c[name]), 0) for name in ROLLUP_COUNTERS])
+        .where(usage.c.user_id == user_id)
+    ).one()
+    conn.execute(UserUsageRollup.__table__.insert().values(
+        user_id=user_id, **dict(zip(ROLLUP_COUNTERS, totals))
+    ))
+
+    tools = [
+        {'user_id': user_id, 'tool_used': tool_used, 'conversion_type': conversion_type, 'count': count}
+        for tool_used, conversion_type, count in conn.execute(
+            select(history.c.tool_used, history.c.conversion_type, func.count())
+            .where(history.c.user_id == user_id)
+            .group_by(history.c.tool_used, history.c.conversion_type)
+        )
+    ]
+    if tools:
+        conn.execute(UserToolRollup.__table__.insert(), tools)
+
+
+def _rollup_exists(conn, user_id: int) -> bool:
+    table = UserUsageRollup.__table__
+    return conn.execute(select(table.c.user_id).where(table.c.user_id == user_id)).first() is not None
+
+
+def _ensure_rollup(conn, user_id: int) -> bool:
+    """Create a user's rollup if missing; True if it was built from the base tables"""
+    if _rollup_exists(conn, user_id):
+        return False
+    try:
+        with conn.begin_nested():
+            rebuild_user_rollup(conn, user_id)
+        return True
+    except IntegrityError:
+        # Built concurrently by another process before our batch was visible
+        return False
+
+
+def apply_rollup_deltas(conn, usage: Dict, history: List[Dict[str, Any]]) -> None:
+    """
+    Fold a flushed batch into the rollups.
+
+    Must run after the batch's UsageTracking and ConversionHistory rows were
+    written on conn: a rollup rebuilt here already includes them, so the
+    batch deltas are only added to rollups that existed before.
+    """
+    user_totals = defaultdict(lambda: defaultdict(int))
+    for (user_id, _), counters in usage.items():
+        for name, value in counters.items():
+            user_totals[user_id][name] += value
+
+    tool_counts = defaultdict(int)
+    for row in history:
+        tool_counts[(row['user_id'], row['tool_used'], row['conversion_type'])] += 1
+
+    rebuilt = set()
+    for user_id in set(user_totals) | {user_id for user_id, _, _ in tool_counts}:
+        if _ensure_rollup(conn, user_id):
+            rebuilt.add(user_id)
+
+    rollups = UserUsageRollup.__table__
+    for user_id, counters in user_totals.items():
+        if user_id in rebuilt:
+            continue
+        conn.execute(rollups.update().where(rollups.c.user_id == user_id).values(**{
+            name: rollups.c[name] + value for name, value in counters.items()
+        }))
+
+    tools = UserToolRollup.__table__
+    for (user_id, tool_used, conversion_type), count in tool_counts.items():
+        if user_id in rebuilt:
+            continue
+        where = ((tools.c.user_id == user_id) & (tools.c.tool_used == tool_used)
+                 & (tools.c.conversion_type == conversion_type))
+        if conn.execute(tools.update().where(where).values(count=tools.c.count + count)).rowcount:
+            continue
+        conn.execute(tools.insert().values(
+            user_id=user_id, tool_used=tool_used, conversion_type=conversion_type, count=count
+        ))
+
+
+def load_user_stats(user_id: int) -> Dict[str, Any]:
+    """Read a user's all-time totals and tool breakdown from the rollups"""
+    with db.engine.begin() as conn:
+        _ensure_rollup(conn, user_id)
+
+        rollups = UserUsageRollup.__table__
+        row = conn.execute(
+            select(*[rollups.c[name] for name in ROLLUP_COUNTERS]).where(rollups.c.user_id == user_id)
+        ).one()
+
+        tools = UserToolRollup.__table__
+        tool_rows = conn.execute(
+            select(tools.c.tool_used, tools.c.conversion_type, tools.c.count)
+            .where(tools.c.user_id == user_id)
+        ).all()
+
+    stats = dict(zip(ROLLUP_COUNTERS, row))
+    by_tool = defaultdict(int)
+    by_type = defaultdict(int)
+    for tool_used, conversion_type, count in tool_rows:
+        by_tool[tool_used] += count
+        by_type[conversion_type] += count
+
+    stats['by_tool'] = dict(by_tool)
+    stats['by_type'] = dict(by_type)
+    stats['most_used_tool'] = max(by_tool.items(), key=lambda item: item[1]) if by_tool else None
+    return stats
+
+
+class UserStatsCache:
+    """Short-TTL per-process cache of per-user dashboard data"""
+
+    def __init__(self, ttl: float = DEFAULT_STATS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Dict[Hashable, Any]] = {}
+
+    def init_app(self, app):
+        """Initialize the cache TTL from Flask app configuration"""
+        self.ttl = app.config.get('DASHBOARD_STATS_TTL', DEFAULT_STATS_TTL)
+
+    def get(self, user_id: int, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return a cached value for user_id/key, calling loader when missing or stale"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        value = loader()
+        if self.ttl > 0:
+            with self._lock:
+                if len(self._entries) >= MAX_CACHED_USERS and user_id not in self._entries:
+                    self._entries.clear()
+                self._entries.setdefault(user_id, {})[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, user_ids: Optional[Iterable[int]] = None) -> None:
+        """Drop cached data for some users, or everyone"""
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+                return
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+def get_user_stats(user_id: int) -> Dict[str, Any]:
+    """All-time dashboard statistics for a user, from the rollups via the cache"""
+    return user_stats_cache.get(user_id, 'totals', lambda: load_user_stats(user_id))
+
+
+# Global instance
+user_stats_cache = UserStatsCache()
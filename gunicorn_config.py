@@ -3,6 +3,8 @@
 
 import multiprocessing
 import os
+import shutil
+import tempfile
 
 # Server Socket
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
@@ -11,6 +13,8 @@ backlog = 2048
 # Worker Processes
 workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
 worker_class = 'sync'
+# Read by core.process_pools to split pool budgets between the workers
+os.environ['CROPIO_WEB_WORKERS'] = str(workers)
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
@@ -46,6 +50,16 @@ limit_request_field_size = 8190
 # Preload app for better performance
 preload_app = True
 
+# Metrics: every worker writes its counters to this directory and a scrape
+# of any worker aggregates them. It must be set before the app (and so
+# prometheus_client) is imported, and is emptied once per server start; the
+# marker keeps a SIGHUP config reload from wiping live values.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'cropio-metrics'))
+if not os.environ.get('CROPIO_METRICS_DIR_READY'):
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    os.environ['CROPIO_METRICS_DIR_READY'] = '1'
+
 # Graceful timeout
 graceful_timeout = 30
 
@@ -72,7 +86,13 @@ def post_fork(server, worker):
 
 def post_worker_init(worker):
     """Called just after a worker has initialized the application."""
-    pass
+    # Optionally load converter libraries now instead of on the first request
+    if os.environ.get('WARM_UP_WORKERS', 'false').lower() == 'true':
+        try:
+            from core.blueprint_registry import blueprint_registry
+            blueprint_registry.warm_up()
+        except Exception as e:
+            print(f"⚠️  Worker warm-up failed (pid: {worker.pid}): {e}")
 
 def worker_int(worker):
     """Called just after a worker exited on SIGINT or SIGQUIT."""
@@ -97,10 +117,29 @@ def post_request(worker, req, environ, resp):
 def child_exit(server, worker):
     """Called just after a worker has been exited."""
     print(f"👋 Worker exited (pid: {worker.pid})")
+    
+    # Drop the exited worker's live gauge files from the metrics directory
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except Exception:
+        pass
 
 def worker_exit(server, worker):
     """Called just after a worker has been exited."""
-    pass
+    # Write out usage buffered in this worker before it goes away
+    try:
+        from core.usage_accounting import usage_accounting
+        usage_accounting.flush()
+    except Exception as e:
+        print(f"⚠️  Usage flush failed on worker exit (pid: {worker.pid}): {e}")
+    
+    # Hand queued log records to the master before the worker goes away
+    try:
+        from core.logging_config import flush_logs
+        flush_logs()
+    except Exception as e:
+        print(f"⚠️  Log flush failed on worker exit (pid: {worker.pid}): {e}")
 
 def nworkers_changed(server, new_value, old_value):
     """Called just after num_workers has been changed."""
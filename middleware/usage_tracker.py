@@ -10,6 +10,8 @@ import time
 import os
 
 from models import db, ConversionHistory, UsageTracking, SystemSettings
+from core.usage_accounting import usage_accounting, conversion_counters
+from core.logging_config import log_conversion_metrics
 
 
 def track_conversion(conversion_type, tool_name):
@@ -37,6 +39,7 @@ def track_conversion(conversion_type, tool_name):
             # Execute the original function
             try:
                 result = f(*args, **kwargs)
+                log_conversion_metrics(tool_name, time.time() - start_time, request.content_length or 0, True)
                 
                 # Track successful conversion if user is authenticated
                 if current_user.is_authenticated:
@@ -68,6 +71,8 @@ def track_conversion(conversion_type, tool_name):
                 return result
                 
             except Exception as e:
+                log_conversion_metrics(tool_name, time.time() - start_time, request.content_length or 0, False)
+                
                 # Track failed conversion
                 if current_user.is_authenticated:
                     processing_time = time.time() - start_time
@@ -143,7 +148,8 @@ def record_conversion(user_id, conversion_type, tool_used, processing_time=0,
     """Record a conversion in the database"""
     try:
         # Create conversion history entry
-        conversion = ConversionHistory(
+        now = datetime.utcnow()
+        usage_accounting.record_history(
             user_id=user_id,
             original_filename=original_filename or 'unknown',
             original_format=original_format or 'unknown',
@@ -154,18 +160,14 @@ def record_conversion(user_id, conversion_type, tool_used, processing_time=0,
             processing_time=processing_time,
             status=status,
             error_message=error_message,
-            created_at=datetime.utcnow(),
-            completed_at=datetime.utcnow() if status == 'completed' else None
+            created_at=now,
+            completed_at=now if status == 'completed' else None
         )
         
-        db.session.add(conversion)
-        
         # Update daily usage tracking
         if status == 'completed':
-            today_usage = UsageTracking.get_or_create_today(user_id)
-            today_usage.increment_usage(conversion_type, processing_time, file_size)
+            usage_accounting.record_usage(user_id, **conversion_counters(conversion_type, file_size, processing_time))
         
-        db.session.commit()
         current_app.logger.info(f"Conversion tracked: {tool_used} for user {user_id}")
         
     except Exception as e:
@@ -7,8 +7,11 @@ from flask import request, jsonify, current_app, g, session, flash, redirect, ur
 from flask_login import current_user
 from datetime import datetime, date, timedelta
 from models import User, UsageTracking, ConversionHistory, db
+from core.usage_accounting import usage_accounting
+from core.logging_config import log_conversion_metrics
 from utils.email_service import send_usage_limit_notification, send_admin_notification
 import os
+import time
 
 # Subscription limits configuration
 SUBSCRIPTION_LIMITS = {
@@ -77,6 +80,15 @@ class UsageTracker:
         
         return usage_record
     
+    @staticmethod
+    def get_conversions_today(user_id):
+        """Conversions used today, including ones not yet flushed to the database"""
+        stored = db.session.query(UsageTracking.conversions_count).filter_by(
+            user_id=user_id,
+            date=date.today()
+        ).scalar() or 0
+        return stored + usage_accounting.pending_conversions(user_id)
+    
     @staticmethod
     def check_conversion_quota(user=None):
         """Check if user can perform more conversions today"""
@@ -87,16 +99,16 @@ class UsageTracker:
             return {'allowed': True, 'remaining': float('inf'), 'limit': float('inf')}
         
         limits = UsageTracker.get_user_limits(user)
-        usage = UsageTracker.get_daily_usage(user.id)
+        used = UsageTracker.get_conversions_today(user.id)
         
-        remaining = limits['daily_conversions'] - usage.conversions_count
+        remaining = limits['daily_conversions'] - used
         allowed = remaining > 0
         
         return {
             'allowed': allowed,
             'remaining': max(0, remaining),
             'limit': limits['daily_conversions'],
-            'used': usage.conversions_count
+            'used': used
         }
     
     @staticmethod
@@ -123,6 +135,7 @@ class UsageTracker:
         current_storage = db.session.query(
             db.func.sum(UsageTracking.storage_used)
         ).filter_by(user_id=user.id).scalar() or 0
+        current_storage += usage_accounting.pending_usage(user.id).get('storage_used', 0)
         
         # Convert bytes to MB and ensure float type
         current_storage_mb = float(current_storage) / (1024 * 1024)
@@ -172,23 +185,24 @@ class UsageTracker:
             
             original_ext = (os.path.splitext(original_filename)[1].lstrip('.').lower() if original_filename else 'unknown')
             
-            # Update daily usage
-            usage = UsageTracker.get_daily_usage(user.id)
-            usage.conversions_count += 1
+            # Update daily usage (flushed in bulk by the usage accountant)
             # Count at least the input size; if output exists use the larger as processed storage
             processed_bytes = max(output_size, input_size)
-            usage.storage_used += processed_bytes
+            counters = {'conversions_count': 1, 'storage_used': processed_bytes}
             
             # Update feature-specific counters
             if 'image' in tool_type:
-                usage.image_conversions += 1
+                counters['image_conversions'] = 1
             elif 'pdf' in tool_type:
-                usage.pdf_conversions += 1
+                counters['pdf_conversions'] = 1
             elif 'document' in tool_type:
-                usage.document_conversions += 1
+                counters['document_conversions'] = 1
+            
+            now = datetime.utcnow()
+            usage_accounting.record_usage(user.id, **counters)
             
             # Create conversion history record (aligned to models.ConversionHistory)
-            conversion = ConversionHistory(
+            usage_accounting.record_history(
                 user_id=user.id,
                 original_filename=original_filename or 'unknown',
                 original_format=original_ext or 'unknown',
@@ -197,16 +211,13 @@ class UsageTracker:
                 conversion_type=tool_type,
                 tool_used=tool_type,
                 status='completed',
-                created_at=datetime.utcnow(),
-                completed_at=datetime.utcnow()
+                created_at=now,
+                completed_at=now
             )
             
-            db.session.add(conversion)
-            db.session.commit()
-            
             # Check if user is approaching limits
             limits = UsageTracker.get_user_limits(user)
-            remaining = limits['daily_conversions'] - usage.conversions_count
+            remaining = limits['daily_conversions'] - UsageTracker.get_conversions_today(user.id)
             
             if 0 < remaining <= 2:
                 # Send approaching limit notification
@@ -237,7 +248,7 @@ class UsageTracker:
             return
         
         try:
-            conversion = ConversionHistory(
+            usage_accounting.record_history(
                 user_id=user.id,
                 original_filename='',
                 original_format='unknown',
@@ -250,9 +261,6 @@ class UsageTracker:
                 created_at=datetime.utcnow()
             )
             
-            db.session.add(conversion)
-            db.session.commit()
-            
             current_app.logger.warning(f"Failed conversion tracked: {tool_type} for user {user.username}")
             
         except Exception as e:
@@ -341,46 +349,81 @@ def quota_required(tool_name=None, check_file_size=True):
         return decorated_function
     return decorator
 
+def _conversion_outcome(result):
+    """
+    Response object, status code and success of a conversion route's result.
+
+    A conversion succeeded when it answered 200 for an uploaded file or a
+    produced output, and, for JSON replies, reported ``success: true``.
+    Redirects and JSON failures sent with 200 are not successes.
+    """
+    if isinstance(result, tuple):
+        response_obj = result[0]
+        status_code = result[1] if len(result) > 1 and isinstance(result[1], int) else 200
+    else:
+        response_obj = result
+        status_code = getattr(result, 'status_code', 200)
+    
+    if getattr(response_obj, 'is_json', False):
+        try:
+            json_data = response_obj.get_json()
+            reported = isinstance(json_data, dict) and json_data.get('success', False) == True
+        except Exception:
+            reported = False
+    else:
+        reported = True
+    
+    has_file = hasattr(g, 'input_file_path') or hasattr(g, 'output_file_path') or (
+        'file' in request.files and bool(request.files['file'].filename)
+    )
+    return response_obj, status_code, status_code == 200 and reported and has_file
+
+def _record_conversion_metrics(tool_name, seconds, result):
+    """Report a synchronous conversion's latency, sizes and outcome to the metrics registry"""
+    response_obj, status_code, succeeded = _conversion_outcome(result)
+    
+    input_bytes = int(getattr(g, 'input_file_size', 0) * 1024 * 1024) or request.content_length or 0
+    output_path = getattr(g, 'output_file_path', '')
+    if output_path and os.path.isfile(output_path):
+        output_bytes = os.path.getsize(output_path)
+    else:
+        output_bytes = getattr(response_obj, 'content_length', None) or 0
+    
+    log_conversion_metrics(tool_name, seconds, input_bytes, succeeded, output_size=output_bytes)
+
 def track_conversion_result(tool_type=None):
     """Decorator to track conversion results"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Execute the original function
-            result = f(*args, **kwargs)
+            # Execute the original function, timing it for the conversion metrics
+            started = time.perf_counter()
+            try:
+                result = f(*args, **kwargs)
+            except Exception:
+                if request.method == 'POST':
+                    log_conversion_metrics(tool_type or getattr(g, 'tool_name', f.__name__),
+                                           time.perf_counter() - started, request.content_length or 0, False)
+                raise
             
-            # Track the result if user is authenticated
-            if current_user.is_authenticated:
+            if request.method == 'POST' and not getattr(g, 'conversion_deferred', False):
+                try:
+                    _record_conversion_metrics(tool_type or getattr(g, 'tool_name', f.__name__),
+                                               time.perf_counter() - started, result)
+                except Exception as e:
+                    current_app.logger.warning(f"Error recording conversion metrics: {e}")
+            
+            # Track the result if user is authenticated; background jobs
+            # are accounted when they finish instead
+            if current_user.is_authenticated and not getattr(g, 'conversion_deferred', False):
                 tool_name = tool_type or getattr(g, 'tool_name', f.__name__)
                 
                 try:
                     # Check if conversion was successful
-                    if isinstance(result, tuple):
-                        # Flask response tuple (response, status_code)
-                        response_obj = result[0]
-                        status_code = result[1] if len(result) > 1 else 200
-                    else:
-                        response_obj = result
-                        status_code = 200
-                    
-                    # Check for JSON API responses (like LaTeX compilation)
-                    is_json_success = False
-                    if hasattr(response_obj, 'is_json') and response_obj.is_json:
-                        try:
-                            json_data = response_obj.get_json()
-                            is_json_success = json_data.get('success', False) == True
-                        except:
-                            pass
+                    response_obj, status_code, succeeded = _conversion_outcome(result)
                     
                     # Only track on successful POST requests
-                    should_track = (
-                        status_code == 200 and request.method == 'POST' and (
-                            # File upload conversions
-                            (hasattr(g, 'input_file_path') or ('file' in request.files and request.files['file'].filename)) or
-                            # JSON API conversions (like LaTeX compilation)
-                            (is_json_success and hasattr(g, 'output_file_path'))
-                        )
-                    )
+                    should_track = succeeded and request.method == 'POST'
                     
                     if should_track:
                         # Successful conversion
@@ -0,0 +1,54 @@
+"""Add per-user usage rollups and conversion history user/date index
+
+Revision ID: 3c9e7f21d4ab
+Revises: 45116e4e8caa
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e7f21d4ab'
+down_revision = '45116e4e8caa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_usage_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('conversions_count', sa.Integer(), nullable=False),
+        sa.Column('storage_used', sa.BigInteger(), nullable=False),
+        sa.Column('processing_time', sa.Float(), nullable=False),
+        sa.Column('image_conversions', sa.Integer(), nullable=False),
+        sa.Column('pdf_conversions', sa.Integer(), nullable=False),
+        sa.Column('document_conversions', sa.Integer(), nullable=False),
+        sa.Column('ai_features_used', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table(
+        'user_tool_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('tool_used', sa.String(length=50), nullable=False),
+        sa.Column('conversion_type', sa.String(length=50), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'tool_used', 'conversion_type')
+    )
+    with op.batch_alter_table('conversion_history', schema=None) as batch_op:
+        batch_op.create_index('ix_conversion_history_user_created', ['user_id', 'created_at'], unique=False)
+
+    # Rollups are rebuilt from usage_tracking and conversion_history on first use
+
+
+def downgrade():
+    with op.batch_alter_table('conversion_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversion_history_user_created')
+
+    op.drop_table('user_tool_rollups')
+    op.drop_table('user_usage_rollups')
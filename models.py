@@ -94,6 +94,8 @@ class User(UserMixin, db.Model):
     # Relationships
     conversions = db.relationship('ConversionHistory', backref='user', lazy=True, cascade='all, delete-orphan')
     usage_records = db.relationship('UsageTracking', backref='user', lazy=True, cascade='all, delete-orphan')
+    usage_rollup = db.relationship('UserUsageRollup', backref='user', uselist=False, cascade='all, delete-orphan')
+    tool_rollups = db.relationship('UserToolRollup', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Hash and set password using bcrypt for maximum security"""
@@ -139,17 +141,19 @@ class User(UserMixin, db.Model):
         if self.is_premium():
             return True
         
+        from core.usage_accounting import usage_accounting
+        today_usage = self.get_daily_usage()
+        used = (today_usage.conversions_count if today_usage else 0) + usage_accounting.pending_conversions(self.id)
+        
         # Check role-based limits
         if self.user_role:
             if self.user_role.daily_conversion_limit == -1:  # Unlimited
                 return True
-            today_usage = self.get_daily_usage()
-            if today_usage and today_usage.conversions_count >= self.user_role.daily_conversion_limit:
+            if used >= self.user_role.daily_conversion_limit:
                 return False
         else:
             # Fallback to subscription-based limits
-            today_usage = self.get_daily_usage()
-            if today_usage and today_usage.conversions_count >= 5:
+            if used >= 5:
                 return False
         
         return True
@@ -287,6 +291,9 @@ class ConversionHistory(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     
+    # Recent history and per-user date ranges
+    __table_args__ = (db.Index('ix_conversion_history_user_created', 'user_id', 'created_at'),)
+    
     def __repr__(self):
         return f'<Conversion {self.original_filename} -> {self.target_format}>'
 
@@ -354,6 +361,40 @@ class UsageTracking(db.Model):
         return f'<Usage {self.user.username} - {self.date}: {self.conversions_count} conversions>'
 
 
+class UserUsageRollup(db.Model):
+    """All-time usage totals per user, maintained incrementally for the dashboard"""
+    __tablename__ = 'user_usage_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    
+    # Sums of the UsageTracking counters
+    conversions_count = db.Column(db.Integer, default=0, nullable=False)
+    storage_used = db.Column(db.BigInteger, default=0, nullable=False)  # in bytes
+    processing_time = db.Column(db.Float, default=0.0, nullable=False)  # total seconds
+    image_conversions = db.Column(db.Integer, default=0, nullable=False)
+    pdf_conversions = db.Column(db.Integer, default=0, nullable=False)
+    document_conversions = db.Column(db.Integer, default=0, nullable=False)
+    ai_features_used = db.Column(db.Integer, default=0, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UsageRollup user={self.user_id}: {self.conversions_count} conversions>'
+
+
+class UserToolRollup(db.Model):
+    """ConversionHistory row counts per user, tool and conversion type"""
+    __tablename__ = 'user_tool_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tool_used = db.Column(db.String(50), primary_key=True)
+    conversion_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<ToolRollup user={self.user_id} {self.tool_used}/{self.conversion_type}: {self.count}>'
+
+
 class UserSession(db.Model):
     """Database-backed user sessions for enhanced security"""
     __tablename__ = 'user_sessions'
@@ -5,6 +5,7 @@ Includes logging, health checks, metrics, and alerting configuration.
 """
 
 import os
+import time
 import logging
 import logging.handlers
 from pathlib import Path
@@ -116,35 +117,30 @@ class ProductionMonitoring:
         def metrics():
             """Prometheus-style metrics endpoint"""
             from flask import jsonify
-            from models import db, User
+            from core.metrics import app_metrics
             
             try:
-                # System metrics
-                memory = psutil.virtual_memory()
-                disk = psutil.disk_usage('/')
+                # System and user gauges come from the background sampler, so
+                # this never blocks on CPU measurement or database counts
+                sample = app_metrics.system_snapshot()
                 process = psutil.Process()
                 
-                # Application metrics
-                with app.app_context():
-                    user_count = User.query.count()
-                    active_users = User.query.filter_by(is_active=True).count()
-                
                 metrics = {
                     'system': {
-                        'memory_used_percent': memory.percent,
-                        'memory_available_mb': memory.available / (1024*1024),
-                        'disk_used_percent': disk.used / disk.total * 100,
-                        'disk_free_gb': disk.free / (1024**3),
-                        'cpu_percent': psutil.cpu_percent(interval=1),
-                        'load_average': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+                        'memory_used_percent': sample.get('memory_used_percent'),
+                        'memory_available_mb': sample.get('memory_available_bytes', 0) / (1024*1024),
+                        'disk_used_percent': sample.get('disk_used_percent'),
+                        'disk_free_gb': sample.get('disk_free_bytes', 0) / (1024**3),
+                        'cpu_percent': sample.get('cpu_percent'),
+                        'load_average': sample.get('load_average', [0, 0, 0])
                     },
                     'application': {
                         'process_memory_mb': process.memory_info().rss / (1024*1024),
-                        'process_cpu_percent': process.cpu_percent(),
-                        'total_users': user_count,
-                        'active_users': active_users,
+                        'total_users': sample.get('total_users'),
+                        'active_users': sample.get('active_users'),
                         'uptime_seconds': time.time() - process.create_time()
                     },
+                    'sampled_at': sample.get('sampled_at'),
                     'timestamp': datetime.utcnow().isoformat()
                 }
                 
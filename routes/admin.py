@@ -23,6 +23,8 @@ from security.logging import security_logger
 from security.core.error_handlers import handle_admin_security_error, handle_validation_error
 from security.core.crypto import secure_hash
 from security.core.audit import audit_admin_action
+from core.conversion_cache import conversion_cache
+from core.storage_index import storage_index
 
 # Create admin blueprint
 admin = Blueprint('admin', __name__, url_prefix='/admin')
@@ -392,10 +394,14 @@ def system():
         # Get logs (last 100 lines)
         recent_logs = get_recent_logs()
         
+        # Get conversion cache hit/miss counters
+        cache_stats = conversion_cache.get_stats()
+        
         return render_template('admin/system.html',
                              system_info=system_info,
                              config_info=config_info,
-                             recent_logs=recent_logs)
+                             recent_logs=recent_logs,
+                             cache_stats=cache_stats)
         
     except Exception as e:
         current_app.logger.error(f"Admin system page error: {e}")
@@ -466,12 +472,17 @@ def get_storage_statistics():
         total_size = 0
         file_count = 0
         
-        for root, dirs, files in os.walk(upload_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if os.path.exists(file_path):
-                    total_size += os.path.getsize(file_path)
-                    file_count += 1
+        if storage_index.enabled:
+            # Totals are maintained as files are written and deleted
+            totals = storage_index.get_stats(upload_dir)
+            total_size, file_count = totals['bytes'], totals['files']
+        else:
+            for root, dirs, files in os.walk(upload_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if os.path.exists(file_path):
+                        total_size += os.path.getsize(file_path)
+                        file_count += 1
         
         return {
             'total_size_gb': round(total_size / (1024**3), 2),
@@ -631,25 +642,29 @@ def get_cleanup_statistics():
     """Get cleanup statistics"""
     try:
         upload_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        temp_files = []
-        old_files = []
+        temp_files_count = 0
+        old_files_count = 0
         
-        # Check for temporary files
-        for root, dirs, files in os.walk(upload_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if os.path.exists(file_path):
-                    stat = os.stat(file_path)
-                    age_days = (datetime.now().timestamp() - stat.st_mtime) / 86400
-                    
-                    if file.startswith('temp_') or file.endswith('.tmp'):
-                        temp_files.append(file)
-                    elif age_days > 30:  # Files older than 30 days
-                        old_files.append(file)
+        if storage_index.enabled:
+            temp_files_count = storage_index.get_stats(upload_dir)['temp_files']
+            old_files_count = storage_index.count_older_than(30 * 86400, upload_dir)
+        else:
+            # Check for temporary files
+            for root, dirs, files in os.walk(upload_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if os.path.exists(file_path):
+                        stat = os.stat(file_path)
+                        age_days = (datetime.now().timestamp() - stat.st_mtime) / 86400
+                        
+                        if file.startswith('temp_') or file.endswith('.tmp'):
+                            temp_files_count += 1
+                        elif age_days > 30:  # Files older than 30 days
+                            old_files_count += 1
         
         return {
-            'temp_files_count': len(temp_files),
-            'old_files_count': len(old_files),
+            'temp_files_count': temp_files_count,
+            'old_files_count': old_files_count,
             'old_conversions_count': ConversionHistory.query.filter(
                 ConversionHistory.created_at < datetime.utcnow() - timedelta(days=90)
             ).count()
@@ -663,6 +678,10 @@ def cleanup_temp_files():
         upload_dir = current_app.config.get('UPLOAD_FOLDER', 'uploads')
         cleaned_count = 0
         
+        if storage_index.enabled:
+            cleaned_count = storage_index.delete_temp_files(upload_dir)['deleted']
+            return {'message': f'Cleaned {cleaned_count} temporary files', 'count': cleaned_count}
+        
         for root, dirs, files in os.walk(upload_dir):
             for file in files:
                 if file.startswith('temp_') or file.endswith('.tmp'):
@@ -24,6 +24,7 @@ from utils.email_service import send_verification_email, verify_email_token, sen
 from utils.permissions import get_user_permissions
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 import secrets
+from core.storage_index import record_after_request
 
 # Create authentication blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -922,6 +923,7 @@ def upload_profile_photo():
         
         # Save new photo
         file.save(filepath)
+        record_after_request(filepath)
         
         # Update user profile picture URL
         photo_url = f"/uploads/profile_photos/{current_user.id}/{filename}"
@@ -9,10 +9,51 @@ from sqlalchemy import and_, desc, func
 import json
 
 from models import db, ConversionHistory, UsageTracking, SystemSettings
+from core.usage_rollups import get_user_stats, user_stats_cache
 
 # Create dashboard blueprint
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+CHART_FIELDS = {
+    'conversions': 'conversions_count',
+    'storage': 'storage_used',
+    'processing_time': 'processing_time'
+}
+MAX_CHART_DAYS = 366
+
+
+def get_daily_chart(user_id, days, chart_type='conversions', label_format='%m/%d'):
+    """
+    Per-day usage series for the last days, cached briefly per user.
+
+    days is clamped to 1..MAX_CHART_DAYS; chart_type must be a CHART_FIELDS
+    key, so request input cannot add arbitrary cache entries.
+    """
+    if chart_type not in CHART_FIELDS:
+        raise ValueError(f"Unknown chart type: {chart_type}")
+    days = min(max(int(days), 1), MAX_CHART_DAYS)
+    
+    def load():
+        start_date = date.today() - timedelta(days=days - 1)
+        field = CHART_FIELDS[chart_type]
+        by_date = dict(db.session.query(UsageTracking.date, getattr(UsageTracking, field)).filter(
+            and_(
+                UsageTracking.user_id == user_id,
+                UsageTracking.date >= start_date
+            )
+        ).all())
+        
+        data = []
+        labels = []
+        for i in range(days):
+            current_date = start_date + timedelta(days=i)
+            data.append(by_date.get(current_date) or 0)
+            labels.append(current_date.strftime(label_format))
+        return data, labels
+    
+    return user_stats_cache.get(user_id, ('chart', date.today(), days, chart_type, label_format), load)
+
+
 @dashboard_bp.route('/')
 @login_required
 def index():
@@ -23,48 +64,24 @@ def index():
         if not today_usage:
             today_usage = UsageTracking.get_or_create_today(current_user.id)
         
-        # Get last 30 days usage for chart
-        thirty_days_ago = date.today() - timedelta(days=30)
-        usage_history = UsageTracking.query.filter(
-            and_(
-                UsageTracking.user_id == current_user.id,
-                UsageTracking.date >= thirty_days_ago
-            )
-        ).order_by(UsageTracking.date.desc()).limit(30).all()
-        
         # Get recent conversions (last 10)
         recent_conversions = ConversionHistory.query.filter_by(
             user_id=current_user.id
         ).order_by(desc(ConversionHistory.created_at)).limit(10).all()
         
-        # Calculate statistics (favor UsageTracking for accuracy even when output is streamed)
-        total_conversions = db.session.query(
-            func.coalesce(func.sum(UsageTracking.conversions_count), 0)
-        ).filter(UsageTracking.user_id == current_user.id).scalar() or 0
-        
-        # Total storage used (sum of all processed storage from UsageTracking)
-        total_storage_used = db.session.query(
-            func.coalesce(func.sum(UsageTracking.storage_used), 0)
-        ).filter(UsageTracking.user_id == current_user.id).scalar() or 0
+        # All-time statistics come from the per-user rollups (favor UsageTracking
+        # counters for accuracy even when output is streamed)
+        stats = get_user_stats(current_user.id)
+        total_conversions = stats['conversions_count']
+        total_storage_used = stats['storage_used']
         
         # Most used tool - prefer ConversionHistory if present; otherwise derive from UsageTracking counters
-        most_used_tool = db.session.query(
-            ConversionHistory.tool_used,
-            func.count(ConversionHistory.tool_used).label('usage_count')
-        ).filter_by(user_id=current_user.id).group_by(
-            ConversionHistory.tool_used
-        ).order_by(desc('usage_count')).first()
-        
+        most_used_tool = stats['most_used_tool']
         if not most_used_tool:
-            # Fallback from usage counters
-            counters = db.session.query(
-                func.coalesce(func.sum(UsageTracking.image_conversions), 0),
-                func.coalesce(func.sum(UsageTracking.pdf_conversions), 0),
-                func.coalesce(func.sum(UsageTracking.document_conversions), 0)
-            ).filter(UsageTracking.user_id == current_user.id).first()
+            counters = [stats['image_conversions'], stats['pdf_conversions'], stats['document_conversions']]
             names = ['image_converter', 'pdf_converter', 'document_converter']
-            most_idx = max(range(3), key=lambda i: counters[i] if counters else 0)
-            most_used_tool = (names[most_idx], counters[most_idx] if counters else 0)
+            most_idx = max(range(3), key=lambda i: counters[i])
+            most_used_tool = (names[most_idx], counters[most_idx])
         
         # Get system limits
         daily_limit = int(SystemSettings.get_setting('free_daily_limit', '5'))
@@ -74,35 +91,14 @@ def index():
         ))
         
         # Prepare chart data for last 7 days
-        chart_data = []
-        labels = []
-        for i in range(6, -1, -1):  # Last 7 days
-            day = date.today() - timedelta(days=i)
-            usage = next((u for u in usage_history if u.date == day), None)
-            chart_data.append(usage.conversions_count if usage else 0)
-            labels.append(day.strftime('%a'))
+        chart_data, labels = get_daily_chart(current_user.id, 7, 'conversions', '%a')
         
         # Tool usage breakdown - use ConversionHistory if available else derive from UsageTracking counters
-        tool_usage_q = db.session.query(
-            ConversionHistory.conversion_type,
-            func.count(ConversionHistory.conversion_type).label('count')
-        ).filter_by(user_id=current_user.id).group_by(
-            ConversionHistory.conversion_type
-        ).all()
-        if tool_usage_q:
-            tool_usage = dict(tool_usage_q)
-        else:
-            # Build from UsageTracking counters
-            aggregates = db.session.query(
-                func.coalesce(func.sum(UsageTracking.image_conversions), 0).label('image'),
-                func.coalesce(func.sum(UsageTracking.pdf_conversions), 0).label('pdf'),
-                func.coalesce(func.sum(UsageTracking.document_conversions), 0).label('document')
-            ).filter(UsageTracking.user_id == current_user.id).first()
-            tool_usage = {
-                'image_converter': int(aggregates.image or 0),
-                'pdf_converter': int(aggregates.pdf or 0),
-                'document_converter': int(aggregates.document or 0)
-            }
+        tool_usage = stats['by_type'] or {
+            'image_converter': int(stats['image_conversions']),
+            'pdf_converter': int(stats['pdf_conversions']),
+            'document_converter': int(stats['document_conversions'])
+        }
         
         dashboard_data = {
             'today_usage': today_usage,
@@ -276,34 +272,16 @@ def settings():
 @login_required
 def api_chart_data():
     """API endpoint for dashboard chart data"""
-    days = request.args.get('days', 7, type=int)
     chart_type = request.args.get('type', 'conversions')
-    
-    start_date = date.today() - timedelta(days=days-1)
-    
-    usage_data = UsageTracking.query.filter(
-        and_(
-            UsageTracking.user_id == current_user.id,
-            UsageTracking.date >= start_date
-        )
-    ).order_by(UsageTracking.date).all()
+    if chart_type not in CHART_FIELDS:
+        return jsonify({'success': False, 'error': 'Invalid chart type'}), 400
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid number of days'}), 400
     
     # Prepare data for chart
-    chart_data = []
-    labels = []
-    
-    for i in range(days):
-        current_date = start_date + timedelta(days=i)
-        usage = next((u for u in usage_data if u.date == current_date), None)
-        
-        if chart_type == 'conversions':
-            chart_data.append(usage.conversions_count if usage else 0)
-        elif chart_type == 'storage':
-            chart_data.append(usage.storage_used if usage else 0)
-        elif chart_type == 'processing_time':
-            chart_data.append(usage.processing_time if usage else 0)
-        
-        labels.append(current_date.strftime('%m/%d'))
+    chart_data, labels = get_daily_chart(current_user.id, days, chart_type)
     
     return jsonify({
         'labels': labels,
@@ -321,12 +299,15 @@ def api_usage_summary():
         today_usage = UsageTracking.get_or_create_today(current_user.id)
     
     daily_limit = int(SystemSettings.get_setting('free_daily_limit', '5'))
+    stats = get_user_stats(current_user.id)
     
     return jsonify({
         'conversions_used': today_usage.conversions_count,
         'daily_limit': daily_limit if not current_user.is_premium() else 'unlimited',
         'storage_used': today_usage.storage_used,
         'processing_time': today_usage.processing_time,
+        'total_conversions': stats['conversions_count'],
+        'total_storage_used': stats['storage_used'],
         'subscription_tier': current_user.subscription_tier,
         'is_premium': current_user.is_premium()
     })
@@ -19,6 +19,7 @@ from typing import Dict, Any, Optional
 
 # Import usage tracking decorators
 from middleware.usage_tracking import quota_required, track_conversion_result
+from utils.document_converter.markdown_preview import MarkdownPreviewEngine
 
 # Create blueprint
 markdown_html_converter_bp = Blueprint('markdown_html_converter', __name__)
@@ -183,6 +184,10 @@ class MarkdownHTMLProcessor:
         return '\n'.join(line.rstrip() for line in cleaned_lines).strip()
 
 
+# Live preview renders through pooled processors and a per-block cache
+preview_engine = MarkdownPreviewEngine(MarkdownHTMLProcessor)
+
+
 @markdown_html_converter_bp.route('/markdown-html')
 def markdown_html_redirect():
     """Redirect old URL to new URL"""
@@ -344,22 +349,28 @@ def api_preview():
                 'html': '<p class="text-slate-500 text-center">Start typing to see preview...</p>'
             })
         
-        # Create processor instance
-        processor = MarkdownHTMLProcessor()
-        
-        # Convert markdown to HTML for preview
-        result = processor.markdown_to_html(content)
+        # Clients that send the ids of the blocks they already display get
+        # only the changed blocks back and patch the preview in place
+        known = data.get('blocks')
+        incremental = isinstance(known, list)
         
-        if not result['success']:
+        try:
+            result = preview_engine.render(content, known if incremental else None)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': result['error']
+                'error': str(e)
             }), 400
         
-        return jsonify({
+        response = {
             'success': True,
-            'html': result['output']
-        })
+            'blocks': result['blocks'],
+            'rendered': result['rendered']
+        }
+        if not incremental:
+            response['html'] = '\n'.join(block['html'] for block in result['blocks'])
+        
+        return jsonify(response)
         
     except Exception as e:
         print(f"Preview error: {e}")
@@ -282,7 +282,7 @@ def convert_excel_internal(input_path, temp_dir, form_data):
         logger.info(f"Parsed parameters - Format: '{output_format}', Headers: {include_headers}, Formulas: {convert_formulas}, Dates: {preserve_dates}, Sheets: {selected_sheets}")
         
         # Validate parameters
-        if output_format not in ['csv', 'tsv', 'json', 'html', 'txt', 'xml', 'ods', 'pdf']:
+        if output_format not in ['csv', 'tsv', 'json', 'jsonl', 'html', 'txt', 'xml', 'ods', 'pdf']:
             logger.warning(f"Invalid output format '{output_format}', defaulting to CSV")
             output_format = 'csv'
 
@@ -294,6 +294,7 @@ def convert_excel_internal(input_path, temp_dir, form_data):
             'csv': converter.is_csv_conversion_available(),
             'tsv': converter.is_tsv_conversion_available(),
             'json': converter.is_json_conversion_available(), 
+            'jsonl': converter.is_jsonl_conversion_available(),
             'html': converter.is_html_conversion_available(),
             'txt': converter.is_txt_conversion_available(),
             'xml': converter.is_xml_conversion_available(),
@@ -317,6 +318,7 @@ def convert_excel_internal(input_path, temp_dir, form_data):
             'csv': '.csv',
             'tsv': '.tsv',
             'json': '.json',
+            'jsonl': '.jsonl',
             'html': '.html',
             'txt': '.txt',
             'xml': '.xml',
@@ -392,6 +394,18 @@ def convert_excel_internal(input_path, temp_dir, form_data):
                 output_path=output_path,
                 **html_options
             )
+        elif output_format == 'jsonl':
+            # Filter out format-specific options for JSON Lines conversion
+            jsonl_specific_params = {
+                'preserve_formatting', 'include_headers', 'convert_formulas', 
+                'preserve_dates', 'selected_sheets'
+            }
+            jsonl_options = {k: v for k, v in conversion_options.items() if k in jsonl_specific_params}
+            success = converter.excel_to_jsonl(
+                input_path=input_path,
+                output_path=output_path,
+                **jsonl_options
+            )
         elif output_format == 'txt':
             # Filter out format-specific options for TXT conversion
             txt_specific_params = {
@@ -449,6 +463,7 @@ def convert_excel_internal(input_path, temp_dir, form_data):
                 'csv': 'text/csv',  # CSV now only supports single sheet
                 'tsv': 'text/tab-separated-values',
                 'json': 'application/octet-stream',  # file download
+                'jsonl': 'application/octet-stream',  # file download
                 'html': 'text/html',
                 'txt': 'text/plain',
                 'xml': 'application/xml',
@@ -572,6 +587,7 @@ def conversion_status():
                 'excel_to_csv': converter.is_csv_conversion_available(),
                 'excel_to_tsv': converter.is_tsv_conversion_available(),
                 'excel_to_json': converter.is_json_conversion_available(),
+                'excel_to_jsonl': converter.is_jsonl_conversion_available(),
                 'excel_to_html': converter.is_html_conversion_available(),
                 'excel_to_txt': converter.is_txt_conversion_available(),
                 'excel_to_xml': converter.is_xml_conversion_available(),
@@ -582,7 +598,7 @@ def conversion_status():
                 'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024),
                 'supported_formats': {
                     'input': list(EXCEL_EXTENSIONS),
-                    'output': ['csv', 'tsv', 'json', 'html', 'txt', 'xml', 'ods', 'pdf']
+                    'output': ['csv', 'tsv', 'json', 'jsonl', 'html', 'txt', 'xml', 'ods', 'pdf']
                 }
             }
         }
@@ -632,6 +648,11 @@ def supported_formats():
                     'description': 'Structured data format for APIs and web applications',
                     'mime_type': 'application/json'
                 },
+                'jsonl': {
+                    'name': 'JSON Lines',
+                    'description': 'One JSON record per line, for streaming and data pipelines',
+                    'mime_type': 'application/x-ndjson'
+                },
                 'html': {
                     'name': 'HTML Table',
                     'description': 'Web-ready table format for display',
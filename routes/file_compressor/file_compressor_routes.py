@@ -165,11 +165,18 @@ def compress_files():
                 
                 compression_options.update({
                     'target_size': target_size_bytes,
-                    'max_iterations': max(1, min(10, max_iterations))
+                    'max_iterations': max(1, min(10, max_iterations)),
+                    # Images keep their dimensions unless the user opts in
+                    'allow_resize': request.form.get('allow_resize') == 'on'
                 })
             except (ValueError, TypeError):
                 return jsonify({'error': 'Invalid target size parameters', 'success': False}), 400
         
+        # Downsample images inside PDFs to a target resolution (optional)
+        target_dpi = request.form.get('target_dpi', '')
+        if target_dpi.isdigit():
+            compression_options['target_dpi'] = max(72, min(600, int(target_dpi)))
+        
         current_app.logger.info(f"  Compression options: {compression_options}")
         
         # Create temporary directories
@@ -271,6 +278,10 @@ def compress_files():
                             if compression_result.get('password_hint'):
                                 file_info['password_hint'] = compression_result.get('password_hint')
                         
+                        # Final image dimensions, so a downscale is visible
+                        if compression_result.get('dimensions'):
+                            file_info['dimensions'] = list(compression_result['dimensions'])
+                        
                         # Add any additional notes
                         if compression_result.get('note'):
                             file_info['note'] = compression_result.get('note')
@@ -527,6 +538,7 @@ def get_compression_presets():
             'name': 'Web Optimized',
             'description': 'Optimized for web usage with balanced quality and size',
             'quality': 75,
+            'target_dpi': 150,
             'remove_metadata': True,
             'ai_optimization': True
         },
@@ -534,6 +546,7 @@ def get_compression_presets():
             'name': 'Maximum Compression',
             'description': 'Smallest file size with acceptable quality',
             'quality': 50,
+            'target_dpi': 96,
             'remove_metadata': True,
             'ai_optimization': True
         },
@@ -3,6 +3,8 @@ from flask import Blueprint, send_from_directory, current_app, abort
 import os
 from werkzeug.utils import secure_filename
 
+from core.storage_index import storage_index
+
 file_serving_bp = Blueprint('file_serving', __name__)
 
 @file_serving_bp.route('/download/<filename>')
@@ -26,6 +28,7 @@ def download_file(filename):
             current_app.logger.info(f"Checking: {file_path}")
             if os.path.exists(file_path):
                 current_app.logger.info(f"Found file at: {file_path}")
+                storage_index.mark_served(file_path)
                 try:
                     return send_from_directory(folder, filename, as_attachment=True, download_name=original_filename)
                 except Exception as e:
@@ -60,6 +63,7 @@ def serve_file(filename):
     file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
     if not os.path.exists(file_path):
         abort(404)
+    storage_index.mark_served(file_path)
     
     # Determine if it should be served as attachment or inline
     # PDFs and images are served inline, others as attachment
@@ -1,9 +1,13 @@
 # routes/health_routes.py
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request, Response
 from models import db
 from datetime import datetime
 import psutil
 import os
+import hmac
+
+from core.blueprint_registry import blueprint_registry
+from core.metrics import app_metrics
 
 health_bp = Blueprint('health', __name__, url_prefix='/api')
 
@@ -63,7 +67,8 @@ def status_check():
                 "environment": os.getenv('FLASK_ENV', 'unknown'),
                 "debug": current_app.debug,
                 "version": "1.0.0"
-            }
+            },
+            "startup": blueprint_registry.get_report()
         }
         
         return jsonify(status), 200
@@ -102,3 +107,19 @@ def liveness_check():
         "status": "alive",
         "timestamp": datetime.utcnow().isoformat()
     }), 200
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics, aggregated across workers; ?format=json for the system sample"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            "system": app_metrics.system_snapshot(),
+            "timestamp": datetime.utcnow().isoformat()
+        }), 200
+    
+    body, content_type = app_metrics.render()
+    return Response(body, status=200, content_type=content_type)
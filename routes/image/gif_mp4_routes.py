@@ -9,7 +9,9 @@ from werkzeug.utils import secure_filename
 import os
 import uuid
 import tempfile
+import shutil
 import logging
+import time
 from datetime import datetime
 import traceback
 from pathlib import Path
@@ -17,6 +19,9 @@ from pathlib import Path
 # Import usage tracking decorators  
 from middleware.usage_tracking import quota_required, track_conversion_result
 from utils.video.gif_mp4_processor import GifMp4Processor
+from utils.video.ffmpeg_progress import FFmpegProgress
+from core.result_store import result_store
+from routes.jobs_routes import wants_async, submit_job
 
 # Create blueprint with unique name
 gif_mp4_bp = Blueprint('gif_mp4', __name__, url_prefix='/gif-mp4')
@@ -28,8 +33,20 @@ ALLOWED_EXTENSIONS = {
     'mp4_to_gif': {'mp4', 'mov', 'avi', 'mkv', 'webm'}
 }
 
-# Global storage for conversion results (in production, use Redis or database)
-conversion_results = {}
+# Conversion results live in the shared result store so any worker can serve
+# status and download requests
+RESULT_NAMESPACE = 'gif_mp4'
+RESULT_TTL = 600  # 10 minutes
+DOWNLOAD_GRACE = 60  # Keep results briefly after download for retries
+
+# Progress snapshots and cancel requests for conversions running on other workers
+PROGRESS_NAMESPACE = 'gif_mp4_progress'
+CANCEL_NAMESPACE = 'gif_mp4_cancel'
+PROGRESS_TTL = 3600
+PROGRESS_PUBLISH_INTERVAL = 1.0
+
+# Live progress records of conversions running in this worker, keyed by conversion ID
+active_conversions = {}
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -43,6 +60,23 @@ def allowed_file(filename, conversion_mode):
     return ext in ALLOWED_EXTENSIONS.get(conversion_mode, set())
 
 
+def resolve_conversion_id(requested_id):
+    """
+    Use the client's conversion ID if it is a fresh UUID, so the client can poll
+    status and cancel while the convert request is still running
+    """
+    if requested_id:
+        try:
+            conversion_id = str(uuid.UUID(requested_id))
+        except ValueError:
+            conversion_id = None
+        if (conversion_id and conversion_id not in active_conversions
+                and result_store.get(RESULT_NAMESPACE, conversion_id) is None
+                and result_store.get(PROGRESS_NAMESPACE, conversion_id) is None):
+            return conversion_id
+    return str(uuid.uuid4())
+
+
 def get_file_size_mb(filepath):
     """Get file size in MB"""
     return os.path.getsize(filepath) / (1024 * 1024)
@@ -51,28 +85,49 @@ def get_file_size_mb(filepath):
 def cleanup_conversion_data(conversion_id):
     """Clean up conversion data and temporary files"""
     try:
-        if conversion_id in conversion_results:
-            result_data = conversion_results[conversion_id]
-            
-            # Clean up temporary files
-            if 'temp_input_path' in result_data:
-                temp_path = result_data['temp_input_path']
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-            
-            if 'output_path' in result_data:
-                output_path = result_data['output_path']
-                if os.path.exists(output_path):
-                    os.unlink(output_path)
-            
-            # Remove from results
-            del conversion_results[conversion_id]
-            
+        result_store.delete(RESULT_NAMESPACE, conversion_id)
         logger.info(f"Cleaned up conversion {conversion_id}")
     except Exception as e:
         logger.error(f"Error cleaning up conversion {conversion_id}: {str(e)}")
 
 
+def track_progress(conversion_id):
+    """
+    Progress record for a conversion in this worker.
+
+    Snapshots are published to the result store so status requests on other
+    workers see them, and cancel requests made on other workers are picked up
+    on the next progress update.
+    """
+    last_publish = [0.0]
+    
+    def publish(progress):
+        now = time.time()
+        if now - last_publish[0] < PROGRESS_PUBLISH_INTERVAL:
+            return
+        last_publish[0] = now
+        try:
+            result_store.put(PROGRESS_NAMESPACE, conversion_id, progress.as_dict(), ttl=PROGRESS_TTL)
+            if result_store.get(CANCEL_NAMESPACE, conversion_id) is not None:
+                progress.cancel()
+        except Exception as e:
+            logger.warning(f"Could not publish progress for {conversion_id}: {e}")
+    
+    progress = FFmpegProgress(on_update=publish)
+    active_conversions[conversion_id] = progress
+    return progress
+
+
+def finish_progress(conversion_id):
+    """Forget a finished conversion's progress record everywhere"""
+    active_conversions.pop(conversion_id, None)
+    try:
+        result_store.delete(PROGRESS_NAMESPACE, conversion_id)
+        result_store.delete(CANCEL_NAMESPACE, conversion_id)
+    except Exception as e:
+        logger.warning(f"Could not clear progress for {conversion_id}: {e}")
+
+
 @gif_mp4_bp.route('/')
 @login_required
 @quota_required(tool_name='gif_mp4_converter', check_file_size=True)
@@ -186,7 +241,7 @@ def convert_gif_mp4():
             }), 400
 
         # Generate unique conversion ID
-        conversion_id = str(uuid.uuid4())
+        conversion_id = resolve_conversion_id(request.form.get('conversion_id'))
         
         # Create temporary directory for this conversion
         temp_dir = tempfile.mkdtemp(prefix=f'gif_mp4_{conversion_id}_')
@@ -208,15 +263,12 @@ def convert_gif_mp4():
                 scale = request.form.get('scale') or None
                 optimize = request.form.get('optimize', 'true').lower() == 'true'
                 
-                # Convert GIF to MP4
-                result = processor.gif_to_mp4(
-                    input_path=temp_input_path,
-                    quality=quality,
-                    fps=fps,
-                    scale=scale,
-                    optimize=optimize
-                )
-                
+                options = {
+                    'quality': quality,
+                    'fps': fps,
+                    'scale': scale,
+                    'optimize': optimize
+                }
                 conversion_type = 'GIF → MP4'
                 output_format = 'mp4'
                 
@@ -227,23 +279,52 @@ def convert_gif_mp4():
                 duration = request.form.get('duration') or None
                 palette_quality = request.form.get('palette_quality', 'high')
                 loop_count = int(request.form.get('loop_count', 0))
+                palette_mode = request.form.get('palette_mode', 'auto')
+                if palette_mode not in ('auto', 'global', 'per_frame'):
+                    palette_mode = 'auto'
                 
-                # Convert MP4 to GIF
-                result = processor.mp4_to_gif(
-                    input_path=temp_input_path,
-                    fps=fps,
-                    scale=scale,
-                    start_time=start_time,
-                    duration=duration,
-                    palette_quality=palette_quality,
-                    loop_count=loop_count
-                )
-                
+                options = {
+                    'fps': fps,
+                    'scale': scale,
+                    'start_time': start_time,
+                    'duration': duration,
+                    'palette_quality': palette_quality,
+                    'loop_count': loop_count,
+                    'palette_mode': palette_mode
+                }
                 conversion_type = 'MP4 → GIF'
                 output_format = 'gif'
             
+            # Run long video conversions in the background job pool
+            if wants_async():
+                response = submit_job(
+                    'gif_mp4', temp_input_path,
+                    params={'conversion_mode': conversion_mode, 'options': options},
+                    tool_type='gif_mp4_converter',
+                    download_name=f"{os.path.splitext(filename)[0]}_converted.{output_format}"
+                )
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return response
+            
+            progress = track_progress(conversion_id)
+            try:
+                if conversion_mode == 'gif_to_mp4':
+                    result = processor.gif_to_mp4(input_path=temp_input_path, progress=progress, **options)
+                else:
+                    result = processor.mp4_to_gif(input_path=temp_input_path, progress=progress, **options)
+            finally:
+                finish_progress(conversion_id)
+            
             if not result['success']:
                 cleanup_conversion_data(conversion_id)
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                
+                if result.get('cancelled'):
+                    return jsonify({
+                        'success': False,
+                        'cancelled': True,
+                        'error': 'Conversion cancelled'
+                    }), 409
                 
                 # Provide more user-friendly error messages
                 error_msg = result['error']
@@ -259,32 +340,20 @@ def convert_gif_mp4():
                     'error': error_msg
                 }), 400
             
-            # Store conversion results with cleanup info
-            conversion_results[conversion_id] = {
+            # Store conversion results; the result store sweeper removes the
+            # files once the entry expires
+            result_store.put(RESULT_NAMESPACE, conversion_id, {
                 'result': result,
                 'conversion_type': conversion_type,
                 'output_format': output_format,
-                'created_at': datetime.now(),
-                'temp_dir': temp_dir,
-                'temp_input_path': temp_input_path,
+                'created_at': datetime.now().isoformat(),
                 'output_path': result['output_path'],
                 'original_filename': filename
-            }
+            }, ttl=RESULT_TTL, paths=[temp_dir, result['output_path']])
             
             # Set up for usage tracking
             g.output_file_path = result['output_path']
             
-            # Schedule cleanup after 10 minutes
-            import threading
-            import time
-            
-            def delayed_cleanup():
-                time.sleep(600)  # 10 minutes
-                cleanup_conversion_data(conversion_id)
-            
-            cleanup_thread = threading.Thread(target=delayed_cleanup, daemon=True)
-            cleanup_thread.start()
-            
             # Return success response
             response_data = {
                 'success': True,
@@ -337,10 +406,10 @@ def convert_gif_mp4():
 def download_converted_file(conversion_id):
     """Download converted file"""
     try:
-        if conversion_id not in conversion_results:
+        conversion_data = result_store.get(RESULT_NAMESPACE, conversion_id)
+        if conversion_data is None:
             return jsonify({'error': 'Conversion not found or expired'}), 404
         
-        conversion_data = conversion_results[conversion_id]
         result = conversion_data['result']
         output_path = result['output_path']
         
@@ -353,14 +422,6 @@ def download_converted_file(conversion_id):
         output_format = conversion_data['output_format']
         download_filename = f"{name_without_ext}_converted.{output_format}"
         
-        def cleanup_after_send():
-            """Clean up after file is sent"""
-            try:
-                cleanup_conversion_data(conversion_id)
-            except:
-                pass
-        
-        
         # Track analytics for logged-in users
         if current_user.is_authenticated:
             try:
@@ -382,10 +443,8 @@ def download_converted_file(conversion_id):
             except Exception as e:
                 print(f"[ANALYTICS] Error: {e}")
         
-        # Schedule cleanup after download
-        import threading
-        cleanup_thread = threading.Thread(target=cleanup_after_send, daemon=True)
-        cleanup_thread.start()
+        # Let the result store sweeper remove the files shortly after download
+        result_store.expire_in(RESULT_NAMESPACE, conversion_id, DOWNLOAD_GRACE)
         
         return send_file(
             output_path,
@@ -403,10 +462,10 @@ def download_converted_file(conversion_id):
 def preview_converted_file(conversion_id):
     """Get preview information for converted file"""
     try:
-        if conversion_id not in conversion_results:
+        conversion_data = result_store.get(RESULT_NAMESPACE, conversion_id)
+        if conversion_data is None:
             return jsonify({'error': 'Conversion not found or expired'}), 404
         
-        conversion_data = conversion_results[conversion_id]
         result = conversion_data['result']
         output_path = result['output_path']
         
@@ -419,7 +478,7 @@ def preview_converted_file(conversion_id):
             'conversion_type': conversion_data['conversion_type'],
             'output_format': conversion_data['output_format'],
             'file_size': os.path.getsize(output_path),
-            'created_at': conversion_data['created_at'].isoformat()
+            'created_at': conversion_data['created_at']
         }
         
         # Add format-specific info
@@ -437,23 +496,32 @@ def preview_converted_file(conversion_id):
 
 @gif_mp4_bp.route('/status/<conversion_id>')
 def get_conversion_status(conversion_id):
-    """Get status of a conversion"""
+    """Get status of a conversion, with live progress while FFmpeg is running"""
     try:
-        if conversion_id not in conversion_results:
+        progress = active_conversions.get(conversion_id)
+        live = progress.as_dict() if progress is not None else result_store.get(PROGRESS_NAMESPACE, conversion_id)
+        if live is not None:
+            return jsonify({
+                'success': True,
+                'status': live.pop('status'),
+                'progress': live,
+                'ready_for_download': False
+            })
+        
+        conversion_data = result_store.get(RESULT_NAMESPACE, conversion_id)
+        if conversion_data is None:
             return jsonify({
                 'success': False,
                 'status': 'not_found',
                 'error': 'Conversion not found or expired'
             }), 404
         
-        conversion_data = conversion_results[conversion_id]
-        
         return jsonify({
             'success': True,
             'status': 'completed',
             'conversion_type': conversion_data['conversion_type'],
             'output_format': conversion_data['output_format'],
-            'created_at': conversion_data['created_at'].isoformat(),
+            'created_at': conversion_data['created_at'],
             'ready_for_download': True
         })
         
@@ -466,6 +534,34 @@ def get_conversion_status(conversion_id):
         }), 500
 
 
+@gif_mp4_bp.route('/cancel/<conversion_id>', methods=['POST'])
+def cancel_conversion(conversion_id):
+    """Cancel a running conversion by killing its FFmpeg process group"""
+    progress = active_conversions.get(conversion_id)
+    if progress is None:
+        # Running on another worker: leave a cancel request it picks up on its next update
+        live = result_store.get(PROGRESS_NAMESPACE, conversion_id)
+        if live is not None and live.get('status') in ('pending', 'running'):
+            result_store.put(CANCEL_NAMESPACE, conversion_id, {'requested_at': time.time()}, ttl=PROGRESS_TTL)
+            logger.info(f"Requested cancellation of conversion {conversion_id}")
+            return jsonify({'success': True, 'status': 'cancelling'})
+        return jsonify({
+            'success': False,
+            'status': 'not_found',
+            'error': 'No running conversion with this ID'
+        }), 404
+    
+    if not progress.cancel():
+        return jsonify({
+            'success': False,
+            'status': progress.status,
+            'error': 'Conversion already finished'
+        }), 409
+    
+    logger.info(f"Cancelled conversion {conversion_id}")
+    return jsonify({'success': True, 'status': 'cancelled'})
+
+
 @gif_mp4_bp.route('/info')
 def converter_info():
     """Get converter information and capabilities"""
@@ -507,30 +603,3 @@ def handle_internal_error(error):
         'success': False,
         'error': 'Internal server error. Please try again.'
     }), 500
-
-
-# Cleanup old conversions on startup
-def cleanup_old_conversions():
-    """Clean up old conversion data"""
-    try:
-        cutoff_time = datetime.now() - timedelta(hours=1)
-        to_cleanup = []
-        
-        for conversion_id, data in conversion_results.items():
-            if data.get('created_at', datetime.now()) < cutoff_time:
-                to_cleanup.append(conversion_id)
-        
-        for conversion_id in to_cleanup:
-            cleanup_conversion_data(conversion_id)
-            
-        if to_cleanup:
-            logger.info(f"Cleaned up {len(to_cleanup)} old conversions")
-            
-    except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}")
-
-
-# Schedule periodic cleanup
-import atexit
-from datetime import timedelta
-atexit.register(cleanup_old_conversions)
@@ -7,7 +7,7 @@ import zipfile
 import tempfile
 import shutil
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from flask import Blueprint, render_template, request, jsonify, send_file, current_app, g
 from flask_login import login_required, current_user
@@ -18,6 +18,7 @@ from PIL import Image
 from middleware.usage_tracking import quota_required, track_conversion_result
 from utils.image.gif_processor import GIFProcessor
 from config import GIF_CONVERTER_CONFIG
+from core.result_store import result_store
 
 
 # Create blueprint
@@ -27,31 +28,11 @@ gif_png_sequence_bp = Blueprint(
     url_prefix='/gif-png-sequence'
 )
 
-# Global storage for conversion results
-conversion_results = {}
-
-
-def threaded_cleanup_with_context(conversion_id: str, app, delay_seconds: int = 5):
-    """Thread-safe cleanup function that properly handles Flask app context"""
-    import threading
-    import time
-    
-    def cleanup_with_context():
-        try:
-            # Wait for specified delay
-            time.sleep(delay_seconds)
-            
-            # Use the Flask app context for proper logging
-            with app.app_context():
-                cleanup_conversion_data(conversion_id, app)
-        except Exception as e:
-            # Fallback logging if Flask context fails
-            logging.getLogger(__name__).error(
-                f"Error in threaded cleanup for conversion {conversion_id}: {str(e)}"
-            )
-    
-    thread = threading.Thread(target=cleanup_with_context, daemon=True)
-    thread.start()
+# Conversion results live in the shared result store so any worker can serve
+# preview and download requests; the store's sweeper removes expired files
+RESULT_NAMESPACE = 'gif_png_sequence'
+RESULT_TTL = 3600  # 1 hour
+DOWNLOAD_GRACE = 60  # Keep results briefly after download for retries
 
 
 def cleanup_conversion_data(conversion_id: str, app=None):
@@ -68,22 +49,8 @@ def cleanup_conversion_data(conversion_id: str, app=None):
                 # Fallback to standard Python logging when outside Flask context
                 logger = logging.getLogger(__name__)
         
-        if conversion_id in conversion_results:
-            result_data = conversion_results[conversion_id]
-            
-            # Clean up temporary directories
-            if 'temp_dir' in result_data:
-                temp_dir = result_data['temp_dir']
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-            
-            if 'output_dir' in result_data:
-                output_dir = result_data['output_dir']
-                if os.path.exists(output_dir):
-                    shutil.rmtree(output_dir, ignore_errors=True)
-            
-            # Remove from results
-            del conversion_results[conversion_id]
+        # Removes the entry together with its temporary directories
+        result_store.delete(RESULT_NAMESPACE, conversion_id)
             
         logger.info(f"Cleaned up conversion {conversion_id}")
     except Exception as e:
@@ -201,7 +168,7 @@ def convert_gif_to_png():
         )
         
         if not result['success']:
-            cleanup_conversion_data(conversion_id)
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return jsonify({
                 'success': False,
                 'error': f"Conversion failed: {result['message']}"
@@ -228,17 +195,17 @@ def convert_gif_to_png():
                 zip_file.writestr('timing_info.json', json.dumps(timing_data, indent=2))
         
         # Store conversion results
-        conversion_results[conversion_id] = {
+        result_store.put(RESULT_NAMESPACE, conversion_id, {
             'type': 'gif_to_png',
             'input_file': input_filename,
             'result': result,
             'settings': settings,
-            'created_at': datetime.now(),
+            'created_at': datetime.now().isoformat(),
             'temp_dir': temp_dir,
             'output_dir': output_dir,
             'zip_path': zip_path,
             'zip_filename': zip_filename
-        }
+        }, ttl=RESULT_TTL, paths=[temp_dir, output_dir])
         
         # Set up for usage tracking
         g.output_file_path = zip_path
@@ -333,23 +300,23 @@ def convert_png_to_gif():
         )
         
         if not result['success']:
-            cleanup_conversion_data(conversion_id)
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return jsonify({
                 'success': False,
                 'error': f"Conversion failed: {result['message']}"
             }), 500
         
         # Store conversion results
-        conversion_results[conversion_id] = {
+        result_store.put(RESULT_NAMESPACE, conversion_id, {
             'type': 'png_to_gif',
             'input_files': [secure_filename(f.filename) for f in files],
             'result': result,
             'settings': settings,
-            'created_at': datetime.now(),
+            'created_at': datetime.now().isoformat(),
             'temp_dir': temp_dir,
             'input_dir': input_dir,
             'output_path': output_path
-        }
+        }, ttl=RESULT_TTL, paths=[temp_dir])
         
         # Set up for usage tracking
         g.output_file_path = output_path
@@ -376,11 +343,10 @@ def convert_png_to_gif():
 def download_result(conversion_id, result_type):
     """Download conversion results"""
     try:
-        if conversion_id not in conversion_results:
+        result_data = result_store.get(RESULT_NAMESPACE, conversion_id)
+        if result_data is None:
             return jsonify({'error': 'Conversion not found'}), 404
         
-        result_data = conversion_results[conversion_id]
-        
         if result_type == 'zip' and result_data['type'] == 'gif_to_png':
             # Download ZIP file of PNG frames
             zip_path = result_data.get('zip_path')
@@ -400,8 +366,8 @@ def download_result(conversion_id, result_type):
                     except Exception as e:
                         print(f"[ANALYTICS] Error: {e}")
                 
-                # Schedule cleanup in thread with proper Flask context
-                threaded_cleanup_with_context(conversion_id, current_app._get_current_object())
+                # Let the result store sweeper remove the files shortly after download
+                result_store.expire_in(RESULT_NAMESPACE, conversion_id, DOWNLOAD_GRACE)
                 
                 return send_file(
                     zip_path, 
@@ -429,8 +395,8 @@ def download_result(conversion_id, result_type):
                     except Exception as e:
                         print(f"[ANALYTICS] Error: {e}")
                 
-                # Schedule cleanup in thread with proper Flask context
-                threaded_cleanup_with_context(conversion_id, current_app._get_current_object())
+                # Let the result store sweeper remove the files shortly after download
+                result_store.expire_in(RESULT_NAMESPACE, conversion_id, DOWNLOAD_GRACE)
                 
                 return send_file(
                     gif_path,
@@ -450,15 +416,14 @@ def download_result(conversion_id, result_type):
 def preview_conversion(conversion_id):
     """Get preview data for conversion result"""
     try:
-        if conversion_id not in conversion_results:
+        result_data = result_store.get(RESULT_NAMESPACE, conversion_id)
+        if result_data is None:
             return jsonify({'error': 'Conversion not found'}), 404
         
-        result_data = conversion_results[conversion_id]
-        
         preview_data = {
             'conversion_id': conversion_id,
             'type': result_data['type'],
-            'created_at': result_data['created_at'].isoformat(),
+            'created_at': result_data['created_at'],
             'settings': result_data['settings']
         }
         
@@ -517,25 +482,6 @@ def cleanup_temp():
         return jsonify({'success': False, 'error': 'Cleanup failed'}), 500
 
 
-# Cleanup old conversions periodically
-@gif_png_sequence_bp.before_app_request
-def cleanup_old_conversions():
-    """Clean up conversions older than 1 hour"""
-    try:
-        cutoff_time = datetime.now() - timedelta(hours=1)
-        expired_conversions = []
-        
-        for conversion_id, data in conversion_results.items():
-            if data['created_at'] < cutoff_time:
-                expired_conversions.append(conversion_id)
-        
-        for conversion_id in expired_conversions:
-            cleanup_conversion_data(conversion_id)
-            
-    except Exception as e:
-        current_app.logger.error(f"Error cleaning up old conversions: {str(e)}")
-
-
 # Error handlers
 @gif_png_sequence_bp.errorhandler(413)
 def file_too_large(e):
@@ -16,6 +16,7 @@ from pathlib import Path
 
 # Import the RAW processor utility
 from utils.image.raw_processor import RAWProcessor
+from routes.jobs_routes import wants_async, submit_job
 
 # Create blueprint
 raw_jpg_bp = Blueprint('raw_jpg', __name__, url_prefix='/raw-jpg')
@@ -144,6 +145,19 @@ def convert_raw_jpg():
                 'error': f'File too large. Maximum size: {MAX_FILE_SIZE // (1024 * 1024)}MB'
             }), 400
 
+        # RAW demosaicing is CPU-heavy; run it in the background job pool on request
+        if wants_async():
+            return submit_job(
+                'raw_convert', temp_input.name,
+                params={
+                    'output_format': output_format,
+                    'quality': quality,
+                    'preserve_metadata': preserve_metadata,
+                    'processing_params': processing_params
+                },
+                tool_type='raw_image_converter'
+            )
+
         # Initialize processor with upload folder from app config
         upload_folder = getattr(current_app.config, 'UPLOAD_FOLDER', 'uploads')
         processor = RAWProcessor(upload_folder)
@@ -16,6 +16,7 @@ from utils.image_converter.image_converter_utils import (
     cleanup_temp_files,
     create_conversion_summary
 )
+from utils.image_converter.target_size_encoder import save_to_target_size
 
 # Create blueprint
 image_converter_bp = Blueprint('image_converter', __name__, url_prefix='/image-converter')
@@ -122,6 +123,14 @@ def convert_images():
             
             if processing_options['quality'] < 1 or processing_options['quality'] > 100:
                 processing_options['quality'] = 85  # Default quality
+            
+            # Optional output size budget for JPEG/WebP, in KB
+            if request.form.get('target_size_kb'):
+                target_size_kb = float(request.form.get('target_size_kb'))
+                if target_size_kb < 1 or target_size_kb > 50 * 1024:
+                    return jsonify({'error': 'Target size must be between 1KB and 50MB'}), 400
+                processing_options['target_size'] = int(target_size_kb * 1024)
+                processing_options['allow_resize'] = request.form.get('allow_resize') == 'on'
                 
         except ValueError as e:
             return jsonify({'error': 'Invalid processing parameters'}), 400
@@ -215,7 +224,16 @@ def convert_images():
                             save_params['format'] = 'WEBP'
                             save_params['quality'] = processing_options.get('quality', 85)
                         
-                        img.save(output_path, **save_params)
+                        target_size = processing_options.get('target_size')
+                        if target_size and save_params.get('format') in ('JPEG', 'WEBP'):
+                            # Best quality up to the selected preset that fits the budget
+                            encoded = save_to_target_size(img, output_path, target_size, save_params['format'],
+                                                          max_quality=save_params['quality'],
+                                                          allow_resize=processing_options.get('allow_resize', False))
+                            output_dimensions = encoded['dimensions']
+                        else:
+                            img.save(output_path, **save_params)
+                            output_dimensions = img.size
                         
                         current_app.logger.info(f"    Image saved successfully to {output_path}")
                         success = True
@@ -238,7 +256,8 @@ def convert_images():
                             'output_name': output_filename,
                             'output_path': output_path,
                             'input_size': file_size,
-                            'output_size': output_size
+                            'output_size': output_size,
+                            'dimensions': list(output_dimensions)
                         })
                         conversion_stats['successful_conversions'] += 1
                         
@@ -0,0 +1,142 @@
+# routes/jobs_routes.py - Background job status and results
+import os
+import uuid
+
+from flask import Blueprint, jsonify, request, send_file, session, url_for, g, current_app
+from flask_login import current_user
+
+from core.job_queue import job_queue, FINISHED_STATUSES
+from middleware.usage_tracking import UsageTracker
+from models import db, User
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+
+def wants_async():
+    """Whether the client asked for a conversion to run as a background job"""
+    if not job_queue.enabled:
+        return False
+    value = request.values.get('async')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def job_owner():
+    """Owner token tying jobs to the current user or anonymous session"""
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    if 'job_owner' not in session:
+        session['job_owner'] = uuid.uuid4().hex
+    return f"anon:{session['job_owner']}"
+
+
+def submit_job(kind, input_path=None, params=None, tool_type=None, download_name=None):
+    """
+    Queue a background job for the current request and return a 202 response.
+
+    Quota accounting is deferred until the job finishes, so
+    track_conversion_result skips this request.
+    """
+    job_id = job_queue.submit(
+        kind,
+        input_path=input_path,
+        params=params,
+        user_id=current_user.id if current_user.is_authenticated else None,
+        owner=job_owner(),
+        tool_type=tool_type,
+        download_name=download_name
+    )
+    g.conversion_deferred = True
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('jobs.job_status', job_id=job_id)
+    }), 202
+
+
+def account_job(job):
+    """Record a finished job against the submitting user's usage"""
+    if not job.get('user_id'):
+        return
+
+    user = db.session.get(User, job['user_id'])
+    if user is None:
+        return
+
+    if job['status'] == 'completed':
+        UsageTracker.track_conversion(
+            job['tool_type'], job.get('input_path') or '', job.get('output_path') or '', user=user
+        )
+    else:
+        UsageTracker.track_failed_conversion(job['tool_type'], job.get('error') or 'Job failed', user=user)
+
+
+def account_finished_jobs(app):
+    """Scheduled sweep accounting jobs that finished without being polled"""
+    with app.app_context():
+        try:
+            for job in job_queue.claim_unaccounted():
+                account_job(job)
+        except Exception as e:
+            app.logger.error(f"Error accounting finished jobs: {e}")
+
+
+def _get_owned_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job.get('owner') != job_owner():
+        return None
+    return job
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report progress of a background job and its result URL once complete"""
+    job = _get_owned_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'status': 'not_found', 'error': 'Job not found or expired'}), 404
+
+    if job['status'] in FINISHED_STATUSES and job_queue.claim_accounting(job_id):
+        try:
+            account_job(job)
+        except Exception as e:
+            current_app.logger.error(f"Error accounting job {job_id}: {e}")
+
+    response = {
+        'success': job['status'] != 'failed',
+        'job_id': job_id,
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': round(job['progress'], 1),
+        'message': job.get('message')
+    }
+
+    if job['status'] == 'completed':
+        result = {k: v for k, v in (job['result'] or {}).items() if not k.endswith('_path')}
+        response['result'] = result
+        response['result_url'] = url_for('jobs.job_result', job_id=job_id)
+    elif job['status'] == 'failed':
+        response['error'] = job.get('error')
+
+    return jsonify(response)
+
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Download the output file of a completed job"""
+    job = _get_owned_job(job_id)
+    if job is None or job['status'] != 'completed':
+        return jsonify({'success': False, 'error': 'Job result not available'}), 404
+
+    output_path = job.get('output_path')
+    if not output_path or not os.path.exists(output_path):
+        return jsonify({'success': False, 'error': 'Job result has expired'}), 404
+
+    return send_file(
+        output_path,
+        as_attachment=True,
+        download_name=job.get('download_name') or os.path.basename(output_path),
+        mimetype=(job['result'] or {}).get('mimetype')
+    )
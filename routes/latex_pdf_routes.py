@@ -7,11 +7,15 @@ from flask import Blueprint, request, render_template, jsonify, send_file, redir
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
+import tempfile
+import threading
 import traceback
 from datetime import datetime
 
 # Import LaTeX utilities
 from utils.latex_utils import LatexProcessor
+from routes.jobs_routes import wants_async, submit_job
+from core.storage_index import record_after_request
 
 # Create blueprint
 latex_pdf_bp = Blueprint('latex_pdf', __name__)
@@ -19,6 +23,20 @@ latex_pdf_bp = Blueprint('latex_pdf', __name__)
 # Initialize LaTeX processor
 latex_processor = LatexProcessor()
 
+
+@latex_pdf_bp.record_once
+def warm_latex_formats(state):
+    """Precompile template preambles in the background when the app starts"""
+    def warm():
+        try:
+            built = latex_processor.warm_formats()
+            if built:
+                state.app.logger.info(f"Precompiled {built} LaTeX preamble formats")
+        except Exception as e:
+            state.app.logger.warning(f"LaTeX format warm-up failed: {e}")
+    
+    threading.Thread(target=warm, name='latex-format-warmup', daemon=True).start()
+
 # Configuration
 ALLOWED_EXTENSIONS = {'tex', 'latex', 'pdf'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -71,6 +89,18 @@ def api_compile():
                 'error': 'No LaTeX content provided'
             }), 400
         
+        # Compile in the background job pool when the client asks for it
+        if wants_async():
+            tex_file = tempfile.NamedTemporaryFile('w', suffix='.tex', delete=False, encoding='utf-8')
+            with tex_file:
+                tex_file.write(latex_content)
+            return submit_job(
+                'latex_to_pdf', tex_file.name,
+                params={'auto_wrap': auto_wrap, 'include_log': show_log},
+                tool_type='latex_to_pdf',
+                download_name='document.pdf'
+            )
+        
         print(f"[DEBUG] Compiling LaTeX - Auto-wrap: {auto_wrap}, Show log: {show_log}")
         
         # Compile LaTeX to PDF
@@ -188,6 +218,7 @@ def api_extract_text():
         filename = secure_filename(file.filename)
         filepath = os.path.join(upload_folder, filename)
         file.save(filepath)
+        record_after_request(filepath)
         
         # Extract text from PDF
         start_time = datetime.now()
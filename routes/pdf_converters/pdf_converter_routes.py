@@ -3,11 +3,10 @@
 import os
 import json
 import re
+import hashlib
 from io import BytesIO
 from flask import Blueprint, render_template, request, flash, redirect, send_file, current_app, g
 import fitz
-import pandas as pd
-from pdf2docx import Converter
 from werkzeug.utils import secure_filename
 
 # UNIVERSAL SECURITY FRAMEWORK IMPORTS - Phase 2 PDF Security
@@ -22,10 +21,16 @@ from security.core.exceptions import (
 )
 
 from utils.helpers import allowed_file
+from core.conversion_cache import conversion_cache
+from core.lazy_imports import lazy_import
+from routes.jobs_routes import wants_async, submit_job
 from forms import PDFConverterForm
 
 pdf_converter_bp = Blueprint('pdf_converter', __name__)
 
+# Only needed for PDF to Excel; loaded on first use
+pd = lazy_import('pandas')
+
 from middleware import quota_required, track_conversion_result
 # from utils.auth_decorators import login_required_for_free_tools # Uncomment if login is required for free tools
 
@@ -163,9 +168,25 @@ def pdf_converter():
                         safe_base_name = sanitize_filename(filename.rsplit('.', 1)[0])
                         docx_file = f"{filepath.rsplit('.', 1)[0]}.docx"
                         
-                        cv = Converter(filepath)
-                        cv.convert(docx_file, start=0, end=None)
-                        cv.close()
+                        # Large PDFs can run as a background job instead of tying up this worker
+                        if wants_async():
+                            return submit_job(
+                                'pdf_to_docx', filepath, tool_type='pdf_converter',
+                                download_name=f"{safe_base_name}.docx"
+                            )
+                        
+                        def convert_to_docx():
+                            from pdf2docx import Converter
+                            cv = Converter(filepath)
+                            cv.convert(docx_file, start=0, end=None)
+                            cv.close()
+                            return True
+                        
+                        # Reuse a previous result for identical PDFs
+                        conversion_cache.run(
+                            'pdf_to_docx', '1', filepath, docx_file, {}, convert_to_docx,
+                            input_sha256=hashlib.sha256(file_content).hexdigest()
+                        )
                         
                         # NEW: Security logging for successful conversion
                         current_app.logger.info(
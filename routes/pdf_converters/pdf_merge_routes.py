@@ -8,6 +8,7 @@ import fitz  # PyMuPDF for preview thumbnails
 import base64
 from io import BytesIO
 from datetime import datetime
+from core.storage_index import record_after_request
 
 pdf_merge_bp = Blueprint('pdf_merge', __name__)
 
@@ -64,6 +65,7 @@ def upload_pdf_files():
                 filepath = os.path.join(upload_dir, unique_filename)
                 
                 file.save(filepath)
+                record_after_request(filepath)
                 
                 # Read file for thumbnail generation
                 with open(filepath, 'rb') as f:
@@ -145,6 +147,7 @@ def merge_pdfs():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"merged_pdf_{timestamp}.pdf"
         output_path = os.path.join(upload_dir, output_filename)
+        record_after_request(output_path)
         
         # Write merged PDF
         with open(output_path, 'wb') as output_file:
@@ -6,6 +6,7 @@ from flask import Blueprint, render_template, request, jsonify, send_file, curre
 import fitz  # PyMuPDF
 from werkzeug.utils import secure_filename
 from utils.helpers import allowed_file
+from core.storage_index import record_after_request
 
 pdf_page_delete_bp = Blueprint('pdf_page_delete', __name__)
 
@@ -29,6 +30,7 @@ def upload_pdf_for_deletion():
         filename = secure_filename(file.filename)
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
+        record_after_request(filepath)
 
         # Open PDF and get page information
         doc = fitz.open(filepath)
@@ -42,6 +44,7 @@ def upload_pdf_for_deletion():
             thumbnail_filename = f"thumb_{filename}_{page_num}.png"
             thumbnail_path = os.path.join(current_app.config['UPLOAD_FOLDER'], thumbnail_filename)
             pix.save(thumbnail_path)
+            record_after_request(thumbnail_path)
             
             # Get basic page info
             page_info = {
@@ -196,6 +199,7 @@ def batch_delete_pages():
                 filename = secure_filename(file.filename)
                 filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                 file.save(filepath)
+                record_after_request(filepath)
 
                 # Open PDF
                 doc = fitz.open(filepath)
@@ -226,6 +230,7 @@ def batch_delete_pages():
                     output_filename = f"batch_deleted_{filename}"
                     output_path = os.path.join(current_app.config['COMPRESSED_FOLDER'], output_filename)
                     doc.save(output_path)
+                    record_after_request(output_path)
                     
                     processed_files.append({
                         'filename': output_filename,
@@ -14,6 +14,7 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.utils import ImageReader
 import tempfile
 from datetime import datetime
+from core.storage_index import record_after_request
 
 pdf_signature_bp = Blueprint('pdf_signature', __name__)
 
@@ -93,6 +94,7 @@ def upload_pdf():
         upload_dir = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
         filepath = os.path.join(upload_dir, unique_filename)
         file.save(filepath)
+        record_after_request(filepath)
         
         # Get PDF info
         pdf_info = get_pdf_info(filepath)
@@ -158,6 +160,7 @@ def upload_signature():
         upload_dir = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
         signature_filename = f"signature_{signature_id}.png"
         signature_path = os.path.join(upload_dir, signature_filename)
+        record_after_request(signature_path)
         
         # Convert to PNG and save
         img = Image.open(file.stream)
@@ -214,6 +217,7 @@ def save_drawn_signature():
         upload_dir = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
         signature_filename = f"signature_{signature_id}.png"
         signature_path = os.path.join(upload_dir, signature_filename)
+        record_after_request(signature_path)
         
         with open(signature_path, 'wb') as f:
             f.write(signature_bytes)
@@ -314,6 +318,7 @@ def apply_signature_to_pdf(pdf_path, signature_path, page_number, x, y, width, h
         
         # Save signed PDF
         output_path = pdf_path.replace('.pdf', '_signed_temp.pdf')
+        record_after_request(output_path)
         doc.save(output_path)
         doc.close()
         
@@ -366,6 +371,7 @@ def create_text_signature():
         upload_dir = current_app.config.get('UPLOAD_FOLDER', tempfile.gettempdir())
         signature_filename = f"signature_{signature_id}.png"
         signature_path = os.path.join(upload_dir, signature_filename)
+        record_after_request(signature_path)
         
         # Create image with text
         img_width = len(text) * font_size + 100
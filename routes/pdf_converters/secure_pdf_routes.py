@@ -3,18 +3,40 @@ import os
 import json
 import uuid
 import time
+import base64
+import hashlib
+import secrets
 from io import BytesIO
 from flask import Blueprint, render_template, request, flash, redirect, send_file, current_app, jsonify, url_for
 import PyPDF2
 import qrcode
 from PIL import Image
+from cryptography.fernet import Fernet, InvalidToken
 from werkzeug.utils import secure_filename
 from utils.helpers import allowed_file
+from core.result_store import result_store
+from core.storage_index import record_after_request
 
 secure_pdf_bp = Blueprint('secure_pdf', __name__)
 
-# In-memory storage for QR unlock tokens (in production, use Redis or database)
-qr_unlock_tokens = {}
+# QR unlock tokens live in the shared result store so the unlock link works on
+# any worker; the PDF is kept as the entry's blob instead of in process memory.
+# The token itself is never stored: entries are keyed by its hash and the
+# password is encrypted with a key derived from it, so the store alone
+# cannot unlock the PDF.
+QR_TOKEN_NAMESPACE = 'qr_unlock'
+QR_TOKEN_TTL = 3600  # 1 hour
+
+
+def _qr_token_key(token):
+    """Result store key for an unlock token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _qr_token_cipher(token):
+    """Cipher for the password stored with an unlock token"""
+    key = hashlib.sha256(b'cropio-qr-unlock-password:' + token.encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
 
 @secure_pdf_bp.route('/secure-pdf', methods=['GET', 'POST'])
 def secure_pdf():
@@ -177,16 +199,7 @@ def generate_qr_unlock():
             return jsonify({'error': 'Incorrect password'}), 400
         
         # Generate unique token
-        token = str(uuid.uuid4())
-        
-        # Store file data and password temporarily (in production, use secure storage)
-        file.seek(0)  # Reset file pointer
-        qr_unlock_tokens[token] = {
-            'filename': secure_filename(file.filename),
-            'password': password,
-            'pdf_data': file.read(),
-            'created_at': time.time()
-        }
+        token = secrets.token_urlsafe(32)
         
         # Generate QR code with unlock URL
         unlock_url = url_for('secure_pdf.qr_unlock_pdf', token=token, _external=True)
@@ -208,13 +221,22 @@ def generate_qr_unlock():
         qr_image.save(img_buffer, format='PNG')
         img_buffer.seek(0)
         
-        # Save QR image temporarily
-        qr_filename = f"qr_unlock_{token}.png"
+        # Save QR image temporarily (named apart from the token)
+        qr_filename = f"qr_unlock_{uuid.uuid4()}.png"
         qr_path = os.path.join(current_app.config['UPLOAD_FOLDER'], qr_filename)
+        record_after_request(qr_path)
         
         with open(qr_path, 'wb') as f:
             f.write(img_buffer.getvalue())
         
+        # Store file data and encrypted password until the token is redeemed or expires
+        file.seek(0)  # Reset file pointer
+        result_store.put(QR_TOKEN_NAMESPACE, _qr_token_key(token), {
+            'filename': secure_filename(file.filename),
+            'password': _qr_token_cipher(token).encrypt(password.encode()).decode(),
+            'created_at': time.time()
+        }, ttl=QR_TOKEN_TTL, blob=file.read(), paths=[qr_path])
+        
         return jsonify({
             'success': True,
             'qr_url': url_for('file_serving.serve_file', filename=qr_filename),
@@ -233,25 +255,25 @@ def qr_unlock_pdf(token=None):
     if not token:
         token = request.args.get('token')
     
-    if not token or token not in qr_unlock_tokens:
+    # Redeem the token; pop() hands it to exactly one request across workers
+    entry = result_store.pop(QR_TOKEN_NAMESPACE, _qr_token_key(token)) if token else None
+    if entry is None:
         flash('Invalid or expired unlock token', 'error')
         return redirect(url_for('secure_pdf.secure_pdf'))
     
     try:
-        token_data = qr_unlock_tokens[token]
-        
-        # Check if token is expired (1 hour)
-        if time.time() - token_data['created_at'] > 3600:
-            del qr_unlock_tokens[token]
-            flash('Unlock token has expired', 'error')
-            return redirect(url_for('secure_pdf.secure_pdf'))
+        token_data, pdf_bytes = entry
         
         # Create PDF reader from stored data
-        pdf_data = BytesIO(token_data['pdf_data'])
+        pdf_data = BytesIO(pdf_bytes)
         pdf_reader = PyPDF2.PdfReader(pdf_data)
         
         # Decrypt with stored password
-        if not pdf_reader.decrypt(token_data['password']):
+        try:
+            password = _qr_token_cipher(token).decrypt(token_data['password'].encode()).decode()
+        except InvalidToken:
+            password = None
+        if not password or not pdf_reader.decrypt(password):
             flash('Error unlocking PDF', 'error')
             return redirect(url_for('secure_pdf.secure_pdf'))
         
@@ -265,9 +287,6 @@ def qr_unlock_pdf(token=None):
         pdf_writer.write(output_buffer)
         output_buffer.seek(0)
         
-        # Clean up token
-        del qr_unlock_tokens[token]
-        
         # Generate filename
         unlocked_name = f"qr_unlocked_{token_data['filename']}"
         
@@ -310,16 +329,6 @@ def check_pdf_security():
 # Cleanup expired tokens periodically
 def cleanup_expired_tokens():
     """Remove expired QR unlock tokens"""
-    current_time = time.time()
-    expired_tokens = [
-        token for token, data in qr_unlock_tokens.items()
-        if current_time - data['created_at'] > 3600
-    ]
-    
-    for token in expired_tokens:
-        del qr_unlock_tokens[token]
-    
-    current_app.logger.info(f"Cleaned up {len(expired_tokens)} expired QR tokens")
-
-# Cleanup function is available for manual use or can be scheduled separately
-# In production, this should be called periodically by the background scheduler
+    # Expired tokens are swept with all other result store entries
+    removed = result_store.sweep()
+    current_app.logger.info(f"Cleaned up {removed} expired result store entries")
@@ -4,7 +4,12 @@ import json
 from io import BytesIO
 from flask import Blueprint, render_template, request, flash, redirect, send_file, current_app
 from werkzeug.utils import secure_filename
-import pandas as pd
+
+from core.lazy_imports import lazy_import
+from core.storage_index import record_after_request
+
+# Only needed for spreadsheet inputs; loaded on first use
+pd = lazy_import('pandas')
 
 # Optional imports
 try:
@@ -55,6 +60,7 @@ def convert_to_pdf():
             filename = secure_filename(file.filename)
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             file.save(filepath)
+            record_after_request(filepath)
             
             file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
             
@@ -101,6 +107,7 @@ def convert_to_docx():
             filename = secure_filename(file.filename)
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             file.save(filepath)
+            record_after_request(filepath)
             
             file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
             
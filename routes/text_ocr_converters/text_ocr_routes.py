@@ -2,8 +2,6 @@ from flask import Blueprint, request, render_template, flash, send_file, current
 import os
 import sys
 import uuid
-import tempfile
-import threading
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import json
@@ -20,15 +18,17 @@ try:
 except Exception as e:
     print(f"Warning: Could not configure Tesseract helper: {e}")
 
-# Try to import OCR dependencies, with fallbacks if not available
-try:
-    import pytesseract
+# Try to import OCR dependencies, with fallbacks if not available.
+# pytesseract pulls in pandas, so it is only imported when OCR runs.
+from core.lazy_imports import lazy_import, module_available
+from core.storage_index import record_after_request
+
+pytesseract = lazy_import('pytesseract')
+TESSERACT_AVAILABLE = module_available('pytesseract')
+if TESSERACT_AVAILABLE and os.name == 'nt':
     # Ensure Tesseract path is set
     if not pytesseract.pytesseract.tesseract_cmd or pytesseract.pytesseract.tesseract_cmd == 'tesseract':
         pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
     
 try:
     from PIL import Image, ImageEnhance, ImageFilter
@@ -68,6 +68,11 @@ try:
 except ImportError:
     REPORTLAB_AVAILABLE = False
 
+from utils.text_ocr_converters.ocr_engine import (
+    enhance_image, detect_language, ocr_image, ocr_pdf, get_ocr_metrics,
+    DEFAULT_DOCUMENT_TIMEOUT
+)
+
 text_ocr_bp = Blueprint('text_ocr', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'tiff', 'docx', 'txt'}
@@ -96,99 +101,6 @@ def allowed_file(filename):
     """Check if the uploaded file has an allowed extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def enhance_image(image, auto_enhance=True):
-    """Enhance image quality for better OCR results using advanced techniques"""
-    if not auto_enhance:
-        return image
-    
-    try:
-        # Convert PIL Image to numpy array
-        img_array = np.array(image)
-        
-        # Convert to grayscale if not already
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
-        
-        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        # This improves contrast while preserving details
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        
-        # Apply bilateral filter to denoise while preserving edges
-        denoised = cv2.bilateralFilter(enhanced, 9, 75, 75)
-        
-        # Apply morphological operations to enhance text
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-        morph = cv2.morphologyEx(denoised, cv2.MORPH_CLOSE, kernel)
-        
-        # Apply thresholding with adaptive method (Otsu's)
-        # This works better than fixed threshold for varying lighting
-        _, binary = cv2.threshold(morph, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Deskew the image (rotate if text is not horizontal)
-        # Calculate the angle to deskew
-        coords = np.column_stack(np.where(binary > 0))
-        angle = cv2.minAreaRect(coords)[2]
-        
-        if angle < -45:
-            angle = 90 + angle
-        
-        # Only rotate if angle is significant
-        if abs(angle) > 0.5:
-            h, w = binary.shape
-            center = (w // 2, h // 2)
-            rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-            rotated = cv2.warpAffine(binary, rotation_matrix, (w, h), 
-                                     borderMode=cv2.BORDER_REPLICATE)
-        else:
-            rotated = binary
-        
-        # Remove small noise (salt and pepper)
-        cleaned = cv2.medianBlur(rotated, 3)
-        
-        # Apply invert if needed (ensure text is black on white)
-        # Check if text is mostly dark
-        if np.mean(cleaned) > 127:
-            cleaned = cv2.bitwise_not(cleaned)
-        
-        # Dilate text slightly to make it bolder and easier to read
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (1, 1))
-        enhanced_final = cv2.dilate(cleaned, kernel, iterations=1)
-        
-        # Convert back to PIL Image
-        final_image = Image.fromarray(enhanced_final)
-        
-        return final_image
-    except Exception as e:
-        print(f"Image enhancement failed: {str(e)}")
-        return image
-
-def detect_language(text):
-    """Detect the primary language of the extracted text"""
-    try:
-        from langdetect import detect
-        lang_code = detect(text)
-        
-        # Map langdetect codes to tesseract codes
-        lang_mapping = {
-            'en': 'eng',
-            'hi': 'hin',
-            'es': 'spa',
-            'fr': 'fra',
-            'de': 'deu',
-            'ar': 'ara',
-            'zh-cn': 'chi_sim',
-            'ja': 'jpn',
-            'ko': 'kor',
-            'ru': 'rus'
-        }
-        
-        return lang_mapping.get(lang_code, 'eng')
-    except:
-        return 'eng'
-
 def process_image_ocr(image_path, language='eng', auto_enhance=True):
     """Process image file for OCR"""
     if not TESSERACT_AVAILABLE:
@@ -210,50 +122,10 @@ def process_image_ocr(image_path, language='eng', auto_enhance=True):
         }
     
     try:
-        # Open and enhance image
-        image = Image.open(image_path)
-        
-        # Convert RGBA to RGB if necessary
-        if image.mode == 'RGBA':
-            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            rgb_image.paste(image, mask=image.split()[3])
-            image = rgb_image
-        
-        # Enhance image if requested
-        if auto_enhance and CV2_AVAILABLE:
-            image = enhance_image(image, auto_enhance)
-        
-        # Perform OCR with optimized Tesseract configuration
-        # These settings improve accuracy and speed:
-        # --oem 1: Use new neural net OCR engine
-        # --psm 1: Automatic page segmentation
-        custom_config = r'--oem 1 --psm 1'
-        
-        # Set a timeout for OCR to prevent hanging
-        ocr_result = {'text': '', 'error': None, 'language': language}
-        
-        def run_ocr():
-            nonlocal language
-            try:
-                if language != 'auto':
-                    ocr_result['text'] = pytesseract.image_to_string(image, lang=language, config=custom_config)
-                else:
-                    # Try to detect language from a sample
-                    sample_text = pytesseract.image_to_string(image, lang='eng', config=custom_config)[:500]
-                    detected_lang = detect_language(sample_text)
-                    ocr_result['text'] = pytesseract.image_to_string(image, lang=detected_lang, config=custom_config)
-                    # Store detected language
-                    language = detected_lang
-                    ocr_result['language'] = detected_lang
-            except Exception as e:
-                ocr_result['error'] = str(e)
-        
-        # Run OCR in a thread with timeout (30 seconds)
-        ocr_thread = threading.Thread(target=run_ocr, daemon=True)
-        ocr_thread.start()
-        ocr_thread.join(timeout=30)
-        
-        if ocr_thread.is_alive():
+        # Recognize in the OCR worker pool, which keeps language models loaded
+        try:
+            ocr_result = ocr_image(image_path, language, auto_enhance, timeout=30)
+        except TimeoutError:
             return {
                 'error': 'OCR processing timeout: The image took too long to process. Please try a simpler image or smaller file.',
                 'text': '',
@@ -262,9 +134,7 @@ def process_image_ocr(image_path, language='eng', auto_enhance=True):
                 'word_count': 0
             }
         
-        if ocr_result['error']:
-            raise Exception(ocr_result['error'])
-        
+        language = ocr_result['language']
         text = ocr_result['text']
         
         # Default confidence based on text quality
@@ -314,46 +184,13 @@ def process_pdf_ocr(pdf_path, language='eng', auto_enhance=True):
         }
     
     try:
-        all_text = []
-        pdf_document = fitz.open(pdf_path)
-        total_confidence = 0
-        page_count = 0
-        
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            
-            # First try to extract text directly
-            text = page.get_text()
-            
-            if text.strip():
-                # If text exists, it's already a text PDF
-                all_text.append(text)
-                total_confidence += 100  # High confidence for native text
-            else:
-                # Convert page to image for OCR (with higher quality)
-                mat = fitz.Matrix(3, 3)  # Increase resolution to 3x for better OCR
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                img_data = pix.pil_tobytes(format="PNG")
-                
-                # Create temporary image file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_img:
-                    tmp_img.write(img_data)
-                    tmp_img_path = tmp_img.name
-                
-                # Process image with OCR
-                result = process_image_ocr(tmp_img_path, language, auto_enhance)
-                all_text.append(result['text'])
-                total_confidence += result['confidence']
-                
-                # Clean up temporary file
-                try:
-                    os.unlink(tmp_img_path)
-                except:
-                    pass
-            
-            page_count += 1
+        # Scanned pages are OCR'd in parallel under one whole-document deadline
+        document = ocr_pdf(pdf_path, language, auto_enhance, timeout=DEFAULT_DOCUMENT_TIMEOUT)
+        pages = document['pages']
         
-        pdf_document.close()
+        all_text = [page['text'] for page in pages]
+        total_confidence = sum(page['confidence'] for page in pages)
+        page_count = len(pages)
         
         full_text = '\n\n'.join(all_text)
         # Clean up text
@@ -367,8 +204,18 @@ def process_pdf_ocr(pdf_path, language='eng', auto_enhance=True):
         return {
             'text': full_text,
             'confidence': round(avg_confidence, 2),
-            'language': SUPPORTED_LANGUAGES.get(language, language),
-            'word_count': len(full_text.split())
+            'language': SUPPORTED_LANGUAGES.get(document['language'], document['language']),
+            'word_count': len(full_text.split()),
+            'pages': [
+                {
+                    'page': page['page'],
+                    'source': page['source'],
+                    'confidence': page['confidence'],
+                    'word_count': len(page['text'].split())
+                }
+                for page in pages
+            ],
+            'timed_out': document['timed_out']
         }
         
     except Exception as e:
@@ -518,6 +365,11 @@ def export_to_json(ocr_result, output_path):
             'paragraphs': ocr_result['text'].split('\n\n')
         }
         
+        # Per-page breakdown for PDFs
+        if 'pages' in ocr_result:
+            json_data['pages'] = ocr_result['pages']
+            json_data['metadata']['timed_out'] = ocr_result.get('timed_out', False)
+        
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(json_data, f, ensure_ascii=False, indent=2)
         
@@ -575,6 +427,7 @@ def process_ocr():
         # Save uploaded file
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
         file.save(upload_path)
+        record_after_request(upload_path)
         
         # Process file based on type
         if file_extension in ['.png', '.jpg', '.jpeg', '.tiff']:
@@ -608,6 +461,7 @@ def process_ocr():
         output_extension = EXPORT_FORMATS[output_format]['extension']
         output_filename = f"{base_name}_ocr_{unique_id}{output_extension}"
         output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
+        record_after_request(output_path)
         
         export_success = False
         if output_format == 'txt':
@@ -663,6 +517,11 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': f'Download failed: {str(e)}', 'success': False}), 500
 
+@text_ocr_bp.route('/api/ocr/metrics')
+def api_ocr_metrics():
+    """OCR worker timing metrics (model load vs recognition time)"""
+    return jsonify({'success': True, 'metrics': get_ocr_metrics()})
+
 @text_ocr_bp.route('/api/ocr', methods=['POST'])
 def api_ocr():
     """API endpoint for OCR processing"""
@@ -683,6 +542,7 @@ def api_ocr():
         filename = secure_filename(file.filename)
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
         file.save(upload_path)
+        record_after_request(upload_path)
         
         # Get file extension
         file_extension = os.path.splitext(filename)[1].lower()
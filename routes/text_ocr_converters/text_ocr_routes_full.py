@@ -5,6 +5,7 @@ import tempfile
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import json
+from core.storage_index import record_after_request
 
 # Try to import OCR dependencies, with fallbacks if not available
 try:
@@ -426,6 +427,7 @@ def process_ocr():
         # Save uploaded file
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
         file.save(upload_path)
+        record_after_request(upload_path)
         
         # Process file based on type
         if file_extension in ['.png', '.jpg', '.jpeg', '.tiff']:
@@ -459,6 +461,7 @@ def process_ocr():
         output_extension = EXPORT_FORMATS[output_format]['extension']
         output_filename = f"{base_name}_ocr_{unique_id}{output_extension}"
         output_path = os.path.join(current_app.config['OUTPUT_FOLDER'], output_filename)
+        record_after_request(output_path)
         
         export_success = False
         if output_format == 'txt':
@@ -533,6 +536,7 @@ def api_ocr():
         filename = secure_filename(file.filename)
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
         file.save(upload_path)
+        record_after_request(upload_path)
         
         # Get file extension
         file_extension = os.path.splitext(filename)[1].lower()
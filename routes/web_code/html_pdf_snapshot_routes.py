@@ -17,6 +17,7 @@ import time
 
 # Import the HTML PDF processor utility
 from utils.web_code.html_pdf_snapshot_utils import HTMLPDFProcessor
+from core.blueprint_registry import blueprint_registry
 
 # Create blueprint with unique name to avoid conflicts
 html_pdf_snapshot_bp = Blueprint('html_pdf_snapshot', __name__, url_prefix='/html-pdf-snapshot')
@@ -27,6 +28,11 @@ MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_CONTENT_SIZE = 10 * 1024 * 1024  # 10MB for direct HTML content
 TIMEOUT_SECONDS = 30
 
+@blueprint_registry.warmup
+def probe_backends():
+    """Probe PDF backends before the first conversion request"""
+    HTMLPDFProcessor()
+
 def allowed_file(filename):
     """Check if file has allowed extension"""
     return '.' in filename and \
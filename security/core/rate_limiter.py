@@ -1,17 +1,38 @@
 """
 Universal Security Framework - Rate Limiter
 Advanced rate limiting with user-specific and IP-based tracking
+
+Limits use a sliding window counter: each key stores only the request counts
+of the current and previous fixed windows, and the previous count is weighted
+by how much of it still overlaps the sliding window. Every check is O(1)
+regardless of the limit.
+
+State lives in a pluggable backend:
+- MemoryRateLimitBackend: per-process, for development and tests
+- SQLiteRateLimitBackend: a memory-mapped SQLite file shared by all workers on one host
+- RedisRateLimitBackend: shared across hosts, updated atomically by a Lua script
 """
 from functools import wraps
 from flask import request, jsonify, current_app
 from flask_login import current_user
-from datetime import datetime, timedelta
-import redis
-import json
-from collections import defaultdict
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from security.logging import security_logger
+
+BACKENDS = ('auto', 'memory', 'sqlite', 'redis')
+SQLITE_MMAP_SIZE = 8 * 1024 * 1024
 
-# In-memory fallback for development
-rate_limit_store = defaultdict(list)
 
 def get_rate_limit_key(key, user_id=None, ip_address=None):
     """Generate unique rate limit key"""
@@ -22,16 +43,279 @@ def get_rate_limit_key(key, user_id=None, ip_address=None):
     else:
         return f"rate_limit:{key}:global"
 
+
+def sliding_window_hit(state: Optional[Tuple[int, int, int]], now: float, window: int,
+                       limit: int, cost: int = 1) -> Tuple[bool, Tuple[int, int, int], float, float]:
+    """
+    Apply one request to a sliding window counter.
+
+    ``state`` is (window_index, current_count, previous_count) or None for a
+    new key. Returns (allowed, new_state, estimated_count, retry_after). The
+    request is only counted when it is allowed.
+    """
+    index = int(now // window)
+    current = previous = 0
+    if state is not None:
+        stored_index, stored_current, stored_previous = state
+        if stored_index == index:
+            current, previous = stored_current, stored_previous
+        elif stored_index == index - 1:
+            previous = stored_current
+
+    elapsed = now - index * window
+    weight = 1 - elapsed / window
+    count = previous * weight + current
+
+    if count + cost > limit:
+        if current + cost > limit or previous == 0:
+            retry_after = window - elapsed
+        else:
+            # Wait until enough of the previous window has slid out
+            retry_after = window * (1 - (limit - current - cost) / previous) - elapsed
+        return False, (index, current, previous), count, max(retry_after, 0.0)
+
+    return True, (index, current + cost, previous), count + cost, 0.0
+
+
+def sliding_window_count(state: Optional[Tuple[int, int, int]], now: float, window: int) -> float:
+    """Estimated number of requests in the sliding window ending at now"""
+    if state is None:
+        return 0.0
+    index = int(now // window)
+    stored_index, current, previous = state
+    if stored_index == index - 1:
+        current, previous = 0, current
+    elif stored_index != index:
+        return 0.0
+    return previous * (1 - (now - index * window) / window) + current
+
+
+class MemoryRateLimitBackend:
+    """Per-process counters; limits are multiplied by the number of workers"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[int, int, int]] = {}
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float, float]:
+        with self._lock:
+            allowed, state, count, retry_after = sliding_window_hit(self._state.get(key), now, window, limit)
+            self._state[key] = state
+        return allowed, count, retry_after
+
+    def count(self, key: str, window: int, now: float) -> float:
+        return sliding_window_count(self._state.get(key), now, window)
+
+    def reset(self, key: str) -> bool:
+        with self._lock:
+            return self._state.pop(key, None) is not None
+
+    def sweep(self, now: float) -> int:
+        removed = 0
+        with self._lock:
+            for key in list(self._state):
+                window = int(key.rsplit(':', 1)[-1])
+                if self._state[key][0] < int(now // window) - 1:
+                    del self._state[key]
+                    removed += 1
+        return removed
+
+
+class SQLiteRateLimitBackend:
+    """
+    Counters in a SQLite file shared by every worker process on the host.
+
+    The database runs in WAL mode with memory-mapped I/O, so checks read
+    shared pages and each hit is a single short write transaction.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window_index INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                previous INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits (expires_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+            self._local.conn = conn
+        return conn
+
+    def _load(self, conn: sqlite3.Connection, key: str) -> Optional[Tuple[int, int, int]]:
+        row = conn.execute(
+            'SELECT window_index, current, previous FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float, float]:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            allowed, state, count, retry_after = sliding_window_hit(self._load(conn, key), now, window, limit)
+            if allowed:
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limits (key, window_index, current, previous, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, state[0], state[1], state[2], (state[0] + 2) * window)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, count, retry_after
+
+    def count(self, key: str, window: int, now: float) -> float:
+        return sliding_window_count(self._load(self._connect(), key), now, window)
+
+    def reset(self, key: str) -> bool:
+        return self._connect().execute('DELETE FROM rate_limits WHERE key = ?', (key,)).rowcount > 0
+
+    def sweep(self, now: float) -> int:
+        return self._connect().execute('DELETE FROM rate_limits WHERE expires_at <= ?', (now,)).rowcount
+
+
+class RedisRateLimitBackend:
+    """Counters in Redis hashes that expire on their own; shared across hosts"""
+
+    name = 'redis'
+
+    # Same algorithm as sliding_window_hit, run atomically on the server
+    HIT_SCRIPT = """
+        local window = tonumber(ARGV[1])
+        local limit = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local index = math.floor(now / window)
+        local state = redis.call('HMGET', KEYS[1], 'i', 'c', 'p')
+        local current, previous = 0, 0
+        local stored = tonumber(state[1])
+        if stored == index then
+            current, previous = tonumber(state[2]), tonumber(state[3])
+        elseif stored == index - 1 then
+            previous = tonumber(state[2])
+        end
+        local elapsed = now - index * window
+        local count = previous * (1 - elapsed / window) + current
+        if count + 1 > limit then
+            local retry = window - elapsed
+            if current + 1 <= limit and previous > 0 then
+                retry = window * (1 - (limit - current - 1) / previous) - elapsed
+            end
+            return {0, tostring(count), tostring(retry)}
+        end
+        redis.call('HSET', KEYS[1], 'i', index, 'c', current + 1, 'p', previous)
+        redis.call('EXPIREAT', KEYS[1], (index + 2) * window)
+        return {1, tostring(count + 1), '0'}
+    """
+
+    def __init__(self, url: str):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError('redis package is not installed')
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client.ping()
+        self._hit = self.client.register_script(self.HIT_SCRIPT)
+
+    def hit(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, float, float]:
+        allowed, count, retry_after = self._hit(keys=[key], args=[window, limit, now])
+        return bool(allowed), float(count), max(float(retry_after), 0.0)
+
+    def count(self, key: str, window: int, now: float) -> float:
+        index, current, previous = self.client.hmget(key, 'i', 'c', 'p')
+        if index is None:
+            return 0.0
+        return sliding_window_count((int(index), int(current), int(previous)), now, window)
+
+    def reset(self, key: str) -> bool:
+        return self.client.delete(key) > 0
+
+    def sweep(self, now: float) -> int:
+        return 0  # Keys expire in Redis
+
+
+class RateLimiter:
+    """Sliding window rate limiter over a configurable storage backend"""
+
+    def __init__(self):
+        self.backend = MemoryRateLimitBackend()
+
+    def init_app(self, app):
+        """Select the storage backend from Flask app configuration"""
+        choice = (app.config.get('RATE_LIMIT_BACKEND') or 'auto').lower()
+        if choice not in BACKENDS:
+            raise ValueError(f"Unknown rate limit backend: {choice}")
+
+        redis_url = app.config.get('RATE_LIMIT_REDIS_URL')
+        if choice == 'redis' or (choice == 'auto' and redis_url):
+            try:
+                self.backend = RedisRateLimitBackend(redis_url or app.config.get('RATELIMIT_STORAGE_URL'))
+                security_logger.info("Rate limiter using Redis backend")
+                return
+            except Exception as e:
+                security_logger.warning(f"Redis rate limit backend unavailable, falling back to SQLite: {e}")
+
+        if choice == 'memory':
+            self.backend = MemoryRateLimitBackend()
+        else:
+            folder = app.config.get('RATE_LIMIT_FOLDER') or os.path.join(
+                os.path.dirname(app.config.get('UPLOAD_FOLDER', 'uploads')), 'ratelimit'
+            )
+            self.backend = SQLiteRateLimitBackend(os.path.join(folder, 'rate_limits.sqlite3'))
+        security_logger.info(f"Rate limiter using {self.backend.name} backend")
+
+    @staticmethod
+    def _storage_key(rate_key: str, window: int) -> str:
+        return f"{rate_key}:{window}"
+
+    def hit(self, rate_key: str, limit: int, window: int) -> Tuple[bool, float, float]:
+        """Count a request; returns (allowed, current_count, retry_after_seconds)"""
+        return self.backend.hit(self._storage_key(rate_key, window), limit, window, time.time())
+
+    def count(self, rate_key: str, window: int) -> float:
+        return self.backend.count(self._storage_key(rate_key, window), window, time.time())
+
+    def reset(self, rate_key: str) -> bool:
+        reset = False
+        for window in (60, 3600):
+            reset = self.backend.reset(self._storage_key(rate_key, window)) or reset
+        return reset
+
+    def sweep(self) -> int:
+        return self.backend.sweep(time.time())
+
+
+# Global instance
+rate_limiter = RateLimiter()
+
+
 def rate_limit(key, limit=100, per_minute=True, per_user=True):
     """
     Rate limiting decorator with advanced tracking
-    
+
     Args:
         key (str): Unique identifier for the rate limit
         limit (int): Maximum requests allowed
         per_minute (bool): If True, limit per minute, else per hour
         per_user (bool): If True, apply per-user limits
     """
+    window = 60 if per_minute else 3600
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
@@ -41,79 +325,53 @@ def rate_limit(key, limit=100, per_minute=True, per_user=True):
                     rate_key = get_rate_limit_key(key, user_id=current_user.id)
                 else:
                     rate_key = get_rate_limit_key(key, ip_address=request.remote_addr)
-                
-                # Get current time window
-                now = datetime.utcnow()
-                window_size = timedelta(minutes=1 if per_minute else 60)
-                window_start = now - window_size
-                
-                # Clean old entries and count current requests
-                rate_limit_store[rate_key] = [
-                    timestamp for timestamp in rate_limit_store[rate_key]
-                    if datetime.fromisoformat(timestamp) > window_start
-                ]
-                
-                # Check if limit exceeded
-                if len(rate_limit_store[rate_key]) >= limit:
-                    current_app.logger.warning(
-                        f"Rate limit exceeded for {rate_key}: "
-                        f"{len(rate_limit_store[rate_key])}/{limit} requests"
-                    )
-                    return jsonify({
-                        'error': 'Rate limit exceeded',
-                        'limit': limit,
-                        'window': '1 minute' if per_minute else '1 hour',
-                        'retry_after': 60 if per_minute else 3600
-                    }), 429
-                
-                # Add current request timestamp
-                rate_limit_store[rate_key].append(now.isoformat())
-                
-                return f(*args, **kwargs)
-                
+
+                allowed, count, retry_after = rate_limiter.hit(rate_key, limit, window)
             except Exception as e:
                 current_app.logger.error(f"Rate limiter error: {e}")
                 # Allow request to proceed if rate limiter fails
                 return f(*args, **kwargs)
-        
+
+            if not allowed:
+                current_app.logger.warning(
+                    f"Rate limit exceeded for {rate_key}: "
+                    f"{count:.0f}/{limit} requests"
+                )
+                response = jsonify({
+                    'error': 'Rate limit exceeded',
+                    'limit': limit,
+                    'window': '1 minute' if per_minute else '1 hour',
+                    'retry_after': math.ceil(retry_after)
+                })
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response, 429
+
+            return f(*args, **kwargs)
+
         return wrapper
     return decorator
 
-def get_rate_limit_info(key, user_id=None, ip_address=None):
+
+def get_rate_limit_info(key, user_id=None, ip_address=None, per_minute=True):
     """Get current rate limit status"""
     rate_key = get_rate_limit_key(key, user_id=user_id, ip_address=ip_address)
     return {
         'key': rate_key,
-        'current_requests': len(rate_limit_store.get(rate_key, [])),
-        'requests': rate_limit_store.get(rate_key, [])
+        'backend': rate_limiter.backend.name,
+        'current_requests': round(rate_limiter.count(rate_key, 60 if per_minute else 3600), 2)
     }
 
+
 def reset_rate_limit(key, user_id=None, ip_address=None):
     """Reset rate limit for a specific key"""
     rate_key = get_rate_limit_key(key, user_id=user_id, ip_address=ip_address)
-    if rate_key in rate_limit_store:
-        del rate_limit_store[rate_key]
-        return True
-    return False
+    return rate_limiter.reset(rate_key)
+
 
 def cleanup_expired_limits():
-    """Clean up expired rate limit entries"""
-    now = datetime.utcnow()
-    cleaned_count = 0
-    
-    for key in list(rate_limit_store.keys()):
-        # Keep only entries from last hour
-        cutoff = now - timedelta(hours=1)
-        old_count = len(rate_limit_store[key])
-        
-        rate_limit_store[key] = [
-            timestamp for timestamp in rate_limit_store[key]
-            if datetime.fromisoformat(timestamp) > cutoff
-        ]
-        
-        # Remove empty entries
-        if not rate_limit_store[key]:
-            del rate_limit_store[key]
-            cleaned_count += 1
-    
-    return cleaned_count
\ No newline at end of file
+    """Clean up expired rate limit entries; run periodically by the scheduler"""
+    try:
+        return rate_limiter.sweep()
+    except Exception as e:
+        security_logger.error(f"Rate limit sweep failed: {e}")
+        return 0
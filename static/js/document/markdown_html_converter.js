@@ -402,12 +402,16 @@ print(markdown_result)  # Output: # Hello World
     async updatePreviewServerSide(content) {
         console.log(`🔄 Using server-side preview for ${content.length} characters`);
         try {
+            // Send the ids of blocks already on screen; only changed blocks come back with HTML
+            const container = this.previewContent.querySelector(':scope > .md-preview-blocks');
+            const known = container ? Array.from(container.children, (el) => el.dataset.block) : [];
+            
             const response = await fetch('/api/markdown-html/preview', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ content: content })
+                body: JSON.stringify({ content: content, blocks: known })
             });
             
             const data = await response.json();
@@ -416,23 +420,19 @@ print(markdown_result)  # Output: # Hello World
                 throw new Error(data.error || 'Preview generation failed');
             }
             
-            console.log(`✅ Server preview success: ${data.html.length} chars HTML returned`);
-            
-            // Safely set HTML content using textContent for security
-            const tempDiv = document.createElement('div');
-            tempDiv.innerHTML = data.html;
+            console.log(`✅ Server preview success: ${data.rendered} of ${data.blocks.length} blocks rendered`);
             
-            // Clear and append sanitized content
-            this.previewContent.innerHTML = '';
-            this.previewContent.appendChild(tempDiv);
+            const fresh = this.patchPreviewBlocks(container, data.blocks);
             
-            // Safely highlight code blocks after DOM insertion
+            // Safely highlight code blocks in newly inserted blocks only
             if (typeof hljs !== 'undefined') {
-                this.previewContent.querySelectorAll('pre code').forEach((block) => {
-                    // Only highlight if not already highlighted
-                    if (!block.dataset.highlighted) {
-                        this.safeHighlightElement(block);
-                    }
+                fresh.forEach((blockEl) => {
+                    blockEl.querySelectorAll('pre code').forEach((block) => {
+                        // Only highlight if not already highlighted
+                        if (!block.dataset.highlighted) {
+                            this.safeHighlightElement(block);
+                        }
+                    });
                 });
             }
             
@@ -464,6 +464,48 @@ print(markdown_result)  # Output: # Hello World
         }
     }
     
+    patchPreviewBlocks(container, blocks) {
+        if (!container) {
+            container = document.createElement('div');
+            container.className = 'md-preview-blocks';
+            this.previewContent.innerHTML = '';
+            this.previewContent.appendChild(container);
+        }
+        
+        // Existing elements by block id; a repeated block shares one id
+        const existing = new Map();
+        Array.from(container.children).forEach((el) => {
+            const list = existing.get(el.dataset.block) || [];
+            list.push(el);
+            existing.set(el.dataset.block, list);
+        });
+        
+        const fresh = [];
+        const nodes = blocks.map((block) => {
+            const reused = existing.get(block.id);
+            if (reused && reused.length) {
+                return reused.shift();
+            }
+            
+            const el = document.createElement('div');
+            el.dataset.block = block.id;
+            if (block.html !== undefined) {
+                el.innerHTML = block.html;
+            } else {
+                // Another copy of a block that is already displayed
+                const original = container.querySelector(`[data-block="${block.id}"]`);
+                if (original) {
+                    el.innerHTML = original.innerHTML;
+                }
+            }
+            fresh.push(el);
+            return el;
+        });
+        
+        container.replaceChildren(...nodes);
+        return fresh;
+    }
+    
     updatePreviewClientSide(content) {
         try {
             if (typeof marked !== 'undefined') {
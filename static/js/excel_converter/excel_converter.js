@@ -579,7 +579,7 @@ function validateForm(form) {
     console.log('Validated output format:', outputFormat.value);
     
     // Additional validation: ensure the format value is valid
-    const validFormats = ['csv', 'tsv', 'json', 'html', 'txt', 'xml', 'ods', 'pdf'];
+    const validFormats = ['csv', 'tsv', 'json', 'jsonl', 'html', 'txt', 'xml', 'ods', 'pdf'];
     if (!validFormats.includes(outputFormat.value)) {
         showNotification('Invalid output format selected.', 'error');
         return false;
@@ -830,6 +830,7 @@ function proceedWithDownload(blob, xhr) {
                 'csv': '.csv',
                 'tsv': '.tsv',
                 'json': '.json',
+                'jsonl': '.jsonl',
                 'html': '.html',
                 'txt': '.txt',
                 'xml': '.xml',
@@ -932,6 +933,7 @@ function updateFormatSelection(format) {
         csv: 'CSV format is perfect for data analysis and spreadsheet applications.',
         tsv: 'TSV format uses tabs as delimiters, ideal for data that contains commas.',
         json: 'JSON format provides structured data for APIs and web applications.',
+        jsonl: 'JSON Lines writes one record per line, ideal for large sheets and data pipelines.',
         html: 'HTML format creates web-ready tables with optional formatting.',
         txt: 'TXT format provides plain text representation of your data.',
         xml: 'XML format offers hierarchical data structure for system integration.',
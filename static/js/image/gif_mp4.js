@@ -361,6 +361,9 @@ class GifMp4Converter {
     }
     
     clearFiles() {
+        if (this.isProcessing) {
+            this.cancelConversion();
+        }
         this.files = [];
         if (this.fileList) {
             this.fileList.style.display = 'none';
@@ -391,6 +394,10 @@ class GifMp4Converter {
             formData.append('files', this.files[0].file);
             formData.append('conversion_mode', this.currentConversionType);
             
+            // Client-chosen ID so progress can be polled while the request runs
+            const conversionId = this.generateConversionId();
+            formData.append('conversion_id', conversionId);
+            
             // Add settings based on conversion type
             if (this.currentConversionType === 'gif_to_mp4') {
                 formData.append('quality', this.quality?.value || 'high');
@@ -408,12 +415,14 @@ class GifMp4Converter {
             
             this.showProgress(30, 'Uploading file...');
             
+            this.startProgressPolling(conversionId);
             const response = await fetch('/gif-mp4/convert', {
                 method: 'POST',
                 body: formData
             });
+            this.stopProgressPolling();
             
-            this.showProgress(70, 'Processing conversion...');
+            this.showProgress(95, 'Finishing conversion...');
             
             const result = await response.json();
             
@@ -433,12 +442,64 @@ class GifMp4Converter {
             console.error('Conversion error:', error);
             this.showError(error.message || 'Conversion failed. Please try again.');
         } finally {
+            this.stopProgressPolling();
             this.isProcessing = false;
             this.convertBtn.disabled = false;
             this.hideProgress();
         }
     }
     
+    generateConversionId() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+            const r = Math.random() * 16 | 0;
+            return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+        });
+    }
+    
+    startProgressPolling(conversionId) {
+        this.stopProgressPolling();
+        this.pollingConversionId = conversionId;
+        this.progressTimer = setInterval(async () => {
+            try {
+                const response = await fetch(`/gif-mp4/status/${conversionId}`);
+                if (!response.ok) return;
+                const status = await response.json();
+                const progress = status.progress;
+                if (!progress || this.pollingConversionId !== conversionId) return;
+                
+                if (progress.percent !== null && progress.percent !== undefined) {
+                    const eta = progress.eta !== null ? ` - about ${Math.ceil(progress.eta)}s left` : '';
+                    this.showProgress(30 + progress.percent * 0.65, `Converting... ${Math.round(progress.percent)}%${eta}`);
+                } else {
+                    this.showProgress(50, `Converting... frame ${progress.frame}`);
+                }
+            } catch (error) {
+                // Polling is best-effort; the convert request reports the outcome
+            }
+        }, 1000);
+    }
+    
+    stopProgressPolling() {
+        if (this.progressTimer) {
+            clearInterval(this.progressTimer);
+            this.progressTimer = null;
+        }
+        this.pollingConversionId = null;
+    }
+    
+    async cancelConversion() {
+        const conversionId = this.pollingConversionId;
+        if (!conversionId) return;
+        try {
+            await fetch(`/gif-mp4/cancel/${conversionId}`, { method: 'POST' });
+        } catch (error) {
+            console.error('Cancel error:', error);
+        }
+    }
+    
     showProgress(percentage, message) {
         if (this.conversionProgress) {
             this.conversionProgress.style.display = 'block';
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed conversion cache in core.conversion_cache.
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.conversion_cache import ConversionCache, make_cache_key
+
+
+class DummyApp:
+    def __init__(self, folder, max_bytes):
+        self.config = {
+            'CONVERSION_CACHE_FOLDER': folder,
+            'CONVERSION_CACHE_MAX_BYTES': max_bytes,
+        }
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+
+def test_key_ignores_option_order():
+    a = make_cache_key('abc', 'conv', '1', {'quality': 80, 'format': 'png'})
+    b = make_cache_key('abc', 'conv', '1', {'format': 'png', 'quality': 80})
+    c = make_cache_key('abc', 'conv', '2', {'format': 'png', 'quality': 80})
+    assert a == b
+    assert a != c
+
+
+def test_hit_after_store_and_lru_eviction():
+    work = tempfile.mkdtemp()
+    cache = ConversionCache(DummyApp(os.path.join(work, 'cache'), max_bytes=10))
+    input_path = write(os.path.join(work, 'input.txt'), 'source')
+    calls = []
+
+    def convert(output_path, content):
+        def run():
+            calls.append(content)
+            write(output_path, content)
+            return True, 'converted'
+        return run
+
+    out1 = os.path.join(work, 'out1.txt')
+    assert cache.run('test', '1', input_path, out1, {'n': 1}, convert(out1, 'aaaaaa')) == (True, 'converted')
+
+    out2 = os.path.join(work, 'out2.txt')
+    assert cache.run('test', '1', input_path, out2, {'n': 1}, convert(out2, 'aaaaaa')) == (True, 'converted')
+    assert len(calls) == 1
+    with open(out2) as f:
+        assert f.read() == 'aaaaaa'
+
+    # A second 6-byte entry pushes the cache over its 10-byte budget
+    out3 = os.path.join(work, 'out3.txt')
+    cache.run('test', '1', input_path, out3, {'n': 2}, convert(out3, 'bbbbbb'))
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 1
+    assert stats['hits'] == 1
+    assert stats['by_converter']['test']['evictions'] == 1
+
+
+def test_admin_system_page_shows_cache_counters(tmp_path, monkeypatch):
+    # The security log is written to the working directory
+    monkeypatch.chdir(tmp_path)
+    from flask import Flask
+    from flask_login import LoginManager
+    import core.conversion_cache
+    from models import db, User
+    from routes.admin import admin as admin_bp
+
+    cache = ConversionCache(DummyApp(str(tmp_path / 'cache'), max_bytes=10))
+    monkeypatch.setattr(core.conversion_cache, 'conversion_cache', cache)
+    monkeypatch.setattr('routes.admin.conversion_cache', cache)
+    input_path = write(str(tmp_path / 'input.txt'), 'source')
+    output_path = str(tmp_path / 'out.txt')
+
+    # Two misses and stores, the second evicting the first, then one hit
+    for content in ('aaaaaa', 'bbbbbb', 'bbbbbb'):
+        cache.run('pdf_to_docx', '1', input_path, output_path, {'content': content},
+                  lambda content=content: (write(output_path, content), True)[1])
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app = Flask(__name__, template_folder=os.path.join(project_root, 'templates'),
+                static_folder=os.path.join(project_root, 'static'))
+    app.config.update(SECRET_KEY='test', SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+    # The base layout links to every blueprint; only the admin one is registered here
+    app.url_build_error_handlers.append(lambda error, endpoint, values: '#')
+    db.init_app(app)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+    app.register_blueprint(admin_bp)
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username='root', email='root@example.com', password_hash='x', is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+        response = client.get('/admin/system')
+        db.session.remove()
+
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Conversion Cache' in page
+    assert 'data-stat="hits">1<' in page
+    assert 'data-stat="misses">2<' in page
+    assert 'data-stat="stores">2<' in page
+    assert 'data-stat="evictions">1<' in page
+    assert 'data-stat="entries">1 entries<' in page
+    assert '<td class="py-2 text-gray-700">pdf_to_docx</td>' in page
+
+if __name__ == '__main__':
+    test_key_ignores_option_order()
+    test_hit_after_store_and_lru_eviction()
+    print("All conversion cache tests passed")
+
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for sampled column type inference in utils.excel_converter.excel_schema.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from utils.excel_converter.excel_schema import apply_schema, infer_schema, row_converters
+
+
+def test_infer_schema_classifies_columns():
+    df = pd.DataFrame({
+        'when': ['2024-01-02', '2024-02-03', None],
+        'us_date': ['01/31/2024', '12/01/2024', '02/29/2024'],
+        'amount': [1.5, 2.0, None],
+        'code': ['007', '12', '3'],
+        'flag': ['yes', 'no', 'YES'],
+        'name': ['a', 'b', 'c'],
+        'blank': [None, None, None],
+    })
+    schema = infer_schema(df)
+    assert schema['when'] == {'type': 'datetime', 'format': '%Y-%m-%d', 'confidence': 1.0}
+    assert schema['us_date']['format'] == '%m/%d/%Y'
+    assert schema['amount']['type'] == 'numeric'
+    assert schema['code']['type'] == 'numeric'
+    assert schema['flag']['type'] == 'boolean'
+    assert schema['name']['type'] == 'text'
+    assert schema['blank']['type'] == 'empty'
+
+
+def test_apply_schema_converts_only_fully_parsed_columns():
+    df = pd.DataFrame({'when': ['2024-01-02', '2024-02-03'], 'name': ['a', 'b']})
+    result = apply_schema(df, infer_schema(df))
+    assert str(result['when'].dtype).startswith('datetime64')
+    assert result['name'] is not None and df['when'].dtype == object
+
+    mostly = {'when': {'type': 'datetime', 'format': '%Y-%m-%d', 'confidence': 0.95}}
+    df = pd.DataFrame({'when': ['2024-01-02', 'not a date']})
+    assert apply_schema(df, mostly) is df
+
+
+def test_row_converters_pass_through_unparsed_values():
+    schema = {'when': {'type': 'datetime', 'format': '%Y-%m-%d', 'confidence': 1.0}}
+    convert, keep = row_converters(['when', 'other'], schema)
+    assert keep is None
+    assert convert('2024-01-02').year == 2024
+    assert convert('n/a') == 'n/a'
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the row-streaming Excel writers in utils.excel_converter.excel_streaming.
+"""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime
+from xml.dom import minidom
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.excel_converter.excel_streaming import (
+    StreamSheet, WorkbookStream, header_names, write_delimited, write_json, write_jsonl, write_txt, write_xml
+)
+
+
+def make_sheet(name, rows, width=0):
+    return StreamSheet(name, iter(rows), width)
+
+
+def output_path(suffix):
+    return os.path.join(tempfile.mkdtemp(), f'out{suffix}')
+
+
+def test_header_names_match_pandas():
+    assert header_names(['a', None, 'a', 'a.1', 'a']) == ['a', 'Unnamed: 1', 'a.1', 'a.1.1', 'a.2']
+
+
+def test_rows_keep_inner_blanks_and_drop_trailing():
+    sheet = make_sheet('S', [('a', 'b'), (1, None), (None, None), (2, 3, 4), (None, None)], width=3)
+    rows = list(sheet.rows())
+    assert rows == [[1, None, None], [None, None, None], [2, 3, 4]]
+    assert sheet.columns == ['a', 'b', 'Unnamed: 2']
+
+
+def test_delimited_writes_header_and_dates():
+    path = output_path('.csv')
+    sheet = make_sheet('S', [('name', 'when'), ('x,y', datetime(2024, 1, 2))])
+    write_delimited(sheet, path, ',', 'utf-8-sig', include_headers=True)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data == '\ufeffname,when\r\n"x,y",2024-01-02\r\n'.encode('utf-8')
+
+
+def test_json_matches_json_dump_layout():
+    rows = [('a', 'b'), (1, 'é'), (None, datetime(2024, 1, 2, 3, 4))]
+    expected = [{'a': 1, 'b': 'é'}, {'a': None, 'b': '2024-01-02T03:04:00'}]
+
+    path = output_path('.json')
+    write_json([make_sheet('S', rows)], 1, path)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == json.dumps(expected, indent=2, ensure_ascii=False)
+
+    path = output_path('.json')
+    write_json([make_sheet('S', rows), make_sheet('Empty', [])], 2, path)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == json.dumps({'S': expected, 'Empty': []}, indent=2, ensure_ascii=False)
+
+
+def test_jsonl_tags_rows_with_sheet():
+    path = output_path('.jsonl')
+    write_jsonl([make_sheet('A', [('x',), (1,)]), make_sheet('B', [('y',), (2,)])], 2, path,
+                include_headers=False)
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == [{'sheet': 'A', 'row': [1]}, {'sheet': 'B', 'row': [2]}]
+
+
+def test_txt_layout():
+    path = output_path('.txt')
+    write_txt([make_sheet('S', [('a', 'b'), (1, None)])], path)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '=== S ===\na\tb\n1\t\n\n'
+
+
+def test_xml_is_well_formed_and_escaped():
+    path = output_path('.xml')
+    write_xml([make_sheet('S&P', [('a<', 'b'), ('x\x01&y', True)])], path)
+    doc = minidom.parse(path)
+    sheet = doc.getElementsByTagName('sheet')[0]
+    assert sheet.getAttribute('name') == 'S&P'
+    cells = doc.getElementsByTagName('cell')
+    assert cells[0].getAttribute('column') == 'a<'
+    assert cells[0].firstChild.data == 'x&y'
+    assert cells[1].firstChild.data == 'true'
+
+
+def test_ragged_sheet_rows_match_the_header_width():
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in [('a', 'b'), (1, 2), (3, 4, 5)]:
+        sheet.append(row)
+    source = output_path('.xlsx')
+    workbook.save(source)
+
+    with WorkbookStream(source) as stream:
+        [ragged] = stream.iter_sheets(stream.sheet_names)
+        path = output_path('.csv')
+        write_delimited(ragged, path, lineterminator='\n')
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'a,b,Unnamed: 2\n1,2,\n3,4,5\n'
+
+
+def test_rows_wider_than_the_given_width_are_truncated():
+    path = output_path('.txt')
+    write_txt([make_sheet('S', [('a', 'b'), (1, 2, 3)])], path)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '=== S ===\na\tb\n1\t2\n\n'
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming FFmpeg progress parsing and cancellation in utils.video.ffmpeg_progress.
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.video.ffmpeg_progress import FFmpegProgress, run_ffmpeg
+
+
+def fake_ffmpeg(body):
+    """Write a stand-in ffmpeg executable that ignores its arguments"""
+    path = os.path.join(tempfile.mkdtemp(), 'ffmpeg')
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n' + body + '\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+def test_feed_parses_progress_block():
+    updates = []
+    progress = FFmpegProgress(total_duration=10.0, on_update=updates.append)
+    progress.status = 'running'
+    for line in ('frame=75', 'fps=25.0', 'out_time_us=5000000', 'speed=2.5x', 'progress=continue'):
+        progress.feed(line + '\n')
+
+    data = progress.as_dict()
+    assert data['frame'] == 75
+    assert data['out_time'] == 5.0
+    assert data['speed'] == 2.5
+    assert data['percent'] == 50.0
+    assert data['eta'] == 2.0
+    assert len(updates) == 1
+
+
+def test_unknown_duration_has_no_percent():
+    progress = FFmpegProgress()
+    progress.feed('out_time_us=N/A\n')
+    assert progress.percent is None
+    assert progress.out_time == 0.0
+
+
+def test_cancel_kills_running_process():
+    cmd = [fake_ffmpeg('while true; do echo progress=continue; sleep 0.1; done'), '-i', 'in.mp4']
+    progress = FFmpegProgress(total_duration=10.0)
+    threading.Timer(0.5, progress.cancel).start()
+
+    started = time.time()
+    result = run_ffmpeg(cmd, progress)
+
+    assert result['cancelled']
+    assert result['returncode'] != 0
+    assert progress.status == 'cancelled'
+    assert time.time() - started < 5
+
+
+def test_stalled_process_is_killed():
+    cmd = [fake_ffmpeg('sleep 30'), '-i', 'in.mp4']
+    started = time.time()
+    result = run_ffmpeg(cmd, FFmpegProgress(), stall_timeout=1)
+
+    assert result['stalled']
+    assert time.time() - started < 10
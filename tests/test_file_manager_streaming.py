@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass streaming validator in core.file_manager.
+Checks that chunked scanning gives the same result as scanning the whole file.
+"""
+
+import sys
+import os
+import base64
+import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.file_manager import FileSecurityValidator, StreamingFileScanner
+
+
+def scan(content, chunk_size):
+    scanner = StreamingFileScanner(FileSecurityValidator())
+    for i in range(0, len(content), chunk_size):
+        scanner.update(content[i:i + chunk_size])
+    scanner.finalize()
+    return scanner
+
+
+def test_hashes_match_hashlib():
+    content = os.urandom(200 * 1024)
+    scanner = scan(content, 4096)
+    assert scanner.size == len(content)
+    assert scanner.hashes['md5'] == hashlib.md5(content).hexdigest()
+    assert scanner.hashes['sha256'] == hashlib.sha256(content).hexdigest()
+
+
+def test_embedded_signature_split_across_chunks():
+    content = b'\x00' * 500 + b'\x7fELF' + b'\x00' * 500
+    for chunk_size in (1, 2, 3, 501, 4096):
+        scanner = scan(content, chunk_size)
+        assert scanner.embedded_errors == ["Embedded Linux executable detected"]
+
+
+def test_signature_in_header_is_not_embedded():
+    scanner = scan(b'\x7fELF' + b'\x00' * 500, 64)
+    assert scanner.embedded_errors == []
+    is_safe, errors = scanner.validator.validate_header(scanner.header)
+    assert not is_safe
+
+
+def test_base64_payload_detected_across_chunks():
+    payload = base64.b64encode(b'A' * 40 + b'<script>alert(1)</script>')
+    content = b'data ' + payload + b' end'
+    for chunk_size in (1, 16, 4096):
+        scanner = scan(content, chunk_size)
+        assert "Suspicious base64 encoded content detected" in scanner.embedded_errors
+
+
+if __name__ == '__main__':
+    test_hashes_match_hashlib()
+    test_embedded_signature_split_across_chunks()
+    test_signature_in_header_is_not_embedded()
+    test_base64_payload_detected_across_chunks()
+    print("All streaming validation tests passed")
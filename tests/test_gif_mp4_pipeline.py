@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-decode MP4 -> GIF pipeline helpers in utils.video.gif_mp4_processor.
+"""
+
+import sys
+import os
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.video.gif_mp4_processor import GifMp4Processor, file_fingerprint, parse_time
+
+
+def test_parse_time_formats():
+    assert parse_time('90') == 90.0
+    assert parse_time('1:30') == 90.0
+    assert parse_time('00:01:30.5') == 90.5
+    assert parse_time(None) is None
+    assert parse_time('abc') is None
+
+
+def test_range_is_applied_on_input():
+    args = GifMp4Processor._input_range_args('00:05:00', '5')
+    assert args == ['-ss', '00:05:00', '-t', '5']
+    assert GifMp4Processor._input_range_args(None, None) == []
+
+
+def test_clip_length_is_bounded_by_video():
+    assert GifMp4Processor._clip_length(600.0, '00:05:00', '5') == 5.0
+    assert GifMp4Processor._clip_length(600.0, '00:09:58', '5') == 2.0
+    assert GifMp4Processor._clip_length(None, None, None) is None
+
+
+def test_filter_graph_splits_single_decode():
+    processor = GifMp4Processor.__new__(GifMp4Processor)
+    graph = processor._gif_filter_graph(15, '-1:480', 'high', 'global')
+    assert 'split[a][b]' in graph
+    assert 'stats_mode=full' in graph
+    per_frame = processor._gif_filter_graph(15, '-1:480', 'high', 'per_frame')
+    assert 'stats_mode=single' in per_frame and 'new=1' in per_frame
+
+
+def test_fingerprint_changes_when_the_file_is_rewritten():
+    path = os.path.join(tempfile.mkdtemp(), 'a.mp4')
+    with open(path, 'wb') as f:
+        f.write(b'x' * 1024)
+    first = file_fingerprint(path)
+    assert file_fingerprint(path) == first
+
+    with open(path, 'wb') as f:
+        f.write(b'y' * 1024)
+    os.utime(path, ns=(first[4] + 10 ** 9, first[4] + 10 ** 9))
+    assert file_fingerprint(path) != first
+
+
+def test_probe_cache_does_not_read_the_file(monkeypatch):
+    import builtins
+    from utils.video import gif_mp4_processor
+
+    path = os.path.join(tempfile.mkdtemp(), 'a.mp4')
+    with open(path, 'wb') as f:
+        f.write(b'x' * 1024)
+    monkeypatch.setattr(gif_mp4_processor, '_probe_cache', gif_mp4_processor.OrderedDict())
+    processor = GifMp4Processor.__new__(GifMp4Processor)
+    probes = []
+    monkeypatch.setattr(processor, '_probe_video', lambda video_path: probes.append(video_path) or {'success': True})
+    monkeypatch.setattr(builtins, 'open', lambda *args, **kwargs: pytest.fail('file content was read'))
+
+    assert processor._get_video_info(path) == {'success': True}
+    assert processor._get_video_info(path) == {'success': True}
+    assert probes == [path]
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTML to PDF subresource fetcher: caching, revalidation, URL checks and batch order.
+"""
+
+import sys
+import os
+import io
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.web_code.resource_fetcher import ResourceFetcher, SubresourceCache, freshness_lifetime
+from utils.web_code import html_pdf_snapshot_utils
+from utils.web_code.html_pdf_snapshot_utils import HTMLPDFProcessor
+
+
+class FakeAdapter(BaseAdapter):
+    """Serves canned responses by URL and records every request"""
+
+    def __init__(self, routes):
+        super().__init__()
+        self.routes = routes
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status, headers, body = self.routes[request.url](request)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def make_fetcher(tmp_path, routes, max_bytes=1024 * 1024):
+    adapter = FakeAdapter(routes)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    cache = SubresourceCache(str(tmp_path / 'subresources'), max_bytes=max_bytes)
+    processor = HTMLPDFProcessor.__new__(HTMLPDFProcessor)
+    return ResourceFetcher(processor._validate_url, cache=cache, session=session), adapter
+
+
+def test_cache_control_is_honoured(tmp_path):
+    routes = {
+        'https://cdn.example.com/site.css': lambda r: (
+            200, {'Content-Type': 'text/css; charset=utf-8', 'Cache-Control': 'public, max-age=600'}, b'body{}'),
+        'https://cdn.example.com/private.css': lambda r: (
+            200, {'Content-Type': 'text/css', 'Cache-Control': 'no-store'}, b'p{}'),
+    }
+    fetcher, adapter = make_fetcher(tmp_path, routes)
+
+    first = fetcher('https://cdn.example.com/site.css')
+    second = fetcher('https://cdn.example.com/site.css')
+    assert first == second
+    assert first['string'] == b'body{}'
+    assert first['mime_type'] == 'text/css' and first['encoding'] == 'utf-8'
+
+    fetcher('https://cdn.example.com/private.css')
+    fetcher('https://cdn.example.com/private.css')
+
+    urls = [request.url for request in adapter.requests]
+    assert urls.count('https://cdn.example.com/site.css') == 1
+    assert urls.count('https://cdn.example.com/private.css') == 2
+    assert fetcher.stats == {'hits': 1, 'revalidated': 0, 'fetched': 3}
+
+    assert freshness_lifetime({'Cache-Control': 'max-age=60', 'Age': '20'}) == 40
+    assert freshness_lifetime({'Cache-Control': 'private, max-age=60'}) is None
+    assert freshness_lifetime({}) == 0
+
+
+def test_stale_entries_are_revalidated(tmp_path):
+    def font(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'Cache-Control': 'max-age=600'}, b''
+        return 200, {'Content-Type': 'font/woff2', 'ETag': '"v1"', 'Cache-Control': 'no-cache'}, b'font-data'
+
+    fetcher, adapter = make_fetcher(tmp_path, {'https://fonts.example.com/a.woff2': font})
+
+    for _ in range(3):
+        assert fetcher('https://fonts.example.com/a.woff2')['string'] == b'font-data'
+
+    # Fetched, revalidated with a 304 that made it fresh, then served from disk
+    assert len(adapter.requests) == 2
+    assert adapter.requests[1].headers['If-None-Match'] == '"v1"'
+    assert fetcher.stats == {'hits': 1, 'revalidated': 1, 'fetched': 1}
+
+
+def test_private_addresses_are_blocked_including_redirects(tmp_path):
+    routes = {
+        'https://cdn.example.com/logo.png': lambda r: (302, {'Location': 'http://10.0.0.5/logo.png'}, b''),
+        'https://cdn.example.com/moved.css': lambda r: (301, {'Location': '/site.css'}, b''),
+        'https://cdn.example.com/site.css': lambda r: (200, {'Content-Type': 'text/css'}, b'a{}'),
+    }
+    fetcher, adapter = make_fetcher(tmp_path, routes)
+
+    for url in ('http://192.168.1.1/style.css', 'http://localhost/x.png', 'file:///etc/passwd'):
+        with pytest.raises(ValueError):
+            fetcher(url)
+    assert adapter.requests == []
+
+    with pytest.raises(ValueError):
+        fetcher('https://cdn.example.com/logo.png')
+    assert [request.url for request in adapter.requests] == ['https://cdn.example.com/logo.png']
+
+    moved = fetcher('https://cdn.example.com/moved.css')
+    assert moved['string'] == b'a{}'
+    assert moved['redirected_url'] == 'https://cdn.example.com/site.css'
+
+
+def test_cache_is_bounded_by_size(tmp_path):
+    routes = {
+        f'https://cdn.example.com/{name}.png': (lambda r: (200, {'Cache-Control': 'max-age=600'}, b'x' * 400))
+        for name in 'abc'
+    }
+    fetcher, adapter = make_fetcher(tmp_path, routes, max_bytes=1000)
+
+    for name in 'abc':
+        fetcher(f'https://cdn.example.com/{name}.png')
+
+    stats = fetcher.cache.get_stats()
+    assert stats['entries'] == 2 and stats['size'] == 800
+    assert fetcher.cache.lookup('https://cdn.example.com/a.png') is None
+    assert fetcher.cache.lookup('https://cdn.example.com/c.png')['fresh']
+
+
+def test_batch_results_keep_input_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = []
+    for index in range(4):
+        path = tmp_path / f'page{index}.html'
+        path.write_text(f'<html><body><p>Page {index}</p></body></html>')
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / 'missing.html'))
+
+    processor = HTMLPDFProcessor()
+    processor.current_backend = 'reportlab'
+    processor.upload_folder = str(tmp_path / 'out')
+    os.makedirs(processor.upload_folder)
+
+    serial = processor.batch_convert_html(paths, {}, workers=1)
+    assert [item['input'] for item in serial['converted']] == [p for p in paths if 'missing' not in p]
+    assert serial['failure_count'] == 1 and serial['failed'][0]['input'].endswith('missing.html')
+    assert all(os.path.exists(item['output']) for item in serial['converted'])
+
+    if HTMLPDFProcessor().current_backend == 'reportlab':
+        pooled = processor.batch_convert_html(paths, {}, workers=3)
+        assert [item['input'] for item in pooled['converted']] == [item['input'] for item in serial['converted']]
+        assert [item['input'] for item in pooled['failed']] == [item['input'] for item in serial['failed']]
+
+        # Later batches reuse the same pool instead of starting their own
+        pool = html_pdf_snapshot_utils._batch_executor
+        processor.batch_convert_html(paths[:2], {}, workers=3)
+        assert html_pdf_snapshot_utils._batch_executor is pool
+        html_pdf_snapshot_utils._reset_batch_executor()
+
+
+def test_subresource_cache_lives_in_the_app_cache_folder(tmp_path, monkeypatch):
+    from flask import Flask
+    from utils.web_code import resource_fetcher
+
+    monkeypatch.delenv('HTML_PDF_CACHE_DIR', raising=False)
+    monkeypatch.setattr(resource_fetcher, '_subresource_cache', None)
+    monkeypatch.chdir(tmp_path)
+
+    app = Flask(__name__)
+    app.config['CONVERSION_CACHE_FOLDER'] = str(tmp_path / 'data' / 'cache')
+    with app.app_context():
+        cache = resource_fetcher.get_subresource_cache()
+
+    assert cache.folder == str(tmp_path / 'data' / 'cache' / 'subresources')
+    assert resource_fetcher.get_subresource_cache() is cache
+
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite-backed background job queue in core.job_queue.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.job_queue import JobQueue, JobError, job_handler, MAX_ATTEMPTS
+
+
+@job_handler('test_upper')
+def upper_handler(ctx, input_path, suffix='.out'):
+    ctx.progress(50, 'Halfway')
+    output_path = ctx.output_path(os.path.basename(input_path) + suffix)
+    with open(input_path) as src, open(output_path, 'w') as dst:
+        dst.write(src.read().upper())
+    return {'output_path': output_path, 'mimetype': 'text/plain'}
+
+
+@job_handler('test_fail')
+def failing_handler(ctx, input_path):
+    raise JobError('Bad input')
+
+
+def make_queue():
+    queue = JobQueue()
+    queue.configure(os.path.join(tempfile.mkdtemp(), 'jobs'), autostart=False)
+    return queue
+
+
+def make_input(content='hello'):
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return path
+
+
+def test_submit_claim_and_complete():
+    queue = make_queue()
+    input_path = make_input()
+    job_id = queue.submit('test_upper', input_path, params={'suffix': '.up'},
+                          user_id=7, owner='user:7', tool_type='text_converter')
+
+    # The input is moved into the job workspace
+    assert not os.path.exists(input_path)
+    job = queue.get(job_id)
+    assert job['status'] == 'queued'
+    assert job['input_path'].startswith(queue.job_dir(job_id))
+
+    claimed = queue.claim_next(worker_pid=1234)
+    assert claimed['id'] == job_id
+    assert claimed['status'] == 'running'
+    assert queue.claim_next(worker_pid=1234) is None
+
+    queue.execute(claimed)
+    job = queue.get(job_id)
+    assert job['status'] == 'completed'
+    assert job['progress'] == 100
+    with open(job['output_path']) as f:
+        assert f.read() == 'HELLO'
+
+
+def test_handler_errors_fail_the_job():
+    queue = make_queue()
+    job_id = queue.submit('test_fail', make_input())
+    queue.execute(queue.claim_next(worker_pid=1))
+
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Bad input'
+
+
+def test_accounting_is_claimed_once():
+    queue = make_queue()
+    job_id = queue.submit('test_upper', make_input(), user_id=3)
+    assert queue.claim_accounting(job_id) is False  # Not finished yet
+
+    queue.execute(queue.claim_next(worker_pid=1))
+    assert [job['id'] for job in queue.claim_unaccounted()] == [job_id]
+    assert queue.claim_unaccounted() == []
+    assert queue.claim_accounting(job_id) is False
+
+
+def test_dead_worker_jobs_are_retried_then_failed():
+    queue = make_queue()
+    job_id = queue.submit('test_upper', make_input())
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        queue.claim_next(worker_pid=99)
+        assert queue.recover_jobs(worker_pid=99) == 1
+        assert queue.get(job_id)['status'] == 'queued'
+
+    queue.claim_next(worker_pid=99)
+    assert queue.recover_jobs(worker_pid=99) == 0
+    assert queue.get(job_id)['status'] == 'failed'
+
+
+def test_purge_removes_expired_accounted_jobs():
+    queue = make_queue()
+    queue.result_ttl = 0
+    job_id = queue.submit('test_upper', make_input())
+    queue.execute(queue.claim_next(worker_pid=1))
+
+    # Unaccounted results are kept until usage has been recorded
+    time.sleep(0.01)
+    assert queue.purge_expired() == {'deleted': 0}
+
+    queue.claim_unaccounted()
+    assert queue.purge_expired() == {'deleted': 1}
+    assert queue.get(job_id) is None
+    assert not os.path.exists(queue.job_dir(job_id))
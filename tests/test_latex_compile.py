@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for preamble format matching and rerun detection in utils.latex_utils.
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.latex_utils import (
+    LatexProcessor, split_package_prefix, format_name, _needs_rerun
+)
+
+TOOLCHAIN = {'engine': 'pdflatex', 'version': 'pdfTeX 3.14', 'format_support': True}
+
+
+def test_prefix_stops_at_first_non_package_line():
+    source = (
+        "\\documentclass[12pt]{article}\n"
+        "\\usepackage[utf8]{inputenc}\n"
+        "\n"
+        "\\usepackage{geometry}\n"
+        "\\geometry{margin=1in}\n"
+        "\\begin{document}\nHi\n\\end{document}\n"
+    )
+    prefix, rest = split_package_prefix(source)
+    assert prefix.endswith("\\usepackage{geometry}\n")
+    assert rest.startswith("\\geometry{margin=1in}")
+    assert split_package_prefix("Hello \\textbf{world}") is None
+
+
+def test_templates_share_formats_with_edited_documents():
+    processor = LatexProcessor()
+    template = processor.get_latex_templates()['article']['content']
+    edited = template.replace('Your Article Title', 'Quarterly Results')
+
+    name = format_name(split_package_prefix(template)[0], TOOLCHAIN)
+    assert name == format_name(split_package_prefix(edited)[0], TOOLCHAIN)
+    other = dict(TOOLCHAIN, version='pdfTeX 3.141')
+    assert name != format_name(split_package_prefix(template)[0], other)
+
+
+def test_single_pass_without_references():
+    log_file = os.path.join(tempfile.mkdtemp(), 'document.log')
+    with open(log_file, 'w') as f:
+        f.write('Output written on document.pdf (1 page).\n')
+
+    trivial = {'.aux': '\\relax \n\\gdef \\@abspage@last{1}\n'}
+    assert not _needs_rerun(log_file, None, trivial)
+
+    labels = {'.aux': '\\relax \n\\newlabel{sec:intro}{{1}{1}}\n'}
+    assert _needs_rerun(log_file, None, labels)
+    assert not _needs_rerun(log_file, labels, dict(labels))
+
+
+def test_log_rerun_request_forces_another_pass():
+    log_file = os.path.join(tempfile.mkdtemp(), 'document.log')
+    with open(log_file, 'w') as f:
+        f.write('LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.\n')
+    assert _needs_rerun(log_file, {'.aux': 'x'}, {'.aux': 'x'})
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for core.libreoffice_pool: instance checkout, recycling and the one-off fallback.
+"""
+
+import sys
+import os
+import time
+import stat
+import tempfile
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import libreoffice_pool as pool_module
+from core.libreoffice_pool import LibreOfficeError, LibreOfficePool
+
+
+FAKE_SOFFICE = """#!/bin/sh
+# Writes <name>.<ext> into --outdir like soffice --convert-to, and records the profile used
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --convert-to) ext="$2"; shift ;;
+    --outdir) outdir="$2"; shift ;;
+    -env:UserInstallation=*) echo "$1" >> "$(dirname "$0")/profiles.log" ;;
+    --*) ;;
+    *) input="$1" ;;
+  esac
+  shift
+done
+name=$(basename "$input"); name="${name%.*}"
+echo converted > "$outdir/$name.$ext"
+"""
+
+
+def make_fake_soffice(work):
+    path = os.path.join(work, 'soffice')
+    with open(path, 'w') as f:
+        f.write(FAKE_SOFFICE)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+class FakeInstance:
+    """Stands in for a soffice listener; conversions just write the output file"""
+
+    def __init__(self, soffice_path, index):
+        self.index = index
+        self.conversions = 0
+        self.starts = 0
+        self.running = False
+
+    def healthy(self):
+        return self.running
+
+    def start(self):
+        self.starts += 1
+        self.running = True
+        self.conversions = 0
+
+    def stop(self):
+        self.running = False
+
+    def convert(self, input_path, output_path, timeout):
+        with open(output_path, 'w') as f:
+            f.write('converted')
+        self.conversions += 1
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    monkeypatch.setattr(pool_module, 'UNO_AVAILABLE', True)
+    monkeypatch.setattr(pool_module, 'OfficeInstance', FakeInstance)
+    pool = LibreOfficePool()
+    pool.configure(size=1, max_conversions=2, timeout=5, soffice_path='/usr/bin/soffice')
+    yield pool
+    pool.shutdown()
+
+
+def test_one_off_conversion_uses_private_profiles():
+    work = tempfile.mkdtemp()
+    pool = LibreOfficePool()
+    pool.configure(size=0, soffice_path=make_fake_soffice(work))
+    assert not pool.is_pooled()
+
+    source = os.path.join(work, 'deck.pptx')
+    open(source, 'w').close()
+    for name in ('a.pdf', 'b.pdf'):
+        pool.convert(source, os.path.join(work, name))
+        assert os.path.exists(os.path.join(work, name))
+
+    with open(os.path.join(work, 'profiles.log')) as f:
+        profiles = f.read().split()
+    assert len(profiles) == 2 and profiles[0] != profiles[1]
+
+
+def test_missing_libreoffice_raises():
+    pool = LibreOfficePool()
+    pool.configure(soffice_path=None)
+    pool._resolved = True
+    with pytest.raises(LibreOfficeError):
+        pool.convert('in.docx', 'out.pdf')
+
+
+def test_instance_is_reused_then_recycled(fake_pool):
+    work = tempfile.mkdtemp()
+    source = os.path.join(work, 'doc.docx')
+    open(source, 'w').close()
+
+    fake_pool.convert(source, os.path.join(work, 'one.pdf'))
+    instance = fake_pool._instances[0]
+    assert instance.starts == 1 and instance.conversions == 1
+
+    fake_pool.convert(source, os.path.join(work, 'two.pdf'))
+    deadline = time.time() + 2
+    while instance.starts < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert instance.starts == 2  # restarted after max_conversions
+    assert len(fake_pool._instances) == 1
+
+
+def test_checkout_times_out_when_pool_is_busy(fake_pool):
+    busy = fake_pool._checkout(time.time() + 1)
+    started = time.time()
+    with pytest.raises(LibreOfficeError):
+        fake_pool._checkout(time.time() + 0.2)
+    assert time.time() - started < 1
+
+    threading.Timer(0.1, fake_pool._release, args=[busy]).start()
+    assert fake_pool._checkout(time.time() + 2) is busy
+
+
+def test_docx_conversion_falls_back_when_libreoffice_fails(tmp_path):
+    from utils.document_converter.document_converter_utils import DocumentConverter
+
+    converter = DocumentConverter()
+    converter.dependencies.update(libreoffice=True, pandoc=True)
+    converter._convert_with_libreoffice = lambda *args: (False, 'soffice crashed')
+    fallbacks = []
+    converter._convert_to_docx_pandoc = lambda *args: fallbacks.append(args) or (True, '')
+
+    source = tmp_path / 'notes.odt'
+    source.write_bytes(b'odt')
+    result = converter._convert_to_docx(str(source), str(tmp_path / 'notes.docx'), 'odt', {})
+
+    assert result == (True, '')
+    assert fallbacks and fallbacks[0][2] == 'odt'
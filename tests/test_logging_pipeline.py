@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for the queued logging pipeline in core.logging_config: forked writers, context capture and thinning.
+"""
+
+import sys
+import os
+import json
+import time
+import logging
+import threading
+
+import pytest
+from flask import Flask, g
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.logging_config import (
+    LogPipeline, PipelineHandler, RateLimitFilter, RoutingHandler, SamplingFilter,
+    StructuredFormatter, parse_sample_rates
+)
+
+
+class CollectingHandler(logging.Handler):
+    """Keeps handled records with the pid of the process that handled them"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((os.getpid(), record))
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_forked_processes_write_through_the_creating_process():
+    collected = CollectingHandler()
+    pipeline = LogPipeline(collected)
+    logger = make_logger('test.pipeline.fork', PipelineHandler(pipeline))
+
+    logger.info('from parent %s', 1)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            logger.warning('from child %s', os.getpid())
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                logger.exception('child failure')
+            pipeline.flush()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert wait_for(lambda: len(collected.records) == 3)
+    pipeline.stop()
+
+    # Every record was handled in this process, including those logged in the child
+    assert {handled_by for handled_by, _ in collected.records} == {os.getpid()}
+    by_message = {record.getMessage(): record for _, record in collected.records}
+    assert f'from child {pid}' in by_message
+    assert by_message[f'from child {pid}'].process == pid
+    assert by_message['child failure'].exception['type'] == 'ValueError'
+
+
+def test_request_context_is_captured_when_queued():
+    blocker = threading.Event()
+    collected = CollectingHandler()
+    collected.emit = lambda record, emit=collected.emit: (blocker.wait(5), emit(record))
+    pipeline = LogPipeline(collected, queue_size=2)
+    logger = make_logger('test.pipeline.context', PipelineHandler(pipeline))
+
+    app = Flask(__name__)
+    with app.test_request_context('/convert?x=1', method='POST', headers={'User-Agent': 'pytest'}):
+        g.request_id = 'abc123'
+        logger.info('queued %d', 0)
+        assert wait_for(lambda: pipeline.get_stats()['queued'] == 0)
+        for index in range(1, 5):
+            logger.info('queued %d', index)
+
+    # The writer is stalled: the first record is being written, two are queued, two were dropped
+    assert pipeline.dropped == 2
+    blocker.set()
+    assert pipeline.flush()
+    pipeline.stop()
+
+    entry = json.loads(StructuredFormatter().format(collected.records[0][1]))
+    assert entry['message'] == 'queued 0'
+    assert entry['request']['method'] == 'POST'
+    assert entry['request']['url'].endswith('/convert?x=1')
+    assert entry['request']['request_id'] == 'abc123'
+    assert 'user' not in entry
+
+
+def test_sampling_and_rate_limiting():
+    collected = CollectingHandler()
+    router = RoutingHandler({'': ([collected], True)})
+    router.addFilter(SamplingFilter(parse_sample_rates('test.sampled=0, bad=x')))
+    router.addFilter(RateLimitFilter(rate=1, burst=3))
+
+    sampled = make_logger('test.sampled.requests', router)
+    sampled.info('dropped by sampling')
+    sampled.warning('warnings are never sampled')
+
+    hot = make_logger('test.hot', router)
+    for index in range(10):
+        hot.info('hot path %d', index)
+    hot.error('errors are never limited')
+
+    messages = [record.getMessage() for _, record in collected.records]
+    assert messages == [
+        'warnings are never sampled', 'hot path 0', 'hot path 1', 'hot path 2', 'errors are never limited'
+    ]
+
+    # Once the bucket refills, the next record reports how many were suppressed
+    time.sleep(1.05)
+    hot.info('hot path %d', 10)
+    assert collected.records[-1][1].suppressed == 7
+
+
+def test_routing_follows_logger_hierarchy():
+    root, security, requests_log = CollectingHandler(), CollectingHandler(), CollectingHandler()
+    router = RoutingHandler({
+        '': ([root], True),
+        'cropio.security': ([security], True),
+        'cropio.requests': ([requests_log], False),
+    })
+
+    for name in ('cropio.security.audit', 'cropio.requests', 'cropio'):
+        router.handle(logging.makeLogRecord({'name': name, 'msg': name, 'levelno': logging.INFO}))
+
+    assert [r.name for _, r in security.records] == ['cropio.security.audit']
+    assert [r.name for _, r in requests_log.records] == ['cropio.requests']
+    assert [r.name for _, r in root.records] == ['cropio.security.audit', 'cropio']
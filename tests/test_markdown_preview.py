@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the block-cached Markdown live preview in utils.document_converter.markdown_preview.
+"""
+
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.document.markdown_html_converter_routes import MarkdownHTMLProcessor
+from utils.document_converter.markdown_preview import MarkdownPreviewEngine, split_blocks
+
+
+DOCUMENT = '''# Title
+
+Intro with a [link][docs] and *emphasis*.
+
+- one
+
+- two
+    continued
+
+> quoted
+
+> still quoted
+
+```python
+x = 1
+
+y = 2
+```
+
+<div>
+
+raw html
+
+</div>
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+[docs]: https://example.com
+'''
+
+
+def markup(html):
+    # Blank lines around raw HTML blocks differ; the elements must not
+    return re.sub(r'>\s+<', '><', html.strip())
+
+
+def full_render(content):
+    return markup(MarkdownHTMLProcessor().markdown_to_html(content)['output'])
+
+
+def joined(result):
+    return markup('\n'.join(block['html'] for block in result['blocks']))
+
+
+def test_blocks_keep_constructs_that_span_blank_lines_together():
+    blocks = split_blocks(DOCUMENT.strip())
+    assert blocks[2] == '- one\n\n- two\n    continued'
+    assert blocks[3] == '> quoted\n\n> still quoted'
+    assert blocks[4].startswith('```python') and blocks[4].endswith('```')
+    assert blocks[5] == '<div>\n\nraw html\n\n</div>'
+
+
+def test_block_render_matches_full_render():
+    engine = MarkdownPreviewEngine(MarkdownHTMLProcessor)
+    content = DOCUMENT.strip()
+    assert joined(engine.render(content)) == full_render(content)
+
+    footnotes = 'Text[^1]\n\nMore\n\n[^1]: note'
+    assert split_blocks(footnotes) == [footnotes]
+    assert joined(engine.render(footnotes)) == full_render(footnotes)
+
+
+def test_only_changed_blocks_are_rendered_and_returned():
+    engine = MarkdownPreviewEngine(MarkdownHTMLProcessor, pool_size=1)
+    first = engine.render('# A\n\nfirst\n\nlast')
+    assert first['rendered'] == 3
+
+    ids = [block['id'] for block in first['blocks']]
+    second = engine.render('# A\n\nfirst edited\n\nlast', known=ids)
+    assert second['rendered'] == 1
+    assert [('html' in block) for block in second['blocks']] == [False, True, False]
+    assert second['blocks'][0]['id'] == ids[0]
+
+    # A fresh client gets cached HTML without re-rendering
+    third = engine.render('# A\n\nfirst edited\n\nlast')
+    assert third['rendered'] == 0 and all('html' in block for block in third['blocks'])
+    assert engine._created == 1
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for core.metrics: request and conversion recording, exposition and multiprocess aggregation.
+"""
+
+import sys
+import os
+import subprocess
+import textwrap
+from io import BytesIO
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.metrics import PROMETHEUS_AVAILABLE, app_metrics
+
+pytestmark = pytest.mark.skipif(not PROMETHEUS_AVAILABLE, reason='requires prometheus_client')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_value(text, name, **labels):
+    """Value of one sample in Prometheus text output, or None"""
+    wanted = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    prefix = f'{name}{{{wanted}}} ' if labels else f'{name} '
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+def test_requests_and_conversions_are_recorded():
+    app = Flask(__name__)
+    app.config['METRICS_SAMPLE_INTERVAL'] = 3600
+    app_metrics.init_app(app)
+
+    @app.route('/convert', methods=['POST'])
+    def convert():
+        app_metrics.record_conversion('metrics_test_tool', 0.2, input_bytes=1000, output_bytes=400)
+        return 'converted'
+
+    before = sample_value(app_metrics.render()[0].decode(), 'cropio_http_requests_total',
+                          method='POST', endpoint='convert', status='200') or 0
+
+    client = app.test_client()
+    client.post('/convert', data=b'x' * 64)
+    client.post('/convert', data=b'x' * 64)
+    app_metrics.record_conversion('metrics_test_tool', 3.0, success=False)
+
+    body, content_type = app_metrics.render()
+    text = body.decode()
+    assert content_type.startswith('text/plain')
+    assert sample_value(text, 'cropio_http_requests_total', method='POST', endpoint='convert', status='200') == before + 2
+    assert sample_value(text, 'cropio_conversions_total', tool='metrics_test_tool', status='success') == 2
+    assert sample_value(text, 'cropio_conversions_total', tool='metrics_test_tool', status='failure') == 1
+    assert sample_value(text, 'cropio_conversion_duration_seconds_bucket', tool='metrics_test_tool', le='0.25') == 2
+    assert sample_value(text, 'cropio_conversion_duration_seconds_count', tool='metrics_test_tool') == 3
+    assert sample_value(text, 'cropio_conversion_input_bytes_total', tool='metrics_test_tool') == 2000
+    assert sample_value(text, 'cropio_conversion_output_bytes_total', tool='metrics_test_tool') == 800
+
+    # System gauges come from the sampler rather than being measured during the scrape
+    assert 'cropio_system_memory_used_percent' in text
+    assert sample_value(text, 'cropio_system_sample_age_seconds') < 60
+
+
+def test_disabled_metrics_record_nothing():
+    app = Flask(__name__)
+    app.config['METRICS_ENABLED'] = False
+    app_metrics.init_app(app)
+    try:
+        app_metrics.record_conversion('metrics_disabled_tool', 1.0)
+        app_metrics.record_job('metrics_disabled_kind', 0.5, 1.0, 'completed')
+    finally:
+        app_metrics.enabled = True
+
+    text = app_metrics.render()[0].decode()
+    assert 'metrics_disabled_tool' not in text and 'metrics_disabled_kind' not in text
+
+
+
+def test_redirects_and_json_failures_count_as_failed_conversions():
+    from flask import jsonify, redirect
+    from flask_login import LoginManager
+    from middleware.usage_tracking import track_conversion_result
+
+    app = Flask(__name__)
+    app.config['METRICS_SAMPLE_INTERVAL'] = 3600
+    LoginManager(app)
+    app_metrics.init_app(app)
+
+    @app.route('/redirects', methods=['POST'])
+    @track_conversion_result('metrics_outcome_tool')
+    def redirects():
+        return redirect('/')
+
+    @app.route('/json-failure', methods=['POST'])
+    @track_conversion_result('metrics_outcome_tool')
+    def json_failure():
+        return jsonify({'success': False, 'error': 'bad input'})
+
+    @app.route('/json-success', methods=['POST'])
+    @track_conversion_result('metrics_outcome_tool')
+    def json_success():
+        return jsonify({'success': True})
+
+    client = app.test_client()
+    for path in ('/redirects', '/json-failure', '/json-success'):
+        client.post(path, data={'file': (BytesIO(b'data'), 'in.txt')})
+
+    text = app_metrics.render()[0].decode()
+    assert sample_value(text, 'cropio_conversions_total', tool='metrics_outcome_tool', status='success') == 1
+    assert sample_value(text, 'cropio_conversions_total', tool='metrics_outcome_tool', status='failure') == 2
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_worker_processes_are_aggregated(tmp_path):
+    script = textwrap.dedent('''
+        import os, sys
+        sys.path.insert(0, sys.argv[1])
+        from core.metrics import app_metrics
+
+        for index in range(3):
+            pid = os.fork()
+            if pid == 0:
+                app_metrics.record_job('pdf_to_docx', 0.5 + index, 2.0, 'completed')
+                app_metrics.record_conversion('pdf_to_docx', 2.0, input_bytes=100)
+                os._exit(0)
+            os.waitpid(pid, 0)
+
+        sys.stdout.write(app_metrics.render()[0].decode())
+    ''')
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    output = subprocess.run(
+        [sys.executable, '-c', script, PROJECT_ROOT], env=env, cwd=str(tmp_path),
+        capture_output=True, text=True, timeout=60, check=True
+    ).stdout
+
+    # The scraping process recorded nothing itself; every value comes from the children
+    assert sample_value(output, 'cropio_jobs_total', kind='pdf_to_docx', status='completed') == 3
+    assert sample_value(output, 'cropio_job_queue_wait_seconds_sum', kind='pdf_to_docx') == 4.5
+    assert sample_value(output, 'cropio_conversion_input_bytes_total', tool='pdf_to_docx') == 300
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled nbconvert exporters and cell render cache in utils.notebook_converter.notebook_utils.
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+nbformat = pytest.importorskip('nbformat')
+nbconvert = pytest.importorskip('nbconvert')
+
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
+
+from utils.notebook_converter import notebook_utils
+from utils.notebook_converter.notebook_utils import NotebookConverter, pooled_exporter
+
+
+def make_notebook():
+    nb = new_notebook(metadata={'language_info': {'name': 'python', 'pygments_lexer': 'ipython3'}})
+    for i in range(3):
+        nb.cells.append(new_markdown_cell(f'## Part {i}\n\nSome *text* and <b>markup</b>.'))
+        nb.cells.append(new_code_cell(f'def f(x):\n    return x * {i}'))
+    return nb
+
+
+def test_pooled_exporter_output_matches_plain_exporter():
+    nb = make_notebook()
+    plain = nbconvert.HTMLExporter()
+    plain.template_name = 'classic'
+    expected = plain.from_notebook_node(nb)[0]
+
+    with pooled_exporter('html', 'classic') as first:
+        assert first.from_notebook_node(nb)[0] == expected
+    cached = len(notebook_utils._cell_cache)
+    assert cached > 0
+
+    # The second export reuses the exporter and every cached cell
+    with pooled_exporter('html', 'classic') as second:
+        assert second.from_notebook_node(nb)[0] == expected
+    assert second is first
+    assert len(notebook_utils._cell_cache) == cached
+
+
+def test_failed_exporter_is_not_returned_to_pool():
+    with pytest.raises(RuntimeError):
+        with pooled_exporter('markdown') as exporter:
+            raise RuntimeError('boom')
+    with pooled_exporter('markdown') as fresh:
+        assert fresh is not exporter
+
+
+def test_preprocess_fast_path_and_filtering():
+    converter = NotebookConverter()
+    nb = make_notebook()
+    assert converter._preprocess_notebook(nb) is nb
+
+    filtered = converter._preprocess_notebook(nb, include_code_cells=False)
+    assert [cell.cell_type for cell in filtered.cells] == ['markdown'] * 3
+    assert len(nb.cells) == 6
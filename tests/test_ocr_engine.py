@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Tests for the OCR engine: page ordering, the document deadline, per-page results and warm models.
+"""
+
+import sys
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_ocr_converters import ocr_engine
+
+pytestmark = pytest.mark.skipif(
+    not (ocr_engine.PYMUPDF_AVAILABLE and ocr_engine.PIL_AVAILABLE), reason='requires PyMuPDF and Pillow'
+)
+
+# Page shades; the stub recognizer reads them back to know which page it got
+SHADES = [0.1, 0.3, 0.5, 0.7, 0.9]
+
+
+def make_pdf(tmp_path, text_pages=()):
+    """PDF whose pages are plain grey rectangles, except ``text_pages``"""
+    fitz = ocr_engine.fitz
+    document = fitz.open()
+    for index, shade in enumerate(SHADES):
+        page = document.new_page(width=100, height=100)
+        if index in text_pages:
+            page.insert_text((10, 50), f'text page {index + 1}')
+        else:
+            page.draw_rect(page.rect, color=None, fill=(shade, shade, shade))
+    path = str(tmp_path / 'scan.pdf')
+    document.save(path)
+    document.close()
+    return path
+
+
+def page_of(image):
+    value = image.convert('L').getpixel((0, 0)) / 255
+    return min(range(len(SHADES)), key=lambda index: abs(SHADES[index] - value)) + 1
+
+
+@pytest.fixture
+def stub_pool(monkeypatch):
+    """Run page tasks in threads; Tesseract is replaced by per-page handlers"""
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(ocr_engine, 'get_ocr_executor', lambda: pool)
+    monkeypatch.setattr(ocr_engine, '_executor_size', 2)
+    monkeypatch.setattr(ocr_engine, 'TESSERACT_AVAILABLE', True)
+
+    handlers = {}
+
+    def recognize_image(image, language='eng', timeout=0, timings=None):
+        page = page_of(image)
+        handlers.get(page, lambda: None)()
+        return {'text': f'recognized page {page}', 'language': language}
+
+    monkeypatch.setattr(ocr_engine, 'recognize_image', recognize_image)
+    yield handlers
+    pool.shutdown(wait=False)
+
+
+def test_pages_are_returned_in_order(tmp_path, stub_pool):
+    # Earlier pages finish last
+    for page in range(1, 6):
+        stub_pool[page] = lambda page=page: time.sleep(0.05 * (6 - page))
+
+    result = ocr_engine.ocr_pdf(make_pdf(tmp_path, text_pages=(2,)), auto_enhance=False, timeout=30)
+
+    assert not result['timed_out']
+    assert [page['page'] for page in result['pages']] == [1, 2, 3, 4, 5]
+    assert [page['source'] for page in result['pages']] == ['ocr', 'ocr', 'text', 'ocr', 'ocr']
+    assert result['pages'][0]['text'] == 'recognized page 1'
+    assert result['pages'][2]['text'].strip() == 'text page 3'
+
+
+def test_document_deadline_reports_unfinished_pages(tmp_path, stub_pool):
+    release = threading.Event()
+    stub_pool[2] = lambda: release.wait(10)
+    try:
+        start = time.monotonic()
+        result = ocr_engine.ocr_pdf(make_pdf(tmp_path), auto_enhance=False, timeout=1)
+        elapsed = time.monotonic() - start
+    finally:
+        release.set()
+
+    assert result['timed_out']
+    assert elapsed < 5
+    assert result['pages'][1]['source'] == 'timeout'
+    assert result['pages'][1]['text'] == ''
+    assert result['pages'][0]['text'] == 'recognized page 1'
+    assert len(result['pages']) == 5
+
+
+def test_pages_are_reported_as_they_finish(tmp_path, stub_pool):
+    # Page 1 only finishes after page 2 has been reported, so this
+    # completes only if results are passed on before the document is done
+    page_two_reported = threading.Event()
+    stub_pool[1] = lambda: page_two_reported.wait(10)
+    reported = []
+
+    def on_page(page_result):
+        reported.append(page_result['page'])
+        if page_result['page'] == 2:
+            page_two_reported.set()
+
+    result = ocr_engine.ocr_pdf(make_pdf(tmp_path), auto_enhance=False, timeout=10, on_page=on_page)
+
+    assert not result['timed_out']
+    assert reported.index(2) < reported.index(1)
+    assert sorted(reported) == [1, 2, 3, 4, 5]
+    assert [page['page'] for page in result['pages']] == [1, 2, 3, 4, 5]
+
+
+def test_pool_budget_is_split_between_web_workers(monkeypatch):
+    from core.process_pools import pool_size
+
+    monkeypatch.setenv('OCR_MAX_WORKERS', '8')
+    monkeypatch.setenv('CROPIO_WEB_WORKERS', '3')
+    assert pool_size('OCR_MAX_WORKERS') == 2
+
+    monkeypatch.setenv('CROPIO_WEB_WORKERS', '16')
+    assert pool_size('OCR_MAX_WORKERS') == 1
+
+    monkeypatch.delenv('OCR_MAX_WORKERS')
+    monkeypatch.delenv('CROPIO_WEB_WORKERS')
+    assert pool_size('OCR_MAX_WORKERS', default_total=6) == 6
+
+
+class FakeTessAPI:
+    """Stands in for tesserocr.PyTessBaseAPI; loading and recognizing take measurable time"""
+    loaded = []
+    unavailable = set()
+    blocks = []
+
+    def __init__(self, lang, psm, oem, path=None):
+        if lang in self.unavailable:
+            raise RuntimeError('Failed to init API, possibly an invalid tessdata path')
+        time.sleep(0.05)
+        FakeTessAPI.loaded.append(lang)
+        self.lang = lang
+        self.psm = psm
+        self.rectangles = []
+        self.ended = False
+
+    def SetImage(self, image):
+        self.rectangles = []
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetRectangle(self, x, y, w, h):
+        self.rectangles.append((x, y, w, h))
+
+    def Recognize(self, timeout=0):
+        time.sleep(0.01)
+        return True
+
+    def GetUTF8Text(self):
+        return f'{self.lang} text'
+
+    def GetComponentImages(self, level, text_only):
+        return [(None, box, index, 0) for index, box in enumerate(self.blocks)]
+
+    def End(self):
+        self.ended = True
+
+
+@pytest.fixture
+def warm_api(monkeypatch):
+    FakeTessAPI.loaded = []
+    FakeTessAPI.unavailable = set()
+    FakeTessAPI.blocks = []
+    monkeypatch.setattr(ocr_engine, 'TESSEROCR_AVAILABLE', True)
+    monkeypatch.setattr(ocr_engine, 'PyTessBaseAPI', FakeTessAPI, raising=False)
+    monkeypatch.setattr(ocr_engine, 'PSM', SimpleNamespace(AUTO_OSD=1, SINGLE_BLOCK=6), raising=False)
+    monkeypatch.setattr(ocr_engine, 'OEM', SimpleNamespace(LSTM_ONLY=1), raising=False)
+    monkeypatch.setattr(ocr_engine, 'RIL', SimpleNamespace(BLOCK=0), raising=False)
+    monkeypatch.setattr(ocr_engine, '_warm_apis', OrderedDict())
+    monkeypatch.setattr(ocr_engine, '_unloadable_languages', set())
+    monkeypatch.setattr(ocr_engine, '_tessdata_path', None)
+    monkeypatch.setattr(ocr_engine, '_metrics', dict.fromkeys(ocr_engine._metrics, 0))
+    return FakeTessAPI
+
+
+def blank_image():
+    from PIL import Image
+    return Image.new('L', (40, 20), 255)
+
+
+def test_warm_models_are_kept_per_language(monkeypatch, warm_api):
+    monkeypatch.setattr(ocr_engine, 'MAX_WARM_LANGUAGES', 2)
+    image = blank_image()
+
+    for language in ('eng', 'fra', 'eng', 'deu', 'eng'):
+        assert ocr_engine.recognize_image(image, language)['text'] == f'{language} text'
+
+    # Each language is loaded once; the least recently used one is released
+    assert warm_api.loaded == ['eng', 'fra', 'deu']
+    assert list(ocr_engine._warm_apis) == ['deu', 'eng']
+
+    ocr_engine.recognize_image(image, 'fra')
+    assert warm_api.loaded == ['eng', 'fra', 'deu', 'fra']
+    assert list(ocr_engine._warm_apis) == ['eng', 'fra']
+
+
+def test_auto_detection_reuses_the_english_layout(monkeypatch, warm_api):
+    warm_api.blocks = [{'x': 0, 'y': 0, 'w': 40, 'h': 8}, {'x': 0, 'y': 10, 'w': 40, 'h': 8}]
+    detected = {'language': 'fra'}
+    monkeypatch.setattr(ocr_engine, 'detect_language', lambda text: detected['language'])
+    image = blank_image()
+
+    timings = ocr_engine._new_timings()
+    result = ocr_engine.recognize_image(image, 'auto', timings=timings)
+
+    assert result == {'text': 'fra text\n\nfra text', 'language': 'fra'}
+    french = ocr_engine._warm_apis['fra']
+    assert french.rectangles == [(0, 0, 40, 8), (0, 10, 40, 8)]
+    assert french.psm == ocr_engine.PSM.AUTO_OSD
+    assert timings['second_passes'] == 1 and timings['second_passes_skipped'] == 0
+
+    # English text needs no second pass
+    detected['language'] = 'eng'
+    timings = ocr_engine._new_timings()
+    assert ocr_engine.recognize_image(image, 'auto', timings=timings) == {'text': 'eng text', 'language': 'eng'}
+    assert timings['second_passes'] == 0 and timings['second_passes_skipped'] == 1
+    assert warm_api.loaded == ['eng', 'fra']
+
+
+def test_metrics_separate_model_loads_from_recognition(warm_api):
+    image = blank_image()
+
+    for _ in range(3):
+        timings = ocr_engine._new_timings()
+        ocr_engine.recognize_image(image, 'eng', timings=timings)
+        ocr_engine._record_timings(timings)
+
+    metrics = ocr_engine.get_ocr_metrics()
+    assert metrics['backend'] == 'tesserocr'
+    assert metrics['images'] == 3
+    assert metrics['model_loads'] == 1
+    assert metrics['model_load_seconds'] >= 0.05
+    assert 0.03 <= metrics['recognition_seconds'] < metrics['model_load_seconds']
+    assert metrics['avg_recognition_seconds'] >= 0.01
+
+
+def test_languages_tesserocr_cannot_load_use_the_binary(monkeypatch, warm_api):
+    warm_api.unavailable = {'hin'}
+    calls = []
+
+    def image_to_string(image, lang, config, timeout):
+        calls.append(lang)
+        return 'binary text'
+
+    monkeypatch.setattr(ocr_engine, 'pytesseract', SimpleNamespace(image_to_string=image_to_string))
+    image = blank_image()
+
+    assert ocr_engine.recognize_image(image, 'hin')['text'] == 'binary text'
+    assert ocr_engine.recognize_image(image, 'hin')['text'] == 'binary text'
+    assert ocr_engine.recognize_image(image, 'eng')['text'] == 'eng text'
+    assert calls == ['hin', 'hin']
+    assert ocr_engine._unloadable_languages == {'hin'}
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for PDF image recompression in utils.file_compressor.file_compressor_utils.
+"""
+
+import sys
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Image = pytest.importorskip('PIL.Image')
+
+from utils.file_compressor import file_compressor_utils
+from utils.file_compressor.file_compressor_utils import (
+    compress_pdf,
+    pdf_image_target_size,
+    recompress_pdf_image,
+    recompress_pdf_images,
+)
+
+
+def noisy_png(width, height, seed=0):
+    import random
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height))
+    img.putdata([(rng.randrange(256), (x * 7) % 256, 128) for x in range(width * height)])
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_target_size_follows_placed_size():
+    # 1200px placed over 4 inches is 300 DPI; 150 DPI halves it
+    image = {'width': 1200, 'height': 600, 'placed_width': 288.0, 'placed_height': 144.0}
+    assert pdf_image_target_size(image, 150) == (600, 300)
+    # Already below the target resolution
+    assert pdf_image_target_size(image, 300) is None
+    assert pdf_image_target_size(image, None) is None
+
+
+def test_recompression_respects_savings_threshold():
+    png = noisy_png(200, 200)
+
+    xref, result = recompress_pdf_image(5, png, len(png), None, 75, 0.1)
+    assert xref == 5
+    assert result['colorspace'] == '/DeviceRGB'
+    assert len(result['data']) < len(png)
+
+    # Pretend the stored stream is already tiny: nothing to gain
+    assert recompress_pdf_image(5, png, 100, None, 75, 0.1) == (5, None)
+
+
+def test_recompression_downsamples_and_skips_unsafe_modes():
+    png = noisy_png(200, 100)
+    _, result = recompress_pdf_image(1, png, len(png), (100, 50), 75, 0.1)
+    assert (result['width'], result['height']) == (100, 50)
+
+    buffer = BytesIO()
+    Image.new('1', (300, 300)).save(buffer, format='PNG')
+    assert recompress_pdf_image(2, buffer.getvalue(), 10 ** 6, None, 75, 0.1) == (2, None)
+
+
+def test_compress_pdf_recompresses_shared_image_once():
+    fitz = pytest.importorskip('fitz')
+
+    work = tempfile.mkdtemp()
+    input_path = os.path.join(work, 'input.pdf')
+    output_path = os.path.join(work, 'output.pdf')
+
+    doc = fitz.open()
+    xref = None
+    for _ in range(3):
+        page = doc.new_page()
+        rect = fitz.Rect(36, 36, 324, 180)
+        if xref is None:
+            xref = page.insert_image(rect, stream=noisy_png(400, 200))
+        else:
+            page.insert_image(rect, xref=xref)
+    doc.save(input_path)
+    doc.close()
+
+    result = compress_pdf(input_path, output_path, {'quality': 70, 'target_dpi': 72})
+    assert result['success']
+    assert result['images_recompressed'] == 1
+    assert result['compressed_size'] < result['original_size']
+
+    # Saving with garbage collection renumbers objects, so look the image up again
+    doc = fitz.open(output_path)
+    xrefs = {info['xref'] for page in doc for info in page.get_image_info(xrefs=True)}
+    assert len(xrefs) == 1
+    xref = xrefs.pop()
+    assert doc.xref_get_key(xref, 'Filter') == ('name', '/DCTDecode')
+    assert doc.xref_get_key(xref, 'Width') == ('int', '288')
+    doc.close()
+
+
+def test_images_are_not_lost_when_the_pool_breaks(monkeypatch):
+    fitz = pytest.importorskip('fitz')
+
+    class BreakingExecutor:
+        """Runs the first image, then fails like a pool whose worker died"""
+        submitted = 0
+
+        def submit(self, fn, *args):
+            self.submitted += 1
+            if self.submitted > 1:
+                raise BrokenProcessPool('worker died')
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    monkeypatch.setattr(file_compressor_utils, 'PDF_IMAGE_WORKERS', 2)
+    monkeypatch.setattr(file_compressor_utils, 'get_pdf_image_executor', BreakingExecutor)
+
+    doc = fitz.open()
+    for seed in range(4):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(36, 36, 324, 180), stream=noisy_png(400, 200, seed))
+
+    # The image whose submission hit the broken pool is recompressed inline
+    assert recompress_pdf_images(doc, {'quality': 70}) == {'recompressed': 4, 'skipped': 0}
+    doc.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for page-streaming PDF to PPTX conversion in utils.pdf_converters.pdf_presentation_utils.
+"""
+
+import sys
+import os
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fitz = pytest.importorskip('fitz')
+pptx = pytest.importorskip('pptx')
+
+from utils.pdf_converters import pdf_presentation_utils as pdf_pptx
+from utils.pdf_converters.pdf_presentation_utils import PdfToPptxConverter, iter_rendered_pages
+
+
+def make_pdf(pages):
+    path = os.path.join(tempfile.mkdtemp(), 'deck.pdf')
+    doc = fitz.open()
+    for i in range(pages):
+        # Alternate orientation so page order is visible in the rendered sizes
+        page = doc.new_page(width=200 if i % 2 else 300, height=100)
+        page.insert_text((10, 50), f'Page {i + 1}')
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_pages_render_in_order_at_requested_dpi():
+    pages = list(iter_rendered_pages(make_pdf(3), dpi=72, image_format='jpeg', workers=1))
+    assert [index for index, _, _ in pages] == [0, 1, 2]
+    assert [size for _, _, size in pages] == [(300, 100), (200, 100), (300, 100)]
+    assert all(data.startswith(b'\xff\xd8') for _, data, _ in pages)
+
+
+def test_process_pool_keeps_page_order(monkeypatch):
+    monkeypatch.setattr(pdf_pptx, 'PARALLEL_MIN_PAGES', 2)
+    path = make_pdf(6)
+    serial = list(iter_rendered_pages(path, dpi=36, workers=1))
+    parallel = list(iter_rendered_pages(path, dpi=36, workers=2))
+    assert [(i, size) for i, _, size in parallel] == [(i, size) for i, _, size in serial]
+
+
+def test_in_process_rendering_opens_the_document_once(monkeypatch):
+    path = make_pdf(5)
+    opened = []
+    real_open = fitz.open
+    monkeypatch.setattr(pdf_pptx.fitz, 'open', lambda *args: opened.append(args) or real_open(*args))
+
+    pages = list(iter_rendered_pages(path, dpi=36, workers=1))
+    assert len(pages) == 5
+    # One open to count the pages, one to render them all
+    assert len(opened) == 2
+
+
+def test_conversions_share_one_render_pool(monkeypatch):
+    monkeypatch.setattr(pdf_pptx, 'PARALLEL_MIN_PAGES', 2)
+    monkeypatch.setattr(pdf_pptx, 'RENDER_WORKERS', 2)
+    pdf_pptx._reset_render_executor()
+    path = make_pdf(4)
+    try:
+        list(iter_rendered_pages(path, dpi=36, workers=2))
+        executor = pdf_pptx._render_executor
+        list(iter_rendered_pages(path, dpi=36, workers=2))
+        assert executor is not None and pdf_pptx._render_executor is executor
+    finally:
+        pdf_pptx._reset_render_executor()
+
+
+def test_basic_conversion_streams_pages_without_temp_files(monkeypatch):
+    monkeypatch.setattr(pdf_pptx, 'SECURITY_FRAMEWORK_AVAILABLE', False)
+    source = make_pdf(4)
+    output = os.path.join(tempfile.mkdtemp(), 'deck.pptx')
+    temp_dir = tempfile.mkdtemp()
+    monkeypatch.setattr(tempfile, 'tempdir', temp_dir)
+
+    assert PdfToPptxConverter().pdf_to_pptx_basic(source, output)
+
+    slides = pptx.Presentation(output).slides
+    assert len(slides) == 4
+    assert all(len(slide.shapes) == 1 for slide in slides)
+    assert os.listdir(temp_dir) == []
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the sliding window rate limiter in security.core.rate_limiter.
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from security.core.rate_limiter import (
+    MemoryRateLimitBackend,
+    SQLiteRateLimitBackend,
+    sliding_window_hit,
+    sliding_window_count,
+)
+
+
+def test_sliding_window_weights_previous_window():
+    state = None
+    for _ in range(10):
+        allowed, state, _, _ = sliding_window_hit(state, 30.0, 60, 10)
+        assert allowed
+    allowed, state, count, retry_after = sliding_window_hit(state, 59.0, 60, 10)
+    assert not allowed
+    assert count == 10
+
+    # A quarter into the next window, 75% of the previous 10 still count
+    assert sliding_window_count(state, 75.0, 60) == 7.5
+    allowed, state, count, _ = sliding_window_hit(state, 75.0, 60, 10)
+    assert allowed
+    assert count == 8.5
+
+    # Two windows later the key is empty again
+    assert sliding_window_count(state, 200.0, 60) == 0.0
+
+
+def test_retry_after_points_to_next_free_slot():
+    state = (0, 10, 0)
+    allowed, state, _, retry_after = sliding_window_hit(state, 45.0, 60, 10)
+    assert not allowed
+    assert retry_after == 15.0
+
+    # Next window: one slot frees up once 10% of the previous window slides out
+    allowed, _, _, retry_after = sliding_window_hit((1, 0, 10), 60.0, 60, 10)
+    assert not allowed
+    assert abs(retry_after - 6.0) < 1e-9
+
+
+def check_backend(backend):
+    key = 'rate_limit:test:ip:127.0.0.1:60'
+    results = [backend.hit(key, 3, 60, 1000.0)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+    assert backend.count(key, 60, 1000.0) == 3
+
+    assert backend.sweep(1000.0) == 0
+    assert backend.sweep(1000.0 + 180) == 1
+    assert backend.count(key, 60, 1000.0) == 0
+
+    backend.hit(key, 3, 60, 1000.0)
+    assert backend.reset(key)
+    assert not backend.reset(key)
+
+
+def test_memory_backend():
+    check_backend(MemoryRateLimitBackend())
+
+
+def test_sqlite_backend_is_shared_between_instances():
+    path = os.path.join(tempfile.mkdtemp(), 'rate_limits.sqlite3')
+    check_backend(SQLiteRateLimitBackend(path))
+
+    first, second = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+    key = 'rate_limit:shared:global:60'
+    assert first.hit(key, 2, 60, 500.0)[0]
+    assert second.hit(key, 2, 60, 500.0)[0]
+    assert not first.hit(key, 2, 60, 500.0)[0]
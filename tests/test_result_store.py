@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared conversion result store in core.result_store.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.result_store
+from core.result_store import ResultStore, DiskResultStoreBackend, MemoryResultStoreBackend
+
+
+class DummyApp:
+    def __init__(self, folder, backend='disk'):
+        self.config = {
+            'RESULT_STORE_BACKEND': backend,
+            'RESULT_STORE_FOLDER': folder,
+        }
+
+
+def disk_stores(count=2):
+    """Several stores over one folder, like gunicorn workers on one host"""
+    folder = tempfile.mkdtemp()
+    stores = []
+    for _ in range(count):
+        store = ResultStore()
+        store.init_app(DummyApp(folder))
+        stores.append(store)
+    return stores
+
+
+def test_entries_are_visible_to_other_workers():
+    writer, reader = disk_stores()
+    assert isinstance(writer.backend, DiskResultStoreBackend)
+
+    writer.put('gif_mp4', 'abc', {'output_format': 'gif'}, blob=b'payload')
+    assert reader.get('gif_mp4', 'abc') == {'output_format': 'gif'}
+    assert reader.get_blob('gif_mp4', 'abc') == b'payload'
+    assert reader.get('gif_png_sequence', 'abc') is None
+
+
+def test_pop_redeems_token_once():
+    first, second = disk_stores()
+    first.put('qr_unlock', 'token', {'password': 'secret'}, blob=b'%PDF')
+
+    assert second.pop('qr_unlock', 'token') == ({'password': 'secret'}, b'%PDF')
+    assert first.pop('qr_unlock', 'token') is None
+
+
+def test_sweep_removes_expired_entries_and_paths():
+    store, = disk_stores(1)
+    work_dir = tempfile.mkdtemp()
+    output = os.path.join(work_dir, 'out.gif')
+    with open(output, 'wb') as f:
+        f.write(b'GIF89a')
+
+    store.put('gif_mp4', 'old', {}, paths=[work_dir])
+    store.put('gif_mp4', 'new', {}, ttl=600)
+    store.expire_in('gif_mp4', 'old', -1)
+
+    assert store.get('gif_mp4', 'old') is None
+    assert store.sweep() == 1
+    assert not os.path.exists(work_dir)
+    assert store.get('gif_mp4', 'new') == {}
+
+
+def test_memory_backend_is_default():
+    store = ResultStore()
+    assert isinstance(store.backend, MemoryResultStoreBackend)
+    store.put('ns', 'key', {'a': 1}, ttl=0.05)
+    assert store.get('ns', 'key') == {'a': 1}
+    time.sleep(0.1)
+    assert store.get('ns', 'key') is None
+    assert store.sweep() == 1
+
+
+class FakeRedis:
+    """The subset of redis.Redis the result store uses, shared like one server"""
+
+    def __init__(self):
+        self.hashes, self.zsets, self.lists = {}, {}, {}
+
+    def ping(self):
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def delete(self, key):
+        return int(self.hashes.pop(key, None) is not None)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = self.hashes.setdefault(key, {})
+        for name, item in (mapping or {field: value}).items():
+            fields[name.encode()] = item if isinstance(item, bytes) else str(item).encode()
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hmget(self, key, *fields):
+        return [self.hashes.get(key, {}).get(field.encode()) for field in fields]
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def expireat(self, key, when):
+        pass
+
+    def expire(self, key, seconds):
+        pass
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+    def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted((score, member) for member, score in self.zsets.get(key, {}).items() if score <= high)
+        return [member.encode() for _, member in members][start:start + num]
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(value.encode() for value in values)
+
+    def lpop(self, key, count):
+        items = self.lists.get(key, [])
+        taken, self.lists[key] = items[:count], items[count:]
+        return taken or None
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+@pytest.mark.skipif(not core.result_store.REDIS_AVAILABLE, reason='requires redis')
+def test_redis_paths_are_only_deleted_by_their_host(monkeypatch):
+    server = FakeRedis()
+    monkeypatch.setattr(core.result_store.redis.Redis, 'from_url', lambda url, **kwargs: server)
+
+    def host_store(host_id):
+        app = DummyApp(None, backend='redis')
+        app.config.update(RESULT_STORE_REDIS_URL='redis://cache', RESULT_STORE_HOST_ID=host_id)
+        store = ResultStore()
+        store.init_app(app)
+        return store
+
+    host_a, host_b = host_store('host-a'), host_store('host-b')
+    work_dir = tempfile.mkdtemp()
+    token_dir = tempfile.mkdtemp()
+
+    host_a.put('gif_mp4', 'old', {'output_format': 'gif'}, paths=[work_dir])
+    host_a.put('qr_unlock', 'token', {}, paths=[token_dir])
+    host_a.expire_in('gif_mp4', 'old', -1)
+
+    # Host B sweeps and redeems host A's entries but must not touch these paths,
+    # which on a real deployment would be on host A's disk
+    assert host_b.sweep() == 1
+    assert host_b.pop('qr_unlock', 'token') == ({}, None)
+    assert os.path.isdir(work_dir) and os.path.isdir(token_dir)
+    assert host_b.sweep() == 0
+    assert os.path.isdir(work_dir)
+
+    # Host A deletes them on its next sweep
+    assert host_a.sweep() == 0
+    assert not os.path.exists(work_dir) and not os.path.exists(token_dir)
+    assert host_a.get_stats() == {'backend': 'redis', 'entries': 0}
+
+
+@pytest.mark.skipif(not core.result_store.REDIS_AVAILABLE, reason='requires redis')
+def test_redis_sweep_keeps_owner_of_refreshed_entries(monkeypatch):
+    server = FakeRedis()
+    monkeypatch.setattr(core.result_store.redis.Redis, 'from_url', lambda url, **kwargs: server)
+    backend_a = core.result_store.RedisResultStoreBackend('redis://cache', 'host-a')
+    backend_b = core.result_store.RedisResultStoreBackend('redis://cache', 'host-b')
+
+    backend_a.put('gif_mp4', 'job', ({}, None, ['/data/job'], time.time() + 60))
+    # What host B's sweeper does when the entry was refreshed after listing it
+    backend_b.put('gif_mp4', 'job', backend_b.pop('gif_mp4', 'job'))
+
+    assert backend_a.get('gif_mp4', 'job')[2].host == 'host-a'
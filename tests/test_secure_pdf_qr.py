@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for QR unlock links in routes.pdf_converters.secure_pdf_routes.
+"""
+
+import sys
+import os
+import json
+from io import BytesIO
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PyPDF2 = pytest.importorskip('PyPDF2')
+pytest.importorskip('qrcode')
+
+from flask import Flask
+
+from core.result_store import result_store, MemoryResultStoreBackend
+from routes.pdf_converters import secure_pdf_routes
+
+
+def encrypted_pdf(password):
+    writer = PyPDF2.PdfWriter()
+    writer.add_blank_page(width=100, height=100)
+    writer.encrypt(password)
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, 'backend', MemoryResultStoreBackend())
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', UPLOAD_FOLDER=str(tmp_path))
+    app.url_build_error_handlers.append(lambda error, endpoint, values: '#')
+    app.register_blueprint(secure_pdf_routes.secure_pdf_bp)
+    return app.test_client()
+
+
+def test_store_cannot_unlock_the_pdf_without_the_token(client):
+    response = client.post('/secure-pdf', data={
+        'action': 'generate_qr',
+        'qr_password': 's3cret-pass',
+        'file': (BytesIO(encrypted_pdf('s3cret-pass')), 'locked.pdf'),
+    })
+    token = response.get_json()['token']
+
+    # Neither the token nor the password appear anywhere in the stored entry
+    [((namespace, key), (data, blob, paths, _))] = result_store.backend._entries.items()
+    stored = json.dumps(data) + key + ''.join(paths)
+    assert token not in stored
+    assert 's3cret-pass' not in stored
+    assert PyPDF2.PdfReader(BytesIO(blob)).is_encrypted
+
+    # A guessed token does not redeem the entry
+    assert client.get('/qr-unlock/not-the-token').status_code == 302
+    assert len(result_store.backend._entries) == 1
+
+    response = client.get(f'/qr-unlock/{token}')
+    assert response.status_code == 200
+    assert not PyPDF2.PdfReader(BytesIO(response.data)).is_encrypted
+    assert result_store.backend._entries == {}
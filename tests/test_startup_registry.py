@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for deferred imports, cached capability probes and the blueprint registry.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import types
+
+import pytest
+from flask import Blueprint, Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.blueprint_registry import BlueprintRegistry
+from core.capabilities import CapabilityCache
+from core.lazy_imports import import_timings, is_loaded, lazy_import, module_available
+
+
+def test_lazy_module_imports_on_first_attribute():
+    module = types.ModuleType('cropio_lazy_probe')
+    module.VALUE = 42
+    sys.modules['cropio_lazy_probe'] = module
+    try:
+        lazy = lazy_import('cropio_lazy_probe')
+        assert lazy is lazy_import('cropio_lazy_probe')
+        assert not is_loaded(lazy)
+        assert lazy.VALUE == 42
+        assert is_loaded(lazy) and 'cropio_lazy_probe' in import_timings()
+    finally:
+        del sys.modules['cropio_lazy_probe']
+
+    assert module_available('json') and not module_available('cropio_not_installed')
+
+
+def test_capability_probe_is_reused_across_instances():
+    app = Flask(__name__)
+    app.config['CAPABILITY_CACHE_FILE'] = os.path.join(tempfile.mkdtemp(), 'capabilities.json')
+    calls = []
+
+    def probe():
+        calls.append(1)
+        return ['reportlab']
+
+    first = CapabilityCache(app)
+    assert first.get('backends', probe, packages=['flask']) == ['reportlab']
+
+    # A restarted worker reads the file instead of probing
+    second = CapabilityCache(app)
+    assert second.get('backends', probe, packages=['flask']) == ['reportlab']
+    assert len(calls) == 1
+
+    # A different package set means a different environment
+    second.get('backends', probe, packages=['flask', 'cropio-not-installed'])
+    assert len(calls) == 2
+    with open(app.config['CAPABILITY_CACHE_FILE']) as f:
+        assert json.load(f)['backends']['result'] == ['reportlab']
+
+
+def test_registry_reports_modules_and_skips_optional_failures():
+    module = types.ModuleType('cropio_fake_routes')
+    module.fake_bp = Blueprint('fake', __name__)
+    module.fake_bp.add_url_rule('/fake', 'index', lambda: 'ok')
+    sys.modules['cropio_fake_routes'] = module
+
+    registry = BlueprintRegistry()
+    registry.add('cropio_fake_routes', 'fake_bp')
+    registry.add('cropio_missing_routes', 'missing_bp', optional=True)
+    warmed = []
+    registry.warmup(lambda: warmed.append(1))
+
+    app = Flask(__name__)
+    try:
+        report = registry.register_all(app)
+    finally:
+        del sys.modules['cropio_fake_routes']
+
+    assert [r['status'] for r in report] == ['registered', 'unavailable']
+    assert app.test_client().get('/fake').data == b'ok'
+
+    registry.warm_up()
+    registry.warm_up()
+    assert warmed == [1] and registry.get_report()['warmed_up']
+
+    required = BlueprintRegistry()
+    required.add('cropio_missing_routes', 'missing_bp')
+    with pytest.raises(ImportError):
+        required.register_all(Flask(__name__))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for the storage accounting index: incremental totals, expiry-ordered cleanup and reconciliation.
+"""
+
+import sys
+import os
+import time
+
+import pytest
+from flask import Flask, g
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.storage_index import StorageIndex
+
+
+def make_index(tmp_path, ttl=3600):
+    app = Flask(__name__)
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        OUTPUT_FOLDER=str(tmp_path / 'outputs'),
+        STORAGE_INDEX_FOLDER=str(tmp_path / 'storage'),
+        STORAGE_FILE_TTL=ttl,
+    )
+    for name in ('uploads', 'outputs'):
+        (tmp_path / name).mkdir()
+    return app, StorageIndex(app)
+
+
+def write(path, size, age=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return str(path)
+
+
+def test_totals_follow_writes_and_deletes(tmp_path):
+    app, index = make_index(tmp_path)
+    uploads = tmp_path / 'uploads'
+
+    a = write(uploads / 'a.pdf', 100)
+    index.record(a, owner=7, tool='pdf_merge')
+    index.record(write(uploads / 'temp_b.png', 50))
+    index.record(write(tmp_path / 'outputs' / 'c.docx', 30))
+    assert not index.record(write(tmp_path / 'elsewhere.txt', 10))
+
+    assert index.get_stats(str(uploads)) == {'files': 2, 'bytes': 150, 'temp_files': 1}
+    assert index.get_stats() == {'files': 3, 'bytes': 180, 'temp_files': 1}
+
+    # Rewriting a file adjusts the totals by the size difference
+    write(uploads / 'a.pdf', 400)
+    index.record(a)
+    assert index.get_stats(str(uploads))['bytes'] == 450
+    row = index._connect().execute('SELECT owner, tool FROM files WHERE path = ?', (a,)).fetchone()
+    assert row == (7, 'pdf_merge')
+
+    assert index.remove(a) == 400
+    assert not os.path.exists(a)
+    assert index.get_stats(str(uploads)) == {'files': 1, 'bytes': 50, 'temp_files': 1}
+
+    assert index.delete_temp_files(str(uploads))['deleted'] == 1
+    assert index.get_stats(str(uploads)) == {'files': 0, 'bytes': 0, 'temp_files': 0}
+
+
+def test_sweep_deletes_expired_files_only(tmp_path):
+    app, index = make_index(tmp_path, ttl=3600)
+    uploads = tmp_path / 'uploads'
+
+    old = write(uploads / 'old.pdf', 10, age=7200)
+    fresh = write(uploads / 'fresh.pdf', 10)
+    nested = write(uploads / 'session' / 'page.png', 10, age=7200)
+    rewritten = write(uploads / 'rewritten.pdf', 10, age=7200)
+    for path in (old, fresh, nested, rewritten):
+        index.record(path)
+    index.record(write(uploads / 'short.pdf', 10, age=120), ttl=60)
+    index.record(write(uploads / 'gone.pdf', 10, age=7200))
+    os.remove(uploads / 'gone.pdf')
+
+    # Written again by code that did not go through the index
+    write(uploads / 'rewritten.pdf', 20)
+
+    result = index.sweep()
+    assert result == {'deleted': 2, 'size_freed': 20, 'missing': 1}
+    assert not os.path.exists(old) and not os.path.exists(uploads / 'short.pdf')
+    assert os.path.exists(fresh) and os.path.exists(nested) and os.path.exists(rewritten)
+
+    # Files in subdirectories are counted but not expired; the rewrite was re-dated
+    assert index.get_stats(str(uploads)) == {'files': 3, 'bytes': 40, 'temp_files': 0}
+    assert index.sweep()['deleted'] == 0
+    assert index.count_older_than(3600, str(uploads)) == 1
+
+
+def test_reconcile_and_request_hooks(tmp_path):
+    app, index = make_index(tmp_path)
+    uploads = tmp_path / 'uploads'
+
+    known = write(uploads / 'known.pdf', 10)
+    index.record(known)
+    write(uploads / 'untracked.png', 25)
+    write(uploads / 'nested' / 'deep.txt', 5)
+    os.remove(known)
+
+    assert index.reconcile() == {'added': 2, 'removed': 1}
+    assert index.get_stats(str(uploads)) == {'files': 2, 'bytes': 30, 'temp_files': 0}
+    assert index.reconcile() == {'added': 0, 'removed': 0}
+
+    output = write(tmp_path / 'outputs' / 'result.zip', 70)
+
+    @app.route('/convert', methods=['POST'])
+    def convert():
+        g.output_file_path = output
+        g.tool_name = 'gif_png_sequence'
+        return 'ok'
+
+    app.test_client().post('/convert')
+    assert index._connect().execute('SELECT tool FROM files WHERE path = ?', (output,)).fetchone() == ('gif_png_sequence',)
+
+    served = write(uploads / 'served.pdf', 15)
+    index.mark_served(served)
+    assert index._connect().execute('SELECT served_at IS NOT NULL FROM files WHERE path = ?', (served,)).fetchone() == (1,)
+    assert index.get_stats() == {'files': 4, 'bytes': 115, 'temp_files': 0}
+
+
+def test_files_written_by_routes_expire_without_a_rescan(tmp_path, monkeypatch):
+    import core.storage_index
+    from core.storage_index import record_after_request
+    from utils.helpers import cleanup_files
+
+    app, index = make_index(tmp_path)
+    monkeypatch.setattr(core.storage_index, 'storage_index', index)
+    monkeypatch.setattr(index, 'reconcile', lambda: pytest.fail('cleanup walked the folders'))
+    monkeypatch.chdir(tmp_path)
+    upload = str(tmp_path / 'uploads' / 'upload.pdf')
+
+    @app.route('/upload', methods=['POST'])
+    def upload_route():
+        # Registered before the route writes the file itself
+        record_after_request(upload)
+        write(tmp_path / 'uploads' / 'upload.pdf', 10, age=7200)
+        return 'ok'
+
+    app.test_client().post('/upload')
+    assert index.get_stats() == {'files': 1, 'bytes': 10, 'temp_files': 0}
+
+    # Outside a request the file is recorded right away
+    recent = write(tmp_path / 'outputs' / 'result.pdf', 10)
+    record_after_request(recent)
+
+    cleanup_files()
+
+    assert not os.path.exists(upload)
+    assert os.path.exists(recent)
+    assert index.get_stats() == {'files': 1, 'bytes': 10, 'temp_files': 0}
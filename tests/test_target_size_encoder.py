@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for target-size image encoding in utils.image_converter.target_size_encoder.
+"""
+
+import sys
+import os
+import random
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Image = pytest.importorskip('PIL.Image')
+
+from utils.image_converter.target_size_encoder import encode_to_target_size, save_to_target_size
+
+
+def noisy_image(width, height, seed=0):
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height))
+    img.putdata([((x + rng.randrange(64)) % 256, (x * 3) % 256, rng.randrange(256))
+                 for x in range(width * height)])
+    return img
+
+
+def test_quality_search_lands_within_tolerance():
+    img = noisy_image(300, 300)
+    full = encode_to_target_size(img, 10 ** 8)
+    assert full['quality'] == 95
+
+    target = len(full['data']) // 2
+    result = encode_to_target_size(img, target, 'JPEG', tolerance=0.1)
+    assert result['met_target']
+    assert result['scale'] == 1.0
+    assert target * 0.9 <= len(result['data']) <= target
+    assert result['encodes'] <= 10
+
+
+def test_downscales_when_min_quality_is_too_large():
+    img = noisy_image(300, 300)
+    smallest = encode_to_target_size(img, 1, allow_resize=False)
+    assert not smallest['met_target']
+    assert smallest['quality'] == 10
+
+    target = len(smallest['data']) // 3
+    result = encode_to_target_size(img, target, 'webp', allow_resize=True)
+    assert result['met_target']
+    assert result['format'] == 'WEBP'
+    assert result['scale'] < 1.0
+    assert len(result['data']) <= target
+
+
+def test_save_writes_the_chosen_encoding():
+    img = noisy_image(120, 80).convert('RGBA')
+    output_path = os.path.join(tempfile.mkdtemp(), 'out.jpg')
+    result = save_to_target_size(img, output_path, 6000)
+
+    assert os.path.getsize(output_path) == len(result['data'])
+    with Image.open(output_path) as saved:
+        assert saved.format == 'JPEG'
+        assert saved.size == result['dimensions']
+
+
+def test_lossless_images_keep_their_size_unless_resizing_is_allowed():
+    img = noisy_image(200, 150)
+    full = encode_to_target_size(img, 10 ** 8, 'PNG')
+    target = len(full['data']) // 4
+
+    kept = encode_to_target_size(img, target, 'PNG')
+    assert not kept['met_target']
+    assert kept['dimensions'] == (200, 150)
+    assert kept['encodes'] == 1
+
+    resized = encode_to_target_size(img, target, 'PNG', allow_resize=True)
+    assert resized['met_target']
+    assert resized['dimensions'][0] < 200
+    assert len(resized['data']) <= target
+
+
+def test_file_compression_reports_dimensions(tmp_path):
+    from utils.file_compressor.file_compressor_utils import apply_target_size_compression
+
+    path = str(tmp_path / 'photo.png')
+    noisy_image(200, 150).save(path)
+    target = os.path.getsize(path) // 4
+
+    result = apply_target_size_compression(path, target, 5)
+    assert not result['success']
+    assert result['dimensions'] == (200, 150)
+    with Image.open(path) as saved:
+        assert saved.size == (200, 150)
+
+    result = apply_target_size_compression(path, target, 5, allow_resize=True)
+    assert result['success']
+    with Image.open(path) as saved:
+        assert saved.size == result['dimensions']
+        assert saved.size[0] < 200
+    assert os.path.getsize(path) <= target
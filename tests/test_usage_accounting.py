@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for write-behind usage accounting in core.usage_accounting.
+"""
+
+import sys
+import os
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, User, UsageTracking, ConversionHistory, UsageAnalytics
+from core.usage_accounting import UsageAccountant, conversion_counters
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['USAGE_FLUSH_INTERVAL'] = 3600  # Only flush when the test asks
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='alice', email='alice@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        app.user_id = user.id
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def stored_usage(user_id):
+    db.session.expire_all()
+    return UsageTracking.query.filter_by(user_id=user_id, date=date.today()).first()
+
+
+def test_counter_deltas_are_aggregated_until_flush(app):
+    accountant = UsageAccountant(app)
+    user_id = app.user_id
+
+    accountant.record_usage(user_id, **conversion_counters('image_convert', file_size=100))
+    accountant.record_usage(user_id, **conversion_counters('pdf_merge', file_size=50))
+    accountant.record_history(user_id=user_id, original_filename='a.png', original_format='png',
+                              target_format='jpg', conversion_type='image', tool_used='image', status='completed')
+
+    # Nothing written yet, but quota reads see the pending conversions
+    assert stored_usage(user_id) is None
+    assert accountant.pending_conversions(user_id) == 2
+
+    assert accountant.flush() == {'usage_rows': 1, 'history_rows': 1, 'analytics_rows': 0}
+    usage = stored_usage(user_id)
+    assert (usage.conversions_count, usage.storage_used) == (2, 150)
+    assert (usage.image_conversions, usage.pdf_conversions) == (1, 1)
+    assert ConversionHistory.query.count() == 1
+    assert accountant.pending_conversions(user_id) == 0
+
+
+def test_flush_increments_existing_rows(app):
+    accountant = UsageAccountant(app)
+    user_id = app.user_id
+    db.session.add(UsageTracking(user_id=user_id, date=date.today(), conversions_count=5, storage_used=10))
+    db.session.commit()
+
+    accountant.record_usage(user_id, conversions_count=1, storage_used=5)
+    accountant.record_analytics(user_id=user_id, feature_name='md_to_html', feature_category='document')
+    accountant.flush()
+
+    usage = stored_usage(user_id)
+    assert (usage.conversions_count, usage.storage_used) == (6, 15)
+    assert UsageAnalytics.query.one().feature_name == 'md_to_html'
+
+
+def test_rejected_row_is_dropped_and_the_rest_written(app):
+    accountant = UsageAccountant(app)
+    accountant.record_usage(app.user_id, conversions_count=1)
+    accountant.record_history(user_id=app.user_id, original_filename='a.png', original_format='png',
+                              target_format='jpg', conversion_type='image', tool_used='image')
+    # user_id is NOT NULL, so this row fails the batch
+    accountant.record_history(user_id=None, original_filename='x', original_format='x',
+                              target_format='x', conversion_type='x', tool_used='x')
+    accountant.record_analytics(user_id=app.user_id, feature_name='md_to_html', feature_category='document')
+
+    assert accountant.flush() == {'usage_rows': 1, 'history_rows': 1, 'analytics_rows': 1}
+    assert stored_usage(app.user_id).conversions_count == 1
+    assert ConversionHistory.query.one().original_filename == 'a.png'
+    assert UsageAnalytics.query.count() == 1
+    assert accountant.pending_conversions(app.user_id) == 0
+    assert accountant._history == []
+
+
+def test_failed_flush_is_retried_a_limited_number_of_times(app, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from core import usage_accounting
+
+    accountant = UsageAccountant(app)
+    accountant.record_usage(app.user_id, conversions_count=1)
+
+    def unavailable(*args):
+        raise OperationalError('UPDATE usage_tracking', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(accountant, '_write', unavailable)
+    for _ in range(usage_accounting.MAX_FLUSH_ATTEMPTS - 1):
+        assert accountant.flush()['usage_rows'] == 0
+        assert accountant.pending_conversions(app.user_id) == 1
+
+    # The last attempt gives up on the batch
+    accountant.flush()
+    assert accountant.pending_conversions(app.user_id) == 0
+
+    monkeypatch.undo()
+    accountant.record_usage(app.user_id, conversions_count=2)
+    assert accountant.flush()['usage_rows'] == 1
+    assert stored_usage(app.user_id).conversions_count == 2
+
+
+def test_disabled_accountant_writes_immediately(app):
+    app.config['USAGE_WRITE_BEHIND_ENABLED'] = False
+    accountant = UsageAccountant(app)
+    accountant.record_usage(app.user_id, conversions_count=1)
+    assert stored_usage(app.user_id).conversions_count == 1
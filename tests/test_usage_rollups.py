@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for per-user dashboard rollups in core.usage_rollups.
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, User, UsageTracking, ConversionHistory, UserUsageRollup, UserToolRollup
+from core.usage_accounting import UsageAccountant
+from core.usage_rollups import UserStatsCache, load_user_stats
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['USAGE_FLUSH_INTERVAL'] = 3600
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bob', email='bob@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        app.user_id = user.id
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def history(user_id, tool, conversion_type='image'):
+    return dict(user_id=user_id, original_filename='f', original_format='png', target_format='jpg',
+                conversion_type=conversion_type, tool_used=tool, status='completed')
+
+
+def test_rollup_is_rebuilt_from_existing_rows(app):
+    user_id = app.user_id
+    db.session.add_all([
+        UsageTracking(user_id=user_id, date=date.today() - timedelta(days=3), conversions_count=4,
+                      storage_used=400, image_conversions=4),
+        UsageTracking(user_id=user_id, date=date.today(), conversions_count=1, storage_used=100),
+        ConversionHistory(**history(user_id, 'image_converter')),
+        ConversionHistory(**history(user_id, 'image_converter')),
+        ConversionHistory(**history(user_id, 'pdf_merge', 'pdf')),
+    ])
+    db.session.commit()
+
+    stats = load_user_stats(user_id)
+    assert (stats['conversions_count'], stats['storage_used'], stats['image_conversions']) == (5, 500, 4)
+    assert stats['most_used_tool'] == ('image_converter', 2)
+    assert stats['by_type'] == {'image': 2, 'pdf': 1}
+    assert UserUsageRollup.query.count() == 1
+
+
+def test_flushes_keep_rollup_in_step_with_base_tables(app):
+    user_id = app.user_id
+    accountant = UsageAccountant(app)
+
+    # First flush builds the rollup (including the batch), later ones add deltas
+    for tool in ('image_converter', 'pdf_merge', 'pdf_merge'):
+        accountant.record_usage(user_id, conversions_count=1, storage_used=10)
+        accountant.record_history(**history(user_id, tool, tool.split('_')[0]))
+        accountant.flush()
+
+    stats = load_user_stats(user_id)
+    assert (stats['conversions_count'], stats['storage_used']) == (3, 30)
+    assert stats['by_tool'] == {'image_converter': 1, 'pdf_merge': 2}
+    assert stats['most_used_tool'] == ('pdf_merge', 2)
+
+
+def test_deleting_a_user_removes_their_rollups(app):
+    user_id = app.user_id
+    db.session.add(ConversionHistory(**history(user_id, 'image_converter')))
+    db.session.commit()
+    load_user_stats(user_id)
+    assert UserToolRollup.query.count() == 1
+
+    # SQLite only enforces foreign keys when asked to
+    db.session.execute(db.text('PRAGMA foreign_keys=ON'))
+
+    db.session.delete(db.session.get(User, user_id))
+    db.session.commit()
+    assert UserUsageRollup.query.count() == 0
+    assert UserToolRollup.query.count() == 0
+
+
+def test_stats_cache_expires_and_invalidates():
+    cache = UserStatsCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get(1, 'totals', loader) == 1
+    assert cache.get(1, 'totals', loader) == 1
+    cache.invalidate([1])
+    assert cache.get(1, 'totals', loader) == 2
+
+    cache.ttl = 0
+    assert cache.get(2, 'totals', loader) == 3
+    assert cache.get(2, 'totals', loader) == 4
+
+
+def test_chart_endpoint_rejects_unknown_types_and_clamps_days(app):
+    from flask_login import LoginManager
+    from routes.dashboard_routes import dashboard_bp, MAX_CHART_DAYS
+    from core.usage_rollups import user_stats_cache
+
+    app.config['SECRET_KEY'] = 'test'
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+    app.register_blueprint(dashboard_bp)
+
+    user_stats_cache.invalidate([app.user_id])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(app.user_id)
+
+    assert client.get('/dashboard/api/chart-data?type=__class__').status_code == 400
+    assert client.get('/dashboard/api/chart-data?days=lots').status_code == 400
+
+    response = client.get(f'/dashboard/api/chart-data?type=storage&days={10 ** 9}')
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == MAX_CHART_DAYS
+    assert len(client.get('/dashboard/api/chart-data?days=-5').get_json()['labels']) == 1
+
+    # Only the clamped requests reached the cache
+    keys = [key for key in user_stats_cache._entries.get(app.user_id, {}) if key[0] == 'chart']
+    assert sorted((key[2], key[3]) for key in keys) == [(1, 'conversions'), (MAX_CHART_DAYS, 'storage')]
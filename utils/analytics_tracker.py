@@ -3,6 +3,7 @@ Analytics Tracker Utility
 Track feature usage for logged-in users
 """
 from models import db, UsageAnalytics
+from core.usage_accounting import usage_accounting
 from flask_login import current_user
 from datetime import datetime, timedelta
 import json
@@ -20,7 +21,7 @@ def track_feature(feature_name, feature_category=None, extra_metadata=None, proc
         success (bool): Whether the operation was successful
     
     Returns:
-        UsageAnalytics: The created usage record
+        bool: True if the usage was queued for the next analytics flush
     """
     if not current_user.is_authenticated:
         return None
@@ -28,7 +29,7 @@ def track_feature(feature_name, feature_category=None, extra_metadata=None, proc
     # Convert metadata dict to JSON string if provided
     metadata_str = json.dumps(extra_metadata) if extra_metadata else None
     
-    return UsageAnalytics.track_usage(
+    usage_accounting.record_analytics(
         user_id=current_user.id,
         feature_name=feature_name,
         feature_category=feature_category,
@@ -36,6 +37,7 @@ def track_feature(feature_name, feature_category=None, extra_metadata=None, proc
         processing_time=processing_time,
         success=success
     )
+    return True
 
 
 def get_user_analytics(user_id, period='day', days=None):
@@ -9,6 +9,10 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+from core.conversion_cache import cached_conversion
+from core.lazy_imports import lazy_import, module_available
+from core.libreoffice_pool import LibreOfficeError, libreoffice_pool
+
 # Universal Security Framework Integration
 try:
     from security.core.sanitizers import sanitize_filename
@@ -79,13 +83,15 @@ except ImportError:
     PDF_PROCESSING_AVAILABLE = False
 
 try:
-    import pytesseract
     from PIL import Image as PILImage
 
-    OCR_AVAILABLE = True
+    OCR_AVAILABLE = module_available("pytesseract")
 except ImportError:
     OCR_AVAILABLE = False
 
+# Loaded on first OCR call; importing it pulls in pandas
+pytesseract = lazy_import("pytesseract")
+
 try:
     from odf import style
     from odf.opendocument import OpenDocumentText
@@ -137,6 +143,9 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Word-processor formats LibreOffice reads and writes with full layout fidelity
+LIBREOFFICE_FORMATS = {"doc", "docx", "odt", "rtf"}
+
 
 class DocumentConverter:
     """
@@ -198,6 +207,7 @@ class DocumentConverter:
             "epub": EPUB_AVAILABLE,
             "docx2txt": DOCX2TXT_AVAILABLE,
             "win32com": WIN32COM_AVAILABLE,
+            "libreoffice": libreoffice_pool.is_available(),
         }
 
     def is_pdf_conversion_available(self) -> bool:
@@ -206,6 +216,7 @@ class DocumentConverter:
             self.dependencies["weasyprint"]
             or self.dependencies["reportlab"]
             or self.dependencies["pandoc"]
+            or self.dependencies["libreoffice"]
         )
 
     def is_docx_conversion_available(self) -> bool:
@@ -432,6 +443,7 @@ class DocumentConverter:
             logger.error(f"Error detecting format by content: {e}")
             return "unknown"
 
+    @cached_conversion("document_converter", version="1")
     def convert_single_document(
         self,
         input_path: str,
@@ -679,6 +691,17 @@ class DocumentConverter:
         """Merge documents by converting all to HTML first"""
         return self._merge_as_html(input_paths, output_path, options)
 
+    def _convert_with_libreoffice(
+        self, input_path: str, output_path: str
+    ) -> Tuple[bool, str]:
+        """Convert on the shared LibreOffice pool; the target format follows output_path"""
+        try:
+            libreoffice_pool.convert(input_path, output_path)
+            return True, ""
+        except LibreOfficeError as e:
+            logger.warning(f"LibreOffice conversion failed: {e}")
+            return False, str(e)
+
     def _convert_to_pdf(
         self,
         input_path: str,
@@ -719,6 +742,20 @@ class DocumentConverter:
                     logger.warning(f"COM PDF conversion error: {com_error}")
                     conversion_error = str(com_error)
 
+            # LibreOffice keeps page layout for word-processor formats
+            if (
+                not conversion_success
+                and self.dependencies["libreoffice"]
+                and input_format in LIBREOFFICE_FORMATS
+            ):
+                success, error = self._convert_with_libreoffice(
+                    input_path, actual_output
+                )
+                if success:
+                    conversion_success = True
+                else:
+                    conversion_error = error
+
             # Try Pandoc for good format support
             if (
                 not conversion_success
@@ -1123,8 +1160,14 @@ class DocumentConverter:
                 shutil.copy2(input_path, output_path)
                 return True, ""
 
+            if input_format in LIBREOFFICE_FORMATS and self.dependencies["libreoffice"]:
+                success, error = self._convert_with_libreoffice(input_path, output_path)
+                if success:
+                    return True, ""
+                logger.warning(f"LibreOffice DOCX conversion failed, trying fallbacks: {error}")
+
             # Special handling for PDF input
-            elif input_format == "pdf":
+            if input_format == "pdf":
                 return self._convert_pdf_to_docx(input_path, output_path, options)
             elif self.dependencies["python_docx"] and input_format in [
                 "txt",
@@ -2188,6 +2231,11 @@ class DocumentConverter:
                 shutil.copy2(input_path, output_path)
                 return True, ""
 
+            if input_format in LIBREOFFICE_FORMATS and self.dependencies["libreoffice"]:
+                success, error = self._convert_with_libreoffice(input_path, output_path)
+                if success:
+                    return True, ""
+
             if self.dependencies["pandoc"]:
                 return self._convert_to_rtf_pandoc(
                     input_path, output_path, input_format, options
@@ -2283,12 +2331,17 @@ class DocumentConverter:
                 shutil.copy2(input_path, output_path)
                 return True, ""
 
+            if input_format in LIBREOFFICE_FORMATS and self.dependencies["libreoffice"]:
+                success, error = self._convert_with_libreoffice(input_path, output_path)
+                if success:
+                    return True, ""
+
             if self.dependencies["pandoc"]:
                 return self._convert_to_odt_pandoc(
                     input_path, output_path, input_format, options
                 )
             else:
-                return False, "ODT conversion requires Pandoc"
+                return False, "ODT conversion requires Pandoc or LibreOffice"
 
         except Exception as e:
             return False, f"ODT conversion error: {str(e)}"
@@ -2565,7 +2618,7 @@ class DocumentConverter:
     ) -> Tuple[bool, str]:
         """Convert DOC file via DOCX intermediate format for better accuracy"""
         try:
-            # Step 1: Convert DOC to DOCX using Windows COM automation
+            # Step 1: Convert DOC to DOCX using Windows COM automation, then LibreOffice
             temp_docx = tempfile.NamedTemporaryFile(
                 mode="w+b", suffix=".docx", delete=False
             )
@@ -2574,9 +2627,13 @@ class DocumentConverter:
             success, error = self._convert_doc_to_docx_com(
                 input_path, temp_docx.name, options
             )
+            if not success and self.dependencies["libreoffice"]:
+                success, error = self._convert_with_libreoffice(
+                    input_path, temp_docx.name
+                )
             if not success:
                 os.unlink(temp_docx.name)
-                logger.warning(f"COM conversion failed: {error}")
+                logger.warning(f"DOC to DOCX conversion failed: {error}")
                 # Fallback to text extraction method
                 return self._convert_doc_fallback(
                     input_path, output_path, output_format, options
@@ -0,0 +1,210 @@
+# utils/document_converter/markdown_preview.py - INCREMENTAL MARKDOWN PREVIEW
+# Block-level rendering cache behind the Markdown live preview
+#
+# A document is split into top-level blocks; each block is rendered and
+# sanitized on its own and cached by content hash, so a keystroke only
+# re-renders the block being edited. Constructs that depend on the whole
+# document (footnotes, [TOC], abbreviations) disable splitting, and blocks
+# that Markdown would join (loose lists, blockquotes, indented continuations,
+# raw HTML spanning blank lines) are kept together.
+import hashlib
+import logging
+import queue
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rendered blocks kept across requests
+PREVIEW_CACHE_SIZE = 4096
+
+# Processors shared by concurrent preview requests
+PREVIEW_POOL_SIZE = 4
+
+FENCE_PATTERN = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+LIST_ITEM_PATTERN = re.compile(r'^ {0,3}([-*+]|\d+[.)])\s')
+REFERENCE_PATTERN = re.compile(r'^ {0,3}\[[^\]^][^\]]*\]:\s*\S.*$', re.MULTILINE)
+HTML_OPEN_PATTERN = re.compile(r'^ {0,3}<([A-Za-z][A-Za-z0-9-]*)')
+
+# Output of these depends on the whole document, so it is rendered in one piece
+WHOLE_DOCUMENT_PATTERN = re.compile(r'\[\^[^\]]+\]|^\s*\[TOC\]\s*$|^\*\[[^\]]+\]:', re.MULTILINE)
+
+
+def _continues(previous: List[str], line: str) -> bool:
+    """Whether a block starting with ``line`` belongs to the block before it"""
+    if line[:1] in (' ', '\t'):
+        return True
+    first = previous[0]
+    if line.lstrip().startswith('>') and first.lstrip().startswith('>'):
+        return True
+    if LIST_ITEM_PATTERN.match(line) and LIST_ITEM_PATTERN.match(first):
+        return True
+    return False
+
+
+def _open_html_tag(lines: List[str]) -> Optional[str]:
+    """Tag of a raw HTML block that is not closed within ``lines``"""
+    match = HTML_OPEN_PATTERN.match(lines[0])
+    if not match:
+        return None
+    tag = match.group(1).lower()
+    text = '\n'.join(lines).lower()
+    if text.count(f'<{tag}') > text.count(f'</{tag}'):
+        return tag
+    return None
+
+
+def split_blocks(content: str) -> List[str]:
+    """
+    Split Markdown into top-level blocks that render independently.
+
+    Blocks are separated by blank lines outside fenced code. Blocks that
+    Markdown would merge with their predecessor are kept in one piece, so
+    joining the rendered blocks gives the same HTML as rendering the whole
+    text.
+    """
+    if WHOLE_DOCUMENT_PATTERN.search(content):
+        return [content]
+
+    blocks: List[List[str]] = []
+    current: List[str] = []
+    fence = None
+    html_tag = None
+
+    def close():
+        nonlocal current, html_tag
+        if not current:
+            return
+        if blocks and (html_tag or _continues(blocks[-1], current[0])):
+            blocks[-1].extend([''] + current)
+        else:
+            blocks.append(current)
+        html_tag = _open_html_tag(blocks[-1])
+        current = []
+
+    for line in content.split('\n'):
+        if fence:
+            current.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+
+        match = FENCE_PATTERN.match(line)
+        if match:
+            fence = match.group(1)[0] * len(match.group(1))
+            current.append(line)
+            continue
+
+        if line.strip():
+            current.append(line)
+        else:
+            close()
+    close()
+
+    return ['\n'.join(block) for block in blocks]
+
+
+class MarkdownPreviewEngine:
+    """
+    Renders Markdown previews block by block with a shared LRU of results.
+
+    ``processor_factory`` builds objects exposing ``markdown_to_html(text)``
+    returning ``{'success', 'output'}``; up to ``pool_size`` of them are
+    created lazily and reused, since building a Markdown instance with its
+    extensions costs far more than rendering a typical block.
+    """
+
+    def __init__(self, processor_factory: Callable[[], Any], pool_size: int = PREVIEW_POOL_SIZE,
+                 cache_size: int = PREVIEW_CACHE_SIZE):
+        self.processor_factory = processor_factory
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self._processors = queue.LifoQueue()
+        self._created = 0
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _checkout(self):
+        try:
+            return self._processors.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self.processor_factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._processors.get()
+
+    def _checkin(self, processor):
+        md = getattr(processor, 'md', None)
+        if md is not None:
+            md.reset()
+        self._processors.put(processor)
+
+    def _render_block(self, source: str) -> str:
+        processor = self._checkout()
+        try:
+            result = processor.markdown_to_html(source)
+        finally:
+            self._checkin(processor)
+        if not result['success']:
+            raise ValueError(result['error'])
+        return result['output'].strip()
+
+    def render(self, content: str, known: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Render ``content`` as an ordered list of blocks.
+
+        Returns ``{'blocks': [{'id', 'html'}...], 'rendered': n}``. Block ids
+        are content hashes; blocks whose id is in ``known`` (already on the
+        client) are returned without ``html``.
+        """
+        known = set(known or ())
+        blocks = split_blocks(content)
+
+        # Reference definitions apply document-wide; each block is rendered
+        # with them appended, and they are part of its cache key
+        references = '\n'.join(m.group(0) for m in REFERENCE_PATTERN.finditer(content))
+
+        result = []
+        rendered = 0
+        for source in blocks:
+            digest = hashlib.blake2b(f'{source}\0{references}'.encode('utf-8'), digest_size=8).hexdigest()
+            entry = {'id': digest}
+            if digest in known:
+                result.append(entry)
+                continue
+
+            with self._lock:
+                html = self._cache.get(digest)
+                if html is not None:
+                    self._cache.move_to_end(digest)
+                    self.stats['hits'] += 1
+
+            if html is None:
+                html = self._render_block(f'{source}\n\n{references}' if references else source)
+                rendered += 1
+                with self._lock:
+                    self.stats['misses'] += 1
+                    self._cache[digest] = html
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+            entry['html'] = html
+            result.append(entry)
+
+        return {'blocks': result, 'rendered': rendered}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,189 @@
+# utils/excel_converter/excel_schema.py - COLUMN TYPE INFERENCE
+# Sampled, vectorized column typing shared by every Excel output format
+#
+# Each column is classified from a bounded sample of its leading rows, so the
+# cost does not grow with sheet size. Only columns whose text values all parse
+# with one explicit datetime format are converted; everything else is left as
+# read from the workbook.
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from core.lazy_imports import lazy_import, module_available
+
+# Loaded on first use, like the rest of the Excel converter
+pd = lazy_import('pandas')
+ptypes = lazy_import('pandas.api.types')
+PANDAS_AVAILABLE = module_available('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Rows per column used for classification
+SCHEMA_SAMPLE_ROWS = 500
+
+# Share of sampled non-empty values that must match for a column to get a type
+MIN_CONFIDENCE = 0.95
+
+# Tried in order; day-first formats come after month-first like Excel's en-US default
+DATETIME_FORMATS = (
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y/%m/%d',
+    '%m/%d/%Y',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S',
+    '%d/%m/%Y',
+    '%d/%m/%Y %H:%M',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+)
+
+# Cheap pre-filter: only columns that mostly look like dates try the formats
+DATE_LIKE_PATTERN = r'^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}'
+
+BOOLEAN_STRINGS = {'true', 'false', 'yes', 'no'}
+
+# Inferred schemas keyed by (workbook sha256, sheet name)
+SCHEMA_CACHE_SIZE = 128
+
+_schema_cache: 'OrderedDict[tuple, Dict[str, Dict[str, Any]]]' = OrderedDict()
+_schema_cache_lock = threading.Lock()
+
+
+def workbook_digest(path: str) -> str:
+    """SHA-256 of a workbook, used to share schemas between requests for the same file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def infer_column(series: 'pd.Series') -> Dict[str, Any]:
+    """
+    Classify one column from its first SCHEMA_SAMPLE_ROWS values.
+
+    Returns a dict with ``type`` (empty, numeric, boolean, datetime or text),
+    the datetime ``format`` for text dates, and the matching ``confidence``.
+    """
+    sample = series.iloc[:SCHEMA_SAMPLE_ROWS].dropna()
+    if sample.empty:
+        return {'type': 'empty', 'format': None, 'confidence': 1.0}
+
+    if ptypes.is_bool_dtype(sample):
+        return {'type': 'boolean', 'format': None, 'confidence': 1.0}
+    if ptypes.is_datetime64_any_dtype(sample):
+        return {'type': 'datetime', 'format': None, 'confidence': 1.0}
+    if ptypes.is_numeric_dtype(sample):
+        return {'type': 'numeric', 'format': None, 'confidence': 1.0}
+
+    text = sample.astype(str).str.strip()
+
+    ratio = text.str.lower().isin(BOOLEAN_STRINGS).mean()
+    if ratio >= MIN_CONFIDENCE:
+        return {'type': 'boolean', 'format': None, 'confidence': round(float(ratio), 3)}
+
+    ratio = pd.to_numeric(text, errors='coerce').notna().mean()
+    if ratio >= MIN_CONFIDENCE:
+        return {'type': 'numeric', 'format': None, 'confidence': round(float(ratio), 3)}
+
+    if text.str.match(DATE_LIKE_PATTERN).mean() >= MIN_CONFIDENCE:
+        for fmt in DATETIME_FORMATS:
+            ratio = pd.to_datetime(text, format=fmt, errors='coerce').notna().mean()
+            if ratio >= MIN_CONFIDENCE:
+                return {'type': 'datetime', 'format': fmt, 'confidence': round(float(ratio), 3)}
+
+    return {'type': 'text', 'format': None, 'confidence': 1.0}
+
+
+def infer_schema(df: 'pd.DataFrame') -> Dict[str, Dict[str, Any]]:
+    """Column name -> inferred type for every column of a sheet"""
+    schema = {}
+    for column in df.columns:
+        try:
+            schema[str(column)] = infer_column(df[column])
+        except Exception as e:
+            logger.debug(f"Type inference failed for column {column!r}: {e}")
+            schema[str(column)] = {'type': 'text', 'format': None, 'confidence': 0.0}
+    return schema
+
+
+def cached_schema(digest: Optional[str], sheet_name: Any,
+                  sample: Callable[[], 'pd.DataFrame']) -> Dict[str, Dict[str, Any]]:
+    """Schema for one sheet, inferred from ``sample()`` only on a cache miss"""
+    if digest is None:
+        return infer_schema(sample())
+
+    key = (digest, str(sheet_name))
+    with _schema_cache_lock:
+        if key in _schema_cache:
+            _schema_cache.move_to_end(key)
+            return _schema_cache[key]
+
+    schema = infer_schema(sample())
+    with _schema_cache_lock:
+        _schema_cache[key] = schema
+        while len(_schema_cache) > SCHEMA_CACHE_SIZE:
+            _schema_cache.popitem(last=False)
+    return schema
+
+
+def apply_schema(df: 'pd.DataFrame', schema: Dict[str, Dict[str, Any]]) -> 'pd.DataFrame':
+    """
+    Convert text-date columns to datetimes with their inferred format.
+
+    A column is converted only when every non-empty value parses; otherwise
+    it is left unchanged so no data is lost. Returns ``df`` itself when
+    nothing changes, or a shallow copy sharing the untouched columns.
+    """
+    result = df
+    for column in df.columns:
+        info = schema.get(str(column))
+        if not info or info['type'] != 'datetime' or not info['format']:
+            continue
+        if df[column].dtype != object:
+            continue
+
+        values = df[column]
+        present = values.notna()
+        converted = pd.to_datetime(values.where(~present, values.astype(str).str.strip()),
+                                   format=info['format'], errors='coerce')
+        if (converted.isna() & present).any():
+            continue
+
+        if result is df:
+            result = df.copy(deep=False)
+        result[column] = converted
+    return result
+
+
+def row_converters(columns: List[str], schema: Dict[str, Dict[str, Any]]) -> List[Optional[Callable[[Any], Any]]]:
+    """
+    Per-column value converters for row-streaming outputs.
+
+    Text values in inferred text-date columns become datetimes; values that
+    do not parse are passed through unchanged.
+    """
+    def make(fmt):
+        def convert(value):
+            if not isinstance(value, str):
+                return value
+            try:
+                return datetime.strptime(value.strip(), fmt)
+            except ValueError:
+                return value
+        return convert
+
+    converters = []
+    for column in columns:
+        info = schema.get(str(column))
+        if info and info['type'] == 'datetime' and info['format']:
+            converters.append(make(info['format']))
+        else:
+            converters.append(None)
+    return converters
@@ -0,0 +1,332 @@
+# utils/excel_converter/excel_streaming.py - STREAMING EXCEL READERS AND WRITERS
+# Row-at-a-time Excel conversion with bounded memory
+#
+# Sheets are read one row at a time (openpyxl read-only mode, or calamine
+# when python-calamine is installed) and written straight to the output file,
+# so memory use does not grow with the number of rows. The DataFrame path in
+# excel_utils remains the fallback for inputs these readers cannot open.
+import os
+import re
+import csv
+import json
+import logging
+from collections import deque
+from datetime import datetime, date, time
+from typing import Any, Iterable, Iterator, List
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# Optional Rust-based reader, much faster than openpyxl on large sheets
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OPENPYXL_EXTENSIONS = {'.xlsx', '.xlsm', '.xltx', '.xltm'}
+CALAMINE_EXTENSIONS = OPENPYXL_EXTENSIONS | {'.xls', '.xlsb', '.ods'}
+
+# Characters that are not allowed anywhere in an XML 1.0 document
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def streaming_supported(input_path: str) -> bool:
+    """Whether a streaming reader is available for this file type"""
+    ext = os.path.splitext(input_path)[1].lower()
+    if CALAMINE_AVAILABLE and ext in CALAMINE_EXTENSIONS:
+        return True
+    return OPENPYXL_AVAILABLE and ext in OPENPYXL_EXTENSIONS
+
+
+def header_names(row: Iterable[Any]) -> List[str]:
+    """Column names from a header row, named and de-duplicated the way pandas does"""
+    names = []
+    seen = {}
+    for index, value in enumerate(row):
+        name = f'Unnamed: {index}' if value is None or value == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            candidate = f'{name}.{seen[name]}'
+            while candidate in seen:
+                seen[name] += 1
+                candidate = f'{name}.{seen[name]}'
+            name = candidate
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _trim(row: Iterable[Any]) -> List[Any]:
+    values = [None if value == '' else value for value in row]
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+class StreamSheet:
+    """One sheet's column names and a single-use iterator over its data rows"""
+
+    def __init__(self, name: str, raw_rows: Iterator[Iterable[Any]], width: int = 0):
+        self.name = name
+        self._raw_rows = raw_rows
+        first = next(raw_rows, None)
+        self.columns = header_names(_trim(first)) if first is not None else []
+        # Writers emit the header before any data row, so columns for rows
+        # wider than the header are added here rather than while reading
+        self.columns.extend(f'Unnamed: {i}' for i in range(len(self.columns), width))
+        self.converters = []
+        self._buffer = deque()
+        self._pending = self._data_rows()
+
+    def peek(self, count: int) -> List[List[Any]]:
+        """Read ahead up to ``count`` data rows without consuming them"""
+        while len(self._buffer) < count:
+            row = next(self._pending, None)
+            if row is None:
+                break
+            self._buffer.append(row)
+        return list(self._buffer)[:count]
+
+    def rows(self) -> Iterator[List[Any]]:
+        """Data rows, with any per-column ``converters`` applied"""
+        while True:
+            row = self._buffer.popleft() if self._buffer else next(self._pending, None)
+            if row is None:
+                return
+            for index, convert in enumerate(self.converters[:len(row)]):
+                if convert is not None and row[index] is not None:
+                    row[index] = convert(row[index])
+            yield row
+
+    def _data_rows(self) -> Iterator[List[Any]]:
+        """
+        Data rows padded or truncated to the header width.
+
+        Blank rows between data rows are kept and trailing blank rows dropped,
+        matching pandas. Rows are only wider than the columns when the sheet
+        width passed in was wrong; the extra cells are dropped.
+        """
+        width = len(self.columns)
+        pending_blank = 0
+        truncated = 0
+        for raw in self._raw_rows:
+            values = _trim(raw)
+            if not values:
+                pending_blank += 1
+                continue
+            for _ in range(pending_blank):
+                yield [None] * width
+            pending_blank = 0
+            if len(values) > width:
+                truncated += 1
+                values = values[:width]
+            yield values + [None] * (width - len(values))
+        if truncated:
+            logger.warning(f"Dropped cells past column {width} in {truncated} rows of sheet {self.name!r}")
+
+
+class WorkbookStream:
+    """Read-only workbook handle yielding sheets row by row"""
+
+    def __init__(self, input_path: str):
+        self.input_path = input_path
+        ext = os.path.splitext(input_path)[1].lower()
+        self._calamine = CALAMINE_AVAILABLE and ext in CALAMINE_EXTENSIONS
+        if self._calamine:
+            self._workbook = CalamineWorkbook.from_path(input_path)
+            self.sheet_names = list(self._workbook.sheet_names)
+        else:
+            # data_only returns cached formula results, like pandas does
+            self._workbook = load_workbook(input_path, read_only=True, data_only=True)
+            self.sheet_names = list(self._workbook.sheetnames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        close = getattr(self._workbook, 'close', None)
+        if close:
+            close()
+
+    def _raw_rows(self, name: str) -> Iterator[Iterable[Any]]:
+        if self._calamine:
+            for row in self._workbook.get_sheet_by_name(name).iter_rows():
+                # calamine reports every number as float
+                yield [int(v) if isinstance(v, float) and v.is_integer() else v for v in row]
+        else:
+            yield from self._workbook[name].iter_rows(values_only=True)
+
+    def _width(self, name: str) -> int:
+        """
+        Number of columns pandas would give the sheet, header row included.
+
+        The recorded sheet dimensions are an upper bound; a sheet whose header
+        fills them needs no further reading. Otherwise the sheet is scanned
+        once for its widest non-blank row, since formatting alone can stretch
+        the dimensions past the data.
+        """
+        if self._calamine:
+            bound = getattr(self._workbook.get_sheet_by_name(name), 'width', None)
+        else:
+            bound = self._workbook[name].max_column
+        first = next(self._raw_rows(name), None)
+        header = len(_trim(first)) if first is not None else 0
+        if bound is not None and bound <= header:
+            return header
+        return max((len(_trim(row)) for row in self._raw_rows(name)), default=0)
+
+    def iter_sheets(self, names: List[str]) -> Iterator[StreamSheet]:
+        for name in names:
+            yield StreamSheet(name, self._raw_rows(name), self._width(name))
+
+
+def text_value(value: Any) -> str:
+    """Cell value as text for CSV, TSV, TXT and XML output"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if value.time() == time(0):
+            return value.date().isoformat()
+        return value.isoformat(sep=' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:  # NaN
+        return ''
+    return str(value)
+
+
+def json_value(value: Any) -> Any:
+    """Cell value as a JSON-serializable object"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _record(sheet: StreamSheet, row: List[Any], include_headers: bool) -> Any:
+    if include_headers:
+        return {column: json_value(value) for column, value in zip(sheet.columns, row)}
+    return [json_value(value) for value in row]
+
+
+def write_delimited(sheet: StreamSheet, output_path: str, delimiter: str = ',',
+                    encoding: str = 'utf-8', include_headers: bool = True,
+                    lineterminator: str = '\r\n') -> None:
+    """Write one sheet as delimited text, one row at a time"""
+    with open(output_path, 'w', encoding=encoding, errors='replace', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter, lineterminator=lineterminator)
+        if include_headers:
+            writer.writerow(sheet.columns)
+        for row in sheet.rows():
+            writer.writerow([text_value(v) for v in row])
+
+
+def write_json(sheets: Iterable[StreamSheet], sheet_count: int, output_path: str,
+               include_headers: bool = True) -> None:
+    """
+    Write sheets as one JSON document, record by record.
+
+    A single sheet is written as a list of rows, several as an object keyed
+    by sheet name. Layout matches json.dump(indent=2).
+    """
+    def write_rows(f, sheet, depth):
+        pad = '  ' * depth
+        f.write('[')
+        first = True
+        for row in sheet.rows():
+            text = json.dumps(_record(sheet, row, include_headers), indent=2, ensure_ascii=False)
+            f.write(('\n' if first else ',\n') + pad + '  ' + text.replace('\n', '\n' + pad + '  '))
+            first = False
+        f.write(']' if first else '\n' + pad + ']')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if sheet_count == 1:
+            for sheet in sheets:
+                write_rows(f, sheet, 0)
+            return
+        f.write('{')
+        first = True
+        for sheet in sheets:
+            f.write(('\n' if first else ',\n') + '  ' + json.dumps(str(sheet.name), ensure_ascii=False) + ': ')
+            write_rows(f, sheet, 1)
+            first = False
+        f.write('}' if first else '\n}')
+
+
+def write_jsonl(sheets: Iterable[StreamSheet], sheet_count: int, output_path: str,
+                include_headers: bool = True) -> None:
+    """Write one JSON value per row; rows are tagged with their sheet when there are several"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for sheet in sheets:
+            for row in sheet.rows():
+                record = _record(sheet, row, include_headers)
+                if sheet_count > 1:
+                    record = {'sheet': sheet.name, 'row': record}
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def write_txt(sheets: Iterable[StreamSheet], output_path: str, include_headers: bool = True) -> None:
+    """Write sheets as tab-separated text with a heading per sheet"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for sheet in sheets:
+            f.write(f"=== {sheet.name} ===\n")
+            if include_headers:
+                f.write("\t".join(sheet.columns) + "\n")
+            for row in sheet.rows():
+                f.write("\t".join(text_value(v) for v in row) + "\n")
+            f.write("\n")
+
+
+def _xml_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return escape(INVALID_XML_CHARS.sub('', text_value(value)))
+
+
+def _xml_attr(value: Any) -> str:
+    return quoteattr(INVALID_XML_CHARS.sub('', str(value)))
+
+
+def write_xml(sheets: Iterable[StreamSheet], output_path: str, include_headers: bool = True) -> None:
+    """Write sheets as <workbook>/<sheet>/<rows>/<row>/<cell> XML, indented like minidom output"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" ?>\n<workbook>\n')
+        for sheet in sheets:
+            f.write(f'  <sheet name={_xml_attr(sheet.name)}>\n')
+            if include_headers:
+                f.write('    <headers>\n')
+                for column in sheet.columns:
+                    f.write(f'      <header>{_xml_text(column)}</header>\n')
+                f.write('    </headers>\n')
+
+            names = sheet.columns if include_headers else range(len(sheet.columns))
+            index = 0
+            for values in sheet.rows():
+                if index == 0:
+                    f.write('    <rows>\n')
+                f.write(f'      <row index="{index}">\n')
+                for column, value in zip(names, values):
+                    text = _xml_text(value)
+                    attr = _xml_attr(column)
+                    f.write(f'        <cell column={attr}>{text}</cell>\n' if text
+                            else f'        <cell column={attr}/>\n')
+                f.write('      </row>\n')
+                index += 1
+            f.write('    </rows>\n' if index else '    <rows/>\n')
+            f.write('  </sheet>\n')
+        f.write('</workbook>\n')
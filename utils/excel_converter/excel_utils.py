@@ -1,5 +1,7 @@
 # utils/excel_converter/excel_utils.py - EXCEL CONVERTER UTILITIES
 # Dedicated utilities for Excel file conversion
+from __future__ import annotations
+
 import os
 import json
 import csv
@@ -11,6 +13,10 @@ from typing import List, Optional, Tuple, Dict, Any
 from datetime import datetime, date
 import io
 
+from core.conversion_cache import cached_conversion
+from core.lazy_imports import lazy_import, module_available
+from utils.excel_converter import excel_schema, excel_streaming
+
 # Universal Security Framework Integration
 try:
     from security.core.validators import validate_content, validate_filename
@@ -20,14 +26,17 @@ except ImportError:
     SECURITY_FRAMEWORK_AVAILABLE = False
 
 # Excel processing dependencies
+# pandas is the slowest import in the app and is only needed once a
+# conversion runs, so it is loaded on first use
 try:
-    import pandas as pd
     import openpyxl
     from openpyxl import load_workbook
-    EXCEL_DEPENDENCIES_AVAILABLE = True
+    EXCEL_DEPENDENCIES_AVAILABLE = module_available('pandas')
 except ImportError:
     EXCEL_DEPENDENCIES_AVAILABLE = False
 
+pd = lazy_import('pandas')
+
 # Additional dependencies for XML processing
 try:
     import xml.etree.ElementTree as ET
@@ -55,10 +64,16 @@ class ExcelConverter:
     - Excel to HTML conversion
     - Excel to TXT conversion
     - Excel to XML conversion
+    - Excel to JSON Lines conversion
+
+    CSV, TSV, JSON, JSON Lines, TXT and XML are written row by row from a
+    read-only workbook (see excel_streaming); the pandas path is used when
+    the streaming readers cannot open the file.
     """
     
     def __init__(self):
         self.temp_dirs = []  # Track temporary directories for cleanup
+        self._digests = {}  # input path -> workbook sha256, for the schema cache
         
         # Check for required dependencies
         self.dependencies = self._check_dependencies()
@@ -110,6 +125,10 @@ class ExcelConverter:
         """Check if XML conversion is available"""
         return (self.dependencies['pandas'] and self.dependencies['xml'])
     
+    def is_jsonl_conversion_available(self) -> bool:
+        """Check if JSON Lines conversion is available"""
+        return self.dependencies['pandas']
+    
     def is_ods_conversion_available(self) -> bool:
         """Check if ODS conversion is available"""
         if not self.dependencies['pandas']:
@@ -216,7 +235,14 @@ class ExcelConverter:
             wb = load_workbook(file_path, read_only=True)
             total_sheets = len(wb.sheetnames)
             wb.close()
-            
+            return self._select_sheet_indices(selection, total_sheets)
+        except Exception as e:
+            logger.error(f"Failed to parse sheet selection '{selection}': {e}")
+            return []
+    
+    def _select_sheet_indices(self, selection: str, total_sheets: int) -> List[int]:
+        """Resolve a selection like "1,3" or "2-4" against a sheet count (0-based result)"""
+        try:
             parts = selection.split(',') if ',' in selection else [selection]
             sheet_indices = set()
             
@@ -241,6 +267,44 @@ class ExcelConverter:
             logger.error(f"Failed to parse sheet selection '{selection}': {e}")
             return []
     
+    def _convert_streaming(self, input_path: str, selected_sheets: str,
+                           write, first_only: bool = False,
+                           preserve_dates: bool = True) -> bool:
+        """
+        Convert through the row-streaming readers.
+
+        ``write`` receives the sheet iterator and the number of sheets it
+        will yield. Returns False when the file cannot be streamed, so the
+        caller falls back to the DataFrame path.
+        """
+        def typed(sheets):
+            for sheet in sheets:
+                if preserve_dates and EXCEL_DEPENDENCIES_AVAILABLE:
+                    schema = self._stream_schema(input_path, sheet)
+                    sheet.converters = excel_schema.row_converters(sheet.columns, schema)
+                yield sheet
+        
+        if not excel_streaming.streaming_supported(input_path):
+            return False
+        
+        try:
+            with excel_streaming.WorkbookStream(input_path) as workbook:
+                names = workbook.sheet_names
+                if selected_sheets not in ('all', 'first'):
+                    indices = self._select_sheet_indices(selected_sheets, len(names))
+                    names = [names[i] for i in indices] or names[:1]
+                if first_only or selected_sheets == 'first':
+                    names = names[:1]
+                if not names:
+                    return False
+                
+                write(typed(workbook.iter_sheets(names)), len(names))
+            return True
+            
+        except Exception as e:
+            logger.warning(f"Streaming conversion failed for {input_path}, using DataFrame path: {e}")
+            return False
+    
     def _write_excel_compatible_csv(self, df: pd.DataFrame, output_path: str, 
                                    delimiter: str = ',', encoding: str = 'utf-8', 
                                    include_headers: bool = True) -> None:
@@ -340,43 +404,18 @@ class ExcelConverter:
     def _process_dataframe(self, df: pd.DataFrame, 
                           convert_formulas: bool = True,
                           preserve_dates: bool = True,
-                          include_headers: bool = True) -> pd.DataFrame:
+                          include_headers: bool = True,
+                          schema: Optional[Dict[str, Dict[str, Any]]] = None) -> pd.DataFrame:
         """Process DataFrame based on conversion options"""
         try:
-            processed_df = df.copy()
+            processed_df = df
             
-            # Handle date preservation
+            # Handle date preservation: convert the text-date columns found by
+            # type inference; untouched columns are shared with df, not copied
             if preserve_dates:
-                for col in processed_df.columns:
-                    if processed_df[col].dtype == 'datetime64[ns]':
-                        # Keep datetime format
-                        continue
-                    elif processed_df[col].dtype == 'object':
-                        # Try to convert to datetime if possible
-                        try:
-                            # Use modern pandas approach with better date detection
-                            temp_series = processed_df[col].copy().dropna()
-                            
-                            # Only try datetime conversion if we have data and it looks like dates
-                            if len(temp_series) > 0:
-                                # Check if any values look like dates (simple heuristic)
-                                sample_val = str(temp_series.iloc[0]) if len(temp_series) > 0 else ''
-                                
-                                # Look for common date patterns
-                                if any(char in sample_val for char in ['-', '/', ':', ' ']) and len(sample_val) > 5:
-                                    try:
-                                        # Use modern pandas datetime parsing (infer_datetime_format is deprecated)
-                                        import warnings
-                                        with warnings.catch_warnings():
-                                            warnings.simplefilter('ignore', UserWarning)
-                                            # Modern pandas automatically infers datetime format
-                                            processed_df[col] = pd.to_datetime(processed_df[col], errors='coerce')
-                                    except (ValueError, TypeError):
-                                        # If conversion fails, keep original values
-                                        pass
-                        except Exception:
-                            # If any error occurs, keep original values
-                            pass
+                if schema is None:
+                    schema = excel_schema.infer_schema(df)
+                processed_df = excel_schema.apply_schema(df, schema)
             
             # Handle formula conversion (formulas are already converted to values by pandas)
             if convert_formulas:
@@ -385,7 +424,7 @@ class ExcelConverter:
             
             # Handle headers
             if not include_headers:
-                processed_df.columns = range(len(processed_df.columns))
+                processed_df = processed_df.set_axis(range(len(processed_df.columns)), axis=1, copy=False)
             
             return processed_df
             
@@ -393,6 +432,30 @@ class ExcelConverter:
             logger.error(f"Failed to process DataFrame: {e}")
             return df
     
+    def _workbook_digest(self, input_path: str) -> Optional[str]:
+        if input_path not in self._digests:
+            try:
+                self._digests[input_path] = excel_schema.workbook_digest(input_path)
+            except OSError as e:
+                logger.warning(f"Could not hash {input_path}: {e}")
+                self._digests[input_path] = None
+        return self._digests[input_path]
+    
+    def _sheet_schema(self, input_path: str, sheet_name: Any, df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """Inferred column types for a loaded sheet, shared across output formats"""
+        return excel_schema.cached_schema(
+            self._workbook_digest(input_path), sheet_name,
+            lambda: df.head(excel_schema.SCHEMA_SAMPLE_ROWS)
+        )
+    
+    def _stream_schema(self, input_path: str, sheet: 'excel_streaming.StreamSheet') -> Dict[str, Dict[str, Any]]:
+        """Inferred column types for a streamed sheet, from its buffered leading rows"""
+        def sample():
+            rows = sheet.peek(excel_schema.SCHEMA_SAMPLE_ROWS)
+            return pd.DataFrame(rows, columns=list(sheet.columns))
+        return excel_schema.cached_schema(self._workbook_digest(input_path), sheet.name, sample)
+    
+    @cached_conversion('excel_to_csv', version='4')
     def excel_to_csv(self, input_path: str, output_path: str,
                     preserve_formatting: bool = False,
                     include_headers: bool = True,
@@ -419,6 +482,18 @@ class ExcelConverter:
             
             logger.info(f"Converting Excel to CSV: {input_path} -> {output_path}")
             
+            # UTF-8 gets a BOM so Excel detects the encoding
+            stream_encoding = 'utf-8-sig' if csv_encoding.lower() in ['utf-8', 'utf8'] else csv_encoding
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_delimited(
+                    next(sheets), output_path, csv_delimiter, stream_encoding, include_headers
+                ),
+                first_only=True, preserve_dates=preserve_dates
+            ):
+                logger.info(f"CSV conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
             # Load Excel file
             excel_data = self._load_excel_file(input_path, selected_sheets)
             if not excel_data:
@@ -428,7 +503,8 @@ class ExcelConverter:
             # Take the first sheet if multiple sheets are loaded
             sheet_name, df = next(iter(excel_data.items()))
             processed_df = self._process_dataframe(
-                df, convert_formulas, preserve_dates, include_headers
+                df, convert_formulas, preserve_dates, include_headers,
+                schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
             )
             
             # Write Excel-compatible CSV
@@ -453,6 +529,7 @@ class ExcelConverter:
             logger.error(f"CSV conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_tsv', version='4')
     def excel_to_tsv(self, input_path: str, output_path: str,
                     preserve_formatting: bool = False,
                     include_headers: bool = True,
@@ -479,6 +556,16 @@ class ExcelConverter:
             
             logger.info(f"Converting Excel to TSV: {input_path} -> {output_path}")
             
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_delimited(
+                    next(sheets), output_path, '\t', tsv_encoding, include_headers, lineterminator='\n'
+                ),
+                first_only=True, preserve_dates=preserve_dates
+            ):
+                logger.info(f"TSV conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
             # Load Excel file
             excel_data = self._load_excel_file(input_path, selected_sheets)
             if not excel_data:
@@ -487,7 +574,8 @@ class ExcelConverter:
             # Handle multiple sheets (take first sheet for TSV)
             sheet_name, df = next(iter(excel_data.items()))
             processed_df = self._process_dataframe(
-                df, convert_formulas, preserve_dates, include_headers
+                df, convert_formulas, preserve_dates, include_headers,
+                schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
             )
             
             # TSV uses tab as delimiter
@@ -514,6 +602,7 @@ class ExcelConverter:
             logger.error(f"TSV conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_json', version='4')
     def excel_to_json(self, input_path: str, output_path: str,
                      preserve_formatting: bool = False,
                      include_headers: bool = True,
@@ -539,6 +628,16 @@ class ExcelConverter:
             
             logger.info(f"Converting Excel to JSON: {input_path} -> {output_path}")
             
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_json(
+                    sheets, count, output_path, include_headers
+                ),
+                preserve_dates=preserve_dates
+            ):
+                logger.info(f"JSON conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
             # Load Excel file
             excel_data = self._load_excel_file(input_path, selected_sheets)
             if not excel_data:
@@ -549,7 +648,8 @@ class ExcelConverter:
             
             for sheet_name, df in excel_data.items():
                 processed_df = self._process_dataframe(
-                    df, convert_formulas, preserve_dates, include_headers
+                    df, convert_formulas, preserve_dates, include_headers,
+                    schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                 )
                 
                 # Convert DataFrame to JSON-compatible format
@@ -597,6 +697,77 @@ class ExcelConverter:
             logger.error(f"JSON conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_jsonl', version='3')
+    def excel_to_jsonl(self, input_path: str, output_path: str,
+                      preserve_formatting: bool = False,
+                      include_headers: bool = True,
+                      convert_formulas: bool = True,
+                      preserve_dates: bool = True,
+                      selected_sheets: str = 'all',
+                      **kwargs) -> bool:
+        """Convert Excel to JSON Lines (one JSON value per row)"""
+        try:
+            if not self.is_jsonl_conversion_available():
+                logger.error("Required dependencies not available for JSON Lines conversion")
+                return False
+            
+            if not os.path.exists(input_path):
+                logger.error(f"Input file not found: {input_path}")
+                return False
+            
+            # Security validation
+            is_safe, security_issues = self.validate_file_security(input_path)
+            if not is_safe:
+                logger.error(f"Security validation failed for {input_path}: {security_issues}")
+                return False
+            
+            logger.info(f"Converting Excel to JSON Lines: {input_path} -> {output_path}")
+            
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_jsonl(
+                    sheets, count, output_path, include_headers
+                ),
+                preserve_dates=preserve_dates
+            ):
+                logger.info(f"JSON Lines conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
+            # Load Excel file
+            excel_data = self._load_excel_file(input_path, selected_sheets)
+            if not excel_data:
+                return False
+            
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for sheet_name, df in excel_data.items():
+                    processed_df = self._process_dataframe(
+                        df, convert_formulas, preserve_dates, include_headers,
+                        schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
+                    )
+                    rows = processed_df.to_dict('records') if include_headers else processed_df.values.tolist()
+                    for row in rows:
+                        if isinstance(row, dict):
+                            record = {str(k): excel_streaming.json_value(None if pd.isna(v) else v)
+                                      for k, v in row.items()}
+                        else:
+                            record = [excel_streaming.json_value(None if pd.isna(v) else v) for v in row]
+                        if len(excel_data) > 1:
+                            record = {'sheet': str(sheet_name), 'row': record}
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            
+            success = os.path.exists(output_path)
+            if success:
+                logger.info(f"JSON Lines conversion successful: {output_path}")
+            else:
+                logger.error("JSON Lines conversion failed - output file not created")
+                
+            return success
+            
+        except Exception as e:
+            logger.error(f"JSON Lines conversion error: {e}")
+            return False
+    
+    @cached_conversion('excel_to_html', version='2')
     def excel_to_html(self, input_path: str, output_path: str,
                      preserve_formatting: bool = True,
                      include_headers: bool = True,
@@ -653,7 +824,8 @@ class ExcelConverter:
             
             for sheet_name, df in excel_data.items():
                 processed_df = self._process_dataframe(
-                    df, convert_formulas, preserve_dates, include_headers
+                    df, convert_formulas, preserve_dates, include_headers,
+                    schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                 )
                 
                 html_content += f'    <div class="sheet">\n'
@@ -693,6 +865,7 @@ class ExcelConverter:
             logger.error(f"HTML conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_txt', version='4')
     def excel_to_txt(self, input_path: str, output_path: str,
                     preserve_formatting: bool = False,
                     include_headers: bool = True,
@@ -718,6 +891,14 @@ class ExcelConverter:
             
             logger.info(f"Converting Excel to TXT: {input_path} -> {output_path}")
             
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_txt(sheets, output_path, include_headers),
+                preserve_dates=preserve_dates
+            ):
+                logger.info(f"TXT conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
             # Load Excel file
             excel_data = self._load_excel_file(input_path, selected_sheets)
             if not excel_data:
@@ -728,7 +909,8 @@ class ExcelConverter:
             
             for sheet_name, df in excel_data.items():
                 processed_df = self._process_dataframe(
-                    df, convert_formulas, preserve_dates, include_headers
+                    df, convert_formulas, preserve_dates, include_headers,
+                    schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                 )
                 
                 txt_content.append(f"=== {sheet_name} ===\n")
@@ -759,6 +941,7 @@ class ExcelConverter:
             logger.error(f"TXT conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_xml', version='4')
     def excel_to_xml(self, input_path: str, output_path: str,
                     preserve_formatting: bool = False,
                     include_headers: bool = True,
@@ -784,6 +967,14 @@ class ExcelConverter:
             
             logger.info(f"Converting Excel to XML: {input_path} -> {output_path}")
             
+            if self._convert_streaming(
+                input_path, selected_sheets,
+                lambda sheets, count: excel_streaming.write_xml(sheets, output_path, include_headers),
+                preserve_dates=preserve_dates
+            ):
+                logger.info(f"XML conversion successful (streamed): {output_path}")
+                return os.path.exists(output_path)
+            
             # Load Excel file
             excel_data = self._load_excel_file(input_path, selected_sheets)
             if not excel_data:
@@ -794,7 +985,8 @@ class ExcelConverter:
             
             for sheet_name, df in excel_data.items():
                 processed_df = self._process_dataframe(
-                    df, convert_formulas, preserve_dates, include_headers
+                    df, convert_formulas, preserve_dates, include_headers,
+                    schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                 )
                 
                 sheet_elem = ET.SubElement(root, "sheet", name=sheet_name)
@@ -1260,6 +1452,14 @@ class ExcelConverter:
             
             wb.close()
             
+            # Column types, inferred once and reused by the conversion that follows
+            try:
+                with excel_streaming.WorkbookStream(input_path) as workbook:
+                    for info, sheet in zip(sheets_info, workbook.iter_sheets(workbook.sheet_names)):
+                        info['schema'] = self._stream_schema(input_path, sheet)
+            except Exception as e:
+                logger.warning(f"Column type inference failed for {input_path}: {e}")
+            
             return {
                 'success': True,
                 'file_info': {
@@ -1277,6 +1477,7 @@ class ExcelConverter:
                 'error': f'Analysis failed: {str(e)}'
             }
     
+    @cached_conversion('excel_to_ods', version='2')
     def excel_to_ods(self, input_path: str, output_path: str,
                     preserve_formatting: bool = False,
                     include_headers: bool = True,
@@ -1334,7 +1535,8 @@ class ExcelConverter:
                         
                         # Optimize data processing for large datasets
                         processed_df = self._process_dataframe(
-                            df, convert_formulas, preserve_dates, include_headers
+                            df, convert_formulas, preserve_dates, include_headers,
+                            schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                         )
                         
                         # Limit data if too large to prevent timeouts
@@ -1371,6 +1573,7 @@ class ExcelConverter:
             logger.error(f"ODS conversion error: {e}")
             return False
     
+    @cached_conversion('excel_to_pdf', version='2')
     def excel_to_pdf(self, input_path: str, output_path: str,
                     preserve_formatting: bool = True,
                     include_headers: bool = True,
@@ -1442,7 +1645,8 @@ class ExcelConverter:
                 
                 for sheet_idx, (sheet_name, df) in enumerate(excel_data.items()):
                     processed_df = self._process_dataframe(
-                        df, convert_formulas, preserve_dates, include_headers
+                        df, convert_formulas, preserve_dates, include_headers,
+                        schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                     )
                     
                     # Add page break between sheets (except first)
@@ -1525,7 +1729,8 @@ class ExcelConverter:
             
             for sheet_name, df in excel_data.items():
                 processed_df = self._process_dataframe(
-                    df, convert_formulas, preserve_dates, include_headers
+                    df, convert_formulas, preserve_dates, include_headers,
+                    schema=self._sheet_schema(input_path, sheet_name, df) if preserve_dates else None
                 )
                 
                 html_content += f'<div class="sheet-title">{sheet_name}</div>\n'
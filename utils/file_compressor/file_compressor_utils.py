@@ -15,7 +15,15 @@ import shutil
 from typing import Dict, List, Tuple, Optional, Union
 from pathlib import Path
 import time
+import math
+import itertools
 import hashlib
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from core.process_pools import pool_size
 
 # Core libraries
 try:
@@ -44,6 +52,8 @@ try:
 except ImportError:
     FFMPEG_AVAILABLE = False
 
+from utils.image_converter.target_size_encoder import encode_to_target_size, save_to_target_size
+
 # Archive handling
 import zipfile
 import gzip
@@ -58,6 +68,12 @@ class ValidationError(Exception):
     """Raised when file validation fails"""
     pass
 
+# PDF image recompression settings
+PDF_IMAGE_MIN_BYTES = 10000  # Leave small images alone
+PDF_IMAGE_MIN_SAVINGS = 0.10  # Keep a recompressed image only if it is at least 10% smaller
+# Host-wide budget (default: the number of cores), split between the web workers
+PDF_IMAGE_WORKERS = pool_size('PDF_IMAGE_WORKERS')
+
 # File type mappings
 FILE_CATEGORIES = {
     'image': {'jpg', 'jpeg', 'png', 'webp', 'bmp', 'tiff'},
@@ -246,25 +262,10 @@ def compress_pdf(input_path: str, output_path: str, options: Dict) -> Dict:
         ascii = False
         
         # Apply AI optimization
+        image_stats = {'recompressed': 0, 'skipped': 0}
         if options.get('ai_optimization', True):
-            # Compress images within PDF
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    try:
-                        xref = img[0]
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        
-                        # Compress image
-                        if len(image_bytes) > 10000:  # Only compress larger images
-                            compressed_image = compress_pdf_image(image_bytes, options)
-                            if compressed_image:
-                                doc.update_stream(xref, compressed_image)
-                    except Exception:
-                        continue
+            # Recompress each unique image once, in parallel
+            image_stats = recompress_pdf_images(doc, options)
         
         # Remove metadata if requested
         if options.get('remove_metadata', False):
@@ -285,7 +286,9 @@ def compress_pdf(input_path: str, output_path: str, options: Dict) -> Dict:
             'success': True,
             'original_size': original_size,
             'compressed_size': compressed_size,
-            'compression_ratio': compression_ratio
+            'compression_ratio': compression_ratio,
+            'images_recompressed': image_stats['recompressed'],
+            'images_skipped': image_stats['skipped']
         }
         
     except Exception as e:
@@ -417,65 +420,224 @@ def remove_image_metadata(img: Image.Image) -> Image.Image:
 def compress_image_to_target_size(img: Image.Image, output_path: str, options: Dict) -> Dict:
     """Compress image to specific target size"""
     target_size = options.get('target_size', 1024 * 1024)  # 1MB default
-    max_iterations = options.get('max_iterations', 5)
     
     original_size = img.size[0] * img.size[1] * len(img.getbands())
     
-    quality = 95
-    for attempt in range(max_iterations):
-        temp_path = output_path + f'.temp{attempt}'
-        
-        img.save(temp_path, quality=quality, optimize=True)
-        file_size = os.path.getsize(temp_path)
-        
-        if file_size <= target_size or quality <= 10:
-            os.rename(temp_path, output_path)
-            return {
-                'success': True,
-                'original_size': original_size,
-                'compressed_size': file_size,
-                'compression_ratio': ((original_size - file_size) / original_size) * 100
-            }
-        
-        # Adjust quality for next iteration
-        quality = max(10, quality - 15)
-        os.remove(temp_path)
-    
-    # If we couldn't reach target size, use the best quality we achieved
-    img.save(output_path, quality=quality, optimize=True)
-    compressed_size = os.path.getsize(output_path)
+    # Search quality (and scale) in memory, then write the result once
+    encoded = save_to_target_size(
+        img, output_path, int(target_size),
+        allow_resize=options.get('allow_resize', False)
+    )
+    compressed_size = len(encoded['data'])
     
-    return {
+    result = {
         'success': True,
         'original_size': original_size,
         'compressed_size': compressed_size,
         'compression_ratio': ((original_size - compressed_size) / original_size) * 100,
-        'note': f'Target size not achieved, compressed to {compressed_size} bytes'
+        'quality': encoded['quality'],
+        'dimensions': encoded['dimensions']
     }
+    if not encoded['met_target']:
+        result['note'] = f'Target size not achieved, compressed to {compressed_size} bytes'
+    
+    return result
+
+# PDF image recompression
+
+_pdf_image_executor = None
+_pdf_image_executor_lock = threading.Lock()
+
+def get_pdf_image_executor() -> ProcessPoolExecutor:
+    """Shared process pool for PDF image recompression"""
+    global _pdf_image_executor
+    with _pdf_image_executor_lock:
+        if _pdf_image_executor is None:
+            _pdf_image_executor = ProcessPoolExecutor(max_workers=PDF_IMAGE_WORKERS)
+        return _pdf_image_executor
+
+def _reset_pdf_image_executor():
+    global _pdf_image_executor
+    with _pdf_image_executor_lock:
+        if _pdf_image_executor is not None:
+            _pdf_image_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_image_executor = None
+
+def collect_pdf_images(doc) -> Dict[int, Dict]:
+    """
+    Map each unique image xref to its pixel size and largest placed size.
+
+    Placed sizes are in points and come from every page that shows the
+    image, so shared images are listed once. Soft masks are excluded since
+    they must stay lossless.
+    """
+    images = {}
+    smasks = set()
+    
+    for page in doc:
+        for item in page.get_images(full=True):
+            if item[1]:
+                smasks.add(item[1])
+        
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get('xref')
+            if not xref:
+                continue
+            x0, y0, x1, y1 = info['bbox']
+            entry = images.setdefault(xref, {
+                'width': info['width'],
+                'height': info['height'],
+                'placed_width': 0.0,
+                'placed_height': 0.0
+            })
+            entry['placed_width'] = max(entry['placed_width'], abs(x1 - x0))
+            entry['placed_height'] = max(entry['placed_height'], abs(y1 - y0))
+    
+    for xref in smasks:
+        images.pop(xref, None)
+    
+    return images
+
+def pdf_image_target_size(image: Dict, target_dpi: Optional[int]) -> Optional[Tuple[int, int]]:
+    """Pixel size for an image at target_dpi, or None if it should not be downsampled"""
+    if not target_dpi or not image['placed_width'] or not image['placed_height']:
+        return None
+    
+    scale = min(
+        image['placed_width'] / 72.0 * target_dpi / image['width'],
+        image['placed_height'] / 72.0 * target_dpi / image['height']
+    )
+    # Ignore marginal resampling that costs quality for little gain
+    if scale >= 0.9:
+        return None
+    
+    return (max(1, math.ceil(image['width'] * scale)), max(1, math.ceil(image['height'] * scale)))
+
+def recompress_pdf_image(xref: int, image_bytes: bytes, raw_size: int,
+                         target_size: Optional[Tuple[int, int]], quality: int,
+                         min_savings: float) -> Tuple[int, Optional[Dict]]:
+    """
+    Re-encode one PDF image as JPEG, downsampling to target_size if given.
 
-def compress_pdf_image(image_bytes: bytes, options: Dict) -> Optional[bytes]:
-    """Compress images within PDF files"""
+    Runs in a worker process. Returns (xref, None) when the image type is
+    not safe to convert or the result would not be smaller than raw_size
+    by at least min_savings.
+    """
     try:
-        if not PIL_AVAILABLE:
-            return None
-        
-        from io import BytesIO
         img = Image.open(BytesIO(image_bytes))
+        img.load()
+        
+        # Bilevel, CMYK, alpha and high bit-depth images are left untouched
+        if img.mode == 'P' and 'transparency' not in img.info:
+            img = img.convert('RGB')
+        if img.mode not in ('RGB', 'L'):
+            return xref, None
+        
+        if target_size and target_size[0] < img.width:
+            img = img.resize(target_size, Image.LANCZOS)
         
-        # Compress image
         output = BytesIO()
-        quality = options.get('quality', 75)
         img.save(output, format='JPEG', quality=quality, optimize=True)
+        data = output.getvalue()
         
-        compressed_bytes = output.getvalue()
-        
-        # Only return if compression achieved size reduction
-        if len(compressed_bytes) < len(image_bytes):
-            return compressed_bytes
+        if len(data) > raw_size * (1 - min_savings):
+            return xref, None
         
-        return None
+        return xref, {
+            'data': data,
+            'width': img.width,
+            'height': img.height,
+            'colorspace': '/DeviceRGB' if img.mode == 'RGB' else '/DeviceGray'
+        }
     except Exception:
-        return None
+        return xref, None
+
+def replace_pdf_image(doc, xref: int, image: Dict) -> None:
+    """Swap an image XObject's stream for JPEG data and fix up its dictionary"""
+    doc.update_stream(xref, image['data'], compress=False)
+    doc.xref_set_key(xref, 'Filter', '/DCTDecode')
+    doc.xref_set_key(xref, 'DecodeParms', 'null')
+    doc.xref_set_key(xref, 'Decode', 'null')
+    doc.xref_set_key(xref, 'Width', str(image['width']))
+    doc.xref_set_key(xref, 'Height', str(image['height']))
+    doc.xref_set_key(xref, 'ColorSpace', image['colorspace'])
+    doc.xref_set_key(xref, 'BitsPerComponent', '8')
+    # Color-key masks refer to the old color values
+    if doc.xref_get_key(xref, 'Mask')[0] == 'array':
+        doc.xref_set_key(xref, 'Mask', 'null')
+
+def recompress_pdf_images(doc, options: Dict) -> Dict:
+    """
+    Recompress the images of an open PDF in place.
+
+    Each shared image is extracted once, unique images are re-encoded in a
+    process pool, and only results that shrink by PDF_IMAGE_MIN_SAVINGS are
+    written back. options may set quality, target_dpi and min_savings.
+    """
+    if not PIL_AVAILABLE:
+        return {'recompressed': 0, 'skipped': 0}
+    
+    quality = options.get('quality', 75)
+    target_dpi = options.get('target_dpi')
+    min_savings = options.get('min_savings', PDF_IMAGE_MIN_SAVINGS)
+    
+    def tasks():
+        for xref, image in collect_pdf_images(doc).items():
+            try:
+                raw_size = len(doc.xref_stream_raw(xref) or b'')
+                if raw_size < PDF_IMAGE_MIN_BYTES:
+                    continue
+                image_bytes = doc.extract_image(xref)['image']
+            except Exception:
+                continue
+            yield (xref, image_bytes, raw_size, pdf_image_target_size(image, target_dpi),
+                   quality, min_savings)
+    
+    results = {}
+    task_iter = tasks()
+    first_tasks = list(itertools.islice(task_iter, 2))
+    
+    if len(first_tasks) > 1 and PDF_IMAGE_WORKERS > 1:
+        task_iter = itertools.chain(first_tasks, task_iter)
+        pending = {}
+        task = None
+        try:
+            executor = get_pdf_image_executor()
+            # Bound in-flight images so large scans do not pile up in memory
+            max_in_flight = PDF_IMAGE_WORKERS * 2
+            for task in task_iter:
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results.update([future.result()])
+                        pending.pop(future)
+                pending[executor.submit(recompress_pdf_image, *task)] = task
+                task = None
+            for future in wait(pending)[0]:
+                results.update([future.result()])
+        except BrokenProcessPool:
+            # Finish serially with whatever the broken pool left undone,
+            # including an image taken from the queue but not yet submitted
+            _reset_pdf_image_executor()
+            unsubmitted = [task] if task is not None else []
+            for task in itertools.chain(pending.values(), unsubmitted, task_iter):
+                if task[0] not in results:
+                    results.update([recompress_pdf_image(*task)])
+    else:
+        for task in itertools.chain(first_tasks, task_iter):
+            results.update([recompress_pdf_image(*task)])
+    
+    recompressed = 0
+    for xref, image in results.items():
+        if image is None:
+            continue
+        try:
+            replace_pdf_image(doc, xref, image)
+            recompressed += 1
+        except Exception:
+            continue
+    
+    return {'recompressed': recompressed, 'skipped': len(results) - recompressed}
 
 def compress_office_document(input_path: str, output_path: str, options: Dict) -> Dict:
     """Compress Office documents (DOCX, PPTX)"""
@@ -582,28 +744,38 @@ def apply_quality_based_compression(file_path: str, quality: int, file_type: str
     except Exception:
         return False
 
-def apply_target_size_compression(file_path: str, target_size: int, max_iterations: int) -> bool:
-    """Apply target size compression to a file"""
+def apply_target_size_compression(file_path: str, target_size: int, max_iterations: int,
+                                  allow_resize: bool = False) -> Dict:
+    """
+    Apply target size compression to a file
+
+    Images are only downscaled when allow_resize is set; the result reports
+    the final dimensions either way.
+    """
     try:
         current_size = os.path.getsize(file_path)
-        if current_size <= target_size:
-            return True
-        
         file_type = get_file_category(file_path)
         
-        for iteration in range(max_iterations):
-            if file_type == 'image':
-                quality = max(10, 95 - (iteration * 15))
-                if compress_image_quality(file_path, quality):
-                    current_size = os.path.getsize(file_path)
-                    if current_size <= target_size:
-                        return True
-            else:
-                break  # Target size compression only implemented for images
+        if file_type == 'image' and PIL_AVAILABLE:
+            with Image.open(file_path) as img:
+                if current_size <= target_size:
+                    return {'success': True, 'dimensions': img.size}
+                encoded = encode_to_target_size(img, int(target_size), img.format,
+                                                allow_resize=allow_resize)
+            with open(file_path, 'wb') as f:
+                f.write(encoded['data'])
+            result = {'success': encoded['met_target'], 'dimensions': encoded['dimensions']}
+            if not encoded['met_target']:
+                result['note'] = f'Target size not achieved, compressed to {len(encoded["data"])} bytes'
+            return result
         
-        return os.path.getsize(file_path) <= target_size
-    except Exception:
-        return False
+        if current_size <= target_size:
+            return {'success': True}
+        
+        # Target size compression only implemented for images
+        return {'success': False, 'error': 'Target size compression is only available for images'}
+    except Exception as e:
+        return {'success': False, 'error': f'Target size compression failed: {str(e)}'}
 
 def apply_password_protection(file_path: str, options: Dict) -> Dict:
     """Apply password protection to the compressed file"""
@@ -10,6 +10,8 @@ import io
 import zipfile
 from typing import Dict, List, Tuple, Optional
 
+from utils.image_converter.target_size_encoder import save_to_target_size
+
 # Enable loading of truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
@@ -41,8 +43,14 @@ def get_optimal_dimensions(img: Image.Image, max_size: int = 1920) -> Tuple[int,
     ratio = min(max_size / width, max_size / height)
     return int(width * ratio), int(height * ratio)
 
-def compress_image_advanced(input_path: str, output_path: str, level: str, max_dimension: int = None) -> bool:
-    """Advanced image compression with multiple optimization techniques"""
+def compress_image_advanced(input_path: str, output_path: str, level: str, max_dimension: int = None,
+                            target_size: int = None, allow_resize: bool = False) -> bool:
+    """
+    Advanced image compression with multiple optimization techniques
+
+    With target_size (bytes), the highest quality up to the level's quality
+    that fits the budget is chosen, downscaling further only with allow_resize.
+    """
     try:
         with Image.open(input_path) as img:
             # Convert RGBA to RGB if saving as JPEG
@@ -71,6 +79,12 @@ def compress_image_advanced(input_path: str, output_path: str, level: str, max_d
             }
             settings = quality_settings.get(level, quality_settings['medium'])
             
+            if target_size:
+                image_format = {'.png': 'PNG', '.webp': 'WEBP'}.get(original_ext, 'JPEG')
+                save_to_target_size(img, output_path, target_size, image_format,
+                                    max_quality=settings['quality'], allow_resize=allow_resize)
+                return True
+            
             if original_ext == '.png':
                 # PNG optimization
                 img.save(output_path, 'PNG', optimize=True, compress_level=9)
@@ -92,10 +106,12 @@ def compress_image_advanced(input_path: str, output_path: str, level: str, max_d
         current_app.logger.error(f"Error compressing image {input_path}: {e}")
         return False
 
-def compress_image(input_path: str, output_path: str, level: str) -> bool:
+def compress_image(input_path: str, output_path: str, level: str, target_size: int = None,
+                   allow_resize: bool = False) -> bool:
     """Enhanced image compression wrapper"""
     max_dimensions = {'low': 1280, 'medium': 1920, 'high': None}
-    return compress_image_advanced(input_path, output_path, level, max_dimensions.get(level))
+    return compress_image_advanced(input_path, output_path, level, max_dimensions.get(level), target_size,
+                                   allow_resize)
 
 def compress_pdf_advanced(input_path: str, output_path: str, level: str) -> bool:
     """Advanced PDF compression with image optimization"""
@@ -278,6 +294,19 @@ def cleanup_files():
         # Define cleanup directories relative to current working directory
         cleanup_dirs = ['uploads', 'compressed', 'outputs']
         
+        # Expired files come from the storage index in expiry order; the
+        # directory scan below is only used when the index is disabled
+        from core.storage_index import storage_index
+        if storage_index.enabled:
+            deleted = 0
+            swept = storage_index.sweep()
+            while swept['deleted'] or swept['missing']:
+                deleted += swept['deleted']
+                swept = storage_index.sweep()
+            if deleted:
+                print(f"APScheduler: Cleaned up {deleted} expired files")
+            cleanup_dirs = []
+        
         for dir_name in cleanup_dirs:
             if os.path.exists(dir_name):
                 try:
@@ -290,6 +319,18 @@ def cleanup_files():
                                 print(f"APScheduler: Cleaned up old file: {filename} from {dir_name}")
                 except Exception as e:
                     print(f"APScheduler: Error during cleanup in {dir_name}: {e}")
+        
+        # Expire conversion cache entries past their TTL
+        from core.conversion_cache import conversion_cache
+        purged = conversion_cache.purge_expired()
+        if purged['deleted']:
+            print(f"APScheduler: Purged {purged['deleted']} expired conversion cache entries")
+        
+        # Remove finished background jobs past their result TTL
+        from core.job_queue import job_queue
+        purged = job_queue.purge_expired()
+        if purged['deleted']:
+            print(f"APScheduler: Purged {purged['deleted']} expired background jobs")
                     
     except Exception as e:
         print(f"APScheduler: Error during file cleanup: {e}")
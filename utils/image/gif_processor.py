@@ -12,6 +12,7 @@ import zipfile
 from typing import List, Dict, Tuple, Optional, Any
 import logging
 from datetime import datetime
+from core.storage_index import record_after_request
 
 
 class GIFProcessor:
@@ -172,6 +173,7 @@ class GIFProcessor:
             if not output_path:
                 output_filename = f"sequence_{uuid.uuid4().hex}.gif"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
             
             images = []
             
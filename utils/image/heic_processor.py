@@ -6,6 +6,7 @@ Handles Apple HEIC image format conversion
 import os
 import uuid
 from PIL import Image
+from core.storage_index import record_after_request
 try:
     from pillow_heif import register_heif_opener
     register_heif_opener()
@@ -37,6 +38,7 @@ class HEICProcessor:
                 # Generate output filename
                 output_filename = f"{uuid.uuid4().hex}_converted.jpg"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
                 
                 # Save as JPG with specified quality
                 img.save(output_path, 'JPEG', quality=quality, optimize=True)
@@ -63,6 +65,7 @@ class HEICProcessor:
                     # Generate HEIC output filename
                     output_filename = f"{uuid.uuid4().hex}_converted.heic"
                     output_path = os.path.join(self.upload_folder, output_filename)
+                    record_after_request(output_path)
                     
                     # Save as HEIC format
                     img.save(output_path, 'HEIF', quality=quality, optimize=True)
@@ -77,6 +80,7 @@ class HEICProcessor:
                     # Fallback to high-quality JPG if HEIC encoding fails
                     output_filename = f"{uuid.uuid4().hex}_heic_fallback.jpg"
                     output_path = os.path.join(self.upload_folder, output_filename)
+                    record_after_request(output_path)
                     
                     # Save as high-quality JPG with notice
                     img.save(output_path, 'JPEG', quality=min(quality + 10, 100), optimize=True)
@@ -103,6 +107,7 @@ class HEICProcessor:
                 ext = 'jpg' if output_format == 'JPEG' else output_format.lower()
                 output_filename = f"{uuid.uuid4().hex}_converted.{ext}"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
                 
                 # Save with metadata
                 save_kwargs = {
@@ -209,6 +214,7 @@ class HEICProcessor:
                 # Generate preview filename
                 preview_filename = f"{uuid.uuid4().hex}_preview.jpg"
                 preview_path = os.path.join(self.upload_folder, preview_filename)
+                record_after_request(preview_path)
                 
                 # Resize for web preview (max 1200px width while maintaining aspect ratio)
                 max_width = 1200
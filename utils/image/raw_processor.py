@@ -10,6 +10,7 @@ from PIL import Image, ImageEnhance, ExifTags
 from datetime import datetime
 import tempfile
 import json
+from core.storage_index import record_after_request
 
 try:
     import rawpy
@@ -149,6 +150,7 @@ class RAWProcessor:
                 output_ext = 'jpg' if output_format.upper() == 'JPEG' else output_format.lower()
                 output_filename = f"{uuid.uuid4().hex}_{base_name}_processed.{output_ext}"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
                 
                 # Save with format-specific options
                 if output_format.upper() == 'JPEG':
@@ -362,6 +364,7 @@ class RAWProcessor:
                 base_name = os.path.splitext(os.path.basename(image_path))[0]
                 enhanced_filename = f"{uuid.uuid4().hex}_{base_name}_enhanced.jpg"
                 enhanced_path = os.path.join(self.upload_folder, enhanced_filename)
+                record_after_request(enhanced_path)
                 
                 enhanced.save(enhanced_path, 'JPEG', quality=95, optimize=True)
                 
@@ -414,6 +417,7 @@ class RAWProcessor:
                 # Save preview
                 preview_filename = f"{uuid.uuid4().hex}_preview.jpg"
                 preview_path = os.path.join(self.upload_folder, preview_filename)
+                record_after_request(preview_path)
                 
                 img.save(preview_path, 'JPEG', quality=85, optimize=True)
                 
@@ -471,6 +475,7 @@ class RAWProcessor:
             
             report_filename = f"{uuid.uuid4().hex}_processing_report.json"
             report_path = os.path.join(self.upload_folder, report_filename)
+            record_after_request(report_path)
             
             with open(report_path, 'w', encoding='utf-8') as f:
                 json.dump(report, f, indent=2, default=str)
@@ -604,6 +609,7 @@ class RAWProcessor:
                 output_ext = output_format.lower()
                 output_filename = f"{uuid.uuid4().hex}_{base_name}_converted.{output_ext}"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
                 
                 # For DNG format, we'll create a simulated RAW file
                 # Note: This is a simplified conversion - real RAW conversion would require
@@ -822,6 +828,7 @@ class RAWProcessor:
                 output_ext = 'jpg' if output_format.upper() == 'JPEG' else output_format.lower()
                 output_filename = f"{uuid.uuid4().hex}_{base_name}_converted.{output_ext}"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
                 
                 # Save with format-specific options
                 if output_format.upper() == 'JPEG':
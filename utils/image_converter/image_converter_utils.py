@@ -6,6 +6,9 @@ from datetime import datetime
 from typing import Tuple, Optional, Dict, Any, List
 import logging
 
+from core.conversion_cache import cached_conversion
+from utils.image_converter.target_size_encoder import save_to_target_size
+
 try:
     from PIL import Image, ImageOps
     PIL_AVAILABLE = True
@@ -82,6 +85,7 @@ def validate_image_file(file_path: str) -> bool:
         logging.error(f"Image validation failed for {file_path}: {str(e)}")
         return False
 
+@cached_conversion('image_converter', version='1')
 def process_image_conversion(
     input_path: str, 
     output_path: str, 
@@ -220,8 +224,15 @@ def process_image_conversion(
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir, exist_ok=True)
             
-            # Save the processed image
-            img.save(output_path, **save_params)
+            # Save the processed image; a byte budget picks the quality (at most
+            # the selected preset) and downscales only if allowed and needed
+            target_size = processing_options.get('target_size')
+            if target_size and save_params['format'] in ('JPEG', 'WEBP'):
+                save_to_target_size(img, output_path, int(target_size), save_params['format'],
+                                    max_quality=save_params['quality'],
+                                    allow_resize=processing_options.get('allow_resize', False))
+            else:
+                img.save(output_path, **save_params)
             
             # Verify the output file was created and has reasonable size
             if not os.path.exists(output_path):
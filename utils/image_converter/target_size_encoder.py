@@ -0,0 +1,177 @@
+"""
+Target-size image encoding
+
+Finds the highest quality (and, if needed, the largest scale) at which an
+image encodes under a byte budget. Every attempt is encoded in memory, the
+prepared and resized images are reused across attempts, and the caller
+writes the winning bytes to disk once.
+"""
+import math
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+LOSSY_FORMATS = {'JPEG', 'WEBP'}
+FORMAT_ALIASES = {'JPG': 'JPEG', 'TIF': 'TIFF'}
+
+DEFAULT_TOLERANCE = 0.05  # Accept results within 5% under the target
+DEFAULT_MIN_QUALITY = 10
+DEFAULT_MAX_QUALITY = 95
+DEFAULT_MIN_SCALE = 0.1
+MAX_ENCODES = 24
+
+
+def normalize_format(image_format: Optional[str]) -> str:
+    """Map a format name or file extension to a Pillow format name"""
+    name = (image_format or 'JPEG').upper().lstrip('.')
+    return FORMAT_ALIASES.get(name, name)
+
+
+def _prepare_image(img: 'Image.Image', image_format: str) -> 'Image.Image':
+    """Convert the image once to a mode the output format can store"""
+    if image_format == 'JPEG':
+        if img.mode in ('RGBA', 'LA', 'P'):
+            rgba = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            return background
+        if img.mode not in ('RGB', 'L'):
+            return img.convert('RGB')
+    elif image_format == 'WEBP' and img.mode not in ('RGB', 'RGBA'):
+        return img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'P') else 'RGB')
+    return img
+
+
+def encode_to_target_size(img: 'Image.Image', target_size: int, image_format: str = 'JPEG',
+                          tolerance: float = DEFAULT_TOLERANCE,
+                          min_quality: int = DEFAULT_MIN_QUALITY,
+                          max_quality: int = DEFAULT_MAX_QUALITY,
+                          allow_resize: bool = False,
+                          min_scale: float = DEFAULT_MIN_SCALE,
+                          save_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Encode img to at most target_size bytes.
+
+    Lossy formats bisect quality between min_quality and max_quality and stop
+    once a result lands within tolerance below the target. If even
+    min_quality is too large and allow_resize is set, the image is
+    downscaled (estimating the scale from the byte count) and the search
+    repeats. Lossless formats can only get smaller by scaling, so without
+    allow_resize they are encoded once at their original dimensions.
+
+    Returns a dict with the encoded ``data``, the chosen ``quality`` and
+    ``scale``, the output ``dimensions``, ``met_target`` and ``encodes``.
+    If the target cannot be met, the smallest encoding tried is returned.
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError('PIL (Pillow) is required for target-size encoding')
+
+    image_format = normalize_format(image_format)
+    lossy = image_format in LOSSY_FORMATS
+    base = _prepare_image(img, image_format)
+    options = {'optimize': True}
+    if image_format == 'WEBP':
+        options = {'method': 4}
+    options.update(save_options or {})
+
+    lower_bound = target_size * (1 - tolerance)
+    scaled_images = {}
+    state = {'encodes': 0}
+    best = None  # Largest encoding that fits
+    smallest = None  # Fallback when nothing fits
+
+    def encode(scale: float, quality: Optional[int]) -> bytes:
+        nonlocal smallest
+        if scale not in scaled_images:
+            size = (max(1, round(base.width * scale)), max(1, round(base.height * scale)))
+            scaled_images[scale] = base if size == base.size else base.resize(size, Image.LANCZOS)
+        buffer = BytesIO()
+        params = dict(options)
+        if quality is not None:
+            params['quality'] = quality
+        scaled_images[scale].save(buffer, format=image_format, **params)
+        state['encodes'] += 1
+        data = buffer.getvalue()
+        candidate = (data, quality, scale)
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = candidate
+        return data
+
+    def consider(data: bytes, quality: Optional[int], scale: float) -> bool:
+        """Track the best fitting result; True once it is close enough"""
+        nonlocal best
+        if len(data) > target_size:
+            return False
+        if best is None or len(data) > len(best[0]):
+            best = (data, quality, scale)
+        return len(data) >= lower_bound
+
+    scale = 1.0
+    while state['encodes'] < MAX_ENCODES:
+        if lossy:
+            # After downscaling, only search quality once min_quality fits
+            if scale < 1.0:
+                data = encode(scale, min_quality)
+                consider(data, min_quality, scale)
+                if len(data) > target_size:
+                    floor_size = len(data)
+                    if scale <= min_scale:
+                        break
+                    scale = max(min_scale, min(scale * 0.9, scale * math.sqrt(target_size / floor_size) * 0.95))
+                    continue
+
+            # Most images already fit at max quality; check that first
+            data = encode(scale, max_quality)
+            if consider(data, max_quality, scale):
+                break
+            if len(data) > target_size:
+                low, high = min_quality, max_quality - 1
+                while low <= high and state['encodes'] < MAX_ENCODES:
+                    quality = (low + high) // 2
+                    data = encode(scale, quality)
+                    if len(data) <= target_size:
+                        if consider(data, quality, scale):
+                            break
+                        low = quality + 1
+                    else:
+                        high = quality - 1
+            floor_size = len(smallest[0]) if smallest[2] == scale else len(data)
+        else:
+            data = encode(scale, None)
+            consider(data, None, scale)
+            floor_size = len(data)
+
+        if best is not None or not allow_resize or scale <= min_scale:
+            break
+
+        # Encoded size grows roughly with pixel count
+        next_scale = max(min_scale, scale * math.sqrt(target_size / floor_size) * 0.95)
+        scale = next_scale if next_scale < scale else scale * 0.9
+
+    data, quality, scale = best or smallest
+    dimensions = scaled_images[scale].size
+    return {
+        'data': data,
+        'format': image_format,
+        'quality': quality,
+        'scale': scale,
+        'dimensions': dimensions,
+        'met_target': best is not None,
+        'encodes': state['encodes']
+    }
+
+
+def save_to_target_size(img: 'Image.Image', output_path: str, target_size: int,
+                        image_format: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    """Encode img under target_size bytes and write the result to output_path once"""
+    if image_format is None:
+        image_format = output_path.rsplit('.', 1)[-1] if '.' in output_path else 'JPEG'
+    result = encode_to_target_size(img, target_size, image_format, **kwargs)
+    with open(output_path, 'wb') as f:
+        f.write(result['data'])
+    return result
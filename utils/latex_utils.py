@@ -4,12 +4,17 @@ import os
 import re
 import time
 import shutil
+import hashlib
 import subprocess
 import tempfile
+import threading
 from pathlib import Path
 from urllib.parse import quote
 from flask import current_app, url_for
 
+from core.conversion_cache import conversion_cache
+from core.storage_index import record_after_request
+
 # Optional imports for enhanced functionality
 try:
     import PyPDF2
@@ -29,6 +34,185 @@ try:
 except ImportError:
     PYMUPDF_AVAILABLE = False
 
+# Bump when compilation changes in a way that affects cached PDFs
+LATEX_CACHE_VERSION = '1'
+
+# Precompiled preamble formats, shared by every process on the host
+FORMAT_DIR = os.environ.get('LATEX_FORMAT_DIR') or os.path.join(tempfile.gettempdir(), 'cropio_latex_formats')
+FORMAT_ENGINES = ('pdflatex',)  # mylatexformat dumps are reliable with pdfTeX only
+FORMAT_BUILD_TIMEOUT = 120
+FORMAT_LOCK_STALE = 600
+
+# Passes stop once the auxiliary files settle, up to this many
+MAX_LATEX_PASSES = 3
+COMPILE_TIMEOUT = 60
+
+# Auxiliary files whose contents feed back into the next pass
+AUX_EXTENSIONS = ('.aux', '.toc', '.lof', '.lot', '.out')
+RERUN_PATTERN = re.compile(r'Rerun to get|Label\(s\) may have changed|Please rerun|rerunfilecheck Warning')
+# .aux lines written by every document that never change the output
+TRIVIAL_AUX_LINE = re.compile(r'^\\(relax|gdef\s*\\@abspage@last\{\d+\}|providecommand\b)')
+
+# Preamble lines a format can replace: the class and the packages right after it
+PACKAGE_LINE = re.compile(r'^\s*\\(documentclass|usepackage|RequirePackage)\s*[\[{]')
+
+_toolchain = {}
+_toolchain_lock = threading.Lock()
+
+
+def resolve_latex_toolchain(engines=('pdflatex', 'xelatex', 'lualatex')):
+    """Find the LaTeX engine, its version and format support once per process"""
+    with _toolchain_lock:
+        if 'engine' not in _toolchain:
+            engine = next((name for name in engines if shutil.which(name)), None)
+            version = None
+            format_support = False
+            if engine:
+                try:
+                    result = subprocess.run([engine, '--version'], capture_output=True, text=True, timeout=10)
+                    version = result.stdout.split('\n')[0].strip()
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+                if engine in FORMAT_ENGINES and shutil.which('kpsewhich'):
+                    try:
+                        result = subprocess.run(['kpsewhich', 'mylatexformat.ltx'],
+                                                capture_output=True, text=True, timeout=10)
+                        format_support = result.returncode == 0 and bool(result.stdout.strip())
+                    except (OSError, subprocess.TimeoutExpired):
+                        pass
+            _toolchain.update(engine=engine, version=version, format_support=format_support)
+        return dict(_toolchain)
+
+
+def _balanced(line):
+    code = line.split('%', 1)[0]
+    return code.count('{') == code.count('}') and code.count('[') == code.count(']')
+
+
+def split_package_prefix(source):
+    """
+    Split a document into its package-loading prefix and the rest.
+
+    The prefix is the \\documentclass line and the \\usepackage lines that
+    directly follow it, which is the part a precompiled format replaces.
+    Returns None when the document does not start that way.
+    """
+    lines = source.splitlines(keepends=True)
+    end = 0
+    seen_class = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('%'):
+            continue
+        match = PACKAGE_LINE.match(line)
+        if not match or not _balanced(stripped) or (match.group(1) == 'documentclass') == seen_class:
+            break
+        seen_class = True
+        end = index + 1
+    if not seen_class:
+        return None
+    return ''.join(lines[:end]), ''.join(lines[end:])
+
+
+def format_name(prefix, toolchain):
+    """Format name for a package prefix, tied to the engine build that dumps it"""
+    significant = '\n'.join(line.strip() for line in prefix.splitlines()
+                            if line.strip() and not line.strip().startswith('%'))
+    material = f"{toolchain['engine']}\0{toolchain['version']}\0{significant}"
+    return 'cropio_' + hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+def find_format(prefix, toolchain, format_dir=FORMAT_DIR):
+    """Name of an already built format for this prefix, or None"""
+    name = format_name(prefix, toolchain)
+    return name if os.path.exists(os.path.join(format_dir, name + '.fmt')) else None
+
+
+def build_format(prefix, toolchain, format_dir=FORMAT_DIR):
+    """
+    Dump a package prefix into a .fmt file with mylatexformat.
+
+    A lock file keeps concurrent workers from building the same format; the
+    finished file is renamed into place so readers never load a partial dump.
+    Returns the format name, or None if it could not be built.
+    """
+    if not toolchain.get('format_support'):
+        return None
+    name = format_name(prefix, toolchain)
+    fmt_path = os.path.join(format_dir, name + '.fmt')
+    if os.path.exists(fmt_path):
+        return name
+
+    os.makedirs(format_dir, exist_ok=True)
+    lock_path = fmt_path + '.lock'
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > FORMAT_LOCK_STALE:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return None
+
+    try:
+        with tempfile.TemporaryDirectory(dir=format_dir) as build_dir:
+            with open(os.path.join(build_dir, name + '.tex'), 'w', encoding='utf-8') as f:
+                f.write(prefix + '\\endofdump\n\\begin{document}\n\\end{document}\n')
+            engine = toolchain['engine']
+            subprocess.run(
+                [engine, '-ini', '-interaction=nonstopmode', f'-jobname={name}',
+                 f'&{engine}', 'mylatexformat.ltx', name + '.tex'],
+                cwd=build_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=FORMAT_BUILD_TIMEOUT
+            )
+            built = os.path.join(build_dir, name + '.fmt')
+            if os.path.exists(built):
+                os.replace(built, fmt_path)
+                return name
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+    return None
+
+
+def _aux_snapshot(temp_dir):
+    """Contents of the auxiliary files written by the last pass"""
+    snapshot = {}
+    for ext in AUX_EXTENSIONS:
+        path = os.path.join(temp_dir, 'document' + ext)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                snapshot[ext] = f.read()
+    return snapshot
+
+
+def _needs_rerun(log_file, previous, current):
+    """Whether another pass can change the output"""
+    try:
+        with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
+            if RERUN_PATTERN.search(f.read()):
+                return True
+    except OSError:
+        pass
+
+    if previous is not None:
+        return current != previous
+
+    # First pass: nothing was read back, so any cross-reference data needs a second pass
+    for ext, content in current.items():
+        lines = [line for line in content.splitlines() if line.strip()]
+        if ext == '.aux':
+            lines = [line for line in lines if not TRIVIAL_AUX_LINE.match(line)]
+        if lines:
+            return True
+    return False
+
+
 class LatexProcessor:
     """LaTeX document processing and compilation utilities"""
     
@@ -36,6 +220,8 @@ class LatexProcessor:
         self.temp_dir = tempfile.gettempdir()
         self.latex_engines = ['pdflatex', 'xelatex', 'lualatex']
         self.required_packages = ['latex', 'pdflatex', 'texlive']
+        self.toolchain = resolve_latex_toolchain(tuple(self.latex_engines))
+        self.latex_engine = self.toolchain['engine']
         
     def check_system_requirements(self):
         """Check if LaTeX system requirements are met"""
@@ -222,6 +408,24 @@ class LatexProcessor:
     
     def compile_to_pdf(self, latex_content, auto_wrap=True, include_log=False):
         """Compile LaTeX content to PDF"""
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        pdf_path = os.path.join(upload_folder, f'latex_output_{int(time.time())}.pdf')
+        record_after_request(pdf_path)
+        
+        result = self.build_pdf(latex_content, pdf_path, auto_wrap, include_log)
+        if result['success']:
+            result['pdf_url'] = url_for('file_serving.serve_file', 
+                                        filename=os.path.basename(pdf_path), 
+                                        _external=False)
+        return result
+    
+    def build_pdf(self, latex_content, output_path, auto_wrap=True, include_log=False):
+        """
+        Compile LaTeX content to a PDF at output_path (no Flask context needed)
+        
+        Results are cached by a hash of the final source, so recompiling an
+        unchanged document only copies the earlier PDF.
+        """
         start_time = time.time()
         
         try:
@@ -229,38 +433,24 @@ class LatexProcessor:
             if auto_wrap and not self._has_document_structure(latex_content):
                 latex_content = self._wrap_in_document(latex_content)
             
-            # Create temporary directory for compilation
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Write LaTeX content to file
-                tex_file = os.path.join(temp_dir, 'document.tex')
-                with open(tex_file, 'w', encoding='utf-8') as f:
-                    f.write(latex_content)
-                
-                # Compile LaTeX to PDF
-                result = self._run_latex_compilation(temp_dir, include_log)
-                
-                if result['success']:
-                    # Move PDF to uploads directory
-                    pdf_path = self._save_pdf_output(result['pdf_path'])
-                    pdf_url = url_for('file_serving.serve_file', 
-                                    filename=os.path.basename(pdf_path), 
-                                    _external=False)
-                    
-                    compilation_time = round(time.time() - start_time, 2)
-                    
-                    return {
-                        'success': True,
-                        'pdf_path': pdf_path,
-                        'pdf_url': pdf_url,
-                        'compilation_time': compilation_time,
-                        'log': result.get('log') if include_log else None
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': result.get('error', 'Compilation failed'),
-                        'log': result.get('log') if include_log else None
-                    }
+            source_sha256 = hashlib.sha256(latex_content.encode('utf-8')).hexdigest()
+            options = {
+                'engine': self.toolchain['engine'],
+                'engine_version': self.toolchain['version'],
+                'include_log': include_log
+            }
+            result = conversion_cache.run(
+                'latex_to_pdf', LATEX_CACHE_VERSION, None, output_path, options,
+                lambda: self._compile(latex_content, output_path, include_log),
+                input_sha256=source_sha256,
+                is_success=lambda r: bool(r and r.get('success'))
+            )
+            
+            result = dict(result)
+            if result['success']:
+                result['pdf_path'] = output_path
+                result['compilation_time'] = round(time.time() - start_time, 2)
+            return result
                     
         except Exception as e:
             return {
@@ -269,6 +459,66 @@ class LatexProcessor:
                 'log': None
             }
     
+    def _compile(self, latex_content, output_path, include_log=False):
+        """Compile source in a fresh directory, using a precompiled preamble when one exists"""
+        format_name = None
+        source = latex_content
+        if self.toolchain['format_support']:
+            split = split_package_prefix(latex_content)
+            if split:
+                format_name = find_format(split[0], self.toolchain)
+                if format_name:
+                    source = split[0] + '\\endofdump\n' + split[1]
+        
+        # Create temporary directory for compilation
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tex_file = os.path.join(temp_dir, 'document.tex')
+            with open(tex_file, 'w', encoding='utf-8') as f:
+                f.write(source)
+            
+            result = self._run_latex_compilation(temp_dir, include_log, format_name)
+            
+            if not result['success'] and format_name:
+                # Retry without the format in case it no longer matches the installation
+                for name in os.listdir(temp_dir):
+                    os.remove(os.path.join(temp_dir, name))
+                with open(tex_file, 'w', encoding='utf-8') as f:
+                    f.write(latex_content)
+                result = self._run_latex_compilation(temp_dir, include_log)
+            
+            if result['success']:
+                # Copy PDF out of the temp directory
+                shutil.copy2(result['pdf_path'], output_path)
+                
+                return {
+                    'success': True,
+                    'pdf_path': output_path,
+                    'passes': result.get('passes'),
+                    'format': result.get('format'),
+                    'log': result.get('log') if include_log else None
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': result.get('error', 'Compilation failed'),
+                    'log': result.get('log') if include_log else None
+                }
+    
+    def warm_formats(self):
+        """Precompile formats for the template and auto-wrap preambles"""
+        if not self.toolchain['format_support']:
+            return 0
+        
+        sources = [template['content'] for template in self.get_latex_templates().values()]
+        sources += [self._wrap_in_document('resume'), self._wrap_in_document('')]
+        
+        built = 0
+        for source in sources:
+            split = split_package_prefix(source)
+            if split and build_format(split[0], self.toolchain):
+                built += 1
+        return built
+    
     def extract_text_from_pdf(self, pdf_path):
         """Extract text content from PDF file"""
         try:
@@ -369,40 +619,46 @@ class LatexProcessor:
         
         return header + latex_content + footer
     
-    def _run_latex_compilation(self, temp_dir, include_log=False):
-        """Run LaTeX compilation process"""
+    def _run_latex_compilation(self, temp_dir, include_log=False, format_name=None):
+        """Run LaTeX compilation process, repeating passes only while references change"""
         tex_file = os.path.join(temp_dir, 'document.tex')
         pdf_file = os.path.join(temp_dir, 'document.pdf')
         log_file = os.path.join(temp_dir, 'document.log')
         
-        # Find available LaTeX engine
-        latex_engine = None
-        for engine in self.latex_engines:
-            if shutil.which(engine):
-                latex_engine = engine
-                break
-        
+        latex_engine = self.latex_engine
         if not latex_engine:
             return {
                 'success': False,
                 'error': 'No LaTeX engine found. Please install TeX Live or MiKTeX.'
             }
         
+        cmd = [latex_engine, '-interaction=nonstopmode', '-output-directory', temp_dir]
+        env = None
+        if format_name:
+            cmd.append(f'-fmt={format_name}')
+            # Trailing separator keeps the default format search path
+            env = dict(os.environ, TEXFORMATS=FORMAT_DIR + os.pathsep)
+        cmd.append(tex_file)
+        
         try:
-            # Run LaTeX compilation (twice for references)
-            for i in range(2):
-                result = subprocess.run([
-                    latex_engine,
-                    '-interaction=nonstopmode',
-                    '-output-directory', temp_dir,
-                    tex_file
-                ], capture_output=True, text=True, timeout=60)
+            previous = None
+            passes = 0
+            while passes < MAX_LATEX_PASSES:
+                passes += 1
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               timeout=COMPILE_TIMEOUT, env=env)
+                current = _aux_snapshot(temp_dir)
+                if not os.path.exists(pdf_file) or not _needs_rerun(log_file, previous, current):
+                    break
+                previous = current
             
             # Check if PDF was generated
             if os.path.exists(pdf_file):
                 response = {
                     'success': True,
-                    'pdf_path': pdf_file
+                    'pdf_path': pdf_file,
+                    'passes': passes,
+                    'format': format_name
                 }
                 
                 # Include compilation log if requested
@@ -451,18 +707,6 @@ class LatexProcessor:
                 'error': f'Compilation error: {str(e)}'
             }
     
-    def _save_pdf_output(self, temp_pdf_path):
-        """Save compiled PDF to uploads directory"""
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        timestamp = str(int(time.time()))
-        pdf_filename = f'latex_output_{timestamp}.pdf'
-        pdf_path = os.path.join(upload_folder, pdf_filename)
-        
-        # Copy PDF from temp directory to uploads
-        shutil.copy2(temp_pdf_path, pdf_path)
-        
-        return pdf_path
-    
     def get_latex_templates(self):
         """Get predefined LaTeX templates"""
         templates = {
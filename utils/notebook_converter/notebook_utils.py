@@ -4,6 +4,10 @@ import os
 import tempfile
 import shutil
 import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 import logging
 from typing import List, Optional, Tuple, Dict, Any
@@ -60,6 +64,141 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Idle exporters kept per (exporter, template); building one loads its Jinja
+# templates, filters and preprocessors
+EXPORTER_POOL_SIZE = 4
+
+# Rendered Markdown cells and highlighted code cells shared across exports
+CELL_CACHE_SIZE = 8192
+
+_exporter_pool: Dict[Tuple[str, str], List[Any]] = {}
+_exporter_pool_lock = threading.Lock()
+
+_cell_cache: 'OrderedDict[str, str]' = OrderedDict()
+_cell_cache_lock = threading.Lock()
+
+
+def _cached_render(kind: str, key_parts: Tuple[Any, ...], source: str, render) -> str:
+    """Return ``render()`` for a cell, reusing the result for identical input"""
+    material = '\0'.join([kind] + [str(part) for part in key_parts] + [source])
+    key = hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    with _cell_cache_lock:
+        if key in _cell_cache:
+            _cell_cache.move_to_end(key)
+            return _cell_cache[key]
+
+    result = render()
+    with _cell_cache_lock:
+        _cell_cache[key] = result
+        while len(_cell_cache) > CELL_CACHE_SIZE:
+            _cell_cache.popitem(last=False)
+    return result
+
+
+if NBCONVERT_AVAILABLE:
+    try:
+        from jinja2 import pass_context
+    except ImportError:  # Jinja2 < 3
+        from jinja2 import contextfilter as pass_context
+
+    class _CellCacheMixin:
+        """Routes per-cell highlighting and Markdown rendering through the cell cache"""
+
+        def _cache_flavour(self) -> Tuple[Any, ...]:
+            return (type(self).__name__, self.template_name)
+
+        def register_filter(self, name, jinja_filter):
+            # from_notebook_node registers a new highlighter for each notebook's lexer
+            if name == 'highlight_code' and not getattr(jinja_filter, '_cropio_cached', False):
+                highlighter = jinja_filter
+                lexer = getattr(highlighter, 'pygments_lexer', None)
+
+                def highlight_code(source, language=None, metadata=None, **kwargs):
+                    magics = (metadata or {}).get('magics_language')
+                    return _cached_render(
+                        'highlight', self._cache_flavour() + (lexer, language, magics, sorted(kwargs.items())),
+                        source, lambda: highlighter(source, language=language, metadata=metadata, **kwargs)
+                    )
+
+                highlight_code._cropio_cached = True
+                jinja_filter = highlight_code
+            return super().register_filter(name, jinja_filter)
+
+        def default_filters(self):
+            for name, jinja_filter in super().default_filters():
+                if name == 'markdown2latex':
+                    # Each call runs pandoc in a subprocess
+                    def markdown2latex(source, markup='markdown', extra_args=None, _convert=jinja_filter):
+                        return _cached_render(
+                            'markdown2latex', self._cache_flavour() + (markup, extra_args),
+                            source, lambda: _convert(source, markup=markup, extra_args=extra_args)
+                        )
+                    jinja_filter = markdown2latex
+                elif name == 'clean_html':
+                    # Sanitizing rendered Markdown with bleach costs more than rendering it
+                    def clean_html(element, _clean=jinja_filter):
+                        html = element.decode() if isinstance(element, bytes) else str(element)
+                        return _cached_render('clean_html', self._cache_flavour(), html, lambda: _clean(html))
+                    jinja_filter = clean_html
+                yield name, jinja_filter
+
+    class CachedHTMLExporter(_CellCacheMixin, HTMLExporter):
+        """HTMLExporter whose cell renders are shared through the cell cache"""
+
+        @pass_context
+        def markdown2html(self, context, source):
+            render = super().markdown2html
+            cell = context.get('cell', {})
+            if cell.get('attachments'):
+                # Attachments are embedded per notebook, so these cells are not shared
+                return render(context, source)
+            path = context.get('resources', {}).get('metadata', {}).get('path', '')
+            return _cached_render(
+                'markdown2html',
+                self._cache_flavour() + (path, self.embed_images, self.anchor_link_text, self.exclude_anchor_links),
+                source, lambda: render(context, source)
+            )
+
+    class CachedPDFExporter(_CellCacheMixin, PDFExporter):
+        """PDFExporter whose cell renders are shared through the cell cache"""
+
+    class CachedMarkdownExporter(_CellCacheMixin, MarkdownExporter):
+        """MarkdownExporter taken from the shared exporter pool"""
+
+    EXPORTER_CLASSES = {
+        'html': CachedHTMLExporter,
+        'pdf': CachedPDFExporter,
+        'markdown': CachedMarkdownExporter,
+    }
+
+
+@contextmanager
+def pooled_exporter(kind: str, template_name: Optional[str] = None):
+    """
+    Check out a configured exporter of ``kind`` ('html', 'pdf' or 'markdown').
+
+    Exporters are reused across conversions rather than rebuilt per call;
+    each one is used by a single conversion at a time.
+    """
+    key = (kind, template_name or '')
+    with _exporter_pool_lock:
+        idle = _exporter_pool.setdefault(key, [])
+        exporter = idle.pop() if idle else None
+
+    if exporter is None:
+        exporter = EXPORTER_CLASSES[kind]()
+        if template_name:
+            exporter.template_name = template_name
+
+    # An exporter that raised is not returned to the pool
+    yield exporter
+    with _exporter_pool_lock:
+        idle = _exporter_pool.setdefault(key, [])
+        if len(idle) < EXPORTER_POOL_SIZE:
+            idle.append(exporter)
+
+
 class NotebookConverter:
     """
     Dedicated Jupyter notebook converter supporting:
@@ -199,6 +338,10 @@ class NotebookConverter:
                            include_outputs: bool = True,
                            include_metadata: bool = True) -> nbformat.NotebookNode:
         """Preprocess notebook based on options"""
+        # Nothing to filter: exporters copy the notebook themselves
+        if include_code_cells and include_outputs and include_metadata:
+            return notebook
+        
         try:
             # Create a copy to avoid modifying original
             processed_notebook = nbformat.v4.new_notebook()
@@ -275,13 +418,9 @@ class NotebookConverter:
             
             # Create PDF exporter
             try:
-                pdf_exporter = PDFExporter()
-                
-                # Configure exporter
-                pdf_exporter.template_name = 'classic'
-                
-                # Convert to PDF
-                (body, resources) = pdf_exporter.from_notebook_node(processed_notebook)
+                with pooled_exporter('pdf', 'classic') as pdf_exporter:
+                    # Convert to PDF
+                    (body, resources) = pdf_exporter.from_notebook_node(processed_notebook)
                 
                 # Write PDF file
                 with open(output_path, 'wb') as f:
@@ -292,8 +431,8 @@ class NotebookConverter:
                 # Try alternative PDF conversion approach
                 try:
                     # Fallback: convert to HTML first, then to PDF if possible
-                    html_exporter = HTMLExporter()
-                    (html_body, html_resources) = html_exporter.from_notebook_node(processed_notebook)
+                    with pooled_exporter('html') as html_exporter:
+                        (html_body, html_resources) = html_exporter.from_notebook_node(processed_notebook)
                     
                     # Save HTML temporarily
                     html_temp = output_path.replace('.pdf', '_temp.html')
@@ -354,18 +493,10 @@ class NotebookConverter:
                 notebook, include_code_cells, include_outputs, include_metadata
             )
             
-            # Create HTML exporter
             try:
-                html_exporter = HTMLExporter()
-                # Configure exporter
-                html_exporter.template_name = 'classic'
-            except Exception as exporter_error:
-                logger.error(f"Failed to create HTML exporter: {exporter_error}")
-                return False
-            
-            try:
-                # Convert to HTML
-                (body, resources) = html_exporter.from_notebook_node(processed_notebook)
+                # Convert to HTML with a pooled exporter
+                with pooled_exporter('html', 'classic') as html_exporter:
+                    (body, resources) = html_exporter.from_notebook_node(processed_notebook)
             except Exception as conversion_error:
                 logger.error(f"Failed to convert notebook to HTML: {conversion_error}")
                 return False
@@ -423,11 +554,9 @@ class NotebookConverter:
                 notebook, include_code_cells, include_outputs, include_metadata
             )
             
-            # Create Markdown exporter
-            md_exporter = MarkdownExporter()
-            
-            # Convert to Markdown
-            (body, resources) = md_exporter.from_notebook_node(processed_notebook)
+            # Convert to Markdown with a pooled exporter
+            with pooled_exporter('markdown') as md_exporter:
+                (body, resources) = md_exporter.from_notebook_node(processed_notebook)
             
             # Write Markdown file
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -478,12 +607,9 @@ class NotebookConverter:
                 notebook, include_code_cells, include_outputs, include_metadata
             )
             
-            # Create HTML exporter first
-            html_exporter = HTMLExporter()
-            html_exporter.template_name = 'basic'
-            
-            # Convert to HTML
-            (html_body, resources) = html_exporter.from_notebook_node(processed_notebook)
+            # Convert to HTML first
+            with pooled_exporter('html', 'basic') as html_exporter:
+                (html_body, resources) = html_exporter.from_notebook_node(processed_notebook)
             
             # Create DOCX document
             doc = Document()
@@ -1,11 +1,19 @@
 # utils/pdf_presentation_utils.py - PDF TO PPTX CONVERTER UTILITIES
 # Dedicated utilities for PDF to PowerPoint conversion
 import os
+import io
 import tempfile
 import shutil
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import logging
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Iterator, List, Optional, Tuple, Dict, Any
+
+from core.lazy_imports import lazy_import, module_available
+from core.process_pools import pool_size
 
 # Universal Security Framework Integration
 try:
@@ -16,7 +24,7 @@ except ImportError:
     SECURITY_FRAMEWORK_AVAILABLE = False
 
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
     PDF2IMAGE_AVAILABLE = True
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
@@ -37,12 +45,14 @@ except ImportError:
     PYMUPDF_AVAILABLE = False
 
 try:
-    import pytesseract
     from PIL import Image, ImageEnhance, ImageFilter
-    OCR_AVAILABLE = True
+    OCR_AVAILABLE = module_available('pytesseract')
 except ImportError:
     OCR_AVAILABLE = False
 
+# Loaded on first OCR call; importing it pulls in pandas
+pytesseract = lazy_import('pytesseract')
+
 try:
     import cv2
     import numpy as np
@@ -54,6 +64,139 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Basic mode rasterizes each page at this resolution
+BASIC_RENDER_DPI = 200
+JPEG_QUALITY = 90
+
+# Page rendering processes for basic mode; 1 renders in the calling process.
+# PDF_RENDER_WORKERS is the budget for the host, split between web workers.
+# The shared pool is only used for documents with at least PARALLEL_MIN_PAGES pages.
+RENDER_WORKERS = pool_size('PDF_RENDER_WORKERS', default_total=1)
+PARALLEL_MIN_PAGES = 16
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+
+def get_render_executor() -> ProcessPoolExecutor:
+    """Shared process pool for rendering PDF pages"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        return _render_executor
+
+
+def _reset_render_executor() -> None:
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is not None:
+            _render_executor.shutdown(wait=False, cancel_futures=True)
+        _render_executor = None
+
+
+def _page_count(input_path: str) -> int:
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(input_path) as doc:
+            return doc.page_count
+    return int(pdfinfo_from_path(input_path)['Pages'])
+
+
+def _render_document_page(doc, index: int, dpi: int, image_format: str) -> Tuple[bytes, Tuple[int, int]]:
+    """Rasterize and encode one page of an open PyMuPDF document"""
+    zoom = dpi / 72
+    pix = doc[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if image_format == 'jpeg':
+        data = pix.tobytes('jpeg', jpg_quality=JPEG_QUALITY)
+    else:
+        data = pix.tobytes('png')
+    return data, (pix.width, pix.height)
+
+
+def _iter_pages_in_process(input_path: str, indexes, dpi: int,
+                           image_format: str) -> Iterator[Tuple[int, Optional[bytes], Tuple[int, int]]]:
+    """Render pages in the calling process, opening the document once"""
+    doc = fitz.open(input_path) if PYMUPDF_AVAILABLE else None
+    try:
+        for index in indexes:
+            try:
+                if doc is not None:
+                    data, size = _render_document_page(doc, index, dpi, image_format)
+                else:
+                    data, size = render_page(input_path, index, dpi, image_format)
+            except Exception as e:
+                logger.warning(f"Failed to render page {index + 1}: {e}")
+                data, size = None, (0, 0)
+            yield index, data, size
+    finally:
+        if doc is not None:
+            doc.close()
+
+
+def render_page(input_path: str, index: int, dpi: int = BASIC_RENDER_DPI,
+                image_format: str = 'png') -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Rasterize one page (0-based) and encode it.
+
+    Returns the encoded image bytes and the pixel size. Uses PyMuPDF when
+    available, otherwise renders just this page with pdf2image.
+    """
+    if PYMUPDF_AVAILABLE:
+        with fitz.open(input_path) as doc:
+            return _render_document_page(doc, index, dpi, image_format)
+
+    image = convert_from_path(input_path, dpi=dpi, first_page=index + 1, last_page=index + 1)[0]
+    buffer = io.BytesIO()
+    if image_format == 'jpeg':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY)
+    else:
+        image.save(buffer, 'PNG')
+    return buffer.getvalue(), image.size
+
+
+def iter_rendered_pages(input_path: str, dpi: int = BASIC_RENDER_DPI, image_format: str = 'png',
+                        workers: int = RENDER_WORKERS) -> Iterator[Tuple[int, Optional[bytes], Tuple[int, int]]]:
+    """
+    Yield ``(index, image_bytes, size)`` for every page, in page order.
+
+    Only a bounded number of encoded pages exist at once: one when rendering
+    in-process, or two per worker when the shared process pool renders
+    ahead. A page that fails to render is yielded with ``None`` bytes.
+    """
+    total = _page_count(input_path)
+
+    if workers <= 1 or total < PARALLEL_MIN_PAGES:
+        yield from _iter_pages_in_process(input_path, range(total), dpi, image_format)
+        return
+
+    executor = get_render_executor()
+    pending = deque()
+    next_index = 0
+    while next_index < total or pending:
+        try:
+            # Keep a bounded window of pages in flight; results come back in submission order
+            while next_index < total and len(pending) < workers * 2:
+                pending.append((next_index, executor.submit(render_page, input_path, next_index, dpi, image_format)))
+                next_index += 1
+            index, future = pending[0]
+            try:
+                data, size = future.result()
+            except (BrokenProcessPool, CancelledError):
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to render page {index + 1}: {e}")
+                data, size = None, (0, 0)
+        except (BrokenProcessPool, CancelledError, RuntimeError) as e:
+            # A worker died or the pool was shut down; finish this document in-process
+            logger.warning(f"PDF render pool unavailable, rendering the remaining pages in-process: {e}")
+            _reset_render_executor()
+            remaining = [queued for queued, _ in pending] + list(range(next_index, total))
+            yield from _iter_pages_in_process(input_path, remaining, dpi, image_format)
+            return
+        pending.popleft()
+        yield index, data, size
+
+
 class PdfToPptxConverter:
     """
     Dedicated PDF to PowerPoint converter supporting:
@@ -93,7 +236,7 @@ class PdfToPptxConverter:
     
     def is_pdf_conversion_available(self) -> bool:
         """Check if basic PDF to PPTX conversion is available"""
-        return (self.dependencies['pdf2image'] and 
+        return ((self.dependencies['pymupdf'] or self.dependencies['pdf2image']) and 
                 self.dependencies['python_pptx'])
     
     def is_ocr_available(self) -> bool:
@@ -148,13 +291,16 @@ class PdfToPptxConverter:
         except Exception as e:
             return False, [f"Basic validation error: {str(e)}"]
     
-    def pdf_to_pptx_basic(self, input_path: str, output_path: str) -> bool:
+    def pdf_to_pptx_basic(self, input_path: str, output_path: str,
+                          image_format: str = 'png', render_workers: int = RENDER_WORKERS) -> bool:
         """
         Convert PDF to PPTX using basic mode (image-based slides)
         
         Args:
             input_path: Path to input PDF file
             output_path: Path for output PPTX file
+            image_format: 'png' (lossless) or 'jpeg' (smaller decks)
+            render_workers: Processes rendering pages ahead; 1 renders inline
             
         Returns:
             bool: True if conversion successful
@@ -176,35 +322,28 @@ class PdfToPptxConverter:
             
             logger.info(f"Converting PDF to PPTX (Basic): {input_path} -> {output_path}")
             
-            # Convert PDF pages to images
-            images = convert_from_path(input_path, dpi=200, fmt='PNG')
-            
-            if not images:
-                logger.error("No pages found in PDF")
-                return False
-            
             # Create new presentation
             prs = Presentation()
             
             # Remove default slide
             prs.slides._sldIdLst.clear()
             
-            # Process each page
-            for i, img in enumerate(images):
+            slide_width = prs.slide_width
+            slide_height = prs.slide_height
+            blank_slide_layout = prs.slide_layouts[6]  # Blank layout
+            
+            # Pages are rendered and encoded one at a time and handed to
+            # python-pptx as in-memory streams; no page images on disk
+            pages = 0
+            for i, image_data, (img_width, img_height) in iter_rendered_pages(
+                    input_path, image_format=image_format, workers=render_workers):
+                pages += 1
+                if image_data is None:
+                    continue
                 try:
                     # Add slide with blank layout
-                    blank_slide_layout = prs.slide_layouts[6]  # Blank layout
                     slide = prs.slides.add_slide(blank_slide_layout)
                     
-                    # Save image temporarily
-                    temp_img_path = os.path.join(tempfile.gettempdir(), f"pdf_page_{i}.png")
-                    img.save(temp_img_path, 'PNG')
-                    
-                    # Calculate dimensions to fit slide
-                    slide_width = prs.slide_width
-                    slide_height = prs.slide_height
-                    img_width, img_height = img.size
-                    
                     # Calculate scaling to fit while maintaining aspect ratio
                     width_ratio = slide_width / img_width
                     height_ratio = slide_height / img_height
@@ -218,15 +357,16 @@ class PdfToPptxConverter:
                     top = (slide_height - new_height) // 2
                     
                     # Add image to slide
-                    slide.shapes.add_picture(temp_img_path, left, top, new_width, new_height)
-                    
-                    # Clean up temporary image
-                    os.unlink(temp_img_path)
+                    slide.shapes.add_picture(io.BytesIO(image_data), left, top, new_width, new_height)
                     
                 except Exception as e:
                     logger.warning(f"Failed to process page {i+1}: {e}")
                     continue
             
+            if not pages:
+                logger.error("No pages found in PDF")
+                return False
+            
             # Save presentation
             prs.save(output_path)
             
@@ -398,15 +538,10 @@ class PdfToPptxConverter:
             # Convert page to image
             mat = fitz.Matrix(2, 2)  # 2x zoom for better OCR
             pix = page.get_pixmap(matrix=mat)
-            img_data = pix.pil_tobytes(format="PNG")
-            
-            # Save temporary image
-            temp_img_path = os.path.join(tempfile.gettempdir(), "ocr_page.png")
-            with open(temp_img_path, "wb") as f:
-                f.write(img_data)
+            img_data = pix.tobytes("png")
             
             # Perform OCR
-            img = Image.open(temp_img_path)
+            img = Image.open(io.BytesIO(img_data))
             
             # Enhance image for better OCR
             img = img.convert('RGB')
@@ -424,9 +559,6 @@ class PdfToPptxConverter:
             # Process OCR results
             self._process_ocr_results(ocr_data, slide, scale)
             
-            # Clean up
-            os.unlink(temp_img_path)
-            
         except Exception as e:
             logger.warning(f"OCR processing error: {e}")
     
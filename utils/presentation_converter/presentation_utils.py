@@ -1,13 +1,14 @@
 # utils/presentation_utils.py - PRESENTATION CONVERTER UTILITIES
 # Comprehensive presentation conversion utilities following project requirements
 import os
-import subprocess
 import tempfile
 import shutil
 from pathlib import Path
 import logging
 from typing import List, Optional, Tuple, Dict, Any
 
+from core.lazy_imports import lazy_import, module_available
+
 # Universal Security Framework Integration
 try:
     from security.core.validators import validate_content, validate_filename
@@ -38,12 +39,14 @@ except ImportError:
     PYMUPDF_AVAILABLE = False
 
 try:
-    import pytesseract
     from PIL import Image, ImageEnhance, ImageFilter
-    OCR_AVAILABLE = True
+    OCR_AVAILABLE = module_available('pytesseract')
 except ImportError:
     OCR_AVAILABLE = False
 
+# Loaded on first OCR call; importing it pulls in pandas
+pytesseract = lazy_import('pytesseract')
+
 try:
     import cv2
     import numpy as np
@@ -51,6 +54,8 @@ try:
 except ImportError:
     OPENCV_AVAILABLE = False
 
+from core.libreoffice_pool import LibreOfficeError, libreoffice_pool
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -85,99 +90,13 @@ class PresentationConverter:
         self.temp_dirs.clear()
     
     def _find_libreoffice(self) -> Optional[str]:
-        """Find LibreOffice installation path"""
-        import platform
-        
-        possible_paths = []
-        
-        if platform.system() == "Windows":
-            # Windows paths - check both 32-bit and 64-bit locations
-            possible_paths.extend([
-                r"C:\Program Files\LibreOffice\program\soffice.exe",
-                r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-                "soffice",  # Try PATH
-                "libreoffice"  # Try PATH
-            ])
+        """Find LibreOffice installation path (resolved once per process by the pool)"""
+        path = libreoffice_pool.soffice_path
+        if path:
+            logger.debug(f"Found LibreOffice at: {path}")
         else:
-            # Linux/macOS paths
-            possible_paths.extend([
-                "/usr/bin/libreoffice",
-                "/usr/bin/soffice",
-                "/snap/bin/libreoffice",
-                "/Applications/LibreOffice.app/Contents/MacOS/soffice",
-                "soffice",
-                "libreoffice"
-            ])
-        
-        for path in possible_paths:
-            logger.debug(f"Checking LibreOffice path: {path}")
-            try:
-                if path in ["soffice", "libreoffice"]:
-                    # Enhanced Windows subprocess to prevent console window
-                    if platform.system() == "Windows":
-                        startupinfo = subprocess.STARTUPINFO()
-                        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                        startupinfo.wShowWindow = subprocess.SW_HIDE
-                        creation_flags = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
-                    else:
-                        startupinfo = None
-                        creation_flags = 0
-                    
-                    result = subprocess.run(
-                        [path, "--version"], 
-                        capture_output=True, 
-                        text=True, 
-                        timeout=10,
-                        creationflags=creation_flags,
-                        startupinfo=startupinfo
-                    )
-                    # LibreOffice returns 0 for --version if successful
-                    if result.returncode == 0:
-                        logger.info(f"Found LibreOffice in PATH: {path}")
-                        return path
-                else:
-                    # Check if file exists
-                    logger.debug(f"Checking if file exists: {path}")
-                    if os.path.exists(path) and os.path.isfile(path):
-                        logger.debug(f"File exists: {path}")
-                        # For Windows, if the file exists and is in the LibreOffice directory,
-                        # assume it's valid to avoid timeout issues
-                        if platform.system() == "Windows" and "LibreOffice" in path:
-                            logger.info(f"Found LibreOffice at: {path}")
-                            return path
-                        else:
-                            # For non-Windows or non-standard paths, test execution
-                            try:
-                                # Enhanced Windows subprocess to prevent console window
-                                if platform.system() == "Windows":
-                                    startupinfo = subprocess.STARTUPINFO()
-                                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                                    startupinfo.wShowWindow = subprocess.SW_HIDE
-                                    creation_flags = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
-                                else:
-                                    startupinfo = None
-                                    creation_flags = 0
-                                
-                                result = subprocess.run(
-                                    [path, "--version"], 
-                                    capture_output=True, 
-                                    text=True, 
-                                    timeout=5,
-                                    creationflags=creation_flags,
-                                    startupinfo=startupinfo
-                                )
-                                if result.returncode == 0:
-                                    logger.info(f"Found LibreOffice at: {path}")
-                                    return path
-                            except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError) as e:
-                                logger.debug(f"Failed to test LibreOffice at {path}: {e}")
-                                continue
-            except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError) as e:
-                logger.debug(f"Failed to check LibreOffice path {path}: {e}")
-                continue
-                
-        logger.warning("LibreOffice not found in any expected location")
-        return None
+            logger.warning("LibreOffice not found in any expected location")
+        return path
     
     def _check_dependencies(self) -> Dict[str, bool]:
         """Check availability of all dependencies"""
@@ -293,88 +212,14 @@ class PresentationConverter:
                     logger.error("Failed to extract specified slide range")
                     return False
             
-            # Create Windows-compatible user installation directory
-            import platform
-            if platform.system() == "Windows":
-                user_install_dir = os.path.join(temp_dir, "libreoffice_user")
-                os.makedirs(user_install_dir, exist_ok=True)
-                user_install_url = f"file:///{user_install_dir.replace(os.sep, '/')}"
-            else:
-                user_install_dir = "/tmp/libreoffice_tmp"
-                user_install_url = "file:///tmp/libreoffice_tmp"
-            
-            # Prepare LibreOffice command
-            cmd = [
-                self.libreoffice_path,
-                "--headless",
-                "--invisible",
-                "--nodefault",
-                "--nolockcheck",
-                "--nologo",
-                "--norestore",
-                "--convert-to", "pdf",
-                "--outdir", os.path.dirname(output_path),
-                f"-env:UserInstallation={user_install_url}",
-                input_for_conversion
-            ]
-            
-            # Add quality-specific parameters
-            # Note: Removed --writer as it's for Writer documents, not Impress
-            
-            # Execute conversion
+            # Convert on a warm pooled LibreOffice instance with its own profile
             logger.info(f"Converting PPTX to PDF: {input_path} -> {output_path}")
-            logger.debug(f"LibreOffice command: {' '.join(cmd)}")
-            
             try:
-                # Enhanced Windows subprocess flags to prevent console window
-                if platform.system() == "Windows":
-                    import subprocess
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    startupinfo.wShowWindow = subprocess.SW_HIDE
-                    creation_flags = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
-                else:
-                    startupinfo = None
-                    creation_flags = 0
-                
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=300,  # 5 minute timeout
-                    cwd=temp_dir,
-                    creationflags=creation_flags,
-                    startupinfo=startupinfo
-                )
-                
-                logger.debug(f"LibreOffice return code: {result.returncode}")
-                logger.debug(f"LibreOffice stdout: {result.stdout}")
-                logger.debug(f"LibreOffice stderr: {result.stderr}")
-                
-                if result.returncode != 0:
-                    error_msg = result.stderr or result.stdout or "Unknown error"
-                    logger.error(f"LibreOffice conversion failed with return code {result.returncode}: {error_msg}")
-                    return False
-                    
-            except subprocess.TimeoutExpired:
-                logger.error("LibreOffice conversion timed out after 5 minutes")
-                return False
-            except Exception as e:
-                logger.error(f"Failed to execute LibreOffice: {e}")
+                libreoffice_pool.convert(input_for_conversion, output_path)
+            except LibreOfficeError as e:
+                logger.error(f"LibreOffice conversion failed: {e}")
                 return False
             
-            # Find the generated PDF file
-            base_name = os.path.splitext(os.path.basename(input_for_conversion))[0]
-            generated_pdf = os.path.join(os.path.dirname(output_path), f"{base_name}.pdf")
-            
-            # Move to final output path if different
-            if generated_pdf != output_path:
-                if os.path.exists(generated_pdf):
-                    shutil.move(generated_pdf, output_path)
-                else:
-                    logger.error(f"Generated PDF not found at expected location: {generated_pdf}")
-                    return False
-            
             success = os.path.exists(output_path)
             if success:
                 logger.info(f"PPTX to PDF conversion successful: {output_path}")
@@ -383,9 +228,6 @@ class PresentationConverter:
                 
             return success
             
-        except subprocess.TimeoutExpired:
-            logger.error("LibreOffice conversion timed out")
-            return False
         except Exception as e:
             logger.error(f"PPTX to PDF conversion error: {e}")
             return False
@@ -28,7 +28,12 @@ Features:
 - Format preservation options
 """
 
-from .text_ocr_utils import TextOCRProcessor, process_text_ocr
+try:
+    from .text_ocr_utils import TextOCRProcessor, process_text_ocr
+except ImportError:
+    # text_ocr_utils is optional; the OCR engine can be used without it
+    TextOCRProcessor = None
+    process_text_ocr = None
 
 __all__ = [
     "TextOCRProcessor",
@@ -0,0 +1,598 @@
+"""
+OCR Engine - Page-Parallel OCR for Scanned PDFs and Images
+Renders pages in the request process and recognizes them in a shared process pool
+whose workers keep Tesseract language models loaded between requests
+"""
+
+import os
+import re
+import time
+import subprocess
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from core.lazy_imports import lazy_import, module_available
+from core.process_pools import pool_size
+
+# Imported in the OCR workers on first use; it loads pandas at import time
+pytesseract = lazy_import('pytesseract')
+TESSERACT_AVAILABLE = module_available('pytesseract')
+
+try:
+    # tesserocr keeps a Tesseract API (and its traineddata) loaded in-process
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    import fitz  # PyMuPDF for PDF processing
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# --oem 1: Use new neural net OCR engine
+# --psm 1: Automatic page segmentation
+TESSERACT_CONFIG = r'--oem 1 --psm 1'
+
+# Scanned pages are rendered at 3x for better OCR accuracy
+PDF_RENDER_SCALE = 3
+
+# Whole-document deadline for PDF OCR (seconds)
+DEFAULT_DOCUMENT_TIMEOUT = int(os.environ.get('OCR_DOCUMENT_TIMEOUT', 300))
+
+# Languages kept loaded per pool worker (least recently used are released)
+MAX_WARM_LANGUAGES = int(os.environ.get('OCR_WARM_LANGUAGES', 4))
+
+_executor = None
+_executor_size = 0
+_executor_lock = threading.Lock()
+
+# Warm Tesseract APIs of the current pool worker, keyed by language
+_warm_apis: 'OrderedDict[str, Any]' = OrderedDict()
+
+# Languages tesserocr failed to load; these go through the tesseract binary
+_unloadable_languages = set()
+
+_UNSET = object()
+_tessdata_path: Any = _UNSET
+
+# Timing metrics reported back by pool workers
+_metrics_lock = threading.Lock()
+_metrics = {
+    'images': 0,
+    'model_loads': 0,
+    'model_load_seconds': 0.0,
+    'recognition_seconds': 0.0,
+    'second_passes': 0,
+    'second_passes_skipped': 0
+}
+
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """
+    Get this process's OCR pool.
+
+    OCR_MAX_WORKERS (default: the number of cores) is the budget for the
+    whole host and is divided between the web workers.
+    """
+    global _executor, _executor_size
+    with _executor_lock:
+        if _executor is None:
+            _executor_size = pool_size('OCR_MAX_WORKERS')
+            _executor = ProcessPoolExecutor(max_workers=_executor_size)
+            logger.info(f"OCR process pool started with {_executor_size} workers")
+        return _executor
+
+
+def get_ocr_pool_size() -> int:
+    """Number of workers in the OCR pool (0 before it is started)"""
+    return _executor_size
+
+
+def _reset_ocr_executor() -> None:
+    """Drop a broken pool so the next request starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def enhance_image(image, auto_enhance=True):
+    """Enhance image quality for better OCR results using advanced techniques"""
+    if not auto_enhance:
+        return image
+
+    try:
+        # Convert PIL Image to numpy array
+        img_array = np.array(image)
+
+        # Convert to grayscale if not already
+        if len(img_array.shape) == 3:
+            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = img_array
+
+        # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
+        # This improves contrast while preserving details
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        enhanced = clahe.apply(gray)
+
+        # Apply bilateral filter to denoise while preserving edges
+        denoised = cv2.bilateralFilter(enhanced, 9, 75, 75)
+
+        # Apply morphological operations to enhance text
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+        morph = cv2.morphologyEx(denoised, cv2.MORPH_CLOSE, kernel)
+
+        # Apply thresholding with adaptive method (Otsu's)
+        # This works better than fixed threshold for varying lighting
+        _, binary = cv2.threshold(morph, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Deskew the image (rotate if text is not horizontal)
+        # Calculate the angle to deskew
+        coords = np.column_stack(np.where(binary > 0))
+        angle = cv2.minAreaRect(coords)[2]
+
+        if angle < -45:
+            angle = 90 + angle
+
+        # Only rotate if angle is significant
+        if abs(angle) > 0.5:
+            h, w = binary.shape
+            center = (w // 2, h // 2)
+            rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated = cv2.warpAffine(binary, rotation_matrix, (w, h),
+                                     borderMode=cv2.BORDER_REPLICATE)
+        else:
+            rotated = binary
+
+        # Remove small noise (salt and pepper)
+        cleaned = cv2.medianBlur(rotated, 3)
+
+        # Apply invert if needed (ensure text is black on white)
+        # Check if text is mostly dark
+        if np.mean(cleaned) > 127:
+            cleaned = cv2.bitwise_not(cleaned)
+
+        # Dilate text slightly to make it bolder and easier to read
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (1, 1))
+        enhanced_final = cv2.dilate(cleaned, kernel, iterations=1)
+
+        # Convert back to PIL Image
+        final_image = Image.fromarray(enhanced_final)
+
+        return final_image
+    except Exception as e:
+        print(f"Image enhancement failed: {str(e)}")
+        return image
+
+
+def detect_language(text):
+    """Detect the primary language of the extracted text"""
+    try:
+        from langdetect import detect
+        lang_code = detect(text)
+
+        # Map langdetect codes to tesseract codes
+        lang_mapping = {
+            'en': 'eng',
+            'hi': 'hin',
+            'es': 'spa',
+            'fr': 'fra',
+            'de': 'deu',
+            'ar': 'ara',
+            'zh-cn': 'chi_sim',
+            'ja': 'jpn',
+            'ko': 'kor',
+            'ru': 'rus'
+        }
+
+        return lang_mapping.get(lang_code, 'eng')
+    except:
+        return 'eng'
+
+
+def _new_timings() -> Dict[str, float]:
+    return {
+        'model_loads': 0,
+        'model_load_seconds': 0.0,
+        'recognition_seconds': 0.0,
+        'second_passes': 0,
+        'second_passes_skipped': 0
+    }
+
+
+class ModelLoadError(RuntimeError):
+    """tesserocr could not load a language model"""
+
+
+def _get_tessdata_path() -> Optional[str]:
+    """
+    Directory holding the system's traineddata files.
+
+    The tesserocr wheels bundle their own libtesseract, whose built-in
+    tessdata location need not be where the tesseract package installed
+    its models, so the tesseract binary is asked for it once.
+    """
+    global _tessdata_path
+    if _tessdata_path is not _UNSET:
+        return _tessdata_path
+
+    _tessdata_path = os.environ.get('TESSDATA_PREFIX') or None
+    if _tessdata_path is None and TESSERACT_AVAILABLE:
+        try:
+            output = subprocess.run(
+                [pytesseract.pytesseract.tesseract_cmd, '--list-langs'],
+                capture_output=True, text=True, timeout=10
+            )
+            match = re.search(r'"(.+?)"', output.stdout + output.stderr)
+            if match:
+                _tessdata_path = match.group(1)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not locate tessdata: {e}")
+    return _tessdata_path
+
+
+def _get_warm_api(language: str, timings: Dict[str, float]):
+    """Get a loaded Tesseract API for language, loading it on first use"""
+    api = _warm_apis.get(language)
+    if api is not None:
+        _warm_apis.move_to_end(language)
+        return api
+    if language in _unloadable_languages:
+        raise ModelLoadError(language)
+
+    start = time.perf_counter()
+    options = {'lang': language, 'psm': PSM.AUTO_OSD, 'oem': OEM.LSTM_ONLY}
+    path = _get_tessdata_path()
+    if path:
+        options['path'] = path
+    try:
+        api = PyTessBaseAPI(**options)
+    except RuntimeError as e:
+        _unloadable_languages.add(language)
+        logger.warning(f"tesserocr could not load '{language}', using the tesseract binary: {e}")
+        raise ModelLoadError(language) from e
+    timings['model_loads'] += 1
+    timings['model_load_seconds'] += time.perf_counter() - start
+
+    _warm_apis[language] = api
+    while len(_warm_apis) > MAX_WARM_LANGUAGES:
+        _, released = _warm_apis.popitem(last=False)
+        released.End()
+    return api
+
+
+def _warm_recognize(api, timeout: float, timings: Dict[str, float]) -> str:
+    start = time.perf_counter()
+    try:
+        if not api.Recognize(timeout=int(timeout * 1000)):
+            raise RuntimeError('Tesseract process timeout')
+        return api.GetUTF8Text()
+    finally:
+        timings['recognition_seconds'] += time.perf_counter() - start
+
+
+def _recognize_warm(image, language: str, timeout: float, timings: Dict[str, float]) -> Dict[str, str]:
+    """Recognize with warm tesserocr APIs"""
+    if language != 'auto':
+        api = _get_warm_api(language, timings)
+        api.SetImage(image)
+        return {'text': _warm_recognize(api, timeout, timings), 'language': language}
+
+    eng_api = _get_warm_api('eng', timings)
+    eng_api.SetImage(image)
+    text = _warm_recognize(eng_api, timeout, timings)
+    detected_lang = detect_language(text[:500])
+
+    if detected_lang == 'eng':
+        timings['second_passes_skipped'] += 1
+        return {'text': text, 'language': detected_lang}
+
+    # Reuse the English pass's layout: recognize each text block in the
+    # detected language instead of re-running page segmentation
+    blocks = eng_api.GetComponentImages(RIL.BLOCK, True)
+    api = _get_warm_api(detected_lang, timings)
+    api.SetImage(image)
+    timings['second_passes'] += 1
+
+    if not blocks:
+        return {'text': _warm_recognize(api, timeout, timings), 'language': detected_lang}
+
+    parts = []
+    api.SetPageSegMode(PSM.SINGLE_BLOCK)
+    try:
+        for _, box, _, _ in blocks:
+            api.SetRectangle(box['x'], box['y'], box['w'], box['h'])
+            parts.append(_warm_recognize(api, timeout, timings))
+    finally:
+        api.SetPageSegMode(PSM.AUTO_OSD)
+
+    return {'text': '\n\n'.join(parts), 'language': detected_lang}
+
+
+def recognize_image(image, language='eng', timeout=0, timings=None) -> Dict[str, str]:
+    """
+    Run Tesseract on a PIL image.
+
+    With language='auto' an English pass is used to detect the language.
+    Recognition is repeated only when a different language was detected.
+    Warm tesserocr APIs are used when available; otherwise, or when
+    tesserocr cannot load a language, each call runs the tesseract binary
+    through pytesseract.
+    """
+    if timings is None:
+        timings = _new_timings()
+
+    if TESSEROCR_AVAILABLE:
+        try:
+            return _recognize_warm(image, language, timeout, timings)
+        except ModelLoadError:
+            pass
+
+    def run(lang):
+        start = time.perf_counter()
+        try:
+            return pytesseract.image_to_string(image, lang=lang, config=TESSERACT_CONFIG, timeout=timeout)
+        finally:
+            timings['recognition_seconds'] += time.perf_counter() - start
+
+    if language != 'auto':
+        return {'text': run(language), 'language': language}
+
+    # Try to detect language from a sample
+    text = run('eng')
+    detected_lang = detect_language(text[:500])
+    if detected_lang == 'eng':
+        timings['second_passes_skipped'] += 1
+    else:
+        timings['second_passes'] += 1
+        text = run(detected_lang)
+    return {'text': text, 'language': detected_lang}
+
+
+def _record_timings(timings: Optional[Dict[str, float]]) -> None:
+    """Add timings reported by a pool worker to this process's metrics"""
+    if not timings:
+        return
+    with _metrics_lock:
+        _metrics['images'] += 1
+        for key, value in timings.items():
+            _metrics[key] += value
+
+
+def get_ocr_metrics() -> Dict[str, Any]:
+    """Get model load vs recognition timing metrics for this process"""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+
+    images = metrics['images']
+    metrics.update({
+        'backend': 'tesserocr' if TESSEROCR_AVAILABLE else 'pytesseract',
+        'model_load_seconds': round(metrics['model_load_seconds'], 3),
+        'recognition_seconds': round(metrics['recognition_seconds'], 3),
+        'avg_recognition_seconds': round(metrics['recognition_seconds'] / images, 3) if images else 0.0
+    })
+    return metrics
+
+
+def _clean_ocr_text(text: str) -> str:
+    """Collapse whitespace in OCR output"""
+    return ' '.join(text.strip().split())
+
+
+def _ocr_page_task(page_number: int, size, mode: str, samples: bytes,
+                   language: str, auto_enhance: bool, timeout: float) -> Dict[str, Any]:
+    """Recognize one rendered page (runs in a pool worker)"""
+    result = {
+        'page': page_number + 1,
+        'text': '',
+        'confidence': 0,
+        'language': language,
+        'source': 'ocr'
+    }
+
+    if not (TESSERACT_AVAILABLE and PIL_AVAILABLE):
+        result['error'] = 'Tesseract OCR is not available'
+        return result
+
+    timings = _new_timings()
+    result['timings'] = timings
+
+    try:
+        image = Image.frombytes(mode, size, samples)
+
+        if auto_enhance and CV2_AVAILABLE:
+            image = enhance_image(image, auto_enhance)
+
+        recognized = recognize_image(image, language, timeout=max(1, int(timeout)), timings=timings)
+        text = _clean_ocr_text(recognized['text'])
+
+        result.update({
+            'text': text,
+            # Default confidence based on text quality
+            'confidence': 85 if len(text) >= 10 else 60,
+            'language': recognized['language']
+        })
+    except Exception as e:
+        result['error'] = f"OCR processing failed: {str(e)}"
+
+    return result
+
+
+def _ocr_image_task(image_path: str, language: str, auto_enhance: bool,
+                    timeout: float) -> Dict[str, Any]:
+    """Recognize an image file (runs in a pool worker)"""
+    timings = _new_timings()
+
+    # Open and enhance image
+    image = Image.open(image_path)
+
+    # Convert RGBA to RGB if necessary
+    if image.mode == 'RGBA':
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[3])
+        image = rgb_image
+
+    # Enhance image if requested
+    if auto_enhance and CV2_AVAILABLE:
+        image = enhance_image(image, auto_enhance)
+
+    recognized = recognize_image(image, language, timeout=max(1, int(timeout)), timings=timings)
+    recognized['timings'] = timings
+    return recognized
+
+
+def ocr_image(image_path: str, language: str = 'eng', auto_enhance: bool = True,
+              timeout: float = 30) -> Dict[str, str]:
+    """
+    Recognize an image file in the OCR pool.
+
+    Returns {'text', 'language'}. Raises TimeoutError when recognition does
+    not finish within timeout seconds; Tesseract errors are re-raised.
+    """
+    executor = get_ocr_executor()
+    future = executor.submit(_ocr_image_task, image_path, language, auto_enhance, timeout)
+    try:
+        recognized = future.result(timeout=timeout)
+    except BrokenProcessPool:
+        _reset_ocr_executor()
+        raise
+    except TimeoutError:
+        future.cancel()
+        raise
+
+    _record_timings(recognized.pop('timings', None))
+    return recognized
+
+
+def ocr_pdf(pdf_path: str, language: str = 'eng', auto_enhance: bool = True,
+            timeout: float = DEFAULT_DOCUMENT_TIMEOUT,
+            on_page: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Extract text from every page of a PDF, OCR-ing scanned pages in parallel.
+
+    Pages with a text layer are read directly. Scanned pages are rendered
+    to raw pixmaps and recognized in the shared process pool; at most two
+    pages per worker are rendered ahead to bound memory. ``timeout`` is a
+    deadline for the whole document: pages not finished in time are
+    reported with ``source='timeout'``. ``on_page`` is called with each
+    page result as soon as it is available.
+
+    Returns a dict with the per-page results in page order, the detected
+    document language and whether the deadline was hit.
+    """
+    deadline = time.monotonic() + timeout
+    results: Dict[int, Dict[str, Any]] = {}
+    pending = {}
+
+    def remaining() -> float:
+        return deadline - time.monotonic()
+
+    def emit(page_result: Dict[str, Any]) -> None:
+        results[page_result['page'] - 1] = page_result
+        if on_page:
+            try:
+                on_page(page_result)
+            except Exception as e:
+                logger.warning(f"OCR page callback failed: {e}")
+
+    def collect(block_timeout: float) -> None:
+        done, _ = wait(list(pending), timeout=max(0, block_timeout), return_when=FIRST_COMPLETED)
+        for future in done:
+            page_num = pending.pop(future)
+            try:
+                page_result = future.result()
+                _record_timings(page_result.pop('timings', None))
+                emit(page_result)
+            except BrokenProcessPool:
+                _reset_ocr_executor()
+                raise
+            except Exception as e:
+                emit({'page': page_num + 1, 'text': '', 'confidence': 0,
+                      'language': language, 'source': 'ocr',
+                      'error': f"OCR processing failed: {str(e)}"})
+
+    pdf_document = fitz.open(pdf_path)
+    page_count = len(pdf_document)
+    executor = None
+
+    try:
+        for page_num in range(page_count):
+            if remaining() <= 0:
+                break
+
+            page = pdf_document[page_num]
+
+            # First try to extract text directly
+            text = page.get_text()
+            if text.strip():
+                emit({'page': page_num + 1, 'text': text, 'confidence': 100,
+                      'language': language, 'source': 'text'})
+                continue
+
+            if executor is None:
+                executor = get_ocr_executor()
+
+            # Wait for a free slot before rendering another page
+            while len(pending) >= max(1, get_ocr_pool_size()) * 2 and remaining() > 0:
+                collect(remaining())
+            if remaining() <= 0:
+                break
+
+            pix = page.get_pixmap(matrix=fitz.Matrix(PDF_RENDER_SCALE, PDF_RENDER_SCALE), alpha=False)
+            mode = 'L' if pix.n == 1 else 'RGB'
+            future = executor.submit(
+                _ocr_page_task, page_num, (pix.width, pix.height), mode, pix.samples,
+                language, auto_enhance, remaining()
+            )
+            pending[future] = page_num
+            del pix
+
+        while pending and remaining() > 0:
+            collect(remaining())
+    finally:
+        pdf_document.close()
+        for future in pending:
+            future.cancel()
+
+    timed_out = len(results) < page_count
+    pages: List[Dict[str, Any]] = []
+    for page_num in range(page_count):
+        pages.append(results.get(page_num) or {
+            'page': page_num + 1, 'text': '', 'confidence': 0,
+            'language': language, 'source': 'timeout'
+        })
+
+    document_language = language
+    if language == 'auto':
+        detected = Counter(p['language'] for p in pages if p['source'] == 'ocr' and p['text'])
+        if detected:
+            document_language = detected.most_common(1)[0][0]
+
+    return {
+        'pages': pages,
+        'language': document_language,
+        'timed_out': timed_out
+    }
@@ -5,6 +5,7 @@ Usage tracking utilities for Cropio converter
 
 from flask_login import current_user
 from models import db, UsageTracking, ConversionHistory
+from core.usage_accounting import usage_accounting, conversion_counters
 from datetime import datetime, date
 
 
@@ -32,8 +33,9 @@ def check_usage_limit(user_id=None, conversion_type='general', limit=5):
         
         # Get or create today's usage record
         today_usage = UsageTracking.get_or_create_today(user_id)
+        used = today_usage.conversions_count + usage_accounting.pending_conversions(user_id)
         
-        return today_usage.conversions_count < limit
+        return used < limit
         
     except Exception as e:
         print(f"Error checking usage limit: {e}")
@@ -60,14 +62,8 @@ def increment_usage(user_id=None, conversion_type='general', credit_cost=1.0, fi
             else:
                 return False
         
-        # Get or create today's usage record
-        today_usage = UsageTracking.get_or_create_today(user_id)
-        
-        # Increment usage
-        today_usage.increment_usage(conversion_type, credit_cost, file_size)
-        
-        # Commit changes
-        db.session.commit()
+        # Increment usage; written to today's record by the usage accountant
+        usage_accounting.record_usage(user_id, **conversion_counters(conversion_type, file_size, credit_cost))
         
         return True
         
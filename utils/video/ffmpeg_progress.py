@@ -0,0 +1,233 @@
+"""
+FFmpeg Progress - Streaming progress and cancellation for FFmpeg runs
+Parses `-progress pipe:1` output incrementally and runs FFmpeg in its own
+process group so a conversion can be cancelled without leaving children behind
+"""
+
+import os
+import time
+import signal
+import threading
+import subprocess
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Kill FFmpeg if it stops reporting progress for this long; replaces the
+# fixed wall-clock timeout so large inputs can run as long as they advance
+STALL_TIMEOUT = 120
+
+# Lines of stderr kept for error messages
+STDERR_TAIL_LINES = 50
+
+# Seconds to wait after SIGTERM before SIGKILL on cancel
+TERMINATE_GRACE = 5
+
+
+class FFmpegProgress:
+    """
+    Live progress record for one conversion.
+
+    Updated from FFmpeg's key=value progress stream; safe to read from other
+    threads through as_dict(). cancel() stops the attached FFmpeg process.
+    """
+
+    def __init__(self, total_duration: Optional[float] = None,
+                 on_update: Optional[Callable[['FFmpegProgress'], None]] = None):
+        self.total_duration = total_duration
+        self.on_update = on_update
+        self.status = 'pending'
+        self.frame = 0
+        self.fps = 0.0
+        self.out_time = 0.0
+        self.speed = None
+        self.started_at = None
+        self.updated_at = None
+        self.cancelled = False
+        self._process = None
+        self._lock = threading.Lock()
+
+    def attach(self, process: subprocess.Popen) -> None:
+        """Bind the running FFmpeg process; cancels it at once if already cancelled"""
+        with self._lock:
+            self._process = process
+            self.status = 'running'
+            self.started_at = self.started_at or time.time()
+            self.updated_at = time.time()
+            cancelled = self.cancelled
+        if cancelled:
+            kill_process_group(process)
+
+    def detach(self) -> None:
+        with self._lock:
+            self._process = None
+
+    def cancel(self) -> bool:
+        """Cancel the conversion; returns False if it had already finished"""
+        with self._lock:
+            if self.status in ('completed', 'failed'):
+                return False
+            self.cancelled = True
+            self.status = 'cancelled'
+            process = self._process
+        if process is not None:
+            kill_process_group(process)
+        return True
+
+    def finish(self, success: bool) -> None:
+        with self._lock:
+            if self.status != 'cancelled':
+                self.status = 'completed' if success else 'failed'
+            self.updated_at = time.time()
+
+    def feed(self, line: str) -> None:
+        """Consume one `key=value` line of FFmpeg progress output"""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return
+        value = value.strip()
+        with self._lock:
+            self.updated_at = time.time()
+            if key == 'frame':
+                self.frame = _to_number(value, int, self.frame)
+            elif key == 'fps':
+                self.fps = _to_number(value, float, self.fps)
+            elif key in ('out_time_us', 'out_time_ms'):
+                # Both keys carry microseconds in current FFmpeg releases
+                micros = _to_number(value, int, None)
+                if micros is not None and micros >= 0:
+                    self.out_time = micros / 1_000_000
+            elif key == 'speed':
+                speed = _to_number(value.rstrip('x'), float, None)
+                self.speed = speed if speed else self.speed
+            elif key != 'progress':
+                return
+        if key == 'progress' and self.on_update:
+            try:
+                self.on_update(self)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {e}")
+
+    @property
+    def percent(self) -> Optional[float]:
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_duration:
+            return None
+        return round(min(99.0, self.out_time / self.total_duration * 100), 1)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds left, from FFmpeg's reported speed or elapsed time"""
+        if self.status != 'running' or not self.total_duration or self.out_time <= 0:
+            return None
+        remaining = max(0.0, self.total_duration - self.out_time)
+        if self.speed:
+            return round(remaining / self.speed, 1)
+        elapsed = time.time() - (self.started_at or time.time())
+        return round(remaining * elapsed / self.out_time, 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'status': self.status,
+                'frame': self.frame,
+                'fps': self.fps,
+                'out_time': round(self.out_time, 2),
+                'speed': self.speed,
+                'duration': self.total_duration,
+                'percent': self.percent,
+                'eta': self.eta,
+            }
+
+
+def _to_number(value: str, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """Terminate FFmpeg and anything it spawned, escalating to SIGKILL"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+        process.wait(timeout=TERMINATE_GRACE)
+    except subprocess.TimeoutExpired:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_ffmpeg(cmd: List[str], progress: Optional[FFmpegProgress] = None,
+               stall_timeout: float = STALL_TIMEOUT) -> Dict[str, Any]:
+    """
+    Run an FFmpeg command, streaming its progress instead of buffering output.
+
+    Args:
+        cmd: FFmpeg command line, starting with the executable
+        progress: Progress record to update and to bind for cancellation
+        stall_timeout: Seconds without progress output before FFmpeg is killed
+
+    Returns:
+        Dict with returncode, stderr (tail only), cancelled and stalled flags
+    """
+    progress = progress or FFmpegProgress()
+    cmd = [cmd[0], '-nostats', '-progress', 'pipe:1'] + list(cmd[1:])
+
+    popen_kwargs = {'start_new_session': True} if os.name == 'posix' else {}
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, errors='replace', **popen_kwargs
+    )
+    progress.attach(process)
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip())
+
+    stalled = threading.Event()
+    done = threading.Event()
+
+    def watchdog():
+        while not done.wait(1.0):
+            if time.time() - (progress.updated_at or time.time()) > stall_timeout:
+                stalled.set()
+                logger.warning(f"FFmpeg made no progress for {stall_timeout}s, killing pid {process.pid}")
+                kill_process_group(process)
+                return
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    watchdog_thread = threading.Thread(target=watchdog, daemon=True)
+    stderr_thread.start()
+    watchdog_thread.start()
+
+    try:
+        for line in process.stdout:
+            progress.feed(line)
+        returncode = process.wait()
+    finally:
+        done.set()
+        if process.poll() is None:
+            kill_process_group(process)
+        stderr_thread.join(timeout=TERMINATE_GRACE)
+        progress.detach()
+
+    return {
+        'returncode': returncode,
+        'stderr': '\n'.join(stderr_tail),
+        'cancelled': progress.cancelled,
+        'stalled': stalled.is_set(),
+    }
@@ -4,16 +4,56 @@ Professional video conversion between GIF and MP4 formats using FFmpeg
 """
 
 import os
+import json
 import uuid
-import tempfile
+import threading
 import subprocess
 import logging
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Union
 from .ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path, is_ffmpeg_available, validate_ffmpeg
+from .ffmpeg_progress import FFmpegProgress, run_ffmpeg
+from core.storage_index import record_after_request
 
 logger = logging.getLogger(__name__)
 
+# One global palette needs every frame buffered until palettegen has seen the
+# whole clip; above this many frames, palettes are generated per frame instead
+GLOBAL_PALETTE_MAX_FRAMES = 300
+
+# ffprobe results keyed by file fingerprint
+PROBE_CACHE_SIZE = 256
+
+_probe_cache: 'OrderedDict[Tuple[str, int, int, int, int], Dict[str, Any]]' = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+
+def file_fingerprint(path: str) -> Tuple[str, int, int, int, int]:
+    """
+    Identity of a file as it is on disk: path, device, inode, size and mtime.
+
+    Only stats the file, so it stays cheaper than the header-only ffprobe
+    call it keys; a file rewritten in place gets a new size or mtime.
+    """
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def parse_time(value: Union[str, int, float, None]) -> Optional[float]:
+    """Parse an ffmpeg time ('90', '1:30', '00:01:30.5') to seconds"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    try:
+        for part in str(value).strip().split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return None
+    return seconds
+
 
 class GifMp4Processor:
     """Professional GIF ⇄ MP4 conversion processor"""
@@ -29,7 +69,8 @@ class GifMp4Processor:
     
     def gif_to_mp4(self, input_path: str, output_path: Optional[str] = None, 
                    quality: str = 'high', fps: Optional[int] = None,
-                   scale: Optional[str] = None, optimize: bool = True) -> Dict[str, Any]:
+                   scale: Optional[str] = None, optimize: bool = True,
+                   progress: Optional[FFmpegProgress] = None) -> Dict[str, Any]:
         """
         Convert GIF to MP4 with advanced options
         
@@ -40,6 +81,7 @@ class GifMp4Processor:
             fps: Target frames per second (None to preserve original)
             scale: Scale filter (e.g., '720:480', '50%', None to preserve)
             optimize: Enable advanced optimization
+            progress: Live progress record, also used to cancel the conversion
         
         Returns:
             Dict with conversion results
@@ -53,6 +95,7 @@ class GifMp4Processor:
             if not output_path:
                 output_filename = f"{uuid.uuid4().hex}_converted.mp4"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
             
             # Ensure output directory exists
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -62,6 +105,8 @@ class GifMp4Processor:
             if not input_info['success']:
                 return {'success': False, 'error': f"Failed to analyze input GIF: {input_info['error']}"}
             
+            progress = self._prepare_progress(progress, input_info.get('duration'))
+            
             # Build FFmpeg command
             cmd = [self.ffmpeg_path, '-i', input_path]
             
@@ -100,16 +145,17 @@ class GifMp4Processor:
             
             # Execute conversion
             logger.info(f"Converting GIF to MP4: {input_path} -> {output_path}")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = run_ffmpeg(cmd, progress)
             
-            if result.returncode != 0:
-                error_msg = result.stderr or 'Unknown FFmpeg error'
-                logger.error(f"GIF to MP4 conversion failed: {error_msg}")
-                return {'success': False, 'error': f'Conversion failed: {error_msg}'}
+            if result['returncode'] != 0:
+                progress.finish(False)
+                return self._run_error(result, 'GIF to MP4')
             
             # Verify output file
             if not os.path.exists(output_path):
+                progress.finish(False)
                 return {'success': False, 'error': 'Output MP4 file was not created'}
+            progress.finish(True)
             
             # Get output video info
             output_info = self._get_video_info(output_path)
@@ -132,8 +178,6 @@ class GifMp4Processor:
                 'format': 'MP4'
             }
             
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Conversion timed out (5 minutes limit)'}
         except Exception as e:
             logger.error(f"GIF to MP4 conversion error: {str(e)}")
             return {'success': False, 'error': f'Conversion error: {str(e)}'}
@@ -141,7 +185,8 @@ class GifMp4Processor:
     def mp4_to_gif_simple(self, input_path: str, output_path: Optional[str] = None,
                          fps: int = 15, scale: str = '-1:480', 
                          start_time: Optional[str] = None, duration: Optional[str] = None,
-                         loop_count: int = 0) -> Dict[str, Any]:
+                         loop_count: int = 0,
+                         progress: Optional[FFmpegProgress] = None) -> Dict[str, Any]:
         """
         Simple single-pass MP4 to GIF conversion (fallback method)
         """
@@ -152,17 +197,17 @@ class GifMp4Processor:
             if not output_path:
                 output_filename = f"{uuid.uuid4().hex}_converted.gif"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
             
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            # Simple single-pass conversion
-            cmd = [self.ffmpeg_path, '-i', input_path]
+            if progress is None or progress.total_duration is None:
+                input_info = self._get_video_info(input_path)
+                clip_length = self._clip_length(input_info.get('duration'), start_time, duration)
+                progress = self._prepare_progress(progress, clip_length)
             
-            # Add time range if specified
-            if start_time:
-                cmd.extend(['-ss', start_time])
-            if duration:
-                cmd.extend(['-t', duration])
+            # Simple single-pass conversion; seek on the input so skipped video isn't decoded
+            cmd = [self.ffmpeg_path] + self._input_range_args(start_time, duration) + ['-i', input_path]
             
             # Simple filter for GIF conversion
             if scale and scale != '-1:480':
@@ -177,15 +222,16 @@ class GifMp4Processor:
             ])
             
             logger.info(f"Converting MP4 to GIF (simple method): {input_path} -> {output_path}")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+            result = run_ffmpeg(cmd, progress)
             
-            if result.returncode != 0:
-                error_msg = result.stderr or 'Unknown FFmpeg error'
-                logger.error(f"Simple MP4 to GIF conversion failed: {error_msg}")
-                return {'success': False, 'error': f'Conversion failed: {error_msg}'}
+            if result['returncode'] != 0:
+                progress.finish(False)
+                return self._run_error(result, 'Simple MP4 to GIF')
             
             if not os.path.exists(output_path):
+                progress.finish(False)
                 return {'success': False, 'error': 'Output GIF file was not created'}
+            progress.finish(True)
             
             input_size = os.path.getsize(input_path)
             output_size = os.path.getsize(output_path)
@@ -209,10 +255,17 @@ class GifMp4Processor:
     def mp4_to_gif(self, input_path: str, output_path: Optional[str] = None,
                    fps: int = 15, scale: str = '-1:480', 
                    start_time: Optional[str] = None, duration: Optional[str] = None,
-                   palette_quality: str = 'high', loop_count: int = 0) -> Dict[str, Any]:
+                   palette_quality: str = 'high', loop_count: int = 0,
+                   palette_mode: str = 'auto',
+                   progress: Optional[FFmpegProgress] = None) -> Dict[str, Any]:
         """
         Convert MP4 to GIF with advanced options
         
+        The clip is decoded once: the filter graph splits the scaled frames
+        into palettegen and paletteuse, and the time range is applied on the
+        input so ffmpeg seeks straight to the clip instead of decoding from
+        the start of the video.
+        
         Args:
             input_path: Path to input MP4 file
             output_path: Path for output GIF file (auto-generated if None)
@@ -222,6 +275,10 @@ class GifMp4Processor:
             duration: Duration to convert (e.g., '00:00:05')
             palette_quality: Palette generation quality ('low', 'medium', 'high')
             loop_count: Number of loops (0 for infinite)
+            palette_mode: 'global' for one palette over the whole clip,
+                'per_frame' for a fresh palette on every frame, or 'auto' to
+                use per-frame palettes only for long clips
+            progress: Live progress record, also used to cancel the conversion
         
         Returns:
             Dict with conversion results
@@ -235,6 +292,7 @@ class GifMp4Processor:
             if not output_path:
                 output_filename = f"{uuid.uuid4().hex}_converted.gif"
                 output_path = os.path.join(self.upload_folder, output_filename)
+                record_after_request(output_path)
             
             # Ensure output directory exists
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -244,82 +302,33 @@ class GifMp4Processor:
             if not input_info['success']:
                 return {'success': False, 'error': f"Failed to analyze input MP4: {input_info['error']}"}
             
-            # Two-pass conversion for better quality GIF
-            
-            # Step 1: Generate optimal palette
-            palette_path = os.path.join(tempfile.gettempdir(), f"palette_{uuid.uuid4().hex}.png")
-            
-            palette_cmd = [self.ffmpeg_path, '-i', input_path]
-            
-            # Add time range if specified
-            if start_time:
-                palette_cmd.extend(['-ss', start_time])
-            if duration:
-                palette_cmd.extend(['-t', duration])
-            
-            # Palette generation settings - simplified approach
-            palette_settings = self._get_palette_settings(palette_quality)
-            # Use a simpler filter chain for palette generation
-            if scale and scale != "-1:480":
-                scale_filter = f"fps={fps},scale={scale}:flags=lanczos"
-            else:
-                scale_filter = f"fps={fps},scale=-1:480:flags=lanczos"  # Default scale for GIF
-            filter_complex = f"{scale_filter},{palette_settings}"
-            
-            palette_cmd.extend([
-                '-vf', filter_complex,
-                '-y', palette_path
-            ])
-            
-            logger.info("Generating optimal color palette for GIF conversion")
-            palette_result = subprocess.run(palette_cmd, capture_output=True, text=True, timeout=120)
+            clip_length = self._clip_length(input_info.get('duration'), start_time, duration)
+            progress = self._prepare_progress(progress, clip_length)
             
-            if palette_result.returncode != 0 or not os.path.exists(palette_path):
-                # Two-pass method failed, try simple single-pass method
-                logger.warning("Two-pass conversion failed, falling back to simple method")
-                try:
-                    if os.path.exists(palette_path):
-                        os.unlink(palette_path)
-                except:
-                    pass
-                return self.mp4_to_gif_simple(input_path, output_path, fps, scale, start_time, duration, loop_count)
+            if palette_mode == 'auto':
+                long_clip = clip_length is None or clip_length * fps > GLOBAL_PALETTE_MAX_FRAMES
+                palette_mode = 'per_frame' if long_clip else 'global'
             
-            # Step 2: Convert to GIF using the generated palette
-            gif_cmd = [self.ffmpeg_path, '-i', input_path, '-i', palette_path]
-            
-            # Add time range if specified
-            if start_time:
-                gif_cmd.extend(['-ss', start_time])
-            if duration:
-                gif_cmd.extend(['-t', duration])
-            
-            # GIF conversion with palette and dimension fix
-            scale_filter = f"scale={scale}:flags=lanczos:force_original_aspect_ratio=decrease,pad=ceil(iw/2)*2:ceil(ih/2)*2"
-            gif_filter = f"[0:v] fps={fps},{scale_filter} [v]; [v][1:v] paletteuse=dither=bayer:bayer_scale=3"
-            
-            gif_cmd.extend([
-                '-filter_complex', gif_filter,
+            cmd = [self.ffmpeg_path] + self._input_range_args(start_time, duration) + ['-i', input_path]
+            cmd.extend([
+                '-filter_complex', self._gif_filter_graph(fps, scale, palette_quality, palette_mode),
                 '-loop', str(loop_count),
                 '-y', output_path
             ])
             
-            logger.info(f"Converting MP4 to GIF: {input_path} -> {output_path}")
-            gif_result = subprocess.run(gif_cmd, capture_output=True, text=True, timeout=300)
-            
-            # Clean up palette file
-            try:
-                os.unlink(palette_path)
-            except:
-                pass
+            logger.info(f"Converting MP4 to GIF ({palette_mode} palette): {input_path} -> {output_path}")
+            gif_result = run_ffmpeg(cmd, progress)
             
-            if gif_result.returncode != 0:
-                error_msg = gif_result.stderr or 'Unknown FFmpeg error'
-                logger.error(f"MP4 to GIF conversion failed: {error_msg}")
-                return {'success': False, 'error': f'Conversion failed: {error_msg}'}
+            if gif_result['cancelled'] or gif_result['stalled']:
+                progress.finish(False)
+                return self._run_error(gif_result, 'MP4 to GIF')
             
-            # Verify output file
-            if not os.path.exists(output_path):
-                return {'success': False, 'error': 'Output GIF file was not created'}
+            if gif_result['returncode'] != 0 or not os.path.exists(output_path):
+                # Palette filter graph failed, try simple single-pass method
+                logger.warning(f"Palette GIF conversion failed, falling back to simple method: {gif_result['stderr'][-500:]}")
+                return self.mp4_to_gif_simple(input_path, output_path, fps, scale, start_time, duration,
+                                              loop_count, progress=progress)
+            progress.finish(True)
             
             # Get output file info
             input_size = os.path.getsize(input_path)
@@ -336,19 +345,92 @@ class GifMp4Processor:
                 'fps': fps,
                 'scale': scale,
                 'palette_quality': palette_quality,
+                'palette_mode': palette_mode,
                 'loop_count': loop_count,
                 'processing_time': 'N/A',
                 'format': 'GIF'
             }
             
-        except subprocess.TimeoutExpired:
-            return {'success': False, 'error': 'Conversion timed out (5 minutes limit)'}
         except Exception as e:
             logger.error(f"MP4 to GIF conversion error: {str(e)}")
             return {'success': False, 'error': f'Conversion error: {str(e)}'}
     
+    @staticmethod
+    def _prepare_progress(progress: Optional[FFmpegProgress],
+                          total_duration: Optional[float]) -> FFmpegProgress:
+        """Use the caller's progress record, filling in the expected output duration"""
+        progress = progress or FFmpegProgress()
+        if progress.total_duration is None:
+            progress.total_duration = total_duration
+        return progress
+    
+    @staticmethod
+    def _run_error(run: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """Result dict for a failed, cancelled or stalled FFmpeg run"""
+        if run['cancelled']:
+            logger.info(f"{label} conversion cancelled")
+            return {'success': False, 'cancelled': True, 'error': 'Conversion cancelled'}
+        if run['stalled']:
+            return {'success': False, 'error': 'Conversion timed out (FFmpeg stopped making progress)'}
+        error_msg = run['stderr'] or 'Unknown FFmpeg error'
+        logger.error(f"{label} conversion failed: {error_msg}")
+        return {'success': False, 'error': f'Conversion failed: {error_msg}'}
+    
+    @staticmethod
+    def _input_range_args(start_time: Optional[str], duration: Optional[str]) -> list:
+        """Clip range as input options, so ffmpeg seeks instead of decoding up to the start"""
+        args = []
+        if start_time:
+            args.extend(['-ss', str(start_time)])
+        if duration:
+            args.extend(['-t', str(duration)])
+        return args
+    
+    @staticmethod
+    def _clip_length(video_duration: Optional[float], start_time: Optional[str],
+                     duration: Optional[str]) -> Optional[float]:
+        """Seconds of video a conversion will cover, if known"""
+        requested = parse_time(duration)
+        remaining = None
+        if video_duration is not None:
+            remaining = max(0.0, video_duration - (parse_time(start_time) or 0.0))
+        if requested is None:
+            return remaining
+        return requested if remaining is None else min(requested, remaining)
+    
+    def _gif_filter_graph(self, fps: int, scale: str, palette_quality: str, palette_mode: str) -> str:
+        """Single-decode filter graph: scale once, split, generate and apply the palette"""
+        scale_filter = f"scale={scale or '-1:480'}:flags=lanczos:force_original_aspect_ratio=decrease,pad=ceil(iw/2)*2:ceil(ih/2)*2"
+        if palette_mode == 'per_frame':
+            palettegen = self._get_palette_settings(palette_quality, stats_mode='single')
+            paletteuse = 'paletteuse=dither=bayer:bayer_scale=3:new=1'
+        else:
+            palettegen = self._get_palette_settings(palette_quality, stats_mode='full')
+            paletteuse = 'paletteuse=dither=bayer:bayer_scale=3'
+        return f"[0:v]fps={fps},{scale_filter},split[a][b];[a]{palettegen}[p];[b][p]{paletteuse}"
+    
     def _get_video_info(self, video_path: str) -> Dict[str, Any]:
-        """Get comprehensive video file information using FFprobe"""
+        """Get video file information using FFprobe, cached by file fingerprint"""
+        try:
+            key = file_fingerprint(video_path)
+        except OSError as e:
+            return {'success': False, 'error': f'Analysis error: {str(e)}'}
+        
+        with _probe_cache_lock:
+            if key in _probe_cache:
+                _probe_cache.move_to_end(key)
+                return dict(_probe_cache[key])
+        
+        info = self._probe_video(video_path)
+        if info['success']:
+            with _probe_cache_lock:
+                _probe_cache[key] = info
+                while len(_probe_cache) > PROBE_CACHE_SIZE:
+                    _probe_cache.popitem(last=False)
+        return dict(info)
+    
+    def _probe_video(self, video_path: str) -> Dict[str, Any]:
+        """Run FFprobe and extract the video stream information"""
         try:
             cmd = [
                 self.ffprobe_path,
@@ -364,7 +446,6 @@ class GifMp4Processor:
             if result.returncode != 0:
                 return {'success': False, 'error': 'Failed to analyze video file'}
             
-            import json
             probe_data = json.loads(result.stdout)
             
             # Extract video stream info
@@ -432,14 +513,14 @@ class GifMp4Processor:
         
         return settings
     
-    def _get_palette_settings(self, palette_quality: str) -> str:
+    def _get_palette_settings(self, palette_quality: str, stats_mode: str = 'full') -> str:
         """Get palette generation settings for GIF conversion"""
         if palette_quality == 'high':
-            return "palettegen=max_colors=256:stats_mode=single"
+            return f"palettegen=max_colors=256:stats_mode={stats_mode}"
         elif palette_quality == 'medium':
-            return "palettegen=max_colors=128:stats_mode=single"
+            return f"palettegen=max_colors=128:stats_mode={stats_mode}"
         else:  # low
-            return "palettegen=max_colors=64:stats_mode=single"
+            return f"palettegen=max_colors=64:stats_mode={stats_mode}"
     
     def optimize_gif(self, gif_path: str, output_path: Optional[str] = None) -> Dict[str, Any]:
         """Optimize an existing GIF file for better compression"""
@@ -6,14 +6,117 @@ Handles HTML to PDF conversion with multiple backend support
 import os
 import uuid
 import tempfile
+import hashlib
+import threading
 import requests
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
 import re
 import mimetypes
 from pathlib import Path
 
+from core.capabilities import capability_cache
+from core.process_pools import pool_size
+from utils.web_code.resource_fetcher import ResourceFetcher, get_subresource_cache
+from core.storage_index import record_after_request
+
+# Distributions whose versions decide whether the backend probe is redone
+PDF_BACKEND_PACKAGES = ('weasyprint', 'pdfkit', 'reportlab', 'selenium')
+
+
+def probe_pdf_backends():
+    """Working PDF backends, in order of preference"""
+    backends = []
+    
+    # Try WeasyPrint first (best CSS support)
+    try:
+        import weasyprint
+        # Test if it actually works
+        test_html = '<html><body><p>Test</p></body></html>'
+        weasyprint.HTML(string=test_html).write_pdf()
+        backends.append('weasyprint')
+    except (ImportError, OSError):
+        pass
+    
+    # Try pdfkit (wkhtmltopdf)
+    try:
+        import pdfkit
+        # Test if wkhtmltopdf is available
+        pdfkit.from_string('<html><body><p>Test</p></body></html>', False)
+        backends.append('pdfkit')
+    except (ImportError, OSError):
+        pass
+    
+    # Try ReportLab (pure Python, most compatible)
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import letter
+        backends.append('reportlab')
+    except ImportError:
+        pass
+    
+    # Try Selenium (most reliable but slower)
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        backends.append('selenium')
+    except ImportError:
+        pass
+    
+    return backends
+
+
+# Parsed WeasyPrint stylesheets for recently used page settings
+STYLESHEET_CACHE_SIZE = 64
+
+_stylesheet_cache = OrderedDict()
+_stylesheet_cache_lock = threading.Lock()
+
+# Processes converting batches of files. HTML_PDF_BATCH_WORKERS (default: the
+# number of cores) is the budget for the host, split between the web workers;
+# 1 converts in the calling process
+BATCH_WORKERS = pool_size('HTML_PDF_BATCH_WORKERS')
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def _init_batch_worker(cache_folder):
+    """Use the web worker's subresource cache in a batch process"""
+    get_subresource_cache(cache_folder)
+
+
+def get_batch_executor(cache_folder):
+    """Process pool shared by every batch conversion in this process"""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS, initializer=_init_batch_worker, initargs=(cache_folder,)
+            )
+        return _batch_executor
+
+
+def _reset_batch_executor():
+    """Drop a broken pool so the next batch starts a fresh one"""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is not None:
+            _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+
+
+def _batch_convert_file(file_path, settings, upload_folder):
+    """Convert one batch file in a pool process"""
+    processor = HTMLPDFProcessor()
+    processor.upload_folder = upload_folder
+    return processor.file_to_pdf(file_path, settings)
+
+
 class HTMLPDFProcessor:
     """Utility class for HTML to PDF processing"""
     
@@ -27,53 +130,17 @@ class HTMLPDFProcessor:
         
         # Initialize backend
         self._detect_backend()
+        
+        # Stylesheets, fonts and images go through a shared cache; every
+        # request, including redirects, is checked against _validate_url
+        self.url_fetcher = ResourceFetcher(self._validate_url, cache=get_subresource_cache())
     
     def _detect_backend(self):
         """Detect available PDF generation backend"""
-        backends = []
-        
-        # Try WeasyPrint first (best CSS support)
-        try:
-            import weasyprint
-            # Test if it actually works
-            test_html = '<html><body><p>Test</p></body></html>'
-            weasyprint.HTML(string=test_html).write_pdf()
-            backends.append('weasyprint')
-            if not self.current_backend:
-                self.current_backend = 'weasyprint'
-        except (ImportError, OSError):
-            pass
-        
-        # Try pdfkit (wkhtmltopdf)
-        try:
-            import pdfkit
-            # Test if wkhtmltopdf is available
-            pdfkit.from_string('<html><body><p>Test</p></body></html>', False)
-            backends.append('pdfkit')
-            if not self.current_backend:
-                self.current_backend = 'pdfkit'
-        except (ImportError, OSError):
-            pass
-        
-        # Try ReportLab (pure Python, most compatible)
-        try:
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            backends.append('reportlab')
-            if not self.current_backend:
-                self.current_backend = 'reportlab'
-        except ImportError:
-            pass
-        
-        # Try Selenium (most reliable but slower)
-        try:
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
-            backends.append('selenium')
-            if not self.current_backend:
-                self.current_backend = 'selenium'
-        except ImportError:
-            pass
+        # Probing renders test documents, so the result is shared by every
+        # processor and reused across restarts
+        backends = capability_cache.get('html_pdf_backends', probe_pdf_backends, packages=PDF_BACKEND_PACKAGES)
+        self.current_backend = backends[0] if backends else None
         
         self.backend_info = {
             'available_backends': backends,
@@ -205,18 +272,18 @@ class HTMLPDFProcessor:
     def _weasyprint_url_to_pdf(self, url, settings):
         """Convert URL to PDF using WeasyPrint"""
         import weasyprint
-        from weasyprint import HTML, CSS
+        from weasyprint import HTML
         
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         # Create CSS from settings
-        css_content = self._build_css_from_settings(settings)
+        css_doc = self._settings_stylesheet(settings)
         
-        html_doc = HTML(url=url)
-        if css_content:
-            css_doc = CSS(string=css_content)
+        html_doc = HTML(url=url, url_fetcher=self.url_fetcher)
+        if css_doc:
             html_doc.write_pdf(output_path, stylesheets=[css_doc])
         else:
             html_doc.write_pdf(output_path)
@@ -226,22 +293,22 @@ class HTMLPDFProcessor:
     def _weasyprint_html_to_pdf(self, html_content, settings):
         """Convert HTML content to PDF using WeasyPrint"""
         import weasyprint
-        from weasyprint import HTML, CSS
+        from weasyprint import HTML
         
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         # Create CSS from settings
-        css_content = self._build_css_from_settings(settings)
+        css_doc = self._settings_stylesheet(settings)
         
         # Add custom CSS to HTML if provided
         if settings.get('custom_css'):
             html_content = self._inject_css(html_content, settings.get('custom_css', ''))
         
-        html_doc = HTML(string=html_content)
-        if css_content:
-            css_doc = CSS(string=css_content)
+        html_doc = HTML(string=html_content, url_fetcher=self.url_fetcher)
+        if css_doc:
             html_doc.write_pdf(output_path, stylesheets=[css_doc])
         else:
             html_doc.write_pdf(output_path)
@@ -255,6 +322,7 @@ class HTMLPDFProcessor:
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         # Build options
         options = self._build_pdfkit_options(settings)
@@ -270,6 +338,7 @@ class HTMLPDFProcessor:
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         # Add custom CSS to HTML if provided
         if settings.get('custom_css'):
@@ -292,6 +361,7 @@ class HTMLPDFProcessor:
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         chrome_options = Options()
         chrome_options.add_argument('--headless')
@@ -366,6 +436,7 @@ class HTMLPDFProcessor:
         # Generate output filename
         output_filename = f"{uuid.uuid4().hex}_converted.pdf"
         output_path = os.path.join(self.upload_folder, output_filename)
+        record_after_request(output_path)
         
         # Convert HTML to text (ReportLab has limited HTML support)
         soup = BeautifulSoup(html_content, 'html.parser')
@@ -589,6 +660,27 @@ class HTMLPDFProcessor:
         
         return '\n'.join(css_parts)
     
+    def _settings_stylesheet(self, settings):
+        """Parsed WeasyPrint stylesheet for the page settings, shared across conversions"""
+        css_content = self._build_css_from_settings(settings)
+        if not css_content:
+            return None
+        
+        key = hashlib.sha256(css_content.encode('utf-8')).hexdigest()
+        with _stylesheet_cache_lock:
+            css_doc = _stylesheet_cache.get(key)
+            if css_doc is not None:
+                _stylesheet_cache.move_to_end(key)
+                return css_doc
+        
+        from weasyprint import CSS
+        css_doc = CSS(string=css_content)
+        with _stylesheet_cache_lock:
+            _stylesheet_cache[key] = css_doc
+            while len(_stylesheet_cache) > STYLESHEET_CACHE_SIZE:
+                _stylesheet_cache.popitem(last=False)
+        return css_doc
+    
     def _build_pdfkit_options(self, settings):
         """Build PDFKit options from settings"""
         options = {
@@ -813,26 +905,56 @@ class HTMLPDFProcessor:
         except Exception:
             return 'webpage'
     
-    def batch_convert_html(self, file_paths, settings):
-        """Convert multiple HTML files to PDF"""
+    def batch_convert_html(self, file_paths, settings, workers=None):
+        """
+        Convert multiple HTML files to PDF.
+        
+        Files are converted in the process pool shared by every batch request
+        (HTML_PDF_BATCH_WORKERS processes per host); with ``workers`` of 1, or
+        a single file, they are converted in the calling process. Results are
+        reported in input order.
+        """
         converted_files = []
         failed_files = []
         
-        for file_path in file_paths:
+        workers = min(workers or BATCH_WORKERS, len(file_paths))
+        if workers > 1:
+            executor = get_batch_executor(self.url_fetcher.cache.folder)
             try:
-                pdf_path = self.file_to_pdf(file_path, settings)
+                futures = [
+                    executor.submit(_batch_convert_file, file_path, settings, self.upload_folder)
+                    for file_path in file_paths
+                ]
+            except BrokenProcessPool:
+                _reset_batch_executor()
+                raise
+            outcomes = [(file_path, future.result) for file_path, future in zip(file_paths, futures)]
+        else:
+            outcomes = [
+                (file_path, lambda file_path=file_path: self.file_to_pdf(file_path, settings))
+                for file_path in file_paths
+            ]
+        
+        pool_broken = False
+        for file_path, convert in outcomes:
+            try:
+                pdf_path = convert()
                 converted_files.append({
                     'input': file_path,
                     'output': pdf_path,
                     'status': 'success'
                 })
             except Exception as e:
+                pool_broken = pool_broken or isinstance(e, BrokenProcessPool)
                 failed_files.append({
                     'input': file_path,
                     'error': str(e),
                     'status': 'failed'
                 })
         
+        if pool_broken:
+            _reset_batch_executor()
+        
         return {
             'converted': converted_files,
             'failed': failed_files,
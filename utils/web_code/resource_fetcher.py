@@ -0,0 +1,387 @@
+"""
+Subresource Fetching for HTML to PDF Conversion
+Pooled HTTP session and shared on-disk cache for stylesheets, fonts and images
+"""
+
+import os
+import re
+import time
+import logging
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urljoin
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Shared by every worker on the host; bounded by total body size. Kept under
+# the app's CONVERSION_CACHE_FOLDER unless HTML_PDF_CACHE_DIR is set
+SUBRESOURCE_CACHE_MAX_BYTES = int(os.environ.get('HTML_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB
+
+# Largest single resource fetched for a document
+MAX_RESOURCE_BYTES = int(os.environ.get('HTML_PDF_MAX_RESOURCE_BYTES', 25 * 1024 * 1024))  # 25MB
+
+MAX_REDIRECTS = 5
+HTTP_POOL_SIZE = 16
+USER_AGENT = 'Mozilla/5.0 (compatible; Cropio HTML to PDF)'
+
+CACHE_CONTROL_PATTERN = re.compile(r'([\w-]+)\s*(?:=\s*"?([^",]*)"?)?')
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Directives of a Cache-Control header, lower-cased"""
+    return {name.lower(): arg for name, arg in CACHE_CONTROL_PATTERN.findall(value or '')}
+
+
+def freshness_lifetime(headers) -> Optional[float]:
+    """
+    Seconds a response may be reused without revalidation.
+
+    ``None`` means the response must not be stored at all (no-store,
+    private, ``Vary: *``). Responses that may be stored but carry no
+    freshness information get 0 and are revalidated on every use.
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives or 'private' in directives or headers.get('Vary', '').strip() == '*':
+        return None
+    if 'no-cache' in directives:
+        return 0
+
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name):
+            try:
+                return max(0, int(directives[name]) - int(headers.get('Age', 0) or 0))
+            except ValueError:
+                return 0
+
+    if headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires']).timestamp()
+            date = parsedate_to_datetime(headers['Date']).timestamp() if headers.get('Date') else time.time()
+            return max(0, expires - date)
+        except (TypeError, ValueError):
+            return 0
+
+    return 0
+
+
+def _content_type(headers):
+    """(mime_type, charset) from a Content-Type header"""
+    parts = [part.strip() for part in (headers.get('Content-Type') or '').split(';')]
+    mime_type = parts[0].lower() or None
+    charset = None
+    for part in parts[1:]:
+        if part.lower().startswith('charset='):
+            charset = part.split('=', 1)[1].strip('"\'') or None
+    return mime_type, charset
+
+
+class SubresourceCache:
+    """
+    On-disk HTTP cache for document subresources.
+
+    Bodies live under ``<folder>/<key[:2]>/<key>`` and their headers in a
+    SQLite index, so every worker on the host shares entries. Cache-Control
+    and Expires decide how long an entry is served without contacting the
+    origin; stale entries with an ETag or Last-Modified are revalidated.
+    Least recently used entries are evicted beyond ``max_bytes``.
+    """
+
+    def __init__(self, folder: str, max_bytes: int = SUBRESOURCE_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            os.makedirs(self.folder, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.folder, 'index.sqlite3'), timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        with self._ready_lock:
+            if not self._ready:
+                with conn:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS entries ('
+                        ' key TEXT PRIMARY KEY, url TEXT NOT NULL, redirected_url TEXT,'
+                        ' mime_type TEXT, encoding TEXT, etag TEXT, last_modified TEXT,'
+                        ' size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access)')
+                self._ready = True
+        return conn
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], key)
+
+    def _remove(self, conn: sqlite3.Connection, key: str) -> None:
+        conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._blob_path(key))
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Stored entry for ``url`` with its body and a ``fresh`` flag, or None"""
+        try:
+            conn = self._connect()
+            key = self.key_for(url)
+            row = conn.execute(
+                'SELECT redirected_url, mime_type, encoding, etag, last_modified, expires_at '
+                'FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._blob_path(key), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                with conn:
+                    self._remove(conn, key)
+                return None
+
+            now = time.time()
+            with conn:
+                conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+            return {
+                'string': body,
+                'redirected_url': row[0],
+                'mime_type': row[1],
+                'encoding': row[2],
+                'etag': row[3],
+                'last_modified': row[4],
+                'fresh': now < row[5],
+            }
+        except Exception as e:
+            logger.warning(f"Subresource cache lookup failed: {e}")
+            return None
+
+    def store(self, url: str, resource: Dict[str, Any], headers, lifetime: float) -> bool:
+        """Store a fetched resource for ``lifetime`` seconds"""
+        body = resource['string']
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        if lifetime <= 0 and not (etag or last_modified):
+            return False  # Could never be served without refetching it anyway
+        if len(body) > self.max_bytes:
+            return False
+
+        try:
+            conn = self._connect()
+            key = self.key_for(url)
+            blob_path = self._blob_path(key)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+            # Write to a temp file first so readers never see a partial body
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    out.write(body)
+                os.replace(tmp_path, blob_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            now = time.time()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, url, redirected_url, mime_type, encoding, etag,'
+                    ' last_modified, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, url, resource.get('redirected_url'), resource.get('mime_type'),
+                     resource.get('encoding'), etag, last_modified, len(body), now + lifetime, now)
+                )
+            self._evict_to_budget(conn)
+            return True
+        except Exception as e:
+            logger.warning(f"Subresource cache store failed: {e}")
+            return False
+
+    def refresh(self, url: str, headers, lifetime: Optional[float]) -> None:
+        """Extend an entry after a 304, or drop it if it may no longer be stored"""
+        try:
+            conn = self._connect()
+            key = self.key_for(url)
+            with conn:
+                if lifetime is None:
+                    self._remove(conn, key)
+                else:
+                    conn.execute('UPDATE entries SET expires_at = ? WHERE key = ?', (time.time() + lifetime, key))
+        except Exception as e:
+            logger.warning(f"Subresource cache refresh failed: {e}")
+
+    def _evict_to_budget(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        rows = conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall()
+        with conn:
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._remove(conn, key)
+                total -= size
+                evicted += 1
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            count, size = self._connect().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        except Exception:
+            count, size = 0, 0
+        return {'folder': self.folder, 'entries': count, 'size': size, 'max_bytes': self.max_bytes}
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_subresource_cache = None
+_subresource_cache_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Keep-alive HTTP session shared by conversions in this process"""
+    global _session, _session_pid
+    with _session_lock:
+        # Connections must not be shared with a forked batch worker
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _subresource_cache_folder() -> str:
+    folder = os.environ.get('HTML_PDF_CACHE_DIR')
+    if folder:
+        return folder
+    if has_app_context() and current_app.config.get('CONVERSION_CACHE_FOLDER'):
+        return os.path.join(current_app.config['CONVERSION_CACHE_FOLDER'], 'subresources')
+    return os.path.join(tempfile.gettempdir(), 'cropio-subresources')
+
+
+def get_subresource_cache(folder: Optional[str] = None) -> SubresourceCache:
+    """
+    Subresource cache shared by conversions in this process.
+
+    The folder is fixed on first use: ``folder`` if given, else
+    HTML_PDF_CACHE_DIR or the app's conversion cache folder.
+    """
+    global _subresource_cache
+    with _subresource_cache_lock:
+        if _subresource_cache is None:
+            _subresource_cache = SubresourceCache(folder or _subresource_cache_folder())
+        return _subresource_cache
+
+
+class ResourceFetcher:
+    """
+    WeasyPrint ``url_fetcher`` backed by a pooled session and ``SubresourceCache``.
+
+    Every URL, including each redirect hop, must pass ``validate_url``;
+    ``data:`` URLs are decoded locally and other schemes are refused.
+    """
+
+    def __init__(self, validate_url: Callable[[str], bool], cache: Optional[SubresourceCache] = None,
+                 session: Optional[requests.Session] = None, max_bytes: int = MAX_RESOURCE_BYTES):
+        self.validate_url = validate_url
+        self.cache = cache
+        self.session = session
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'fetched': 0}
+
+    def __call__(self, url: str, timeout: int = 10, ssl_context=None) -> Dict[str, Any]:
+        if url.startswith('data:'):
+            from weasyprint import default_url_fetcher
+            return default_url_fetcher(url, timeout=timeout)
+
+        if not self.validate_url(url):
+            raise ValueError(f"Blocked resource URL: {url}")
+
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached['fresh']:
+            self.stats['hits'] += 1
+            return self._result(cached)
+
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self._get(url, headers, timeout)
+        try:
+            if response.status_code == 304 and cached:
+                self.stats['revalidated'] += 1
+                self.cache.refresh(url, response.headers, freshness_lifetime(response.headers))
+                return self._result(cached)
+
+            response.raise_for_status()
+            mime_type, encoding = _content_type(response.headers)
+            resource = {
+                'string': self._read_body(response, url),
+                'mime_type': mime_type,
+                'encoding': encoding,
+                'redirected_url': response.url,
+            }
+        finally:
+            response.close()
+
+        self.stats['fetched'] += 1
+        lifetime = freshness_lifetime(response.headers)
+        if self.cache and response.status_code == 200 and lifetime is not None:
+            self.cache.store(url, resource, response.headers, lifetime)
+        return resource
+
+    def _get(self, url: str, headers: Dict[str, str], timeout) -> requests.Response:
+        """GET following redirects, validating every hop"""
+        session = self.session or get_http_session()
+        for _ in range(MAX_REDIRECTS + 1):
+            response = session.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            location = urljoin(url, response.headers['Location'])
+            response.close()
+            if not self.validate_url(location):
+                raise ValueError(f"Blocked redirect from {url} to {location}")
+            url = location
+            headers = {}  # Validators belong to the original URL
+        raise ValueError(f"Too many redirects for {url}")
+
+    def _read_body(self, response: requests.Response, url: str) -> bytes:
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ValueError(f"Resource exceeds {self.max_bytes} bytes: {url}")
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _result(cached: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: cached[key] for key in ('string', 'mime_type', 'encoding', 'redirected_url')}